@@ -1,10 +1,7 @@
 """GPT Image 2 节点 - 文生图和图片编辑"""
 
-import io
-import requests
-import numpy as np
+from pathlib import Path
 import torch
-from PIL import Image
 
 from ..Sora2.kuai_utils import (
     env_or,
@@ -12,6 +9,9 @@ from ..Sora2.kuai_utils import (
     http_headers_multipart,
     raise_for_bad_status,
 )
+from ..Utils import http_transport
+from ..Utils.image_decode import decode_images, load_images, parse_size, to_image_tensor
+from ..Utils.result_cache import ResultCache, request_key
 
 MODELS = ["gpt-image-2"]
 EDIT_MODELS = ["gpt-image-2"]
@@ -58,17 +58,27 @@ def _extract_urls(data: dict) -> list:
     raise RuntimeError(f"响应中没有图像数据: {data}")
 
 
-def _url_to_tensor(url: str, timeout: int) -> torch.Tensor:
+def _url_to_bytes(url: str, timeout: int) -> bytes:
     if url.startswith("data:"):
         import base64
-        content = base64.b64decode(url.split(",", 1)[1])
-    else:
-        resp = requests.get(url, timeout=timeout)
-        resp.raise_for_status()
-        content = resp.content
-    pil = Image.open(io.BytesIO(content)).convert("RGB")
-    arr = np.array(pil).astype(np.float32) / 255.0
-    return torch.from_numpy(arr)[None,]
+        return base64.b64decode(url.split(",", 1)[1])
+    resp = http_transport.get(url, timeout=timeout)
+    resp.raise_for_status()
+    return resp.content
+
+
+def _bytes_to_tensor(content: bytes) -> torch.Tensor:
+    return to_image_tensor(decode_images([content]))
+
+
+def _url_to_tensor(url: str, timeout: int) -> torch.Tensor:
+    return _bytes_to_tensor(_url_to_bytes(url, timeout))
+
+
+def _load_results(urls: list, timeout: int, size: str) -> tuple:
+    """并行下载全部结果并解码到同一个预分配张量，返回 (IMAGE 张量, 原始字节列表)"""
+    batch, contents = load_images(urls, lambda u: _url_to_bytes(u, timeout), parse_size(size))
+    return to_image_tensor(batch), contents
 
 
 class GPTImage2Generate:
@@ -87,6 +97,7 @@ class GPTImage2Generate:
             "optional": {
                 "api_base": ("STRING", {"default": "https://ai.kegeai.top", "tooltip": "API服务器地址"}),
                 "timeout": ("INT", {"default": 1800, "min": 30, "max": 9999, "tooltip": "超时时间(秒)"}),
+                "use_cache": ("BOOLEAN", {"default": False, "tooltip": "相同提示词/模型/尺寸/数量直接复用上次生成的图像，不再调用接口"}),
             }
         }
 
@@ -100,6 +111,7 @@ class GPTImage2Generate:
             "api_key": "API密钥",
             "api_base": "API地址",
             "timeout": "超时",
+            "use_cache": "使用结果缓存",
         }
 
     RETURN_TYPES = ("IMAGE", "STRING")
@@ -107,7 +119,8 @@ class GPTImage2Generate:
     FUNCTION = "generate"
     CATEGORY = "KuAi/GPTImage"
 
-    def generate(self, prompt, model, size, n, api_key, api_base="https://ai.kegeai.top", timeout=1800):
+    def generate(self, prompt, model, size, n, api_key, api_base="https://ai.kegeai.top", timeout=1800,
+                 use_cache=False):
         api_key = env_or(api_key, "KUAI_API_KEY")
         if not api_key:
             raise RuntimeError("API Key 未配置，请在节点参数或环境变量 KUAI_API_KEY 中设置")
@@ -115,7 +128,16 @@ class GPTImage2Generate:
             raise RuntimeError("提示词不能为空")
 
         payload = {"model": model, "prompt": prompt, "n": n, "size": SIZE_MAP.get(size, size)}
-        resp = requests.post(
+
+        cache_key = request_key("gptimage:generate", dict(payload, api_base=api_base)) if use_cache else None
+        if cache_key:
+            cached = ResultCache().get(cache_key)
+            if cached:
+                image_tensor = to_image_tensor(decode_images([Path(p).read_bytes() for p in cached["blobs"]]))
+                print(f"[GPTImage] 命中结果缓存，复用 {image_tensor.shape[0]} 张图像")
+                return (image_tensor, "\n".join(cached["urls"]))
+
+        resp = http_transport.post(
             f"{api_base.rstrip('/')}/v1/images/generations",
             json=payload,
             headers=http_headers_auth_only(api_key),
@@ -125,8 +147,12 @@ class GPTImage2Generate:
         data = resp.json()
 
         urls = _extract_urls(data)
-        tensors = [_url_to_tensor(u, timeout) for u in urls]
-        image_tensor = torch.cat(tensors, dim=0)
+        if len(urls) == 1 and not cache_key:
+            image_tensor = _url_to_tensor(urls[0], timeout)
+        else:
+            image_tensor, contents = _load_results(urls, timeout, payload["size"])
+            if cache_key:
+                ResultCache().put(cache_key, urls=[u for u in urls if not u.startswith("data:")], blobs=contents)
         print(f"[GPTImage] 文生图完成，生成 {len(urls)} 张图像")
         return (image_tensor, "\n".join(urls))
 
@@ -199,7 +225,7 @@ class GPTImage2Edit:
 
         files = []
         for i, url in enumerate(image_urls):
-            r = requests.get(url, timeout=timeout)
+            r = http_transport.get(url, timeout=timeout)
             r.raise_for_status()
             files.append(("image[]", (f"image_{i}.png", r.content, "image/png")))
 
@@ -214,7 +240,7 @@ class GPTImage2Edit:
             "moderation": moderation,
         }
 
-        resp = requests.post(
+        resp = http_transport.post(
             f"{api_base.rstrip('/')}/v1/images/edits",
             files=files,
             data=form_data,
@@ -225,8 +251,9 @@ class GPTImage2Edit:
         data = resp.json()
 
         urls = _extract_urls(data)
-        tensors = [_url_to_tensor(u, timeout) for u in urls]
-
-        image_tensor = torch.cat(tensors, dim=0)
+        if len(urls) == 1:
+            image_tensor = _url_to_tensor(urls[0], timeout)
+        else:
+            image_tensor, _ = _load_results(urls, timeout, form_data["size"])
         print(f"[GPTImage] 图片编辑完成，输入{len(image_urls)}张图，生成{len(urls)}张图像")
         return (image_tensor, "\n".join(urls))
@@ -1,14 +1,12 @@
 """gpt-image-2-all 节点"""
 
-import io
 import json
 
-import numpy as np
-import requests
 import torch
-from PIL import Image
 
 from ..Sora2.kuai_utils import env_or, http_headers_auth_only, raise_for_bad_status
+from ..Utils import http_transport
+from ..Utils.image_decode import decode_images, load_images, parse_size, to_image_tensor
 
 MODELS = ["gpt-image-2-all"]
 SIZES = ["1024x1024", "1536x1024", "1024x1536"]
@@ -23,13 +21,23 @@ def _extract_generation_result(payload: dict):
     return urls
 
 
+def _url_to_bytes(url: str, timeout: int) -> bytes:
+    resp = http_transport.get(url, timeout=timeout)
+    resp.raise_for_status()
+    return resp.content
+
+
 def _url_to_tensor(url: str, timeout: int) -> torch.Tensor:
     """从 URL 下载图片并转换为 ComfyUI IMAGE tensor"""
-    resp = requests.get(url, timeout=timeout)
-    resp.raise_for_status()
-    pil = Image.open(io.BytesIO(resp.content)).convert("RGB")
-    arr = np.array(pil).astype(np.float32) / 255.0
-    return torch.from_numpy(arr)[None, ...]
+    return to_image_tensor(decode_images([_url_to_bytes(url, timeout)]))
+
+
+def _urls_to_tensor(urls: list, timeout: int, size: str) -> torch.Tensor:
+    """下载全部结果并解码到同一个预分配张量（多张时并行下载与解码）"""
+    if len(urls) == 1:
+        return _url_to_tensor(urls[0], timeout)
+    batch, _ = load_images(urls, lambda url: _url_to_bytes(url, timeout), parse_size(size))
+    return to_image_tensor(batch)
 
 
 class GPTImage2AllGenerate:
@@ -79,7 +87,7 @@ class GPTImage2AllGenerate:
             "n": n,
             "prompt": prompt,
         }
-        resp = requests.post(
+        resp = http_transport.post(
             f"{api_base.rstrip('/')}/v1/images/generations",
             json=payload,
             headers=http_headers_auth_only(api_key),
@@ -91,7 +99,7 @@ class GPTImage2AllGenerate:
         urls = _extract_generation_result(data)
         revised = [str(item.get("revised_prompt", "")) for item in (data.get("data") or [])]
         raw = json.dumps(data, ensure_ascii=False)
-        image = torch.cat([_url_to_tensor(url, timeout) for url in urls], dim=0)
+        image = _urls_to_tensor(urls, timeout, size)
         return (image, "\n".join(urls), "\n".join(revised), raw)
 
 
@@ -177,7 +185,7 @@ class GPTImage2AllEdit:
             "prompt": prompt,
             "image": image_urls,
         }
-        resp = requests.post(
+        resp = http_transport.post(
             f"{api_base.rstrip('/')}/v1/images/generations",
             json=payload,
             headers=http_headers_auth_only(api_key),
@@ -189,5 +197,5 @@ class GPTImage2AllEdit:
         urls = _extract_generation_result(data)
         revised = [str(item.get("revised_prompt", "")) for item in (data.get("data") or [])]
         raw = json.dumps(data, ensure_ascii=False)
-        image = torch.cat([_url_to_tensor(url, timeout) for url in urls], dim=0)
+        image = _urls_to_tensor(urls, timeout, size)
         return (image, "\n".join(urls), "\n".join(revised), raw)
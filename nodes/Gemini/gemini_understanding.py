@@ -4,7 +4,6 @@ import os
 import io
 import json
 import tempfile
-import requests
 
 from ..Sora2.kuai_utils import (
     env_or,
@@ -14,6 +13,7 @@ from ..Sora2.kuai_utils import (
     extract_gemini_text_from_response,
     extract_error_message_from_response,
 )
+from ..Utils import http_transport
 
 
 def _save_video_input_to_temp_file(video_input):
@@ -157,7 +157,7 @@ class GeminiImageUnderstanding:
             print(f"[ComfyUI_KuAi_Power] Gemini 图片理解: {prompt[:50]}...")
 
             # 调用 API
-            resp = requests.post(
+            resp = http_transport.post(
                 url,
                 params={"key": api_key},
                 json=payload,
@@ -319,7 +319,7 @@ class GeminiVideoUnderstanding:
             print(f"[ComfyUI_KuAi_Power] Gemini 视频理解: {prompt[:50]}...")
 
             # 调用 API
-            resp = requests.post(
+            resp = http_transport.post(
                 url,
                 params={"key": api_key},
                 json=payload,
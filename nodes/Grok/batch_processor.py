@@ -3,11 +3,17 @@
 import json
 import os
 import time
-import requests
 import hashlib
+from concurrent.futures import as_completed
 from pathlib import Path
-from ..Sora2.kuai_utils import env_or
+from ..Sora2.kuai_utils import env_or, get_duration_for_grok_model
 from .grok import GrokCreateVideo, GrokQueryVideo
+from ..Utils.download_engine import download_file
+from ..Utils.download_queue import DownloadQueue
+from ..Utils.retry_policy import RetryScope
+from ..Utils.poll_engine import PollEngine, PollTimeoutError
+from ..Utils.poll_timing import timing_profile
+from ..Utils.task_source import load_tasks
 
 
 class GrokBatchProcessor:
@@ -107,7 +113,7 @@ class GrokBatchProcessor:
         """批量处理视频生成任务"""
         try:
             # 解析任务数据
-            tasks = json.loads(batch_tasks)
+            tasks = load_tasks(batch_tasks)
             if not tasks:
                 raise ValueError("没有任务需要处理")
 
@@ -142,32 +148,77 @@ class GrokBatchProcessor:
             print(f"[GrokBatch] 自动下载: {'是' if (auto_download and wait_for_completion) else '否'}")
             print(f"{'='*60}\n")
 
-            # 逐个处理任务
+            task_results_by_idx = {}
+            pending = {}
+
+            def _record_failure(idx, task, e):
+                results["failed"] += 1
+                error_msg = f"任务 {idx} (行 {task.get('_row_number', '?')}): {str(e)}"
+                results["errors"].append(error_msg)
+                print(f"\033[91m✗ {error_msg}\033[0m")
+
+            # 批量重试范围：每个任务的提交、轮询与下载共用一份重试预算，重试统计汇总到报告
+            batch_retry = RetryScope()
+
+            # 逐个提交任务；需要等待的任务交给共享轮询引擎跟踪，不阻塞后续提交
             for idx, task in enumerate(tasks, start=1):
+                task_retry = batch_retry.child()
                 try:
                     print(f"\n[{idx}/{len(tasks)}] 处理任务 (行 {task.get('_row_number', '?')})")
 
                     # 处理单个任务
-                    task_info = self._process_single_task(
-                        task, idx, api_key, api_base, output_dir,
-                        wait_for_completion, auto_download, video_save_dir,
-                        max_wait_time, poll_interval, download_timeout
-                    )
-
-                    results["success"] += 1
-                    results["task_ids"].append(task_info)
-                    print(f"✓ 任务 {idx} 完成")
+                    with task_retry.activate():
+                        task_info = self._process_single_task(
+                            task, idx, api_key, api_base
+                        )
+
+                    if wait_for_completion:
+                        # 轮询在登记时的上下文中执行，沿用该任务的重试预算
+                        with task_retry.activate():
+                            future = self._watch_completion(
+                                task_info, api_key, api_base, max_wait_time, poll_interval
+                            )
+                        pending[future] = (idx, task, task_info, task_retry)
+                    else:
+                        self._save_task_info(task_info, output_dir)
+                        results["success"] += 1
+                        task_results_by_idx[idx] = task_info
+                        print(f"✓ 任务 {idx} 完成")
 
                 except Exception as e:
-                    results["failed"] += 1
-                    error_msg = f"任务 {idx} (行 {task.get('_row_number', '?')}): {str(e)}"
-                    results["errors"].append(error_msg)
-                    print(f"\033[91m✗ {error_msg}\033[0m")
+                    _record_failure(idx, task, e)
 
                 # 任务间延迟
                 if idx < len(tasks) and delay_between_tasks > 0:
                     time.sleep(delay_between_tasks)
 
+            # 按完成先后收集轮询结果，下载交给独立的下载队列（不阻塞收集后续完成的任务）
+            if pending:
+                print(f"\n[GrokBatch] 提交完毕，等待 {len(pending)} 个任务完成...")
+            finishing = {}
+            for future in as_completed(pending):
+                idx, task, task_info, task_retry = pending[future]
+                # 下载在登记时的上下文中执行，沿用该任务的重试预算
+                with task_retry.activate():
+                    finish = DownloadQueue().submit(
+                        self._finish_task, future, task_info, auto_download, video_save_dir,
+                        max_wait_time, download_timeout
+                    )
+                finishing[finish] = (idx, task)
+            for finish in as_completed(finishing):
+                idx, task = finishing[finish]
+                try:
+                    task_info = finish.result()
+                    self._save_task_info(task_info, output_dir)
+                    results["success"] += 1
+                    task_results_by_idx[idx] = task_info
+                    print(f"✓ 任务 {idx} 完成")
+                except Exception as e:
+                    _record_failure(idx, task, e)
+
+            results["task_ids"] = [task_results_by_idx[i] for i in sorted(task_results_by_idx)]
+            results["retry"] = batch_retry.summary()
+
             # 保存任务列表
             tasks_file = os.path.join(output_dir, "tasks.json")
             with open(tasks_file, 'w', encoding='utf-8') as f:
@@ -187,10 +238,8 @@ class GrokBatchProcessor:
             print(f"\033[91m[GrokBatch] {error_msg}\033[0m")
             raise RuntimeError(error_msg)
 
-    def _process_single_task(self, task, task_idx, api_key, api_base, output_dir,
-                            wait_for_completion, auto_download, video_save_dir,
-                            max_wait_time, poll_interval, download_timeout):
-        """处理单个任务"""
+    def _process_single_task(self, task, task_idx, api_key, api_base):
+        """提交单个任务，返回任务信息"""
         # 必需参数
         prompt = task.get("prompt", "").strip()
         if not prompt:
@@ -216,9 +265,10 @@ class GrokBatchProcessor:
             print(f"  参考图片: {image_urls[:50]}...")
 
         # 创建任务
+        model = "grok-video-3 (6秒)"
         task_id, status, enhanced_prompt = self.creator.create(
             prompt=prompt,
-            model="grok-video-3 (6秒)",
+            model=model,
             aspect_ratio=aspect_ratio,
             size=size,
             enhance_prompt=enhance_prompt,
@@ -234,6 +284,7 @@ class GrokBatchProcessor:
         task_info = {
             "task_id": task_id,
             "prompt": prompt,
+            "model": model,
             "aspect_ratio": aspect_ratio,
             "size": size,
             "image_urls": image_urls,
@@ -244,66 +295,66 @@ class GrokBatchProcessor:
             "created_at": time.strftime("%Y-%m-%d %H:%M:%S")
         }
 
-        # 如果需要等待完成
-        if wait_for_completion:
-            print(f"  等待视频生成完成...")
-            task_info = self._wait_for_completion(
-                task_id, task_info, api_key, api_base, max_wait_time, poll_interval
-            )
+        return task_info
 
-            # 如果完成且需要下载
-            if auto_download and task_info.get("status") == "completed" and task_info.get("video_url"):
-                print(f"  开始下载视频...")
-                local_path = self._download_video(
-                    task_info["video_url"],
-                    output_prefix,
-                    video_save_dir,
-                    download_timeout
-                )
-                if local_path:
-                    task_info["local_path"] = local_path
-                    print(f"  ✓ 视频已保存: {local_path}")
-
-        # 保存任务信息
-        task_file = os.path.join(output_dir, f"{output_prefix}_{task_id.replace(':', '_')}.json")
+    def _save_task_info(self, task_info, output_dir):
+        """保存任务信息"""
+        task_file = os.path.join(output_dir, f"{task_info['output_prefix']}_{task_info['task_id'].replace(':', '_')}.json")
         with open(task_file, 'w', encoding='utf-8') as f:
             json.dump(task_info, f, ensure_ascii=False, indent=2)
 
-        return task_info
+    def _watch_completion(self, task_info, api_key, api_base, max_wait_time, poll_interval):
+        """登记到共享轮询引擎，返回完成时解析为 task_info 的 Future"""
+        task_id = task_info["task_id"]
 
-    def _wait_for_completion(self, task_id, task_info, api_key, api_base, max_wait_time, poll_interval):
-        """等待任务完成"""
-        elapsed = 0
+        def _query():
+            return self.querier.query(task_id, api_key, api_base)
 
-        while elapsed < max_wait_time:
-            time.sleep(poll_interval)
-            elapsed += poll_interval
+        def _check(elapsed, queried):
+            _, status, video_url, enhanced_prompt, _ = queried
 
-            try:
-                _, status, video_url, enhanced_prompt, _ = self.querier.query(task_id, api_key, api_base)
+            task_info["status"] = status
+            task_info["video_url"] = video_url
+            if enhanced_prompt:
+                task_info["enhanced_prompt"] = enhanced_prompt
 
-                task_info["status"] = status
-                task_info["video_url"] = video_url
-                if enhanced_prompt:
-                    task_info["enhanced_prompt"] = enhanced_prompt
+            if status == "completed":
+                print(f"  ✓ {task_id} 视频生成完成！")
+                print(f"  视频URL: {video_url}")
+                task_info["completed_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+                return True, task_info
 
-                if status == "completed":
-                    print(f"  ✓ 视频生成完成！")
-                    print(f"  视频URL: {video_url}")
-                    task_info["completed_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
-                    return task_info
+            print(f"  {task_id} 进行中... 已等待 {elapsed}/{max_wait_time} 秒")
+            return False, None
 
-                print(f"  进行中... 已等待 {elapsed}/{max_wait_time} 秒")
+        return PollEngine().watch(_query, _check, poll_interval, max_wait_time,
+                                  label=task_id, key=f"grok:{task_id}",
+                                  profile=timing_profile("grok", task_info["model"],
+                                                         get_duration_for_grok_model(task_info["model"])))
 
-            except RuntimeError:
-                raise
-            except Exception as e:
-                print(f"  查询出错: {str(e)}")
-                # 继续等待
+    def _finish_task(self, future, task_info, auto_download, video_save_dir,
+                     max_wait_time, download_timeout):
+        """取回轮询结果，完成且需要时下载视频（任务失败时抛出 RuntimeError）"""
+        try:
+            task_info = future.result()
+        except PollTimeoutError:
+            print(f"  ⚠ {task_info['task_id']} 等待超时（{max_wait_time}秒），任务仍在进行中")
+            task_info["timeout"] = True
+            return task_info
+
+        # 如果完成且需要下载
+        if auto_download and task_info.get("status") == "completed" and task_info.get("video_url"):
+            print(f"  开始下载视频...")
+            local_path = self._download_video(
+                task_info["video_url"],
+                task_info["output_prefix"],
+                video_save_dir,
+                download_timeout
+            )
+            if local_path:
+                task_info["local_path"] = local_path
+                print(f"  ✓ 视频已保存: {local_path}")
 
-        # 超时
-        print(f"  ⚠ 等待超时（{max_wait_time}秒），任务仍在进行中")
-        task_info["timeout"] = True
         return task_info
 
     def _download_video(self, video_url, output_prefix, video_save_dir, timeout):
@@ -327,12 +378,7 @@ class GrokBatchProcessor:
 
             # 下载视频
             print(f"  下载中: {video_url}")
-            resp = requests.get(video_url, timeout=timeout, stream=True)
-            resp.raise_for_status()
-
-            with open(filepath, 'wb') as f:
-                for chunk in resp.iter_content(chunk_size=8192):
-                    f.write(chunk)
+            download_file(video_url, filepath, timeout=timeout)
 
             # 返回相对路径
             rel_path = filepath.relative_to(comfy_root)
@@ -350,6 +396,8 @@ class GrokBatchProcessor:
             f"成功: {results['success']}",
             f"失败: {results['failed']}",
         ]
+        if results.get("retry"):
+            lines.append(f"网络重试: {results['retry']}")
 
         if results['task_ids']:
             lines.append(f"\n已创建的任务:")
@@ -1,17 +1,26 @@
-"""Grok CSV 并发批量处理器 — 从 CSV 读取任务，按批次并发提交、轮询、下载"""
+"""Grok CSV 并发批量处理器 — 从 CSV 读取任务，以滑动窗口并发提交、轮询、下载"""
 
 import json
 import os
 import time
-import requests
 import hashlib
 import concurrent.futures
 from pathlib import Path
 
-from ..Sora2.kuai_utils import env_or
+from ..Sora2.kuai_utils import env_or, get_duration_for_grok_model
 from .grok import GrokCreateVideo as _GrokCreateVideo
 from .grok import GrokQueryVideo as _GrokQueryVideo
-from ..Utils.batch_state import BatchProcessState
+from ..Utils.batch_state import BatchProcessState, SessionHandle
+from ..Utils import http_transport
+from ..Utils.download_engine import download_file
+from ..Utils.download_queue import DownloadQueue
+from ..Utils.retry_policy import RetryScope, bind_task
+from ..Utils.sliding_window import SlidingWindow
+from ..Utils.poll_engine import PollEngine
+from ..Utils.poll_timing import timing_profile
+from ..Utils.result_cache import ResultCache, request_key
+from ..Utils.task_source import TaskSource
+from ..Utils.job_manager import background_capable
 
 
 # ─────────────────────────────────────────────
@@ -26,11 +35,7 @@ def _download(video_url: str, save_dir: str, prefix: str, timeout: int) -> str:
         out_dir.mkdir(parents=True, exist_ok=True)
         url_hash = hashlib.md5(video_url.encode()).hexdigest()[:8]
         filepath = out_dir / f"{prefix}_{url_hash}.mp4"
-        resp = requests.get(video_url, timeout=timeout, stream=True)
-        resp.raise_for_status()
-        with open(filepath, "wb") as f:
-            for chunk in resp.iter_content(chunk_size=8192):
-                f.write(chunk)
+        download_file(video_url, filepath, timeout=timeout)
         return str(filepath.relative_to(comfy_root))
     except Exception as e:
         print(f"[GrokCSVConcurrent] 下载失败 ({prefix}): {e}")
@@ -43,16 +48,32 @@ def _process_one_task(task_idx: int, task: dict,
                       api_key: str, api_base: str,
                       save_dir: str, max_wait_time: int,
                       poll_interval: int, download_timeout: int,
-                      state_manager: BatchProcessState = None) -> dict:
+                      state_manager: SessionHandle = None,
+                      use_cache: bool = False) -> dict:
     """
     单任务完整流程：提交 → 轮询 → 下载。
     GrokCreateVideo.create() 统一处理文/图生视频：
       image_urls="" → 文生视频
       image_urls="https://..." → 图生视频
-    返回包含 task_id / status / video_url / local_path / error 的字典。
+    use_cache=True 时参数完全相同且本地视频仍在的任务直接复用结果缓存，不调用接口。
+    返回包含 task_id / status / video_url / local_path / error 的字典；
+    生成完成的任务交给下载队列，字典中的 "download" 为下载阶段的 Future，完成后补齐 local_path。
     """
     result = {"task_idx": task_idx, "row": task.get("_row_number", task_idx),
               "prompt": "", "status": "error", "video_url": "", "local_path": "", "error": ""}
+
+    def _fail(e):
+        result["error"] = str(e)
+        result["status"] = "failed"
+        print(f"[GrokCSVConcurrent] [{task_idx}] ✗ {e}")
+
+        # 更新状态：failed
+        if state_manager:
+            state_manager.update_task(task_idx, "failed", error=str(e))
+            state_manager.add_log(task_idx, "ERROR", f"任务失败 | 错误: {str(e)}")
+
+        return result
+
     try:
         prompt = task.get("prompt", "").strip()
         if not prompt:
@@ -69,9 +90,27 @@ def _process_one_task(task_idx: int, task: dict,
 
         result["prompt"] = prompt
 
+        cache_key = None
+        if use_cache:
+            cache_key = request_key("grok:video", {
+                "model": custom_model or model, "prompt": prompt, "aspect_ratio": aspect_ratio,
+                "size": size, "image_urls": image_urls, "enhance_prompt": enhance, "api_base": api_base,
+            })
+            cached = ResultCache().get(cache_key)
+            if cached and cached["files"]:
+                comfy_root = Path(__file__).parent.parent.parent.parent.parent
+                local = str(Path(cached["files"][0]).relative_to(comfy_root))
+                result.update(status="completed", video_url=cached["urls"][0] if cached["urls"] else "",
+                              local_path=local, task_id=cached["meta"].get("task_id", ""))
+                print(f"[GrokCSVConcurrent] [{task_idx}] 命中结果缓存，跳过生成 ({local})")
+                if state_manager:
+                    state_manager.update_task(task_idx, "completed", prompt=prompt,
+                                              video_url=result["video_url"], local_path=local)
+                return result
+
         # 更新状态：pending
         if state_manager:
-            state_manager.update_task(task_idx, "pending", prompt=prompt)
+            state_manager.update_task(task_idx, "pending", prompt=prompt, model=custom_model or model)
             state_manager.add_log(task_idx, "INFO", f"任务准备就绪 | 提示词: {prompt[:50]}...")
 
         # 1. 提交任务
@@ -90,58 +129,57 @@ def _process_one_task(task_idx: int, task: dict,
             state_manager.update_task(task_idx, "processing", task_id=task_id)
             state_manager.add_log(task_idx, "INFO", f"任务已提交 | task_id: {task_id} | 模型: {model}")
 
-        # 2. 轮询直到完成
+        # 2. 轮询直到完成（由共享轮询引擎调度，失败/超时以异常上抛）
         querier = _GrokQueryVideo()
-        elapsed = 0
-        while elapsed < max_wait_time:
-            time.sleep(poll_interval)
-            elapsed += poll_interval
-            try:
-                # query 返回 (task_id, status, video_url, enhanced_prompt, status_update_time)
-                _, status, video_url, _, _ = querier.query(task_id, api_key, api_base)
-                result["status"] = status
-
-                # 记录轮询日志
-                if state_manager:
-                    state_manager.add_log(task_idx, "DEBUG", f"轮询中 {elapsed}/{max_wait_time}s | 状态: {status}")
 
-                if status == "completed" and video_url:
-                    result["video_url"] = video_url
-                    print(f"[GrokCSVConcurrent] [{task_idx}] 完成，下载中...")
-
-                    # 更新状态：completed（下载前）
-                    if state_manager:
-                        state_manager.update_task(task_idx, "completed", video_url=video_url)
-                        state_manager.add_log(task_idx, "INFO", f"生成完成 | 开始下载: {video_url[:60]}...")
-
-                    local = _download(video_url, save_dir, output_prefix, download_timeout)
-                    result["local_path"] = local
+        def _check(elapsed, queried):
+            # query 返回 (task_id, status, video_url, enhanced_prompt, status_update_time)
+            _, status, video_url, _, _ = queried
+            result["status"] = status
+
+            # 记录轮询日志
+            if state_manager:
+                state_manager.add_log(task_idx, "DEBUG", f"轮询中 {elapsed}/{max_wait_time}s | 状态: {status}")
+
+            if status == "completed" and video_url:
+                return True, video_url
+            print(f"[GrokCSVConcurrent] [{task_idx}] 进行中 {elapsed}/{max_wait_time}s")
+            return False, None
+
+        effective_model = custom_model or model
+        video_url = PollEngine().wait(
+            lambda: querier.query(task_id, api_key, api_base),
+            _check, poll_interval, max_wait_time, key=f"grok:{task_id}",
+            profile=timing_profile("grok", effective_model, get_duration_for_grok_model(effective_model)))
+        result["video_url"] = video_url
+        print(f"[GrokCSVConcurrent] [{task_idx}] 完成，下载中...")
+
+        # 更新状态：生成完成、下载中（仍为 processing，下载完成后才计为 completed）
+        if state_manager:
+            state_manager.update_task(task_idx, "processing", video_url=video_url)
+            state_manager.add_log(task_idx, "INFO", f"生成完成 | 开始下载: {video_url[:60]}...")
 
-                    # 更新状态：completed（下载后）
-                    if state_manager:
-                        state_manager.update_task(task_idx, "completed", video_url=video_url, local_path=local)
-                        state_manager.add_log(task_idx, "INFO", f"下载完成 | 保存至: {local}")
+        # 3. 下载交给独立的下载队列：工作线程立即返回，不因 CDN 传输慢而占住并发名额
+        def _download_stage():
+            try:
+                local = _download(video_url, save_dir, output_prefix, download_timeout)
+                result["local_path"] = local
+                if cache_key and local:
+                    ResultCache().put(cache_key, urls=[video_url], files=[local], meta={"task_id": task_id})
 
-                    return result
-                print(f"[GrokCSVConcurrent] [{task_idx}] 进行中 {elapsed}/{max_wait_time}s")
-            except RuntimeError:
-                raise  # 任务失败，停止轮询
+                # 更新状态：completed（下载后）
+                if state_manager:
+                    state_manager.update_task(task_idx, "completed", video_url=video_url, local_path=local)
+                    state_manager.add_log(task_idx, "INFO", f"下载完成 | 保存至: {local}")
             except Exception as e:
-                print(f"[GrokCSVConcurrent] [{task_idx}] 查询出错（继续重试）: {e}")
+                _fail(e)
+            return result
 
-        raise RuntimeError(f"超时 ({max_wait_time}s)")
+        result["download"] = DownloadQueue().submit(_download_stage)
+        return result
 
     except Exception as e:
-        result["error"] = str(e)
-        result["status"] = "failed"
-        print(f"[GrokCSVConcurrent] [{task_idx}] ✗ {e}")
-
-        # 更新状态：failed
-        if state_manager:
-            state_manager.update_task(task_idx, "failed", error=str(e))
-            state_manager.add_log(task_idx, "ERROR", f"任务失败 | 错误: {str(e)}")
-
-        return result
+        return _fail(e)
 
 
 # ─────────────────────────────────────────────
@@ -176,7 +214,7 @@ class GrokCSVConcurrentProcessor:
                 }),
                 "batch_size": ("INT", {
                     "default": 10, "min": 1, "max": 20,
-                    "tooltip": "每批并发任务数（建议 5-10）"
+                    "tooltip": "同时进行的任务数（建议 5-10，任一任务结束立即补位）"
                 }),
                 "default_model": (["grok-video-3 (6秒)", "grok-video-3-10s (10秒)", "grok-video-3-15s (15秒)"],
                                   {"default": "grok-video-3 (6秒)", "tooltip": "CSV 中未指定 model 时的默认值"}),
@@ -190,6 +228,10 @@ class GrokCSVConcurrentProcessor:
                                           "tooltip": "单任务最大等待时间（秒）"}),
                 "poll_interval": ("INT", {"default": 10, "min": 5, "max": 60}),
                 "download_timeout": ("INT", {"default": 1800, "min": 30, "max": 9999}),
+                "use_cache": ("BOOLEAN", {"default": False,
+                                          "tooltip": "参数完全相同且本地视频仍在的任务直接复用上次的结果，不再调用接口"}),
+                "async_mode": ("BOOLEAN", {"default": False,
+                                           "tooltip": "后台运行：立即返回作业句柄，不占用执行队列；下游用「⏳ 等待后台作业」节点获取结果"}),
             }
         }
 
@@ -208,6 +250,8 @@ class GrokCSVConcurrentProcessor:
             "max_wait_time": "最大等待时间",
             "poll_interval": "轮询间隔",
             "download_timeout": "下载超时",
+            "use_cache": "使用结果缓存",
+            "async_mode": "后台运行",
         }
 
     RETURN_TYPES = ("STRING", "STRING", "STRING")
@@ -215,58 +259,80 @@ class GrokCSVConcurrentProcessor:
     FUNCTION = "process"
     CATEGORY = "KuAi/Grok"
 
+    @background_capable()
     def process(self, batch_tasks, api_key,
                 save_dir="output/grok", batch_size=10,
                 default_model="grok-video-3 (6秒)", default_aspect_ratio="3:2",
                 default_size="720P", default_enhance_prompt=True,
                 api_base="https://api.kegeai.top",
-                max_wait_time=1200, poll_interval=10, download_timeout=180):
+                max_wait_time=1200, poll_interval=10, download_timeout=180,
+                use_cache=False, session_id=""):
 
         api_key = env_or(api_key, "KUAI_API_KEY")
         if not api_key:
             raise RuntimeError("API Key 未配置")
 
-        tasks = json.loads(batch_tasks)
-        if not tasks:
+        source = TaskSource.from_input(batch_tasks)
+        if source.total == 0:
             raise RuntimeError("任务列表为空")
 
-        total = len(tasks)
+        # 流式任务源在读完之前总数未知，边读边更新
+        total = source.total
         all_results = []
 
-        # 初始化状态管理器
-        state_manager = BatchProcessState()
-        session_id = f"grok_{int(time.time())}"
-        state_manager.start_session(session_id, total)
+        # 初始化状态管理器（每次执行独立会话，与同时运行的其他批量节点互不干扰）
+        state_manager = BatchProcessState().start_session(session_id or f"grok_{int(time.time())}", total or 0)
+        session_id = state_manager.session_id
 
         print(f"\n{'='*60}")
-        print(f"[GrokCSVConcurrent] 共 {total} 个任务，每批 {batch_size} 路并发")
+        print(f"[GrokCSVConcurrent] 共 {total if total is not None else '?（流式读取）'} 个任务，滑动窗口 {batch_size} 路并发")
         print(f"[GrokCSVConcurrent] 保存目录: {save_dir}")
         print(f"[GrokCSVConcurrent] 会话ID: {session_id}")
         print(f"{'='*60}\n")
 
-        # 按 batch_size 分批并发处理
-        for batch_start in range(0, total, batch_size):
-            batch = tasks[batch_start: batch_start + batch_size]
-            batch_num = batch_start // batch_size + 1
-            total_batches = (total + batch_size - 1) // batch_size
-            print(f"\n[GrokCSVConcurrent] 批次 {batch_num}/{total_batches}：提交 {len(batch)} 个任务")
-
-            with concurrent.futures.ThreadPoolExecutor(max_workers=len(batch)) as executor:
-                future_map = {}
-                for local_i, task in enumerate(batch):
-                    global_idx = batch_start + local_i + 1
-                    future = executor.submit(
-                        _process_one_task,
-                        global_idx, task,
-                        default_model, default_aspect_ratio, default_size, default_enhance_prompt,
-                        api_key, api_base, save_dir, max_wait_time, poll_interval, download_timeout,
-                        state_manager  # 传递状态管理器
-                    )
-                    future_map[future] = global_idx
-
-                for future in concurrent.futures.as_completed(future_map):
-                    result = future.result()  # _process_one_task 内部不抛出，总是返回 dict
-                    all_results.append(result)
+        http_transport.ensure_pool_size(batch_size)
+        # 批量重试范围：汇总各任务的重试次数与原因（每个任务另有独立预算）
+        batch_retry = RetryScope()
+        downloads = []
+
+        process_one = bind_task(_process_one_task, batch_retry)
+
+        def _numbered():
+            """按窗口大小分块读取任务（流式任务源每次只读入一块），边读边登记总数"""
+            count = 0
+            for chunk in source.chunks(batch_size):
+                if total is None:
+                    state_manager.set_total(count + len(chunk))
+                for task in chunk:
+                    count += 1
+                    yield count, task
+
+        def _run(item):
+            idx, task = item
+            return process_one(
+                idx, task,
+                default_model, default_aspect_ratio, default_size, default_enhance_prompt,
+                api_key, api_base, save_dir, max_wait_time, poll_interval, download_timeout,
+                state_manager,  # 传递状态管理器
+                use_cache,
+            )
+
+        # 滑动窗口：始终保持 batch_size 个任务在途，任一任务结束立即补位（不再等待整批最慢的任务）
+        window = SlidingWindow(min(batch_size, total) if total else batch_size)
+        for _, future in window.run(_run, _numbered()):
+            result = future.result()  # _process_one_task 内部不抛出，总是返回 dict
+            if "download" in result:
+                downloads.append(result.pop("download"))
+            all_results.append(result)
+            print(f"[GrokCSVConcurrent] 进度 {len(all_results)}/{total if total is not None else '?'}")
+
+        # 后续任务的提交不等待已完成任务的下载；报告前等待下载队列完成全部下载
+        concurrent.futures.wait(downloads)
+
+        if total is None:
+            total = len(all_results)
+            if not total:
+                raise RuntimeError("任务列表为空")
 
         # 生成报告
         success = [r for r in all_results if r.get("status") == "completed"]
@@ -276,6 +342,8 @@ class GrokCSVConcurrentProcessor:
             f"\n{'='*60}",
             f"Grok CSV 并发处理完成",
             f"总计: {total}  成功: {len(success)}  失败: {len(failed)}",
+            f"网络重试: {batch_retry.summary()}",
+            f"并发利用率: {window.summary()}",
             f"保存目录: {save_dir}",
             f"{'='*60}",
         ]
@@ -302,6 +370,8 @@ class GrokCSVConcurrentProcessor:
             "total": total,
             "success": len(success),
             "failed": len(failed),
+            "retry": batch_retry.to_dict(),
+            "window": window.to_dict(),
             "tasks": [
                 {
                     "idx": r["task_idx"],
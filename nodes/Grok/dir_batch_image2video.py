@@ -1,22 +1,36 @@
 """Grok 目录批量图生视频（一键闭环）
 
 完整链路：扫描本地目录 → 并发上传图片 → 并发图生视频 → 轮询 → 下载 MP4
+各阶段以流水线方式重叠：每张图片上传完成即提交生成，生成完成即进入下载队列。
+目录下的清单（.kuai_manifest.json）记录每张图片的处理结果，重复运行时只处理新增或修改过的图片；
+监视模式下处理完已有图片后继续等待新图片放入目录。
 单节点完成全部操作，无需串联多个节点。
 """
 
 import json
 import os
-import io
 import time
+import io
 import hashlib
-import requests
+import itertools
 import concurrent.futures
 from pathlib import Path
+from typing import Callable, Iterable, Optional
 from PIL import Image
 
-from ..Sora2.kuai_utils import env_or, http_headers_multipart
+from ..Sora2.kuai_utils import env_or, http_headers_multipart, get_duration_for_grok_model
 from .grok import GrokCreateVideo as _GrokCreateVideo
 from .grok import GrokQueryVideo as _GrokQueryVideo
+from ..Utils import http_transport
+from ..Utils.batch_state import BatchProcessState
+from ..Utils.download_engine import download_file
+from ..Utils.download_queue import DownloadQueue
+from ..Utils.upload_index import UploadIndex, upload_key
+from ..Utils.retry_policy import RetryScope, bind_task
+from ..Utils.sliding_window import SlidingWindow, WAIT
+from ..Utils.dir_manifest import DirManifest, params_key, watch_new_files
+from ..Utils.poll_engine import PollEngine
+from ..Utils.poll_timing import timing_profile
 
 
 # ─────────────────────────────────────────────
@@ -34,22 +48,27 @@ def _natural_sort_key(path: Path):
             for c in re.split(r'(\d+)', path.stem)]
 
 
-def _scan_images(directory: str, max_images: int) -> list[Path]:
-    """扫描目录中的图片文件，按自然数字排序"""
+def _list_images(d: Path) -> list[Path]:
+    """列出目录中的图片文件，按自然数字排序"""
+    files = [f for f in d.iterdir()
+             if f.is_file() and f.suffix.lower() in _IMAGE_EXTS]
+    files.sort(key=_natural_sort_key)
+    return files
+
+
+def _scan_images(directory: str, max_images: int, allow_empty: bool = False) -> list[Path]:
+    """扫描目录中的图片文件，按自然数字排序（allow_empty 为真时目录为空不报错，用于监视模式）"""
     d = Path(directory.strip())
     if not d.exists():
         raise RuntimeError(f"目录不存在: {d}")
     if not d.is_dir():
         raise RuntimeError(f"路径不是目录: {d}")
 
-    files = [f for f in d.iterdir()
-             if f.is_file() and f.suffix.lower() in _IMAGE_EXTS]
+    files = _list_images(d)
 
-    if not files:
+    if not files and not allow_empty:
         raise RuntimeError(f"目录中没有找到图片: {d}")
 
-    files.sort(key=_natural_sort_key)
-
     if len(files) > max_images:
         print(f"{_LOG_TAG} 目录共 {len(files)} 张图片，限制为 {max_images} 张")
         files = files[:max_images]
@@ -59,7 +78,15 @@ def _scan_images(directory: str, max_images: int) -> list[Path]:
 
 def _upload_one(image_path: Path, upload_url: str, fmt: str,
                 quality: int, timeout: int) -> str:
-    """上传单张图片，返回 CDN URL"""
+    """上传单张图片，返回 CDN URL（相同文件内容在有效期内直接复用上次的 URL）"""
+    index = UploadIndex()
+    key = ""
+    if index.enabled:
+        key = upload_key(index.file_digest(image_path), upload_url, f"{fmt}:{quality}")
+        hit = index.lookup(key)
+        if hit:
+            return hit["url"]
+
     pil = Image.open(image_path)
     if pil.mode not in ('RGB', 'RGBA'):
         pil = pil.convert('RGB')
@@ -75,8 +102,8 @@ def _upload_one(image_path: Path, upload_url: str, fmt: str,
 
     ext = 'jpg' if fmt == 'jpeg' else fmt
     files = {"file": (f"{image_path.stem}.{ext}", buf, f"image/{fmt}")}
-    resp = requests.post(upload_url, headers=http_headers_multipart(),
-                         files=files, timeout=timeout)
+    resp = http_transport.post(upload_url, headers=http_headers_multipart(),
+                               files=files, timeout=timeout)
 
     if resp.status_code >= 400:
         raise RuntimeError(f"上传失败 HTTP {resp.status_code}: {resp.text[:200]}")
@@ -84,14 +111,19 @@ def _upload_one(image_path: Path, upload_url: str, fmt: str,
     url = resp.json().get("url", "")
     if not url:
         raise RuntimeError(f"上传响应缺少 url: {resp.text[:200]}")
+    if key:
+        index.record(key, url)
     return url
 
 
-def _upload_batch(image_paths: list[Path], upload_url: str, fmt: str,
-                  quality: int, timeout: int, workers: int) -> list[dict]:
-    """并发上传多张图片，返回 [{index, path, url, error}]"""
-    results = []
+def _upload_stream(image_paths: Iterable, upload_url: str, fmt: str,
+                   quality: int, timeout: int, workers: int,
+                   retry: Optional[RetryScope] = None):
+    """并发上传多张图片，按完成先后逐个产出 {index, path, url, error}；每张图片的重试计入 retry
 
+    调用方每取走一个结果才补充一个新的上传，已上传但尚未取走的结果不超过 workers 个（阶段间背压）。
+    image_paths 可以是监视目录的生成器：其中的 WAIT（暂时没有新图片）原样传给调用方。
+    """
     def _worker(idx_path):
         idx, path = idx_path
         try:
@@ -102,14 +134,18 @@ def _upload_batch(image_paths: list[Path], upload_url: str, fmt: str,
             print(f"{_LOG_TAG} [{idx}] 上传失败: {path.name} - {e}")
             return {"index": idx, "path": path, "url": "", "error": str(e)}
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
-        futures = [pool.submit(_worker, (i, p))
-                   for i, p in enumerate(image_paths, 1)]
-        for f in concurrent.futures.as_completed(futures):
-            results.append(f.result())
+    def _numbered():
+        idx = 0
+        for path in image_paths:
+            if path is WAIT:
+                yield WAIT
+                continue
+            idx += 1
+            yield idx, path
 
-    results.sort(key=lambda r: r["index"])
-    return results
+    window = SlidingWindow(workers, thread_name_prefix="kuai-upload")
+    for _, f in window.run(bind_task(_worker, retry), _numbered()):
+        yield WAIT if f is None else f.result()
 
 
 def _download_video(video_url: str, save_dir: str, prefix: str,
@@ -121,11 +157,7 @@ def _download_video(video_url: str, save_dir: str, prefix: str,
         out_dir.mkdir(parents=True, exist_ok=True)
         url_hash = hashlib.md5(video_url.encode()).hexdigest()[:8]
         filepath = out_dir / f"{prefix}_{url_hash}.mp4"
-        resp = requests.get(video_url, timeout=timeout, stream=True)
-        resp.raise_for_status()
-        with open(filepath, "wb") as f:
-            for chunk in resp.iter_content(chunk_size=8192):
-                f.write(chunk)
+        download_file(video_url, filepath, timeout=timeout)
         return str(filepath.relative_to(comfy_root))
     except Exception as e:
         print(f"{_LOG_TAG} 下载失败 ({prefix}): {e}")
@@ -138,8 +170,12 @@ def _process_one(task_idx: int, image_url: str, prompt: str,
                  enhance_prompt: bool, custom_model: str,
                  api_key: str, api_base: str,
                  save_dir: str, max_wait: int,
-                 poll_interval: int, dl_timeout: int) -> dict:
-    """单任务完整流程：提交 → 轮询 → 下载"""
+                 poll_interval: int, dl_timeout: int,
+                 on_downloaded: Optional[Callable[[dict], None]] = None) -> dict:
+    """单任务完整流程：提交 → 轮询 → 下载（下载在下载队列中进行，结果中的 "download" 为其 Future）
+
+    on_downloaded(result) 在下载结束后、下载 Future 完成前调用，等待该 Future 的一方返回时结果已记录。
+    """
     result = {"idx": task_idx, "prompt": prompt, "status": "error",
               "video_url": "", "local_path": "", "error": ""}
     try:
@@ -156,27 +192,36 @@ def _process_one(task_idx: int, image_url: str, prompt: str,
 
         # 2. 轮询
         querier = _GrokQueryVideo()
-        elapsed = 0
-        while elapsed < max_wait:
-            time.sleep(poll_interval)
-            elapsed += poll_interval
-            try:
-                _, status, video_url, _, _ = querier.query(
-                    task_id, api_key, api_base)
-                result["status"] = status
-                if status == "completed" and video_url:
-                    result["video_url"] = video_url
-                    print(f"{_LOG_TAG} [{task_idx}] 生成完成，下载中...")
-                    result["local_path"] = _download_video(
-                        video_url, save_dir, output_prefix, dl_timeout)
-                    return result
-                print(f"{_LOG_TAG} [{task_idx}] 进行中 {elapsed}/{max_wait}s")
-            except RuntimeError:
-                raise
-            except Exception as e:
-                print(f"{_LOG_TAG} [{task_idx}] 查询出错（重试）: {e}")
-
-        raise RuntimeError(f"超时 ({max_wait}s)")
+
+        def _check(elapsed, queried):
+            _, status, video_url, _, _ = queried
+            result["status"] = status
+            if status == "completed" and video_url:
+                return True, video_url
+            print(f"{_LOG_TAG} [{task_idx}] 进行中 {elapsed}/{max_wait}s")
+            return False, None
+
+        effective_model = custom_model or model
+        video_url = PollEngine().wait(
+            lambda: querier.query(task_id, api_key, api_base),
+            _check, poll_interval, max_wait, key=f"grok:{task_id}",
+            profile=timing_profile("grok", effective_model, get_duration_for_grok_model(effective_model)))
+        result["video_url"] = video_url
+        print(f"{_LOG_TAG} [{task_idx}] 生成完成，下载中...")
+
+        # 3. 下载交给独立的下载队列，工作线程不必等待传输完成
+        def _download_stage():
+            result["local_path"] = _download_video(
+                video_url, save_dir, output_prefix, dl_timeout)
+            if on_downloaded is not None:
+                try:
+                    on_downloaded(result)
+                except Exception as e:
+                    print(f"{_LOG_TAG} [{task_idx}] 记录结果失败: {e}")
+            return result
+
+        result["download"] = DownloadQueue().submit(_download_stage)
+        return result
 
     except Exception as e:
         result["error"] = str(e)
@@ -250,7 +295,7 @@ class GrokDirBatchImage2Video:
                 }),
                 "batch_size": ("INT", {
                     "default": 5, "min": 1, "max": 20,
-                    "tooltip": "每批并发任务数（图生视频阶段）"
+                    "tooltip": "同时进行的任务数（图生视频阶段，任一任务结束立即补位）"
                 }),
                 "upload_workers": ("INT", {
                     "default": 5, "min": 1, "max": 20,
@@ -260,6 +305,16 @@ class GrokDirBatchImage2Video:
                     "default": 100, "min": 1, "max": 500,
                     "tooltip": "最大处理图片数"
                 }),
+                "skip_processed": ("BOOLEAN", {
+                    "default": True,
+                    "tooltip": "跳过已处理的图片：目录清单中记录为已生成（提示词、模型等参数相同且输出文件仍在）"
+                               "且内容未修改的图片不再重复生成"
+                }),
+                "watch_minutes": ("INT", {
+                    "default": 0, "min": 0, "max": 1440,
+                    "tooltip": "监视模式：大于 0 时处理完已有图片后继续监视目录，新图片写入完成即进入流水线，"
+                               "连续 N 分钟没有新图片后结束（0 为关闭）"
+                }),
                 "upload_url": ("STRING", {
                     "default": "https://imageproxy.zhongzhuan.chat/api/upload",
                     "tooltip": "图床上传地址"
@@ -304,6 +359,8 @@ class GrokDirBatchImage2Video:
             "batch_size": "并发批次大小",
             "upload_workers": "上传并发数",
             "max_images": "最大图片数",
+            "skip_processed": "跳过已处理",
+            "watch_minutes": "监视时长（分钟）",
             "upload_url": "图床地址",
             "upload_format": "上传格式",
             "upload_quality": "图片质量",
@@ -313,6 +370,18 @@ class GrokDirBatchImage2Video:
             "download_timeout": "下载超时",
         }
 
+    @classmethod
+    def IS_CHANGED(cls, directory_path="", watch_minutes=0, **kwargs):
+        """目录中的图片增加、删除或修改时重新执行；监视模式每次都执行"""
+        if watch_minutes > 0:
+            return float("nan")
+        try:
+            files = _list_images(Path(directory_path.strip()))
+            listing = "|".join(f"{f.name}:{f.stat().st_size}:{f.stat().st_mtime_ns}" for f in files)
+        except OSError:
+            return float("nan")
+        return hashlib.md5(listing.encode()).hexdigest()
+
     RETURN_TYPES = ("STRING", "STRING")
     RETURN_NAMES = ("处理报告", "视频保存目录")
     FUNCTION = "run"
@@ -326,7 +395,8 @@ class GrokDirBatchImage2Video:
             upload_url="https://imageproxy.zhongzhuan.chat/api/upload",
             upload_format="jpeg", upload_quality=90,
             api_base="https://api.kegeai.top",
-            max_wait_time=1200, poll_interval=10, download_timeout=180):
+            max_wait_time=1200, poll_interval=10, download_timeout=180,
+            skip_processed=True, watch_minutes=0, session_id=""):
 
         api_key = env_or(api_key, "KUAI_API_KEY")
         if not api_key:
@@ -334,63 +404,123 @@ class GrokDirBatchImage2Video:
         if not prompt.strip():
             raise RuntimeError("提示词不能为空")
 
+        http_transport.ensure_pool_size(batch_size + upload_workers)
+
         # ── 阶段 1：扫描目录 ──
         print(f"\n{'='*60}")
-        print(f"{_LOG_TAG} 阶段 1/3：扫描目录")
+        print(f"{_LOG_TAG} 阶段 1/2：扫描目录")
         print(f"{'='*60}")
 
-        image_paths = _scan_images(directory_path, max_images)
-        print(f"{_LOG_TAG} 找到 {len(image_paths)} 张图片")
-
-        # ── 阶段 2：并发上传 ──
+        watching = watch_minutes > 0
+        image_paths = _scan_images(directory_path, max_images, allow_empty=watching)
+        scan_dir = Path(directory_path.strip())
+        manifest = DirManifest(scan_dir)
+        run_key = params_key(provider="grok", prompt=prompt, model=model, custom_model=custom_model,
+                             aspect_ratio=aspect_ratio, size=size, enhance_prompt=enhance_prompt)
+        pending = manifest.pending(image_paths, run_key) if skip_processed else list(image_paths)
+        skipped = len(image_paths) - len(pending)
+        print(f"{_LOG_TAG} 找到 {len(image_paths)} 张图片"
+              + (f"，其中 {skipped} 张已处理过，跳过" if skipped else ""))
+
+        sources = pending
+        if watching:
+            print(f"{_LOG_TAG} 监视模式：处理完已有图片后继续监视目录，连续 {watch_minutes} 分钟没有新图片时结束")
+            accept = (lambda p: not manifest.is_done(p, run_key)) if skip_processed else (lambda p: True)
+            sources = itertools.chain(pending, watch_new_files(
+                lambda: _list_images(scan_dir), _list_images(scan_dir), accept,
+                watch_minutes * 60, limit=max(max_images - len(pending), 0)))
+
+        # ── 阶段 2：流水线（上传 → 图生视频 → 轮询 → 下载）──
         print(f"\n{'='*60}")
-        print(f"{_LOG_TAG} 阶段 2/3：并发上传（{upload_workers} 线程）")
+        print(f"{_LOG_TAG} 阶段 2/2：流水线（上传 {upload_workers} 线程 → "
+              f"图生视频滑动窗口 {batch_size} 路 → 下载队列）")
         print(f"{'='*60}")
 
-        upload_results = _upload_batch(
-            image_paths, upload_url, upload_format,
-            upload_quality, 30, upload_workers)
-
-        # 过滤上传成功的
-        uploaded = [r for r in upload_results if r["url"]]
-        upload_failed = [r for r in upload_results if not r["url"]]
-
-        if not uploaded:
+        batch_retry = RetryScope()
+        uploaded, upload_failed = [], []
+        all_results, downloads = [], []
+        total = len(pending)
+        comfy_root = Path(__file__).resolve().parent.parent.parent.parent.parent
+        # 每次执行独立会话（热文件夹守护传入固定的 session_id），进度经实时监控推送
+        state = BatchProcessState().start_session(session_id or f"grok_dir_{int(time.time())}", total)
+        queued = total
+
+        def _uploaded():
+            """上传成功的图片立即交给生成阶段，失败的记录下来"""
+            nonlocal queued
+            for r in _upload_stream(sources, upload_url, upload_format,
+                                    upload_quality, 30, upload_workers, batch_retry):
+                if r is WAIT:
+                    yield r
+                    continue
+                if r["index"] > queued:
+                    # 监视模式下新图片陆续加入
+                    queued = r["index"]
+                    state.set_total(queued)
+                if r["url"]:
+                    manifest.record_upload(r["path"], r["url"])
+                    state.update_task(r["index"], "processing", prompt=prompt, model=custom_model or model)
+                    state.add_log(r["index"], "INFO", f"上传完成 | {r['path'].name}")
+                    uploaded.append(r)
+                    yield r
+                else:
+                    state.update_task(r["index"], "failed", error=r["error"])
+                    state.add_log(r["index"], "ERROR", f"上传失败 | {r['path'].name}: {r['error']}")
+                    upload_failed.append(r)
+
+        def _record(path, result):
+            """把生成结果写入目录清单（下次运行据此跳过已完成的图片）与会话状态"""
+            local_path = result.get("local_path", "")
+            ok = result.get("status") == "completed" and bool(local_path)
+            error = result.get("error", "") or ("" if ok else "下载失败")
+            manifest.record_result(path, run_key, task_id=result.get("task_id", ""),
+                                   output=str(comfy_root / local_path) if ok else "",
+                                   status="completed" if ok else "failed", error=error)
+            state.update_task(result["idx"], "completed" if ok else "failed",
+                              task_id=result.get("task_id", ""), video_url=result.get("video_url", ""),
+                              local_path=local_path, error=error)
+            state.add_log(result["idx"], "INFO" if ok else "ERROR",
+                          f"完成 | 保存至: {local_path}" if ok else f"失败 | {path.name}: {error}")
+
+        process_one = bind_task(_process_one, batch_retry)
+
+        def _run(item):
+            idx = item["index"]
+            return process_one(
+                idx, item["url"], prompt, f"{output_prefix}_{idx}",
+                model, aspect_ratio, size, enhance_prompt, custom_model,
+                api_key, api_base, save_dir, max_wait_time,
+                poll_interval, download_timeout,
+                # 下载完成后才记录，输出文件确实存在时才算已处理
+                on_downloaded=lambda r, p=item["path"]: _record(p, r))
+
+        # 滑动窗口：始终保持 batch_size 个任务在途，任一任务结束立即从上传阶段取下一张补位
+        window = SlidingWindow(batch_size if watching else min(batch_size, total))
+        for item, f in window.run(_run, _uploaded()):
+            if f is None:
+                continue
+            result = f.result()
+            if "download" in result:
+                # 结果在下载阶段内记录（见 on_downloaded），等待全部下载即等待全部记录完成
+                downloads.append(result.pop("download"))
+            else:
+                _record(item["path"], result)
+            all_results.append(result)
+            finished = len(all_results) + len(upload_failed)
+            print(f"{_LOG_TAG} 已完成 {finished} 张（监视中）" if watching
+                  else f"{_LOG_TAG} 进度 {finished}/{total}")
+
+        attempted = len(uploaded) + len(upload_failed)
+        if upload_failed and not uploaded:
             raise RuntimeError("所有图片上传失败，无法继续")
 
-        print(f"{_LOG_TAG} 上传完成: 成功 {len(uploaded)}/{len(upload_results)}")
-        if upload_failed:
-            for r in upload_failed:
-                print(f"{_LOG_TAG}   上传失败: {r['path'].name} - {r['error']}")
-
-        # ── 阶段 3：并发图生视频 + 轮询 + 下载 ──
-        print(f"\n{'='*60}")
-        print(f"{_LOG_TAG} 阶段 3/3：并发图生视频（每批 {batch_size} 路）")
-        print(f"{'='*60}")
+        upload_failed.sort(key=lambda r: r["index"])
+        print(f"{_LOG_TAG} 上传完成: 成功 {len(uploaded)}/{attempted}")
+        for r in upload_failed:
+            print(f"{_LOG_TAG}   上传失败: {r['path'].name} - {r['error']}")
 
-        all_results = []
-        total = len(uploaded)
-
-        for batch_start in range(0, total, batch_size):
-            batch = uploaded[batch_start:batch_start + batch_size]
-            batch_num = batch_start // batch_size + 1
-            total_batches = (total + batch_size - 1) // batch_size
-            print(f"\n{_LOG_TAG} 批次 {batch_num}/{total_batches}：提交 {len(batch)} 个任务")
-
-            with concurrent.futures.ThreadPoolExecutor(max_workers=len(batch)) as pool:
-                future_map = {}
-                for item in batch:
-                    idx = item["index"]
-                    prefix = f"{output_prefix}_{idx}"
-                    future = pool.submit(
-                        _process_one, idx, item["url"], prompt, prefix,
-                        model, aspect_ratio, size, enhance_prompt, custom_model,
-                        api_key, api_base, save_dir, max_wait_time,
-                        poll_interval, download_timeout)
-                    future_map[future] = idx
-
-                for f in concurrent.futures.as_completed(future_map):
-                    all_results.append(f.result())
+        # 报告前等待下载队列完成全部下载
+        concurrent.futures.wait(downloads)
 
         # ── 生成报告 ──
         all_results.sort(key=lambda r: r["idx"])
@@ -401,9 +531,11 @@ class GrokDirBatchImage2Video:
             f"\n{'='*60}",
             f"Grok 目录批量图生视频完成",
             f"目录: {directory_path}",
-            f"图片: {len(image_paths)}  上传成功: {len(uploaded)}  "
+            f"图片: {skipped + attempted}  跳过(已处理): {skipped}  上传成功: {len(uploaded)}  "
             f"生成成功: {len(success)}  生成失败: {len(failed)}",
             f"保存目录: {save_dir}",
+            f"网络重试: {batch_retry.summary()}",
+            f"并发利用率: {window.summary()}",
             f"{'='*60}",
         ]
 
@@ -423,7 +555,6 @@ class GrokDirBatchImage2Video:
         report = "\n".join(lines)
         print(report)
 
-        comfy_root = Path(__file__).resolve().parent.parent.parent.parent.parent
         abs_save_dir = str(comfy_root / save_dir)
 
         return (report, abs_save_dir)
@@ -3,7 +3,6 @@
 import json
 import os
 import time
-import requests
 from ..Sora2.kuai_utils import (
     env_or,
     http_headers_json,
@@ -12,6 +11,7 @@ from ..Sora2.kuai_utils import (
     extract_error_message_from_response,
     extract_task_failure_detail,
 )
+from ..Utils import http_transport
 
 
 class GrokCreateVideo:
@@ -120,7 +120,7 @@ class GrokCreateVideo:
             print(f"[ComfyUI_KuAi_Power] 提示词增强: 已启用")
 
         try:
-            resp = requests.post(
+            resp = http_transport.post(
                 f"{api_base}/v1/video/create",
                 json=payload,
                 headers=headers,
@@ -199,7 +199,7 @@ class GrokQueryVideo:
         print(f"[ComfyUI_KuAi_Power] Grok 查询任务: {task_id}")
 
         try:
-            resp = requests.get(
+            resp = http_transport.get(
                 f"{api_base}/v1/video/query",
                 params={"id": task_id},
                 headers=headers,
@@ -506,7 +506,7 @@ class GrokImage2Video:
 
         # 4. 调用 API
         try:
-            resp = requests.post(
+            resp = http_transport.post(
                 f"{api_base}/v1/video/create",
                 json=payload,
                 headers=headers,
@@ -781,7 +781,7 @@ class GrokText2Video:
         print(f"[ComfyUI_KuAi_Power] 模型: {effective_model}, 宽高比: {aspect_ratio}, 分辨率: {effective_size}")
 
         try:
-            resp = requests.post(
+            resp = http_transport.post(
                 f"{api_base}/v1/video/create",
                 json=payload,
                 headers=headers,
@@ -1020,7 +1020,7 @@ class GrokExtendVideo:
         print(f"[ComfyUI_KuAi_Power] 模型: {effective_model}, 宽高比: {aspect_ratio}, 分辨率: {size}")
 
         try:
-            resp = requests.post(f"{api_base}/v1/video/extend", json=payload, headers=headers, timeout=30)
+            resp = http_transport.post(f"{api_base}/v1/video/extend", json=payload, headers=headers, timeout=30)
             if resp.status_code >= 400:
                 detail = extract_error_message_from_response(resp)
                 raise RuntimeError(explain_grok_extend_error(detail))
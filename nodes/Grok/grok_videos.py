@@ -3,8 +3,6 @@
 import json
 import time
 
-import requests
-
 from ..Sora2.kuai_utils import (
     env_or,
     extract_error_message_from_response,
@@ -12,6 +10,7 @@ from ..Sora2.kuai_utils import (
     http_headers_auth_only,
     http_headers_json,
 )
+from ..Utils import http_transport
 
 
 _ALLOWED_SECONDS = {"6", "10"}
@@ -190,7 +189,7 @@ class GrokVideosCreateVideo:
             print("[ComfyUI_KuAi_Power] 模式: 文生视频")
 
         try:
-            resp = requests.post(
+            resp = http_transport.post(
                 f"{api_base}/v1/videos",
                 files=files,
                 headers=headers,
@@ -264,7 +263,7 @@ class GrokVideosQueryVideo:
         print(f"[ComfyUI_KuAi_Power] Grok-videos 查询任务: {normalized_task_id}")
 
         try:
-            resp = requests.get(
+            resp = http_transport.get(
                 f"{api_base}/v1/video/query",
                 params={"id": normalized_task_id},
                 headers=headers,
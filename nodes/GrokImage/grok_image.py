@@ -1,12 +1,10 @@
-import io
 import json
 
-import numpy as np
-import requests
 import torch
-from PIL import Image
 
 from ..Sora2.kuai_utils import env_or, extract_error_message_from_response, http_headers_auth_only
+from ..Utils import http_transport
+from ..Utils.image_decode import decode_images, to_image_tensor
 
 MODELS = [
     "grok-4.2-image",
@@ -25,11 +23,9 @@ QUALITIES = ["low", "medium", "high"]
 
 
 def _download_image_as_tensor(url: str, timeout: int) -> torch.Tensor:
-    resp = requests.get(url, timeout=timeout)
+    resp = http_transport.get(url, timeout=timeout)
     resp.raise_for_status()
-    pil = Image.open(io.BytesIO(resp.content)).convert("RGB")
-    arr = np.array(pil).astype(np.float32) / 255.0
-    return torch.from_numpy(arr)[None, ...]
+    return to_image_tensor(decode_images([resp.content]))
 
 
 def _extract_image_url(data: dict) -> str:
@@ -87,7 +83,7 @@ class GrokImageGenerate:
 
         payload = {"model": model, "prompt": prompt, "size": size}
         try:
-            resp = requests.post(
+            resp = http_transport.post(
                 f"{api_base.rstrip('/')}/v1/images/generations",
                 json=payload,
                 headers=http_headers_auth_only(api_key),
@@ -182,7 +178,7 @@ class GrokImageEdit:
             "n": int(n),
         }
         try:
-            resp = requests.post(
+            resp = http_transport.post(
                 f"{api_base.rstrip('/')}/v1/images/edits",
                 files=_multipart_form_fields(data_payload),
                 headers=http_headers_auth_only(api_key),
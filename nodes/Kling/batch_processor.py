@@ -5,6 +5,8 @@ import os
 import time
 from ..Sora2.kuai_utils import env_or
 from .kling import KlingText2VideoAndWait, KlingImage2VideoAndWait
+from ..Utils.retry_policy import RetryScope
+from ..Utils.task_source import load_tasks
 
 
 class KlingBatchProcessor:
@@ -59,7 +61,7 @@ class KlingBatchProcessor:
         """批量处理任务"""
         try:
             # 解析任务数据
-            tasks = json.loads(batch_tasks)
+            tasks = load_tasks(batch_tasks)
             if not tasks:
                 raise ValueError("没有任务需要处理")
 
@@ -84,13 +86,15 @@ class KlingBatchProcessor:
             print(f"[Batch] 开始批量处理 {len(tasks)} 个任务")
             print(f"{'='*60}\n")
 
-            # 逐个处理任务
+            # 逐个处理任务（每个任务独立的重试预算，重试统计汇总到报告）
+            batch_retry = RetryScope()
             for idx, task in enumerate(tasks, start=1):
                 try:
                     print(f"\n[{idx}/{len(tasks)}] 处理任务 (行 {task.get('_row_number', '?')})")
 
                     # 处理单个任务
-                    task_info = self._process_single_task(task, idx, api_key, output_dir)
+                    with batch_retry.child().activate():
+                        task_info = self._process_single_task(task, idx, api_key, output_dir)
 
                     results["success"] += 1
                     results["task_ids"].append(task_info)
@@ -106,6 +110,8 @@ class KlingBatchProcessor:
                 if idx < len(tasks) and delay_between_tasks > 0:
                     time.sleep(delay_between_tasks)
 
+            results["retry"] = batch_retry.summary()
+
             # 保存任务列表
             tasks_file = os.path.join(output_dir, "tasks.json")
             with open(tasks_file, 'w', encoding='utf-8') as f:
@@ -208,6 +214,8 @@ class KlingBatchProcessor:
             f"成功: {results['success']}",
             f"失败: {results['failed']}",
         ]
+        if results.get("retry"):
+            lines.append(f"网络重试: {results['retry']}")
 
         if results['errors']:
             lines.append("\n失败任务详情:")
@@ -2,9 +2,9 @@
 
 import json
 import time
-import requests
 from ..Sora2.kuai_utils import env_or, http_headers_auth_only, raise_for_bad_status
 from .kling_utils import parse_kling_response, KLING_MODELS, KLING_ASPECT_RATIOS
+from ..Utils import http_transport
 
 
 class KlingText2Video:
@@ -140,7 +140,7 @@ class KlingText2Video:
         # 调用 API
         try:
             print(f"[ComfyUI_KuAi_Power] 创建可灵文生视频任务: {final_model}, {mode}, {duration}s")
-            resp = requests.post(endpoint, headers=headers, json=payload, timeout=int(timeout))
+            resp = http_transport.post(endpoint, headers=headers, json=payload, timeout=int(timeout))
             raise_for_bad_status(resp, "创建文生视频任务失败")
 
             data = resp.json()
@@ -306,7 +306,7 @@ class KlingImage2Video:
         # 调用 API
         try:
             print(f"[ComfyUI_KuAi_Power] 创建可灵图生视频任务: {final_model}, {mode}, {duration}s")
-            resp = requests.post(endpoint, headers=headers, json=payload, timeout=int(timeout))
+            resp = http_transport.post(endpoint, headers=headers, json=payload, timeout=int(timeout))
             raise_for_bad_status(resp, "创建图生视频任务失败")
 
             data = resp.json()
@@ -397,7 +397,7 @@ class KlingQueryTask:
         def query_once():
             """查询一次"""
             try:
-                resp = requests.get(endpoint, headers=headers, timeout=60)
+                resp = http_transport.get(endpoint, headers=headers, timeout=60)
                 raise_for_bad_status(resp, "查询任务失败")
 
                 data = resp.json()
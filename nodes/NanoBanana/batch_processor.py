@@ -9,6 +9,8 @@ from PIL import Image
 
 from ..Sora2.kuai_utils import env_or
 from .nano_banana import NanoBananaAIO, pil_to_base64, to_pil_from_comfy
+from ..Utils.retry_policy import RetryScope
+from ..Utils.task_source import load_tasks
 
 
 class NanoBananaBatchProcessor:
@@ -49,7 +51,7 @@ class NanoBananaBatchProcessor:
         """批量处理图像生成任务"""
         try:
             # 解析任务数据
-            tasks = json.loads(batch_tasks)
+            tasks = load_tasks(batch_tasks)
             if not tasks:
                 raise ValueError("没有任务需要处理")
 
@@ -74,13 +76,15 @@ class NanoBananaBatchProcessor:
             print(f"[NanoBananaBatch] 输出目录: {output_dir}")
             print(f"{'='*60}\n")
 
-            # 逐个处理任务
+            # 逐个处理任务（每个任务独立的重试预算，重试统计汇总到报告）
+            batch_retry = RetryScope()
             for idx, task in enumerate(tasks, start=1):
                 try:
                     print(f"\n[{idx}/{len(tasks)}] 处理任务 (行 {task.get('_row_number', '?')})")
 
                     # 处理单个任务
-                    self._process_single_task(task, idx, api_base, api_key, output_dir)
+                    with batch_retry.child().activate():
+                        self._process_single_task(task, idx, api_base, api_key, output_dir)
 
                     results["success"] += 1
                     print(f"✓ 任务 {idx} 完成")
@@ -95,6 +99,8 @@ class NanoBananaBatchProcessor:
                 if idx < len(tasks) and delay_between_tasks > 0:
                     time.sleep(delay_between_tasks)
 
+            results["retry"] = batch_retry.summary()
+
             # 生成结果报告
             report = self._generate_report(results)
             print(f"\n{'='*60}")
@@ -242,6 +248,8 @@ class NanoBananaBatchProcessor:
             f"成功: {results['success']}",
             f"失败: {results['failed']}",
         ]
+        if results.get("retry"):
+            lines.append(f"网络重试: {results['retry']}")
 
         if results['errors']:
             lines.append("\n失败任务详情:")
@@ -4,18 +4,21 @@ import io
 import json
 import time
 import base64
+import hashlib
 import random
 import torch
-import numpy as np
-import requests
 from PIL import Image
 
 from ..Sora2.kuai_utils import (
     env_or,
     to_pil_from_comfy,
+    to_pil_batch_from_comfy,
     http_headers_json,
     extract_error_message_from_response,
 )
+from ..Utils import http_transport
+from ..Utils.image_decode import decode_images, to_image_tensor
+from ..Utils.result_cache import ResultCache, request_key
 
 
 def pil_to_base64(pil_image: Image.Image, format: str = "PNG") -> str:
@@ -32,6 +35,11 @@ def base64_to_pil(base64_str: str) -> Image.Image:
     return Image.open(io.BytesIO(image_bytes)).convert("RGB")
 
 
+def base64_to_tensor(base64_str: str) -> torch.Tensor:
+    """将 base64 图像直接解码为 ComfyUI IMAGE 张量 [1,H,W,3]"""
+    return to_image_tensor(decode_images([base64.b64decode(base64_str)]))
+
+
 class NanoBananaAIO:
     """Nano Banana Pro 多功能节点：支持单/多图生成、grounding、搜索和 thinking 能力"""
 
@@ -65,6 +73,7 @@ class NanoBananaAIO:
                 "api_base": ("STRING", {"default": "https://api.kegeai.top", "tooltip": "API 端点地址"}),
                 "api_key": ("STRING", {"default": "", "tooltip": "API 密钥"}),
                 "timeout": ("INT", {"default": 1800, "min": 60, "max": 9999, "tooltip": "超时时间(秒)"}),
+                "use_cache": ("BOOLEAN", {"default": False, "tooltip": "固定种子下参数完全相同时直接复用上次生成的图像，不再调用接口（种子为0时不缓存）"}),
             }
         }
 
@@ -95,6 +104,7 @@ class NanoBananaAIO:
             "api_base": "API地址",
             "api_key": "API密钥",
             "timeout": "超时",
+            "use_cache": "使用结果缓存",
         }
 
     def _extract_text_error_from_response(self, data):
@@ -121,6 +131,12 @@ class NanoBananaAIO:
         except Exception:
             return ""
 
+    @staticmethod
+    def _pil_to_png(pil_img) -> bytes:
+        buffer = io.BytesIO()
+        pil_img.save(buffer, format="PNG")
+        return buffer.getvalue()
+
     def _handle_error(self, message):
         """统一错误处理"""
         print(f"\033[91m[NanoBanana] 错误: {message}\033[0m")
@@ -129,7 +145,7 @@ class NanoBananaAIO:
     def generate_unified(self, model_name, prompt, image_count=1, use_search=True, seed=0,
                         custom_model="", system_prompt="", image_1=None, image_2=None, image_3=None, image_4=None, image_5=None, image_6=None,
                         aspect_ratio="1:1", image_size="2K", temperature=1.0,
-                        api_base="https://api.kegeai.top", api_key="", timeout=120):
+                        api_base="https://api.kegeai.top", api_key="", timeout=120, use_cache=False):
         """统一生成接口"""
         try:
             # 自定义模型覆盖下拉框选择
@@ -167,18 +183,42 @@ class NanoBananaAIO:
                     except Exception as e:
                         print(f"[NanoBanana] 警告: 转换参考图失败: {e}")
 
+            # 结果缓存（随机种子的请求本就期望每次不同，不参与缓存）
+            cache_key = None
+            if use_cache and seed != 0:
+                cache_key = request_key("nanobanana", {
+                    "model": model_name, "prompt": prompt, "system_prompt": system_prompt,
+                    "image_count": image_count, "use_search": use_search, "seed": actual_seed,
+                    "images": [hashlib.sha256(b.encode("ascii")).hexdigest() for b in reference_images_base64],
+                    "aspect_ratio": aspect_ratio, "image_size": image_size,
+                    "temperature": float(temperature), "api_base": api_base,
+                })
+                cached = ResultCache().get(cache_key)
+                if cached:
+                    images = to_image_tensor(decode_images([open(p, "rb").read() for p in cached["blobs"]]))
+                    print(f"[NanoBanana] 命中结果缓存，复用 {images.shape[0]} 张图像")
+                    return (images, cached["meta"].get("thinking", ""),
+                            cached["meta"].get("grounding", ""))
+
             # 根据图像数量选择生成方式
             if image_count == 1:
-                return self._generate_single_image(
+                result = self._generate_single_image(
                     api_base, api_key, model_name, prompt, system_prompt, reference_images_base64,
                     aspect_ratio, image_size, temperature, use_search, actual_seed, timeout
                 )
             else:
-                return self._generate_multiple_images(
+                result = self._generate_multiple_images(
                     api_base, api_key, model_name, prompt, system_prompt, image_count, reference_images_base64,
                     aspect_ratio, image_size, temperature, use_search, actual_seed, timeout
                 )
 
+            image_tensor, thinking, grounding = result
+            is_placeholder = image_tensor.shape[1] == 64 and image_tensor.shape[2] == 64
+            if cache_key and not is_placeholder:
+                blobs = [self._pil_to_png(pil) for pil in to_pil_batch_from_comfy(image_tensor)]
+                ResultCache().put(cache_key, blobs=blobs, meta={"thinking": thinking, "grounding": grounding})
+            return result
+
         except RuntimeError:
             raise
         except Exception as e:
@@ -242,7 +282,7 @@ class NanoBananaAIO:
             payload["tools"] = [{"googleSearch": {}}]
 
         try:
-            resp = requests.post(
+            resp = http_transport.post(
                 endpoint,
                 headers=http_headers_json(api_key),
                 data=json.dumps(payload),
@@ -295,16 +335,12 @@ class NanoBananaAIO:
         except Exception as e:
             return self._handle_error(f"解析响应失败: {str(e)}")
 
-        # 解码 base64 图像
+        # 解码 base64 图像（直接写入 float32 张量）
         try:
-            pil_image = base64_to_pil(image_base64)
+            image_tensor = base64_to_tensor(image_base64)
         except Exception as e:
             return self._handle_error(f"解码图像失败: {str(e)}")
 
-        # 转换为 tensor
-        image_np = np.array(pil_image).astype(np.float32) / 255.0
-        image_tensor = torch.from_numpy(image_np)[None,]
-
         return (image_tensor, thinking, grounding_sources)
 
     def _generate_multiple_images(self, api_base, api_key, model_name, prompt, system_prompt, image_count, reference_images_base64,
@@ -541,7 +577,7 @@ class NanoBananaMultiTurnChat:
                 }
 
             try:
-                resp = requests.post(
+                resp = http_transport.post(
                     endpoint,
                     headers=http_headers_json(api_key),
                     data=json.dumps(payload),
@@ -592,9 +628,9 @@ class NanoBananaMultiTurnChat:
             except Exception as e:
                 return self._handle_error(f"解析响应失败: {str(e)}")
 
-            # 解码图像
+            # 解码图像（直接写入 float32 张量）
             try:
-                pil_image = base64_to_pil(image_base64)
+                image_tensor = base64_to_tensor(image_base64)
             except Exception as e:
                 return self._handle_error(f"解码图像失败: {str(e)}")
 
@@ -617,10 +653,6 @@ class NanoBananaMultiTurnChat:
             })
             self.last_image_base64 = image_base64
 
-            # 转换为 tensor
-            image_np = np.array(pil_image).astype(np.float32) / 255.0
-            image_tensor = torch.from_numpy(image_np)[None,]
-
             # 格式化对话历史（不包含 base64 数据，太长了）
             chat_history_display = []
             for msg in self.conversation_history:
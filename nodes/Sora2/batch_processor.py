@@ -6,11 +6,20 @@ import time
 import hashlib
 from pathlib import Path
 
-import requests
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 
-from .kuai_utils import env_or
+from .kuai_utils import env_or, get_duration_for_sora2_model
 from .sora2 import SoraCreateVideo, SoraText2Video, SoraQueryTask
+from ..Utils import http_transport
+from ..Utils.download_engine import download_file
+from ..Utils.download_queue import DownloadQueue
+from ..Utils.retry_policy import RetryScope
+from ..Utils.poll_engine import PollEngine, PollTimeoutError
+from ..Utils.poll_timing import timing_profile
+from ..Utils.job_journal import JobJournal, batch_key as journal_batch_key
+from ..Utils.result_cache import ResultCache, request_key
+from ..Utils.task_source import load_tasks
+from ..Utils.job_manager import background_capable
 
 
 class Sora2BatchProcessor:
@@ -116,6 +125,18 @@ class Sora2BatchProcessor:
                     "max": 100,
                     "tooltip": "并发提交数量"
                 }),
+                "resume": ("BOOLEAN", {
+                    "default": False,
+                    "tooltip": "断点续跑：同一份任务重新执行时，沿用任务日志中已提交的任务ID只轮询/下载，不重复提交"
+                }),
+                "use_cache": ("BOOLEAN", {
+                    "default": False,
+                    "tooltip": "参数完全相同且本地视频仍在的任务直接复用上次的结果，不再调用接口"
+                }),
+                "async_mode": ("BOOLEAN", {
+                    "default": False,
+                    "tooltip": "后台运行：立即返回作业句柄，不占用执行队列；下游用「⏳ 等待后台作业」节点获取结果"
+                }),
             }
         }
 
@@ -141,6 +162,9 @@ class Sora2BatchProcessor:
             "default_watermark": "默认水印",
             "create_timeout": "创建超时",
             "max_workers": "并发数量",
+            "resume": "断点续跑",
+            "use_cache": "使用结果缓存",
+            "async_mode": "后台运行",
         }
 
     RETURN_TYPES = ("STRING", "STRING")
@@ -148,16 +172,18 @@ class Sora2BatchProcessor:
     FUNCTION = "process_batch"
     CATEGORY = "KuAi/Sora2"
 
+    @background_capable()
     def process_batch(self, batch_tasks, api_key="", output_dir="./output/sora2_batch",
                      delay_between_tasks=2.0, api_base="https://api.kuai.host",
                      wait_for_completion=False, auto_download=True,
                      max_wait_time=1200, poll_interval=15, download_timeout=180,
                      default_model="sora-2-all", default_duration_sora2="10", default_duration_sora2pro="15",
                      default_custom_model="", default_orientation="portrait", default_size="large",
-                     default_watermark=False, create_timeout=120, max_workers=8):
+                     default_watermark=False, create_timeout=120, max_workers=8, resume=False,
+                     use_cache=False):
         """批量生成视频"""
         try:
-            tasks = json.loads(batch_tasks)
+            tasks = load_tasks(batch_tasks)
             if not tasks:
                 raise ValueError("没有任务需要处理")
 
@@ -180,14 +206,37 @@ class Sora2BatchProcessor:
             print(f"[Sora2Batch] 输出目录: {output_dir}")
             print(f"[Sora2Batch] 等待完成: {'是' if wait_for_completion else '否'}")
             print(f"[Sora2Batch] 自动下载: {'是' if (wait_for_completion and auto_download) else '否'}")
+            journal = JobJournal()
+            journal_key = journal_batch_key("sora2", tasks, output_dir)
+            print(f"[Sora2Batch] 任务日志: {journal_key}{'（断点续跑）' if resume else ''}")
             print(f"{'='*60}\n")
 
             total_tasks = len(tasks)
             max_workers = min(max(int(max_workers), 1), 100, total_tasks)
+            http_transport.ensure_pool_size(max_workers)
             futures = {}
             task_results_by_idx = {}
+            # 每个任务的提交、轮询与下载分布在不同线程，共用同一个任务重试范围；重试统计汇总到报告
+            batch_retry = RetryScope()
+            task_retries = {}
+
+            def _scoped(task_idx, fn, *args):
+                scope = task_retries.get(task_idx)
+                if scope is None:
+                    scope = task_retries.setdefault(task_idx, batch_retry.child())
+                with scope.activate():
+                    return fn(*args)
 
             def _run_task(task_idx, task_data):
+                """返回 (task_info, 是否已全部完成)；续跑时沿用任务日志中的任务"""
+                entry = journal.get(journal_key, task_idx) if resume else None
+                if entry and entry["status"] != "failed" and entry["info"].get("task_id"):
+                    task_info = dict(entry["info"])
+                    print(f"\n[{task_idx}/{total_tasks}] 续跑：沿用已提交的任务 {task_info['task_id']} (状态 {entry['status']})")
+                    local = task_info.get("local_video_path", "")
+                    comfy_root = Path(__file__).parent.parent.parent.parent.parent
+                    return task_info, entry["status"] == "downloaded" and bool(local) and (comfy_root / local).exists()
+
                 if delay_between_tasks > 0:
                     # 并发模式下仍保留提交节流：按索引错峰启动
                     time.sleep((task_idx - 1) * delay_between_tasks)
@@ -198,12 +247,6 @@ class Sora2BatchProcessor:
                     task_idx=task_idx,
                     api_key=api_key,
                     api_base=api_base,
-                    output_dir=output_dir,
-                    wait_for_completion=wait_for_completion,
-                    auto_download=auto_download,
-                    max_wait_time=max_wait_time,
-                    poll_interval=poll_interval,
-                    download_timeout=download_timeout,
                     default_model=default_model,
                     default_duration_sora2=default_duration_sora2,
                     default_duration_sora2pro=default_duration_sora2pro,
@@ -212,28 +255,66 @@ class Sora2BatchProcessor:
                     default_size=default_size,
                     default_watermark=default_watermark,
                     create_timeout=create_timeout,
+                    use_cache=use_cache,
                 )
-                return task_info
+                if task_info.get("from_cache"):
+                    return task_info, True
+                journal.record_submit(journal_key, task_idx, "sora2", task_info["task_id"], task_info)
+                return task_info, False
+
+            def _record_failure(idx, e):
+                results["failed"] += 1
+                error_msg = f"任务 {idx}: {str(e)}"
+                results["errors"].append(error_msg)
+                print(f"✗ {error_msg}")
+
+            def _record_success(idx, task_info):
+                results["success"] += 1
+                task_results_by_idx[idx] = task_info
+                print(f"✓ 任务 {idx} 完成")
 
             with ThreadPoolExecutor(max_workers=max_workers) as executor:
                 for idx, task in enumerate(tasks, start=1):
-                    future = executor.submit(_run_task, idx, task)
+                    future = executor.submit(_scoped, idx, _run_task, idx, task)
                     futures[future] = idx
 
+                # 线程池只负责提交；等待期间的轮询交给共享轮询引擎，下载交给独立的下载队列
+                pending = {}
                 for future in as_completed(futures):
                     idx = futures[future]
                     try:
-                        task_info = future.result()
-                        results["success"] += 1
-                        task_results_by_idx[idx] = task_info
-                        print(f"✓ 任务 {idx} 完成")
+                        task_info, done = future.result()
                     except Exception as e:
-                        results["failed"] += 1
-                        error_msg = f"任务 {idx}: {str(e)}"
-                        results["errors"].append(error_msg)
-                        print(f"✗ {error_msg}")
+                        _record_failure(idx, e)
+                        continue
+                    if done:
+                        _record_success(idx, task_info)
+                    elif wait_for_completion:
+                        poll_future = _scoped(idx, self._watch_task, task_info, api_key, api_base,
+                                              max_wait_time, poll_interval, journal_key, idx)
+                        pending[poll_future] = (idx, task_info)
+                    else:
+                        self._save_task_info(task_info, output_dir)
+                        _record_success(idx, task_info)
+
+                finishing = {}
+                for poll_future in as_completed(pending):
+                    idx, task_info = pending[poll_future]
+                    future = DownloadQueue().submit(
+                        _scoped, idx, self._finish_task, poll_future, task_info, output_dir,
+                        auto_download, download_timeout, journal_key, idx,
+                    )
+                    finishing[future] = idx
+
+                for future in as_completed(finishing):
+                    idx = finishing[future]
+                    try:
+                        _record_success(idx, future.result())
+                    except Exception as e:
+                        _record_failure(idx, e)
 
             results["video_tasks"] = [task_results_by_idx[i] for i in sorted(task_results_by_idx.keys())]
+            results["retry"] = batch_retry.summary()
 
             tasks_file = os.path.join(output_dir, "tasks.json")
             with open(tasks_file, 'w', encoding='utf-8') as f:
@@ -251,13 +332,11 @@ class Sora2BatchProcessor:
             print(f"[Sora2Batch] {error_msg}")
             raise RuntimeError(error_msg)
 
-    def _process_single_task(self, task, task_idx, api_key, api_base, output_dir,
-                            wait_for_completion, auto_download, max_wait_time,
-                            poll_interval, download_timeout,
+    def _process_single_task(self, task, task_idx, api_key, api_base,
                             default_model, default_duration_sora2, default_duration_sora2pro,
                             default_custom_model, default_orientation, default_size,
-                            default_watermark, create_timeout):
-        """处理单个视频生成任务"""
+                            default_watermark, create_timeout, use_cache=False):
+        """提交单个视频生成任务，返回任务信息（命中结果缓存时不提交，返回 from_cache=True 的任务信息）"""
         prompt = task.get("prompt", "").strip()
         images = task.get("images", "").strip()
         model = (str(task.get("model", "")).strip() or default_model)
@@ -277,8 +356,31 @@ class Sora2BatchProcessor:
         if not prompt:
             raise ValueError("提示词不能为空")
 
+        actual_model = custom_model if custom_model else model
+        duration = get_duration_for_sora2_model(actual_model, duration_sora2, duration_sora2pro)
+        cache_key = None
+        if use_cache:
+            cache_key = request_key("sora2:video", {
+                "model": actual_model, "prompt": prompt, "images": images, "duration": duration,
+                "orientation": orientation, "size": size, "watermark": watermark, "api_base": api_base,
+            })
+            cached = ResultCache().get(cache_key)
+            if cached and cached["files"]:
+                comfy_root = Path(__file__).parent.parent.parent.parent.parent
+                task_info = dict(cached["meta"])
+                task_info.update(
+                    output_prefix=output_prefix,
+                    final_status="completed",
+                    video_url=cached["urls"][0] if cached["urls"] else "",
+                    local_video_path=str(Path(cached["files"][0]).relative_to(comfy_root)),
+                    download_status="cached",
+                    from_cache=True,
+                )
+                print(f"  命中结果缓存，跳过生成: {task_info['local_video_path']}")
+                return task_info
+
         print(f"  提示词: {prompt[:50]}...")
-        print(f"  模型: {custom_model if custom_model else model}")
+        print(f"  模型: {actual_model}")
         print(f"  方向: {orientation}")
         print(f"  尺寸: {size}")
 
@@ -317,11 +419,11 @@ class Sora2BatchProcessor:
         print(f"  任务ID: {task_id}")
         print(f"  状态: {status}")
 
-        actual_model = custom_model if custom_model else model
         task_info = {
             "task_id": task_id,
             "prompt": prompt,
             "model": actual_model,
+            "duration": duration,
             "orientation": orientation,
             "size": size,
             "has_images": bool(images),
@@ -330,58 +432,112 @@ class Sora2BatchProcessor:
             "output_prefix": output_prefix,
             "created_at": time.strftime("%Y-%m-%d %H:%M:%S")
         }
+        if cache_key:
+            task_info["cache_key"] = cache_key
 
-        if wait_for_completion:
-            print("  等待视频生成完成...")
-            try:
-                final_status, video_url, gif_url, thumbnail_url, _raw = self.querier.query(
-                    task_id=task_id,
-                    api_base=api_base,
-                    api_key=api_key,
-                    wait=True,
-                    poll_interval_sec=poll_interval,
-                    timeout_sec=max_wait_time
-                )
-
-                task_info["final_status"] = final_status
-                task_info["video_url"] = video_url
-                task_info["gif_url"] = gif_url
-                task_info["thumbnail_url"] = thumbnail_url
-                task_info["completed_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
-
-                print(f"  最终状态: {final_status}")
-                if video_url:
-                    print(f"  视频URL: {video_url[:50]}...")
-
-                if auto_download:
-                    if final_status == "completed" and str(video_url).strip():
-                        local_path, download_status = self._download_video(
-                            video_url=video_url,
-                            output_prefix=output_prefix,
-                            output_dir=output_dir,
-                            timeout=download_timeout,
-                        )
-                        task_info["local_video_path"] = local_path
-                        task_info["download_status"] = download_status
-                        if local_path:
-                            print(f"  本地保存: {local_path}")
-                        else:
-                            print(f"  下载状态: {download_status}")
-                    else:
-                        task_info["local_video_path"] = ""
-                        task_info["download_status"] = "skip_no_video"
-
-            except Exception as e:
-                print(f"  等待完成失败: {str(e)}")
-                task_info["wait_error"] = str(e)
-                if auto_download:
-                    task_info["local_video_path"] = ""
-                    task_info["download_status"] = "skip_wait_error"
+        return task_info
 
-        task_file = os.path.join(output_dir, f"{output_prefix}.json")
+    def _save_task_info(self, task_info, output_dir):
+        """保存任务信息到 <output_prefix>.json"""
+        task_file = os.path.join(output_dir, f"{task_info['output_prefix']}.json")
         with open(task_file, 'w', encoding='utf-8') as f:
             json.dump(task_info, f, ensure_ascii=False, indent=2)
 
+    def _watch_task(self, task_info, api_key, api_base, max_wait_time, poll_interval,
+                    journal_key="", task_idx=0):
+        """登记到共享轮询引擎，返回完成时解析为 (final_status, video_url, gif_url, thumbnail_url) 的 Future"""
+        task_id = task_info["task_id"]
+
+        if task_info.get("final_status") == "completed" and task_info.get("video_url"):
+            # 续跑：日志显示已生成完成，只需下载
+            done = Future()
+            done.set_result(("completed", task_info["video_url"],
+                             task_info.get("gif_url", ""), task_info.get("thumbnail_url", "")))
+            return done
+
+        def _query():
+            return self.querier.query(
+                task_id=task_id,
+                api_base=api_base,
+                api_key=api_key,
+                wait=False,
+            )
+
+        def _check(elapsed, queried):
+            status, video_url, gif_url, thumbnail_url, _raw = queried
+            if journal_key and status != task_info.get("status"):
+                JobJournal().update(journal_key, task_idx, status, info={"status": status})
+            task_info["status"] = status
+            if status == "completed":
+                return True, (status, video_url, gif_url, thumbnail_url)
+            print(f"  {task_id} 状态={status}，已等待 {elapsed}/{max_wait_time} 秒")
+            return False, None
+
+        return PollEngine().watch(_query, _check, poll_interval, max_wait_time,
+                                  label=task_id, key=f"sora2:{task_id}",
+                                  profile=timing_profile("sora2", task_info["model"], task_info["duration"]))
+
+    def _finish_task(self, poll_future, task_info, output_dir, auto_download, download_timeout,
+                     journal_key="", task_idx=0):
+        """取回轮询结果，按需下载并保存任务信息"""
+        try:
+            try:
+                final_status, video_url, gif_url, thumbnail_url = poll_future.result()
+            except PollTimeoutError:
+                final_status, video_url, gif_url, thumbnail_url = "timeout", "", "", ""
+
+            task_info["final_status"] = final_status
+            task_info["video_url"] = video_url
+            task_info["gif_url"] = gif_url
+            task_info["thumbnail_url"] = thumbnail_url
+            task_info["completed_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+
+            print(f"  {task_info['task_id']} 最终状态: {final_status}")
+            if video_url:
+                print(f"  视频URL: {video_url[:50]}...")
+
+            if auto_download:
+                if final_status == "completed" and str(video_url).strip():
+                    local_path, download_status = self._download_video(
+                        video_url=video_url,
+                        output_prefix=task_info["output_prefix"],
+                        output_dir=output_dir,
+                        timeout=download_timeout,
+                    )
+                    task_info["local_video_path"] = local_path
+                    task_info["download_status"] = download_status
+                    if local_path:
+                        print(f"  本地保存: {local_path}")
+                    else:
+                        print(f"  下载状态: {download_status}")
+                else:
+                    task_info["local_video_path"] = ""
+                    task_info["download_status"] = "skip_no_video"
+
+        except Exception as e:
+            print(f"  等待完成失败: {str(e)}")
+            task_info["wait_error"] = str(e)
+            if auto_download:
+                task_info["local_video_path"] = ""
+                task_info["download_status"] = "skip_wait_error"
+
+        if task_info.get("cache_key") and task_info.get("local_video_path"):
+            ResultCache().put(task_info["cache_key"], urls=[task_info["video_url"]],
+                              files=[task_info["local_video_path"]],
+                              meta={k: task_info[k] for k in ("task_id", "prompt", "model", "duration") if k in task_info})
+
+        if journal_key:
+            if task_info.get("wait_error"):
+                journal_status = "failed"
+            elif task_info.get("local_video_path"):
+                journal_status = "downloaded"
+            else:
+                journal_status = task_info.get("final_status", "")
+            JobJournal().update(journal_key, task_idx, journal_status,
+                                detail=task_info.get("local_video_path") or task_info.get("wait_error", ""),
+                                info=task_info)
+
+        self._save_task_info(task_info, output_dir)
         return task_info
 
     def _download_video(self, video_url, output_prefix, output_dir, timeout):
@@ -396,12 +552,7 @@ class Sora2BatchProcessor:
             url_hash = hashlib.md5(video_url.encode("utf-8")).hexdigest()[:8]
             filepath = target_dir / f"{output_prefix}_{url_hash}.mp4"
 
-            resp = requests.get(video_url, timeout=int(timeout), stream=True)
-            resp.raise_for_status()
-            with open(filepath, "wb") as f:
-                for chunk in resp.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+            download_file(video_url, filepath, timeout=int(timeout))
 
             rel_path = str(filepath.relative_to(comfy_root))
             return rel_path, "downloaded"
@@ -416,6 +567,8 @@ class Sora2BatchProcessor:
             f"成功: {results['success']}",
             f"失败: {results['failed']}",
         ]
+        if results.get("retry"):
+            lines.append(f"网络重试: {results['retry']}")
 
         if results['errors']:
             lines.append("\n失败任务详情:")
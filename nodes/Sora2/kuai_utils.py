@@ -2,6 +2,7 @@ import os
 import io
 import base64
 import typing
+import threading
 import numpy as np
 import requests
 from PIL import Image
@@ -12,37 +13,94 @@ def env_or(value: str, env_name: str) -> str:
         return value
     return os.environ.get(env_name, "").strip()
 
-def to_pil_from_comfy(image_any, index: int = 0) -> Image.Image:
-    """将 ComfyUI IMAGE 转换为 PIL.Image"""
+def _as_image_array(image_any):
+    """把 torch.Tensor / np.ndarray 统一为 numpy 数组（CPU 张量零拷贝，GPU 张量在设备上先量化为 uint8）"""
     try:
         import torch
-        is_torch = True
     except Exception:
-        is_torch = False
+        torch = None
 
     arr = image_any
-    if is_torch:
-        import torch
-        if isinstance(arr, torch.Tensor):
-            if arr.dim() == 4:
-                arr = arr[index]
-            arr = arr.detach().cpu().numpy()
-
-    if isinstance(arr, np.ndarray):
-        if arr.ndim == 4:
-            arr = arr[index]
-        if arr.dtype != np.uint8:
-            arr = np.clip(arr * 255.0, 0, 255).astype(np.uint8)
-        if arr.ndim == 3 and arr.shape[2] in (1, 3, 4):
-            if arr.shape[2] == 1:
-                arr = np.repeat(arr, 3, axis=2)
-            return Image.fromarray(arr)
-        return Image.fromarray(arr)
-
-    if isinstance(arr, Image.Image):
-        return arr
-
-    raise ValueError("无法将输入转换为 PIL.Image")
+    if torch is not None and isinstance(arr, torch.Tensor):
+        arr = arr.detach()
+        if arr.device.type != "cpu" and arr.is_floating_point():
+            # 在设备上完成缩放与量化，只传回 uint8（传输量为 float32 的 1/4）
+            arr = (arr * 255.0).clamp_(0, 255).to(torch.uint8)
+        arr = arr.cpu()
+        if arr.dtype == torch.bfloat16:
+            arr = arr.float()
+        arr = arr.numpy()
+    return arr
+
+
+_scratch = threading.local()
+
+
+def _scratch_buffer(shape, dtype) -> np.ndarray:
+    """线程内复用的缩放缓冲（单张图像大小），避免每张图像分配浮点临时数组"""
+    size = int(np.prod(shape))
+    buf = getattr(_scratch, "buf", None)
+    if buf is None or buf.dtype != dtype or buf.size < size:
+        buf = np.empty(size, dtype=dtype)
+        _scratch.buf = buf
+    return buf[:size].reshape(shape)
+
+
+def comfy_to_uint8(image_any, out: typing.Optional[np.ndarray] = None) -> np.ndarray:
+    """将 ComfyUI IMAGE（[B,H,W,C] / [H,W,C] / [H,W]，0~1 浮点）整批转换为 uint8 数组
+    （[B,H,W,C]；单张输入补出批次维）
+
+    缩放与截断在复用的缓冲中原地完成，每张图像只写一次输出；out 可传入形状相同的 uint8 数组以复用输出缓冲。
+    输入已是 uint8 时直接返回（不复制）。
+    """
+    arr = _as_image_array(image_any)
+    if not isinstance(arr, np.ndarray):
+        raise ValueError("无法将输入转换为图像数组")
+    if arr.ndim in (2, 3):
+        arr = arr[None]
+
+    if arr.dtype == np.uint8:
+        if out is None:
+            return arr
+        np.copyto(out, arr)
+        return out
+
+    if out is None:
+        out = np.empty(arr.shape, dtype=np.uint8)
+    # 与 arr * 255.0 的计算精度一致（float32 输入仍以 float32 计算）
+    scratch = _scratch_buffer(arr.shape[1:], np.result_type(arr.dtype, 255.0))
+    for i in range(arr.shape[0]):
+        np.multiply(arr[i], 255.0, out=scratch, casting="unsafe")
+        np.clip(scratch, 0, 255, out=scratch)
+        np.copyto(out[i], scratch, casting="unsafe")
+    return out
+
+
+def _uint8_to_pil(arr: np.ndarray) -> Image.Image:
+    if arr.ndim == 3 and arr.shape[2] == 1:
+        # 单通道按 L 模式构造，由 PIL 直接转为 RGB，不在 numpy 中复制三份通道
+        return Image.fromarray(arr[:, :, 0]).convert("RGB")
+    return Image.fromarray(arr)
+
+
+def to_pil_batch_from_comfy(image_any) -> typing.List[Image.Image]:
+    """将整批 ComfyUI IMAGE 一次转换为 PIL.Image 列表"""
+    if isinstance(image_any, Image.Image):
+        return [image_any]
+    return [_uint8_to_pil(arr) for arr in comfy_to_uint8(image_any)]
+
+
+def to_pil_from_comfy(image_any, index: int = 0) -> Image.Image:
+    """将 ComfyUI IMAGE 转换为 PIL.Image（批量输入只转换第 index 张）"""
+    if isinstance(image_any, Image.Image):
+        return image_any
+    if getattr(image_any, "ndim", None) == 4:
+        image_any = image_any[index:index + 1]
+    try:
+        return _uint8_to_pil(comfy_to_uint8(image_any)[0])
+    except ValueError:
+        raise ValueError("无法将输入转换为 PIL.Image")
+
 
 def save_image_to_buffer(pil: Image.Image, fmt: str, quality: int) -> io.BytesIO:
     """保存 PIL 到内存缓冲"""
@@ -1,6 +1,6 @@
 import json
-import requests
 from .kuai_utils import env_or, http_headers_auth_only, extract_error_message_from_response
+from ..Utils import http_transport
 
 # 默认系统提示词（使用 $ 语法）
 DEFAULT_SYSTEM_PROMPT = """# 身份认定
@@ -457,7 +457,7 @@ class SoraPromptFromProduct:
         }
 
         try:
-            resp = requests.post(endpoint, headers=http_headers_auth_only(api_key), json=payload, timeout=int(timeout))
+            resp = http_transport.post(endpoint, headers=http_headers_auth_only(api_key), json=payload, timeout=int(timeout))
             if resp.status_code >= 400:
                 detail = extract_error_message_from_response(resp)
                 raise RuntimeError(f"AI 提示词生成失败: {detail}")
@@ -68,6 +68,18 @@ from .realtime_monitor import (
     NODE_DISPLAY_NAME_MAPPINGS as REALTIME_MONITOR_DISPLAY_MAPPINGS
 )
 
+from .hot_folder import (
+    HotFolderControl,
+    NODE_CLASS_MAPPINGS as HOT_FOLDER_MAPPINGS,
+    NODE_DISPLAY_NAME_MAPPINGS as HOT_FOLDER_DISPLAY_MAPPINGS
+)
+
+from .job_manager import (
+    AwaitBackgroundJob,
+    NODE_CLASS_MAPPINGS as JOB_MANAGER_MAPPINGS,
+    NODE_DISPLAY_NAME_MAPPINGS as JOB_MANAGER_DISPLAY_MAPPINGS
+)
+
 # 合并所有节点映射
 NODE_CLASS_MAPPINGS = {}
 NODE_CLASS_MAPPINGS.update(UPLOAD_MAPPINGS)
@@ -81,6 +93,8 @@ NODE_CLASS_MAPPINGS.update(SHOW_TEXT_MAPPINGS)
 NODE_CLASS_MAPPINGS.update(BATCH_LOGGER_MAPPINGS)
 NODE_CLASS_MAPPINGS.update(BATCH_MONITOR_MAPPINGS)
 NODE_CLASS_MAPPINGS.update(REALTIME_MONITOR_MAPPINGS)
+NODE_CLASS_MAPPINGS.update(HOT_FOLDER_MAPPINGS)
+NODE_CLASS_MAPPINGS.update(JOB_MANAGER_MAPPINGS)
 
 NODE_DISPLAY_NAME_MAPPINGS = {}
 NODE_DISPLAY_NAME_MAPPINGS.update(UPLOAD_DISPLAY_MAPPINGS)
@@ -94,6 +108,8 @@ NODE_DISPLAY_NAME_MAPPINGS.update(SHOW_TEXT_DISPLAY_MAPPINGS)
 NODE_DISPLAY_NAME_MAPPINGS.update(BATCH_LOGGER_DISPLAY_MAPPINGS)
 NODE_DISPLAY_NAME_MAPPINGS.update(BATCH_MONITOR_DISPLAY_MAPPINGS)
 NODE_DISPLAY_NAME_MAPPINGS.update(REALTIME_MONITOR_DISPLAY_MAPPINGS)
+NODE_DISPLAY_NAME_MAPPINGS.update(HOT_FOLDER_DISPLAY_MAPPINGS)
+NODE_DISPLAY_NAME_MAPPINGS.update(JOB_MANAGER_DISPLAY_MAPPINGS)
 
 __all__ = [
     "NODE_CLASS_MAPPINGS",
@@ -111,4 +127,6 @@ __all__ = [
     "BatchProcessLogger",
     "BatchProcessMonitor",
     "RealtimeBatchMonitor",
+    "HotFolderControl",
+    "AwaitBackgroundJob",
 ]
@@ -2,7 +2,6 @@ import io
 import json
 import mimetypes
 import os
-import requests
 import sys
 import wave
 from pathlib import Path
@@ -26,6 +25,10 @@ except ImportError:
     http_headers_multipart = utils.http_headers_multipart
     extract_error_message_from_response = utils.extract_error_message_from_response
 
+from . import http_transport
+from .input_index import get_index
+from .upload_index import UploadIndex, bytes_digest, upload_key
+
 # 尝试导入 ComfyUI 的 folder_paths
 try:
     import folder_paths
@@ -76,11 +79,15 @@ class UploadAudioToHost:
                     "max": 300,
                     "tooltip": "超时时间(秒)"
                 }),
+                "dedupe": ("BOOLEAN", {
+                    "default": True,
+                    "tooltip": "相同音频内容在有效期内直接复用上次上传的URL，不再重复上传"
+                }),
             }
         }
 
     @classmethod
-    def VALIDATE_INPUTS(cls, audio_file=None, audio_select="", audio_path="", upload_url="", timeout=30):
+    def VALIDATE_INPUTS(cls, audio_file=None, audio_select="", audio_path="", upload_url="", timeout=30, dedupe=True):
         return True
 
     INPUT_IS_LIST = False
@@ -99,6 +106,7 @@ class UploadAudioToHost:
             "audio_path": "文件路径",
             "upload_url": "上传URL",
             "timeout": "超时",
+            "dedupe": "复用已上传URL",
         }
 
     @staticmethod
@@ -146,6 +154,8 @@ class UploadAudioToHost:
             input_dir = folder_paths.get_input_directory()
             path = os.path.join(input_dir, str(audio_select).strip())
             if not os.path.exists(path):
+                path = get_index(input_dir).find(os.path.basename(str(audio_select).strip()))
+            if not path:
                 raise RuntimeError(f"音频文件不存在: {audio_select}")
             return path
 
@@ -156,6 +166,9 @@ class UploadAudioToHost:
         if not os.path.isabs(path) and HAS_FOLDER_PATHS:
             input_dir = folder_paths.get_input_directory()
             candidate = os.path.join(input_dir, path)
+            if not os.path.exists(candidate) and not os.path.exists(path):
+                # 不在 input 顶层时，通过目录索引在子目录中查找同名文件
+                candidate = get_index(input_dir).find(os.path.basename(path)) or candidate
             if os.path.exists(candidate):
                 path = candidate
 
@@ -218,24 +231,36 @@ class UploadAudioToHost:
 
         return ""
 
-    def upload(self, audio_file=None, audio_select="", audio_path="", upload_url="https://tmpfile.link/api/upload", timeout=30):
-        files = None
+    def upload(self, audio_file=None, audio_select="", audio_path="", upload_url="https://tmpfile.link/api/upload", timeout=30,
+               dedupe=True):
+        index = UploadIndex()
+        dedupe = dedupe and index.enabled
 
         if audio_file is not None:
             wav_buf = self._audio_to_wav_buffer(audio_file)
-            files = {
-                "file": ("audio.wav", wav_buf, "audio/wav")
-            }
+            digest = bytes_digest(wav_buf.getvalue()) if dedupe else ""
+            upload_file = ("audio.wav", wav_buf, "audio/wav")
         else:
             file_path = self._resolve_audio_path(audio_select=audio_select, audio_path=audio_path)
             ext = os.path.splitext(file_path)[1].lower()
             if ext not in {".mp3", ".wav"}:
                 raise RuntimeError(f"仅支持 mp3/wav 格式，当前文件: {file_path}")
-            mime = self._guess_audio_mime(file_path)
+            digest = index.file_digest(file_path) if dedupe else ""
+            upload_file = (os.path.basename(file_path), None, self._guess_audio_mime(file_path))
+
+        # 按内容去重：命中时跳过上传
+        key = upload_key(digest, upload_url, "audio") if dedupe else ""
+        if key:
+            hit = index.lookup(key)
+            if hit:
+                print(f"[UploadAudioToHost] 复用已上传的音频: {hit['url']}")
+                return (hit["url"], str(hit["meta"].get("created") or ""))
+
+        if upload_file[1] is None:
             f = open(file_path, "rb")
             try:
-                files = {"file": (os.path.basename(file_path), f, mime)}
-                resp = requests.post(
+                files = {"file": (upload_file[0], f, upload_file[2])}
+                resp = http_transport.post(
                     upload_url,
                     headers=http_headers_multipart(),
                     files=files,
@@ -249,35 +274,32 @@ class UploadAudioToHost:
                 raise RuntimeError(f"音频上传失败: {detail}")
 
             data = resp.json()
-            url = self._extract_uploaded_url(upload_url, data)
-            created = str(data.get("created") or "")
-            if not url:
-                raise RuntimeError(f"上传响应缺少可用 URL 字段: {json.dumps(data, ensure_ascii=False)}")
-            return (url, created)
-
-        try:
-            resp = requests.post(
-                upload_url,
-                headers=http_headers_multipart(),
-                files=files,
-                timeout=int(timeout)
-            )
+        else:
+            try:
+                resp = http_transport.post(
+                    upload_url,
+                    headers=http_headers_multipart(),
+                    files={"file": upload_file},
+                    timeout=int(timeout)
+                )
 
-            if resp.status_code >= 400:
-                detail = extract_error_message_from_response(resp)
-                raise RuntimeError(f"音频上传失败: {detail}")
+                if resp.status_code >= 400:
+                    detail = extract_error_message_from_response(resp)
+                    raise RuntimeError(f"音频上传失败: {detail}")
 
-            data = resp.json()
-        except RuntimeError:
-            raise
-        except Exception as e:
-            raise RuntimeError(f"音频上传失败: {str(e)}")
+                data = resp.json()
+            except RuntimeError:
+                raise
+            except Exception as e:
+                raise RuntimeError(f"音频上传失败: {str(e)}")
 
         url = self._extract_uploaded_url(upload_url, data)
         created = str(data.get("created") or "")
         if not url:
             raise RuntimeError(f"上传响应缺少可用 URL 字段: {json.dumps(data, ensure_ascii=False)}")
 
+        if key:
+            index.record(key, url, {"created": created})
         return (url, created)
 
 
@@ -2,10 +2,7 @@
 
 import os
 import json
-import requests
 from pathlib import Path
-from PIL import Image
-import io
 
 # 导入工具函数
 import sys
@@ -24,6 +21,10 @@ except ImportError:
     http_headers_multipart = utils.http_headers_multipart
     extract_error_message_from_response = utils.extract_error_message_from_response
 
+from . import http_transport
+from .upload_index import UploadIndex, upload_key
+from .upload_pipeline import run_pipeline
+
 
 class BatchImageUploader:
     """批量上传本地目录中的图片到图床"""
@@ -65,6 +66,22 @@ class BatchImageUploader:
                     "max": 1000,
                     "tooltip": "最大上传图片数量"
                 }),
+                "upload_workers": ("INT", {
+                    "default": 8,
+                    "min": 1,
+                    "max": 32,
+                    "tooltip": "并发上传数量（复用 keep-alive 连接）"
+                }),
+                "encode_workers": ("INT", {
+                    "default": 0,
+                    "min": 0,
+                    "max": 32,
+                    "tooltip": "图片编码进程数，0 表示按 CPU 核数自动设置"
+                }),
+                "dedupe": ("BOOLEAN", {
+                    "default": True,
+                    "tooltip": "内容未变化的图片在有效期内直接复用上次上传的URL，跳过编码与上传"
+                }),
             }
         }
 
@@ -77,6 +94,9 @@ class BatchImageUploader:
             "quality": "质量",
             "timeout": "超时",
             "max_images": "最大数量",
+            "upload_workers": "并发上传数",
+            "encode_workers": "编码进程数",
+            "dedupe": "复用已上传URL",
         }
 
     RETURN_TYPES = ("STRING", "STRING", "INT")
@@ -85,8 +105,9 @@ class BatchImageUploader:
     CATEGORY = "KuAi/Utils"
 
     def batch_upload(self, directory_path, upload_url="https://imageproxy.zhongzhuan.chat/api/upload",
-                    format="jpeg", quality=90, timeout=30, max_images=100):
-        """批量上传目录中的图片"""
+                    format="jpeg", quality=90, timeout=30, max_images=100,
+                    upload_workers=8, encode_workers=0, dedupe=True):
+        """批量上传目录中的图片（编码与上传流水线并行，结果按文件名顺序输出）"""
 
         # 构建完整路径
         full_path = Path(directory_path.strip())
@@ -117,76 +138,74 @@ class BatchImageUploader:
 
         print(f"[ComfyUI_KuAi_Power] 找到 {len(image_files)} 个图片文件")
 
-        # 批量上传
-        uploaded_urls = []
-        upload_details = []
-        success_count = 0
-        failed_count = 0
-
-        for idx, image_path in enumerate(image_files, start=1):
-            try:
-                print(f"[ComfyUI_KuAi_Power] 上传 {idx}/{len(image_files)}: {image_path.name}")
-
-                # 读取并转换图片
-                pil_image = Image.open(image_path)
-
-                # 转换为RGB（如果需要）
-                if pil_image.mode not in ('RGB', 'RGBA'):
-                    pil_image = pil_image.convert('RGB')
-
-                # 保存到内存缓冲区
-                buf = io.BytesIO()
-                save_format = format.upper()
-                if save_format == 'JPEG':
-                    # JPEG 不支持透明度
-                    if pil_image.mode == 'RGBA':
-                        # 创建白色背景
-                        background = Image.new('RGB', pil_image.size, (255, 255, 255))
-                        background.paste(pil_image, mask=pil_image.split()[3])
-                        pil_image = background
-                    pil_image.save(buf, format='JPEG', quality=quality)
-                else:
-                    pil_image.save(buf, format=save_format, quality=quality)
-
-                buf.seek(0)
-
-                # 上传
-                files = {
-                    "file": (
-                        f"{image_path.stem}.{'jpg' if format=='jpeg' else format}",
-                        buf,
-                        f"image/{'jpeg' if format=='jpeg' else format}"
-                    )
-                }
-
-                resp = requests.post(
-                    upload_url,
-                    headers=http_headers_multipart(),
-                    files=files,
-                    timeout=int(timeout)
-                )
-
-                if resp.status_code >= 400:
-                    detail = extract_error_message_from_response(resp)
-                    raise RuntimeError(f"上传失败: {detail}")
-
-                data = resp.json()
-                url = data.get("url", "")
-
-                if not url:
-                    raise RuntimeError(f"上传响应缺少 url 字段: {json.dumps(data, ensure_ascii=False)}")
-
-                uploaded_urls.append(url)
-                upload_details.append(f"✓ {image_path.name} -> {url}")
-                success_count += 1
-
-                print(f"[ComfyUI_KuAi_Power]   成功: {url}")
-
-            except Exception as e:
-                error_msg = f"✗ {image_path.name}: {str(e)}"
-                upload_details.append(error_msg)
-                failed_count += 1
-                print(f"[ComfyUI_KuAi_Power]   失败: {str(e)}")
+        # 内容去重：未变化的图片直接复用上次上传的 URL
+        index = UploadIndex()
+        keys = {}
+        reused = {}
+        if dedupe and index.enabled:
+            for image_path in image_files:
+                try:
+                    keys[image_path] = upload_key(index.file_digest(image_path), upload_url, f"{format}:{quality}")
+                except OSError:
+                    continue
+                hit = index.lookup(keys[image_path])
+                if hit:
+                    reused[image_path] = hit["url"]
+            if reused:
+                print(f"[ComfyUI_KuAi_Power] {len(reused)} 个图片内容未变化，复用已上传的URL")
+        pending_files = [p for p in image_files if p not in reused]
+
+        http_transport.ensure_pool_size(upload_workers)
+        completed = [len(reused)]
+
+        def _upload(filename, data, mime):
+            resp = http_transport.post(
+                upload_url,
+                headers=http_headers_multipart(),
+                files={"file": (filename, data, mime)},
+                timeout=int(timeout)
+            )
+
+            if resp.status_code >= 400:
+                detail = extract_error_message_from_response(resp)
+                raise RuntimeError(f"上传失败: {detail}")
+
+            payload = resp.json()
+            url = payload.get("url", "")
+
+            if not url:
+                raise RuntimeError(f"上传响应缺少 url 字段: {json.dumps(payload, ensure_ascii=False)}")
+            return url
+
+        def _on_result(result):
+            completed[0] += 1
+            name = result["path"].name
+            if result["url"] and result["path"] in keys:
+                index.record(keys[result["path"]], result["url"])
+            if result["error"]:
+                print(f"[ComfyUI_KuAi_Power] [{completed[0]}/{len(image_files)}] 失败 {name}: {result['error']}")
+            else:
+                print(f"[ComfyUI_KuAi_Power] [{completed[0]}/{len(image_files)}] 成功 {name}: {result['url']}")
+
+        uploaded = run_pipeline(
+            pending_files, _upload, fmt=format, quality=quality,
+            encode_workers=encode_workers, upload_workers=upload_workers,
+            on_result=_on_result
+        )
+
+        # 按原始顺序汇总
+        by_path = {r["path"]: r for r in uploaded}
+        results = [
+            {"path": p, "url": reused[p], "error": "", "reused": True} if p in reused else by_path[p]
+            for p in image_files
+        ]
+        uploaded_urls = [r["url"] for r in results if r["url"]]
+        upload_details = [
+            f"✓ {r['path'].name} -> {r['url']}{'（复用）' if r.get('reused') else ''}" if r["url"] else f"✗ {r['path'].name}: {r['error']}"
+            for r in results
+        ]
+        success_count = len(uploaded_urls)
+        failed_count = len(results) - success_count
 
         # 生成结果
         urls_json = json.dumps(uploaded_urls, ensure_ascii=False)
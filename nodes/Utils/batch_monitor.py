@@ -23,6 +23,10 @@ class BatchProcessMonitor:
                     "max": 100,
                     "tooltip": "最多显示的任务数"
                 }),
+                "session_id": ("STRING", {
+                    "default": "",
+                    "tooltip": "只显示指定会话；留空显示全部会话（最近开始的在前）"
+                }),
             }
         }
 
@@ -31,6 +35,7 @@ class BatchProcessMonitor:
         return {
             "poll_interval": "轮询间隔",
             "max_display_tasks": "最多显示任务数",
+            "session_id": "会话ID",
         }
 
     RETURN_TYPES = ("STRING",)
@@ -39,17 +44,19 @@ class BatchProcessMonitor:
     CATEGORY = "KuAi/Utils"
     OUTPUT_NODE = True  # 标记为输出节点，可以在 UI 中显示
 
-    def monitor(self, poll_interval=2.0, max_display_tasks=20):
+    def monitor(self, poll_interval=2.0, max_display_tasks=20, session_id=""):
         """监控批量处理状态"""
         try:
             # 获取状态管理器
             state_manager = BatchProcessState()
 
-            # 读取当前状态
-            state = state_manager.get_state()
+            # 读取指定会话或全部会话的状态
+            session_id = (session_id or "").strip()
+            states = [state_manager.get_state(session_id)] if session_id else state_manager.get_sessions()
 
             # 格式化日志
-            log = format_realtime_log(state, max_tasks=max_display_tasks)
+            log = "\n".join(format_realtime_log(state, max_tasks=max_display_tasks) for state in states) \
+                if states else format_realtime_log({}, max_tasks=max_display_tasks)
 
             # 输出到控制台
             print(log)
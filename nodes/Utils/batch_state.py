@@ -1,13 +1,52 @@
-"""批量处理实时状态管理"""
+"""批量处理实时状态管理
 
+状态保存在内存中的索引结构里（task_idx → 任务记录），所有读写都在锁内完成，
+监控节点通过 get_state() 读取一致的快照。持久化采用只追加的增量日志
+（temp/batch_process_state.jsonl，每行一条 JSON 变更）：变更先进入待写队列，
+由后台定时器按 FLUSH_INTERVAL 合并写入，避免每次状态变化都整体重写状态文件。
+当前进程没有活动会话时（例如 ComfyUI 重启后），get_state() 通过重放增量日志恢复上次的状态。
+
+多个批量节点可同时运行：每个会话按 session_id 独立保存计数器、任务表与日志，
+start_session() 返回绑定到该会话的 SessionHandle，处理器通过它更新状态，互不覆盖。
+监控节点可以读取指定会话（get_state(session_id)）或全部会话（get_sessions()）。
+
+每条变更同时发布给进程内的订阅者（subscribe()），实时监控据此合并推送差异，
+无需定时重新读取整个状态。
+
+统计信息使用单调时钟记录各阶段耗时（提交 submit / 渲染 render / 下载 download / 全程 total），
+按模型与阶段维护滚动聚合（见 rolling_stats），读取时直接由聚合量得出，不遍历任务。
+"""
+
+import atexit
 import json
 import os
 import time
+from collections import deque
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple
 import threading
 
+from .rolling_stats import RunningStat
+
+# 增量日志的最短写入间隔（秒）
+FLUSH_INTERVAL = 0.5
+
+# 默认保留的日志条数
+DEFAULT_MAX_LOGS = 1000
+
+# 内存中最多保留的会话数（超出时淘汰最早结束的会话）
+MAX_SESSIONS = 10
+
+# 单个订阅者最多积压的变更条数（超出时丢弃最旧的变更并标记溢出）
+MAX_PENDING_EVENTS = 10000
+
+# 任务记录的字段（update_task 只接受这些字段）
+TASK_FIELDS = ("status", "prompt", "model", "task_id", "video_url", "local_path", "error", "start_time", "update_time")
+
+# 阶段耗时统计的阶段名
+STAGES = ("submit", "render", "download", "total")
+
 
 class LogLevel:
     """日志级别"""
@@ -16,6 +55,269 @@ class LogLevel:
     VERBOSE = 3   # 记录所有细节
 
 
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class BatchSession:
+    """单个批量处理会话：计数器、按序号索引的任务表与日志环形缓冲区"""
+
+    def __init__(self, session_id: str = "", total: int = 0, start_time: str = ""):
+        self.session_id = session_id
+        self.start_time = start_time
+        self.total = total
+        self.counts = {"completed": 0, "failed": 0, "processing": 0}
+        self.tasks: Dict[int, Dict[str, Any]] = {}
+        self.logs: deque = deque()
+        self.statistics: Dict[str, Any] = {}
+        self.last_update = start_time
+        # 节点退出时关闭会话；关闭后即使任务数不足或仍有处理中的任务，也视为已结束
+        self.closed = False
+        # 单调时钟：会话开始时刻、各任务的阶段时间点、(模型, 阶段) → 滚动聚合
+        self.started = time.monotonic()
+        self._timing: Dict[int, Dict[str, float]] = {}
+        self.stage_stats: Dict[Tuple[str, str], RunningStat] = {}
+        self.duration_stat = RunningStat()
+
+    def _observe(self, task: Dict[str, Any], old: Dict[str, Any]):
+        """根据字段变化记录阶段耗时（单调时钟，不受系统时间与跨午夜影响）"""
+        now = time.monotonic()
+        timing = self._timing.setdefault(task["idx"], {})
+        model = task.get("model") or "default"
+
+        def _add(stage: str, since: str):
+            if since in timing:
+                self.stage_stats.setdefault((model, stage), RunningStat()).add(now - timing[since])
+
+        # 首次进入 pending/processing 视为开始处理；直接以完成状态创建的记录（缓存命中）没有开始时间
+        if task["status"] in ("pending", "processing") and "started" not in timing:
+            timing["started"] = now
+        if task["task_id"] and task["task_id"] != old["task_id"] and "submitted" not in timing:
+            _add("submit", "started")
+            timing["submitted"] = now
+        if task["video_url"] and not old["video_url"]:
+            _add("render", "submitted")
+            timing["rendered"] = now
+        if task["local_path"] and not old["local_path"]:
+            _add("download", "rendered")
+        # 命中缓存/续跑直接完成的任务没有经过处理阶段，不计入耗时统计
+        if task["status"] == "completed" and old["status"] != "completed" and "started" in timing:
+            _add("total", "started")
+            self.duration_stat.add(now - timing["started"])
+
+    def apply_task(self, task_idx: int, status: str, fields: Dict[str, Any], timed: bool = True) -> Dict[str, Any]:
+        """更新（或创建）任务记录并维护计数器，返回更新后的记录
+
+        timed=False 用于重放历史变更（不记录阶段耗时）。
+        """
+        task = self.tasks.get(task_idx)
+        if task is None:
+            now = datetime.now().strftime("%H:%M:%S")
+            task = {
+                "idx": task_idx,
+                "status": "pending",
+                "prompt": "",
+                "model": "",
+                "task_id": "",
+                "video_url": "",
+                "local_path": "",
+                "error": "",
+                "start_time": now,
+                "update_time": now
+            }
+            self.tasks[task_idx] = task
+
+        old = dict(task) if timed else None
+        old_status = task["status"]
+        task["status"] = status
+        task["update_time"] = datetime.now().strftime("%H:%M:%S")
+        for key, value in fields.items():
+            if key in task:
+                task[key] = value
+
+        if timed:
+            self._observe(task, old)
+
+        if old_status != status:
+            if old_status in self.counts:
+                self.counts[old_status] -= 1
+            if status in self.counts:
+                self.counts[status] += 1
+        return task
+
+    def append_log(self, entry: Dict[str, Any], max_logs: int = DEFAULT_MAX_LOGS):
+        """追加日志，超过上限时丢弃最旧的条目（FIFO）"""
+        self.logs.append(entry)
+        while len(self.logs) > max_logs:
+            self.logs.popleft()
+
+    def summary(self) -> Dict[str, Any]:
+        """会话概要（不含任务与日志）"""
+        return {
+            "session_id": self.session_id,
+            "start_time": self.start_time,
+            "total": self.total,
+            "completed": self.counts["completed"],
+            "failed": self.counts["failed"],
+            "processing": self.counts["processing"],
+            "last_update": self.last_update
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """生成与旧版状态文件格式一致的状态快照（任务与日志为副本）"""
+        return {
+            "session_id": self.session_id,
+            "start_time": self.start_time,
+            "total": self.total,
+            "completed": self.counts["completed"],
+            "failed": self.counts["failed"],
+            "processing": self.counts["processing"],
+            "tasks": [dict(t) for t in self.tasks.values()],
+            "logs": list(self.logs),
+            "statistics": self.compute_statistics(),
+            "closed": self.closed,
+            "last_update": self.last_update
+        }
+
+    def compute_statistics(self) -> Dict[str, Any]:
+        """由滚动聚合计算统计信息（耗时与任务数无关）"""
+        done = self.counts["completed"] + self.counts["failed"]
+        if not self.duration_stat.count and not done and self.statistics:
+            return dict(self.statistics)  # 由快照恢复的会话沿用快照中的统计
+
+        elapsed = time.monotonic() - self.started
+        throughput = done / elapsed if done and elapsed > 0 else 0.0
+        remaining = max(self.total - done, 0)
+        stages: Dict[str, Dict[str, Any]] = {}
+        for (model, stage), stat in self.stage_stats.items():
+            stages.setdefault(model, {})[stage] = stat.to_dict()
+
+        return {
+            "avg_duration": round(self.duration_stat.mean, 2),
+            "p50_duration": round(self.duration_stat.sketch.quantile(0.5), 2),
+            "p95_duration": round(self.duration_stat.sketch.quantile(0.95), 2),
+            "success_rate": (self.counts["completed"] / done) * 100 if done else 0.0,
+            # 按实际吞吐（已结束任务数 / 已用时间）估算，已包含并发的影响
+            "throughput_per_min": round(throughput * 60, 2),
+            "estimated_remaining": int(remaining / throughput) if throughput and remaining else 0,
+            "stages": stages,
+        }
+
+    @property
+    def finished(self) -> bool:
+        """会话已关闭，或全部任务均已结束（没有处理中的任务，且完成数达到总数）"""
+        done = self.counts["completed"] + self.counts["failed"]
+        return self.closed or (self.counts["processing"] == 0 and self.total > 0 and done >= self.total)
+
+    @classmethod
+    def from_snapshot(cls, snap: Dict[str, Any]) -> "BatchSession":
+        """由状态快照重建会话"""
+        session = cls(snap.get("session_id", ""), snap.get("total", 0), snap.get("start_time", ""))
+        for task in snap.get("tasks", []):
+            session.apply_task(task.get("idx", 0), task.get("status", "pending"), task, timed=False)
+        for entry in snap.get("logs", []):
+            session.append_log(entry)
+        session.statistics = dict(snap.get("statistics", {}))
+        session.closed = bool(snap.get("closed", False))
+        session.last_update = snap.get("last_update", "")
+        return session
+
+
+def replay_sessions(lines) -> Dict[str, BatchSession]:
+    """重放增量日志，恢复全部会话（按开始顺序）"""
+    sessions: Dict[str, BatchSession] = {}
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            delta = json.loads(line)
+        except ValueError:
+            continue  # 进程中途退出时最后一行可能不完整
+        op = delta.get("op")
+        sid = delta.get("session", "")
+        if op == "start":
+            sessions.pop(sid, None)
+            sessions[sid] = BatchSession(sid, delta.get("total", 0), delta.get("start_time", ""))
+        elif op == "snapshot":
+            sessions[sid] = BatchSession.from_snapshot(delta.get("state", {}))
+        session = sessions.get(sid)
+        if session is None:
+            continue
+        if op == "total":
+            session.total = delta.get("total", 0)
+        elif op == "task":
+            record = delta.get("task", {})
+            session.apply_task(record.get("idx", 0), record.get("status", "pending"), record, timed=False)
+        elif op == "log":
+            session.append_log(delta.get("entry", {}))
+        elif op == "close":
+            session.closed = True
+        if delta.get("ts"):
+            session.last_update = delta["ts"]
+    return sessions
+
+
+class StateSubscription:
+    """状态变更订阅：发布方追加变更，订阅方阻塞等待并批量取出"""
+
+    def __init__(self, session_id: str = ""):
+        self.session_id = session_id
+        self.overflowed = False
+        self._events: deque = deque()
+        self._cond = threading.Condition()
+
+    def publish(self, delta: Dict[str, Any]):
+        if self.session_id and delta.get("session") != self.session_id:
+            return
+        with self._cond:
+            self._events.append(delta)
+            if len(self._events) > MAX_PENDING_EVENTS:
+                self._events.popleft()
+                self.overflowed = True
+            self._cond.notify()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待新的变更，返回是否有待取出的变更"""
+        with self._cond:
+            if not self._events:
+                self._cond.wait(timeout)
+            return bool(self._events)
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """取出全部待处理的变更"""
+        with self._cond:
+            events = list(self._events)
+            self._events.clear()
+            return events
+
+
+class SessionHandle:
+    """绑定到单个会话的状态句柄，接口与 BatchProcessState 的更新方法一致"""
+
+    def __init__(self, manager: "BatchProcessState", session_id: str):
+        self.manager = manager
+        self.session_id = session_id
+
+    def set_total(self, total: int):
+        self.manager.set_total(total, session_id=self.session_id)
+
+    def update_task(self, task_idx: int, status: str, **kwargs):
+        self.manager.update_task(task_idx, status, session_id=self.session_id, **kwargs)
+
+    def add_log(self, task_idx: int, level: str, message: str, max_logs: int = DEFAULT_MAX_LOGS):
+        self.manager.add_log(task_idx, level, message, max_logs, session_id=self.session_id)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return self.manager.get_statistics(session_id=self.session_id)
+
+    def close(self):
+        self.manager.close_session(self.session_id)
+
+    def get_state(self) -> Dict[str, Any]:
+        return self.manager.get_state(session_id=self.session_id)
+
+
 class BatchProcessState:
     """批量处理状态管理（单例模式）"""
 
@@ -35,95 +337,105 @@ class BatchProcessState:
             return
 
         self._initialized = True
-        self.state_file = Path(__file__).parent.parent.parent.parent.parent / "temp" / "batch_process_state.json"
+        self.state_file = Path(__file__).parent.parent.parent.parent.parent / "temp" / "batch_process_state.jsonl"
         self.state_file.parent.mkdir(parents=True, exist_ok=True)
-        self.current_state = {
-            "session_id": "",
-            "start_time": "",
-            "total": 0,
-            "completed": 0,
-            "failed": 0,
-            "processing": 0,
-            "tasks": [],
-            "logs": [],  # 新增：详细日志列表
-            "statistics": {},  # 新增：统计信息
-            "last_update": ""
-        }
-
-    def start_session(self, session_id: str, total: int):
-        """开始新的批量处理会话"""
-        self.current_state = {
-            "session_id": session_id,
-            "start_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "total": total,
-            "completed": 0,
-            "failed": 0,
-            "processing": 0,
-            "tasks": [],
-            "logs": [],
-            "statistics": {
-                "avg_duration": 0.0,
-                "success_rate": 0.0,
-                "estimated_remaining": 0
-            },
-            "last_update": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
+        # session_id → 会话（按开始顺序）；未指定会话的调用作用于最近开始的会话
+        self._sessions: Dict[str, BatchSession] = {}
+        self._latest = ""
+        self._state_lock = threading.RLock()
+        # 待写入的增量与写入控制
+        self._pending: List[Dict[str, Any]] = []
+        self._rewrite = False
+        # 锁顺序固定为 _flush_lock → _state_lock；_flush_timer 由 _state_lock 保护
+        self._flush_timer: Optional[threading.Timer] = None
+        self._flush_lock = threading.Lock()
+        self._subscribers: List[StateSubscription] = []
+        atexit.register(self.flush)
+
+    @property
+    def current_state(self) -> Dict[str, Any]:
+        """最近开始的会话的状态快照"""
+        return self.get_state()
+
+    def _session(self, session_id: Optional[str] = None) -> BatchSession:
+        """查找会话（调用方需持有 _state_lock）；未指定时使用最近开始的会话"""
+        sid = self._latest if session_id is None else session_id
+        session = self._sessions.get(sid)
+        if session is None:
+            # 未开始会话就更新状态时，创建一个临时会话承接（与旧版行为一致）
+            session = self._sessions[sid] = BatchSession(sid, 0, _now())
+        return session
+
+    def _record(self, session: BatchSession, delta: Dict[str, Any]):
+        """记录一条增量并安排写入（调用方需持有 _state_lock）"""
+        delta["session"] = session.session_id
+        delta["ts"] = session.last_update = _now()
+        self._pending.append(delta)
+        for sub in self._subscribers:
+            sub.publish(delta)
         self._save_state()
 
-    def update_task(self, task_idx: int, status: str, **kwargs):
-        """更新任务状态"""
-        # 查找现有任务
-        task = None
-        for t in self.current_state["tasks"]:
-            if t["idx"] == task_idx:
-                task = t
+    def subscribe(self, session_id: str = "") -> StateSubscription:
+        """订阅状态变更（指定会话或全部会话）；订阅者不得修改收到的变更"""
+        sub = StateSubscription(session_id)
+        with self._state_lock:
+            self._subscribers.append(sub)
+        return sub
+
+    def unsubscribe(self, sub: StateSubscription):
+        with self._state_lock:
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+
+    def _evict(self):
+        """会话数超过上限时淘汰最早结束的会话（调用方需持有 _state_lock）"""
+        for sid in [sid for sid, s in self._sessions.items() if s.finished or not sid]:
+            if len(self._sessions) <= MAX_SESSIONS:
                 break
+            if sid != self._latest:
+                del self._sessions[sid]
 
-        # 如果任务不存在，创建新任务
-        if task is None:
-            task = {
-                "idx": task_idx,
-                "status": "pending",
-                "prompt": "",
-                "task_id": "",
-                "video_url": "",
-                "local_path": "",
-                "error": "",
-                "start_time": datetime.now().strftime("%H:%M:%S"),
-                "update_time": datetime.now().strftime("%H:%M:%S")
-            }
-            self.current_state["tasks"].append(task)
-
-        # 更新任务状态
-        old_status = task["status"]
-        task["status"] = status
-        task["update_time"] = datetime.now().strftime("%H:%M:%S")
-
-        # 更新其他字段
-        for key, value in kwargs.items():
-            if key in task:
-                task[key] = value
-
-        # 更新统计
-        if old_status != status:
-            if old_status == "processing":
-                self.current_state["processing"] -= 1
-            elif old_status == "completed":
-                self.current_state["completed"] -= 1
-            elif old_status == "failed":
-                self.current_state["failed"] -= 1
-
-            if status == "processing":
-                self.current_state["processing"] += 1
-            elif status == "completed":
-                self.current_state["completed"] += 1
-            elif status == "failed":
-                self.current_state["failed"] += 1
+    def start_session(self, session_id: str, total: int) -> SessionHandle:
+        """开始新的批量处理会话，返回绑定到该会话的句柄
 
-        self.current_state["last_update"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self._save_state()
+        同名会话仍在运行时自动追加序号，避免两个节点写入同一会话。
+        """
+        with self._state_lock:
+            base, n = session_id, 1
+            while session_id in self._sessions and not self._sessions[session_id].finished:
+                n += 1
+                session_id = f"{base}_{n}"
+
+            self._sessions.pop(session_id, None)
+            session = self._sessions[session_id] = BatchSession(session_id, total, _now())
+            self._latest = session_id
+            self._evict()
+
+            # 重写增量日志：其余会话写入快照（已包含其尚未写入的变更），再记录新会话的开始
+            self._pending = [
+                {"op": "snapshot", "session": sid, "state": s.snapshot(), "ts": s.last_update}
+                for sid, s in self._sessions.items() if sid != session_id
+            ]
+            self._rewrite = True
+            self._record(session, {"op": "start", "total": total, "start_time": session.start_time})
+        return SessionHandle(self, session_id)
+
+    def set_total(self, total: int, session_id: Optional[str] = None):
+        """更新任务总数（流式任务源边读边提交时逐步增加）"""
+        with self._state_lock:
+            session = self._session(session_id)
+            session.total = total
+            self._record(session, {"op": "total", "total": total})
+
+    def update_task(self, task_idx: int, status: str, session_id: Optional[str] = None, **kwargs):
+        """更新任务状态"""
+        with self._state_lock:
+            session = self._session(session_id)
+            task = session.apply_task(task_idx, status, kwargs)
+            self._record(session, {"op": "task", "task": dict(task)})
 
-    def add_log(self, task_idx: int, level: str, message: str, max_logs: int = 1000):
+    def add_log(self, task_idx: int, level: str, message: str, max_logs: int = DEFAULT_MAX_LOGS,
+                session_id: Optional[str] = None):
         """
         添加日志条目
 
@@ -132,6 +444,7 @@ class BatchProcessState:
             level: 日志级别 (INFO, DEBUG, WARNING, ERROR)
             message: 日志消息
             max_logs: 最大日志条数（使用循环缓冲区）
+            session_id: 会话ID，默认为最近开始的会话
         """
         log_entry = {
             "timestamp": datetime.now().strftime("%H:%M:%S"),
@@ -140,102 +453,126 @@ class BatchProcessState:
             "message": message
         }
 
-        # 添加日志
-        self.current_state["logs"].append(log_entry)
-
-        # 限制日志数量（FIFO）
-        if len(self.current_state["logs"]) > max_logs:
-            self.current_state["logs"] = self.current_state["logs"][-max_logs:]
-
-        self.current_state["last_update"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self._save_state()
-
-    def get_statistics(self) -> Dict[str, Any]:
+        with self._state_lock:
+            session = self._session(session_id)
+            session.append_log(log_entry, max_logs)
+            self._record(session, {"op": "log", "entry": log_entry})
+
+    def close_session(self, session_id: Optional[str] = None):
+        """关闭会话（节点退出时调用）：之后同名的 start_session 复用该名称，不再追加序号"""
+        with self._state_lock:
+            session = self._sessions.get(self._latest if session_id is None else session_id)
+            if session is None or session.closed:
+                return
+            session.closed = True
+            self._record(session, {"op": "close"})
+
+    def get_statistics(self, session_id: Optional[str] = None) -> Dict[str, Any]:
         """
-        计算统计信息
+        获取统计信息（由滚动聚合直接得出，不遍历任务）
 
         Returns:
-            包含平均耗时、成功率、预计剩余时间的字典
+            包含平均耗时、p50/p95 耗时、成功率、吞吐量、预计剩余时间，
+            以及按模型与阶段（submit/render/download/total）细分的耗时统计
         """
-        stats = {
-            "avg_duration": 0.0,
-            "success_rate": 0.0,
-            "estimated_remaining": 0
-        }
-
-        try:
-            # 获取已完成的任务
-            completed_tasks = [t for t in self.current_state["tasks"] if t["status"] == "completed"]
-
-            if completed_tasks:
-                # 计算平均耗时
-                durations = []
-                for task in completed_tasks:
-                    try:
-                        start_time = datetime.strptime(task["start_time"], "%H:%M:%S")
-                        update_time = datetime.strptime(task["update_time"], "%H:%M:%S")
-                        duration = (update_time - start_time).total_seconds()
-                        if duration > 0:
-                            durations.append(duration)
-                    except:
-                        pass
-
-                if durations:
-                    stats["avg_duration"] = sum(durations) / len(durations)
-
-            # 计算成功率
-            finished = self.current_state["completed"] + self.current_state["failed"]
-            if finished > 0:
-                stats["success_rate"] = (self.current_state["completed"] / finished) * 100
-
-            # 预计剩余时间
-            remaining = self.current_state["total"] - finished
-            if stats["avg_duration"] > 0 and remaining > 0:
-                stats["estimated_remaining"] = int(stats["avg_duration"] * remaining)
-
-        except Exception as e:
-            print(f"[BatchProcessState] 计算统计信息失败: {e}")
-
-        # 更新状态中的统计信息
-        self.current_state["statistics"] = stats
-
-        return stats
+        with self._state_lock:
+            session = self._sessions.get(self._latest if session_id is None else session_id)
+            if session is None:
+                return {
+                    "avg_duration": 0.0,
+                    "success_rate": 0.0,
+                    "estimated_remaining": 0
+                }
+            try:
+                session.statistics = session.compute_statistics()
+            except Exception as e:
+                print(f"[BatchProcessState] 计算统计信息失败: {e}")
+            return dict(session.statistics)
 
     def _save_state(self):
-        """保存状态到文件"""
-        try:
-            with open(self.state_file, 'w', encoding='utf-8') as f:
-                json.dump(self.current_state, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"[BatchProcessState] 保存状态失败: {e}")
-
-    def get_state(self) -> Dict[str, Any]:
-        """获取当前状态"""
+        """安排一次增量写入（FLUSH_INTERVAL 内的多次变更合并为一次追加）；只取 _state_lock，可在持有它时调用"""
+        with self._state_lock:
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(FLUSH_INTERVAL, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def flush(self):
+        """立即把待写入的增量追加到状态文件"""
+        with self._flush_lock:
+            with self._state_lock:
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                    self._flush_timer = None
+                pending, self._pending = self._pending, []
+                rewrite, self._rewrite = self._rewrite, False
+            if not pending and not rewrite:
+                return
+            try:
+                with open(self.state_file, 'w' if rewrite else 'a', encoding='utf-8') as f:
+                    f.write("".join(json.dumps(d, ensure_ascii=False) + "\n" for d in pending))
+            except Exception as e:
+                print(f"[BatchProcessState] 保存状态失败: {e}")
+
+    def _load_sessions(self) -> Dict[str, BatchSession]:
+        """当前进程没有会话时从增量日志恢复（只读，不影响内存中的状态）"""
+        with self._state_lock:
+            if self._sessions:
+                return self._sessions
         try:
             if self.state_file.exists():
                 with open(self.state_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                    return replay_sessions(f)
         except Exception as e:
             print(f"[BatchProcessState] 读取状态失败: {e}")
+        return {}
+
+    def get_state(self, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """获取会话的状态快照；未指定时返回最近开始的会话"""
+        with self._state_lock:
+            sessions = self._load_sessions()
+            if session_id is None:
+                session_id = self._latest if self._sessions else next(reversed(sessions), "")
+            session = sessions.get(session_id)
+            return session.snapshot() if session else BatchSession().snapshot()
+
+    def get_summary(self, session_id: str) -> Dict[str, Any]:
+        """获取会话概要（不复制任务与日志）"""
+        with self._state_lock:
+            session = self._sessions.get(session_id)
+            return session.summary() if session else BatchSession(session_id).summary()
+
+    def get_sessions(self) -> List[Dict[str, Any]]:
+        """获取全部会话的状态快照（最近开始的在前）"""
+        with self._state_lock:
+            return [s.snapshot() for sid, s in reversed(list(self._load_sessions().items())) if sid]
+
+    def clear_state(self, session_id: Optional[str] = None):
+        """清除状态（指定会话时只清除该会话）"""
+        if session_id is not None:
+            with self._state_lock:
+                self._sessions.pop(session_id, None)
+                if self._latest == session_id:
+                    self._latest = next(reversed(self._sessions), "")
+                self._pending = [
+                    {"op": "snapshot", "session": sid, "state": s.snapshot(), "ts": s.last_update}
+                    for sid, s in self._sessions.items()
+                ]
+                self._rewrite = True
+            self._save_state()
+            return
 
-        return self.current_state
-
-    def clear_state(self):
-        """清除状态"""
-        self.current_state = {
-            "session_id": "",
-            "start_time": "",
-            "total": 0,
-            "completed": 0,
-            "failed": 0,
-            "processing": 0,
-            "tasks": [],
-            "logs": [],
-            "statistics": {},
-            "last_update": ""
-        }
-        if self.state_file.exists():
-            self.state_file.unlink()
+        with self._flush_lock:
+            with self._state_lock:
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                    self._flush_timer = None
+                self._sessions = {}
+                self._latest = ""
+                self._pending = []
+                self._rewrite = False
+            if self.state_file.exists():
+                self.state_file.unlink()
 
 
 def format_realtime_log(state: Dict[str, Any], max_tasks: int = 20) -> str:
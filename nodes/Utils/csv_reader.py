@@ -1,9 +1,11 @@
 """CSV 批量读取节点 - 用于批量图像生成任务"""
 
-import csv
 import os
 import json
 
+from .input_index import get_index
+from .task_source import iter_csv_rows, make_csv_source
+
 # 尝试导入 ComfyUI 的 folder_paths
 try:
     import folder_paths
@@ -24,14 +26,8 @@ class CSVBatchReader:
             try:
                 input_dir = folder_paths.get_input_directory()
                 if os.path.exists(input_dir):
-                    # 递归扫描所有子目录
-                    for root, dirs, files in os.walk(input_dir):
-                        for f in files:
-                            if f.lower().endswith('.csv'):
-                                # 计算相对路径
-                                rel_path = os.path.relpath(os.path.join(root, f), input_dir)
-                                csv_files.append(rel_path)
-                    csv_files = sorted(csv_files)
+                    # 递归列出所有子目录中的 CSV（使用缓存索引，只重新列举有变化的目录）
+                    csv_files = get_index(input_dir).list_files(('.csv',))
             except Exception as e:
                 print(f"[CSVBatchReader] 无法读取 input 目录: {e}")
 
@@ -48,11 +44,15 @@ class CSVBatchReader:
                     "multiline": False,
                     "tooltip": "或输入完整路径（支持绝对路径和相对路径）"
                 }),
+                "streaming": ("BOOLEAN", {
+                    "default": False,
+                    "tooltip": "流式读取：只输出文件引用，由批量处理器按行分批读取（适合数万行的大文件）"
+                }),
             }
         }
 
     @classmethod
-    def VALIDATE_INPUTS(cls, csv_file="", csv_path=""):
+    def VALIDATE_INPUTS(cls, csv_file="", csv_path="", streaming=False):
         """验证输入参数 - 在节点创建时允许空值"""
         # 允许节点创建，在执行时再检查
         return True
@@ -67,17 +67,20 @@ class CSVBatchReader:
         return {
             "csv_file": "CSV文件",
             "csv_path": "文件路径",
+            "streaming": "流式读取",
         }
 
     @classmethod
-    def IS_CHANGED(cls, csv_file="", csv_path=""):
+    def IS_CHANGED(cls, csv_file="", csv_path="", streaming=False):
         """检测输入是否改变"""
         # 优先检查 csv_file（从 input 目录）
         if csv_file and csv_file.strip() and HAS_FOLDER_PATHS:
             try:
                 input_dir = folder_paths.get_input_directory()
                 file_path = os.path.join(input_dir, csv_file)
-                if os.path.exists(file_path):
+                if not os.path.exists(file_path):
+                    file_path = get_index(input_dir).find(os.path.basename(csv_file))
+                if file_path:
                     return os.path.getmtime(file_path)
             except:
                 pass
@@ -90,12 +93,13 @@ class CSVBatchReader:
 
         return float("nan")
 
-    def read_csv(self, csv_file="", csv_path=""):
+    def read_csv(self, csv_file="", csv_path="", streaming=False):
         """读取 CSV 文件并返回 JSON 格式的任务列表
 
         Args:
             csv_file: 从下拉列表选择的文件名（input 目录）
             csv_path: 或输入完整路径
+            streaming: 为 True 时只校验文件并返回任务源引用，由批量处理器流式读取
         """
         try:
             file_path = None
@@ -111,19 +115,13 @@ class CSVBatchReader:
                 # 支持相对路径（如 csv/file.csv）
                 file_path = os.path.join(input_dir, csv_file)
 
-                # 如果直接拼接找不到，尝试在子目录中递归查找
+                # 如果直接拼接找不到，通过 input 目录索引在子目录中查找
                 if not os.path.exists(file_path):
-                    # 尝试递归查找文件名
-                    found = False
-                    filename = os.path.basename(csv_file)
-                    for root, dirs, files in os.walk(input_dir):
-                        if filename in files:
-                            file_path = os.path.join(root, filename)
-                            found = True
-                            print(f"[CSVBatchReader] 在子目录中找到文件: {os.path.relpath(file_path, input_dir)}")
-                            break
-
-                    if not found:
+                    found_path = get_index(input_dir).find(os.path.basename(csv_file))
+                    if found_path:
+                        file_path = found_path
+                        print(f"[CSVBatchReader] 在子目录中找到文件: {os.path.relpath(file_path, input_dir)}")
+                    else:
                         raise FileNotFoundError(
                             f"文件不存在: {csv_file}\n\n"
                             f"💡 上传方法：\n"
@@ -174,35 +172,18 @@ class CSVBatchReader:
             if not file_path.lower().endswith('.csv'):
                 raise ValueError(f"文件必须是 CSV 格式: {file_path}")
 
+            # 流式模式：只确认存在有效行，返回任务源引用
+            if streaming:
+                rows = iter_csv_rows(file_path)
+                first_row = next(rows, None)
+                rows.close()
+                if first_row is None:
+                    raise ValueError("CSV 文件中没有有效的任务数据")
+                print(f"[CSVBatchReader] 流式读取模式，任务将由批量处理器按行读取: {file_path}")
+                return (make_csv_source(file_path),)
+
             # 读取 CSV 文件
-            tasks = []
-            try:
-                with open(file_path, 'r', encoding='utf-8-sig') as f:
-                    reader = csv.DictReader(f)
-
-                    # 验证必需的列
-                    if not reader.fieldnames:
-                        raise ValueError("CSV 文件为空或格式不正确")
-
-                    for row_num, row in enumerate(reader, start=2):  # 从第2行开始（第1行是标题）
-                        # 跳过空行
-                        if not any(row.values()):
-                            continue
-
-                        # 清理数据（去除空白）
-                        cleaned_row = {k: v.strip() if isinstance(v, str) else v for k, v in row.items()}
-                        cleaned_row['_row_number'] = row_num  # 添加行号用于调试
-                        tasks.append(cleaned_row)
-
-            except UnicodeDecodeError as e:
-                raise RuntimeError(
-                    f"CSV 文件编码错误: {file_path}\n\n"
-                    f"💡 解决方法：\n"
-                    f"  1. 用文本编辑器打开CSV文件\n"
-                    f"  2. 另存为时选择 UTF-8 编码\n"
-                    f"  3. 重新上传文件\n\n"
-                    f"详细错误: {str(e)}"
-                )
+            tasks = list(iter_csv_rows(file_path))
 
             if not tasks:
                 raise ValueError("CSV 文件中没有有效的任务数据")
@@ -1,5 +1,5 @@
 import json
-import requests
+from . import http_transport
 import sys
 from pathlib import Path
 
@@ -69,7 +69,7 @@ class DeepseekOCRToPrompt:
         }
 
         try:
-            resp = requests.post(endpoint, headers=http_headers_auth_only(api_key), json=payload, timeout=int(timeout))
+            resp = http_transport.post(endpoint, headers=http_headers_auth_only(api_key), json=payload, timeout=int(timeout))
             if resp.status_code >= 400:
                 detail = extract_error_message_from_response(resp)
                 raise RuntimeError(f"OCR 调用失败: {detail}")
@@ -0,0 +1,198 @@
+"""目录清单 - 记录目录批量节点对每张图片的处理结果，重复运行时只处理新增或修改过的图片
+
+清单保存在图片目录下的 .kuai_manifest.json，按文件名记录：
+  - 文件指纹：大小、修改时间（纳秒）与内容 SHA-256（大小与修改时间未变时不重新计算哈希）；
+  - 上传得到的图床 URL；
+  - 每组生成参数（提供方、模型、提示词等的哈希）下的任务 ID、输出文件与状态。
+同一组参数下已生成成功、输出文件仍存在且图片内容未变的视为已处理；新增、修改、失败或输出被删除的图片重新处理。
+
+watch_new_files 用于监视模式：处理完已有图片后继续扫描目录，产出写入完成的新图片。
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from .sliding_window import WAIT
+
+MANIFEST_NAME = ".kuai_manifest.json"
+MANIFEST_VERSION = 1
+
+# 新文件两次扫描间大小与修改时间不变、且间隔不少于该秒数才视为写入完成
+WATCH_SETTLE_SECONDS = 2.0
+
+
+def params_key(**params) -> str:
+    """生成参数的哈希；提示词、模型等任一参数变化都视为需要重新生成"""
+    raw = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _sha256(path: Path) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class DirManifest:
+    """单个图片目录的处理清单（线程安全，每次记录后立即落盘）"""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.path = self.directory / MANIFEST_NAME
+        self._lock = threading.Lock()
+        self._save_failed = False
+        self._entries: Dict[str, dict] = self._load()
+
+    def _load(self) -> Dict[str, dict]:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"[DirManifest] 清单读取失败，将重新建立: {e}")
+            return {}
+        if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+            return {}
+        return data.get("entries", {})
+
+    def _save(self):
+        """写入清单（调用方需持有锁）；先写临时文件再替换，中途中断不会损坏已有清单"""
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        try:
+            tmp.write_text(json.dumps({"version": MANIFEST_VERSION, "entries": self._entries},
+                                      ensure_ascii=False, indent=1), encoding="utf-8")
+            os.replace(tmp, self.path)
+        except OSError as e:
+            if not self._save_failed:
+                print(f"[DirManifest] 清单写入失败（本次仍会处理，但下次无法跳过已处理图片）: {e}")
+            self._save_failed = True
+
+    def _refresh(self, path: Path) -> dict:
+        """更新图片的文件指纹并返回其条目；内容变化时清除旧的上传与生成记录"""
+        stat = path.stat()
+        with self._lock:
+            entry = self._entries.get(path.name)
+            if entry and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+                return entry
+
+        digest = _sha256(path)
+        with self._lock:
+            entry = self._entries.get(path.name)
+            if entry is None or entry.get("digest") != digest:
+                entry = {"digest": digest, "url": "", "runs": {}}
+                self._entries[path.name] = entry
+            entry["size"] = stat.st_size
+            entry["mtime_ns"] = stat.st_mtime_ns
+            return entry
+
+    def _entry(self, path: Path) -> Optional[dict]:
+        try:
+            return self._refresh(path)
+        except OSError as e:
+            print(f"[DirManifest] 读取文件失败 {path.name}: {e}")
+            return None
+
+    def is_done(self, path: Path, key: str) -> bool:
+        """该图片在参数 key 下是否已生成成功且输出文件仍存在"""
+        entry = self._entry(path)
+        run = entry["runs"].get(key) if entry else None
+        return bool(run and run.get("status") == "completed"
+                    and run.get("output") and os.path.isfile(run["output"]))
+
+    def pending(self, paths: Iterable[Path], key: str) -> List[Path]:
+        """筛选出需要处理的图片（新增、修改、失败或输出已删除），并保存更新后的文件指纹"""
+        result = [p for p in paths if not self.is_done(p, key)]
+        with self._lock:
+            self._save()
+        return result
+
+    def record_upload(self, path: Path, url: str):
+        """记录图片上传得到的 URL"""
+        entry = self._entry(path)
+        if entry is None:
+            return
+        with self._lock:
+            entry["url"] = url
+            self._save()
+
+    def record_result(self, path: Path, key: str, task_id: str = "", output: str = "",
+                      status: str = "", error: str = ""):
+        """记录图片在参数 key 下的生成结果（output 为输出文件的绝对路径）"""
+        entry = self._entry(path)
+        if entry is None:
+            return
+        with self._lock:
+            entry["runs"][key] = {
+                "task_id": task_id,
+                "output": output,
+                "status": status,
+                "error": error,
+                "updated": int(time.time()),
+            }
+            self._save()
+
+    def get(self, path: Path) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(Path(path).name)
+            return json.loads(json.dumps(entry)) if entry else None
+
+
+def watch_new_files(list_files: Callable[[], List[Path]], known: Iterable[Path],
+                    accept: Callable[[Path], bool], idle_seconds: float,
+                    limit: Optional[int] = None,
+                    settle_seconds: float = WATCH_SETTLE_SECONDS) -> Iterator:
+    """监视目录中新出现的文件
+
+    每次被取值时重新扫描：写入完成（大小与修改时间在 settle_seconds 内不变）且 accept(path) 为真的新文件依次产出；
+    暂时没有新文件时产出 WAIT（由滑动窗口稍后再取）；连续 idle_seconds 秒没有新文件，或已产出 limit 个文件后结束。
+    """
+    seen = set(known)
+    observed: Dict[Path, tuple] = {}
+    count = 0
+    idle_since = time.monotonic()
+
+    while limit is None or count < limit:
+        now = time.monotonic()
+        ready = []
+        files = list_files()
+        for path in set(observed) - set(files):
+            observed.pop(path)  # 写入中途被删除或改名
+        for path in files:
+            if path in seen:
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+            last = observed.get(path)
+            if last is None or last[0] != signature:
+                observed[path] = (signature, now)
+            elif now - last[1] >= settle_seconds:
+                seen.add(path)
+                observed.pop(path, None)
+                if accept(path):
+                    ready.append(path)
+
+        if ready:
+            idle_since = now
+            for path in ready:
+                if limit is not None and count >= limit:
+                    return
+                count += 1
+                yield path
+        elif observed:
+            # 有文件正在写入，不计入空闲时间
+            idle_since = now
+            yield WAIT
+        elif now - idle_since >= idle_seconds:
+            return
+        else:
+            yield WAIT
@@ -0,0 +1,334 @@
+"""共享下载引擎 - 断点续传、大文件分段并行下载、临时文件原子替换与完整性校验
+
+各节点原先各自以 8KB 分块流式下载：失败后从头开始，且可能留下写了一半的 .mp4。
+本模块统一处理生成结果的下载：
+  - 先以 Range: bytes=0- 探测：服务端返回 206 时支持断点续传，并得到文件总长度；
+  - 大文件（默认 ≥16MB）拆成若干段并行下载到预分配的临时文件，每段失败后从已写入的位置续传；
+  - 进度保存在 <目标文件>.part.json（传输中每 PROGRESS_SAVE_BYTES 字节或 PROGRESS_SAVE_SECONDS 秒更新一次），
+    进程中断后再次下载同一 URL 时从断点继续；
+  - 以 1MB 块写入，下载完成后校验长度（以及 Content-MD5 / x-goog-hash 或调用方给出的校验和），
+    通过后才原子替换为目标文件，目标路径上永远不会出现不完整的文件。
+分段数可通过环境变量 KUAI_DOWNLOAD_SEGMENTS 调整（1 表示不分段）；
+所有下载共享的带宽上限由 KUAI_DOWNLOAD_BANDWIDTH_MBPS 设置（MB/s，默认 0 表示不限）。
+"""
+
+import base64
+import concurrent.futures
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from . import http_transport
+from .retry_policy import backoff_delay
+
+CHUNK_SIZE = 1024 * 1024
+DEFAULT_SEGMENTS = 4
+# 不小于该大小的文件才分段并行下载；每段不小于 MIN_SEGMENT_SIZE
+PARALLEL_THRESHOLD = 16 * 1024 * 1024
+MIN_SEGMENT_SIZE = 4 * 1024 * 1024
+# 单段（或单流）在传输中断后的续传次数
+RESUME_ATTEMPTS = 5
+# 分段下载时进度文件的更新频率：每段每写入该字节数或经过该秒数保存一次
+PROGRESS_SAVE_BYTES = 8 * 1024 * 1024
+PROGRESS_SAVE_SECONDS = 2.0
+
+
+def _default_segments() -> int:
+    try:
+        return max(int(os.environ.get("KUAI_DOWNLOAD_SEGMENTS", "").strip()), 1)
+    except ValueError:
+        return DEFAULT_SEGMENTS
+
+
+def _default_bandwidth() -> float:
+    try:
+        return max(float(os.environ.get("KUAI_DOWNLOAD_BANDWIDTH_MBPS", "").strip()), 0.0)
+    except ValueError:
+        return 0.0
+
+
+class BandwidthLimiter:
+    """全局带宽上限（字节令牌桶，单例模式）；rate 为 0 时不限速"""
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self._initialized = True
+        self._bucket_lock = threading.Lock()
+        self.set_rate(_default_bandwidth() * 1024 * 1024)
+
+    def set_rate(self, bytes_per_sec: float):
+        """设置带宽上限（字节/秒），0 表示不限；桶容量为 1 秒的流量"""
+        with self._bucket_lock:
+            self.rate = max(float(bytes_per_sec), 0.0)
+            self._tokens = self.rate
+            self._stamp = time.monotonic()
+
+    def consume(self, nbytes: int):
+        """记入 nbytes 字节的流量，超出上限时阻塞到令牌足够"""
+        if self.rate <= 0 or nbytes <= 0:
+            return
+        with self._bucket_lock:
+            now = time.monotonic()
+            self._tokens = min(self._tokens + (now - self._stamp) * self.rate, self.rate)
+            self._stamp = now
+            # 先扣减（允许为负），多个线程按扣减顺序依次等待，整体速率不超过上限
+            self._tokens -= nbytes
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+
+def _content_range_total(value: str) -> Optional[int]:
+    """解析 Content-Range: bytes 0-99/1234 中的总长度"""
+    try:
+        total = value.rsplit("/", 1)[1].strip()
+        return int(total) if total != "*" else None
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def _content_range_start(value: str) -> Optional[int]:
+    try:
+        return int(value.split()[1].split("-", 1)[0])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def _server_checksum(headers) -> Optional[str]:
+    """从响应头读取服务端给出的 MD5（Content-MD5 或 x-goog-hash: md5=...），格式为 "md5:<hex>" """
+    candidates = [headers.get("Content-MD5", "")]
+    candidates += [part.strip()[4:] for part in headers.get("x-goog-hash", "").split(",")
+                   if part.strip().startswith("md5=")]
+    for value in candidates:
+        try:
+            raw = base64.b64decode(value, validate=True) if value else b""
+        except ValueError:
+            continue
+        if len(raw) == 16:
+            return f"md5:{raw.hex()}"
+    return None
+
+
+def _file_checksum(path: Path, algorithm: str) -> str:
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class _Progress:
+    """分段下载进度（持久化到 .part.json，用于跨进程续传）"""
+
+    def __init__(self, path: Path, url: str, total: int, validator: str, segments: List[List[int]]):
+        self.path = path
+        self.url = url
+        self.total = total
+        self.validator = validator
+        # 每段 [起始, 结束(含), 已写入到的位置]
+        self.segments = segments
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: Path, url: str, total: int, validator: str) -> Optional["_Progress"]:
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if (data.get("url"), data.get("total"), data.get("validator")) != (url, total, validator):
+            return None
+        return cls(path, url, total, validator, data.get("segments", []))
+
+    def save(self):
+        """写入进度（先写临时文件再替换，进程在写入途中被终止也不会留下损坏的进度）"""
+        with self._lock:
+            data = {"url": self.url, "total": self.total, "validator": self.validator,
+                    "segments": self.segments}
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            tmp.write_text(json.dumps(data), encoding="utf-8")
+            os.replace(tmp, self.path)
+
+
+def _stream_range(url: str, part: Path, segment: List[int], timeout, progress: Optional[_Progress]):
+    """下载 segment=[start, end, pos] 的剩余部分写入 part；中断时从已写入位置续传"""
+    start, end, _ = segment
+    for attempt in range(RESUME_ATTEMPTS + 1):
+        pos = segment[2]
+        if pos > end:
+            return
+        try:
+            resp = http_transport.get(url, headers={"Range": f"bytes={pos}-{end}"}, timeout=timeout, stream=True)
+            with resp:
+                resp.raise_for_status()
+                if resp.status_code != 206 or _content_range_start(resp.headers.get("Content-Range", "")) != pos:
+                    raise RuntimeError(f"服务端未按请求返回分段 ({resp.status_code})")
+                with open(part, "r+b") as f:
+                    f.seek(pos)
+                    saved_pos, saved_at = pos, time.monotonic()
+                    for chunk in resp.iter_content(chunk_size=CHUNK_SIZE):
+                        if not chunk:
+                            continue
+                        chunk = chunk[:end + 1 - segment[2]]
+                        # 写入后立即交给操作系统，任一分段保存进度时记录的位置都不会超过已写入的内容
+                        f.write(chunk)
+                        f.flush()
+                        segment[2] += len(chunk)
+                        BandwidthLimiter().consume(len(chunk))
+                        if progress is not None and (segment[2] - saved_pos >= PROGRESS_SAVE_BYTES
+                                                     or time.monotonic() - saved_at >= PROGRESS_SAVE_SECONDS):
+                            progress.save()
+                            saved_pos, saved_at = segment[2], time.monotonic()
+            if segment[2] > end:
+                return
+            raise RuntimeError(f"分段 {start}-{end} 提前结束")
+        except Exception as e:
+            if progress is not None:
+                progress.save()
+            if attempt >= RESUME_ATTEMPTS:
+                raise RuntimeError(f"分段 {start}-{end} 下载失败: {e}") from e
+            delay = backoff_delay(attempt)
+            print(f"[Download] 分段 {start}-{end} 中断（已写入 {segment[2] - start} 字节），{delay:.1f}s 后续传: {e}")
+            time.sleep(delay)
+
+
+def _download_single(url: str, part: Path, probe, total: Optional[int], ranged: bool, timeout):
+    """单流下载：支持 Range 时从临时文件已有长度续传，否则整体重下"""
+    resp = probe
+    for attempt in range(RESUME_ATTEMPTS + 1):
+        try:
+            if resp is None:
+                offset = part.stat().st_size if (ranged and part.exists()) else 0
+                headers = {"Range": f"bytes={offset}-"} if offset else None
+                resp = http_transport.get(url, headers=headers, timeout=timeout, stream=True)
+            with resp:
+                resp.raise_for_status()
+                offset = 0
+                if resp.status_code == 206:
+                    offset = _content_range_start(resp.headers.get("Content-Range", "")) or 0
+                with open(part, "r+b" if offset and part.exists() else "wb") as f:
+                    f.seek(offset)
+                    f.truncate()
+                    for chunk in resp.iter_content(chunk_size=CHUNK_SIZE):
+                        if chunk:
+                            f.write(chunk)
+                            BandwidthLimiter().consume(len(chunk))
+            resp = None
+            size = part.stat().st_size
+            if total is None or size >= total:
+                return
+            raise RuntimeError(f"连接提前结束（{size}/{total} 字节）")
+        except Exception as e:
+            resp = None
+            if attempt >= RESUME_ATTEMPTS:
+                raise
+            delay = backoff_delay(attempt)
+            print(f"[Download] 下载中断，{delay:.1f}s 后{'续传' if ranged else '重新下载'}: {e}")
+            time.sleep(delay)
+
+
+def _plan_segments(total: int, count: int) -> List[List[int]]:
+    count = max(min(count, total // MIN_SEGMENT_SIZE), 1)
+    size = -(-total // count)
+    return [[s, min(s + size, total) - 1, s] for s in range(0, total, size)]
+
+
+def download_file(url: str, dest, timeout=180, segments: Optional[int] = None,
+                  checksum: Optional[str] = None) -> Path:
+    """下载 url 到 dest（先写临时文件，校验通过后原子替换），返回目标路径
+
+    Args:
+        url: 下载地址
+        dest: 目标文件路径（所在目录不存在时自动创建）
+        timeout: 单次请求的连接/读取超时（秒）
+        segments: 大文件分段数，默认 KUAI_DOWNLOAD_SEGMENTS（4）
+        checksum: 期望的校验和，如 "sha256:<hex>" / "md5:<hex>"；为空时使用服务端提供的 MD5（若有）
+
+    Raises:
+        RuntimeError: 下载失败或校验不通过（此时不会生成目标文件）
+    """
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    part = dest.with_name(dest.name + ".part")
+    meta = dest.with_name(dest.name + ".part.json")
+    segments = segments or _default_segments()
+
+    # 探测：206 表示支持 Range，并从 Content-Range 得到总长度
+    probe = http_transport.get(url, headers={"Range": "bytes=0-"}, timeout=timeout, stream=True)
+    try:
+        probe.raise_for_status()
+    except Exception as e:
+        probe.close()
+        raise RuntimeError(f"下载失败: {e}") from e
+    ranged = probe.status_code == 206
+    if ranged:
+        total = _content_range_total(probe.headers.get("Content-Range", ""))
+    else:
+        length = probe.headers.get("Content-Length")
+        total = int(length) if length and length.isdigit() else None
+    checksum = checksum or _server_checksum(probe.headers)
+    validator = probe.headers.get("ETag") or probe.headers.get("Last-Modified") or ""
+
+    try:
+        if ranged and total and total >= PARALLEL_THRESHOLD and segments > 1:
+            probe.close()
+            progress = _Progress.load(meta, url, total, validator)
+            if progress is None or not part.exists() or part.stat().st_size != total:
+                progress = _Progress(meta, url, total, validator, _plan_segments(total, segments))
+                with open(part, "wb") as f:
+                    f.truncate(total)
+                progress.save()
+            else:
+                done = sum(s[2] - s[0] for s in progress.segments)
+                print(f"[Download] 从断点续传: 已完成 {done}/{total} 字节")
+            remaining = [s for s in progress.segments if s[2] <= s[1]]
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max(len(remaining), 1),
+                                                       thread_name_prefix="kuai-download") as pool:
+                futures = [pool.submit(_stream_range, url, part, s, timeout, progress) for s in remaining]
+                for f in futures:
+                    f.result()
+        else:
+            # 临时文件只有在服务端支持 Range 且对象未变化时才能续传
+            resumable = ranged and part.exists() and _Progress.load(meta, url, total, validator) is not None
+            if resumable and 0 < part.stat().st_size < (total or 0):
+                probe.close()
+                probe = None
+                print(f"[Download] 从断点续传: 已完成 {part.stat().st_size}/{total} 字节")
+            elif ranged:
+                _Progress(meta, url, total or 0, validator, []).save()
+            _download_single(url, part, probe, total, ranged, timeout)
+
+        size = part.stat().st_size
+        if total is not None and size != total:
+            raise RuntimeError(f"文件长度不符（{size}/{total} 字节）")
+        if checksum:
+            algorithm, _, expected = checksum.partition(":")
+            actual = _file_checksum(part, algorithm)
+            if actual.lower() != expected.lower():
+                part.unlink(missing_ok=True)
+                meta.unlink(missing_ok=True)
+                raise RuntimeError(f"校验和不符（{algorithm}: {actual} ≠ {expected}）")
+    except RuntimeError:
+        raise
+    except Exception as e:
+        raise RuntimeError(f"下载失败: {e}") from e
+
+    os.replace(part, dest)
+    meta.unlink(missing_ok=True)
+    return dest
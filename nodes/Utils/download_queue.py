@@ -0,0 +1,89 @@
+"""下载队列 - 与提交/轮询解耦的独立下载阶段
+
+批量节点的工作线程原先在轮询完成后自己下载视频，CDN 传输慢时该工作线程迟迟不能去提交或轮询下一个任务。
+现在轮询完成的结果交给本队列：
+  - 下载在独立的有界线程池中执行（默认 4 路，KUAI_DOWNLOAD_WORKERS），工作线程提交后立即返回；
+  - 排队 + 进行中的下载数有上限（默认 64，KUAI_DOWNLOAD_QUEUE），超过时提交方阻塞，形成背压；
+  - 所有下载共享带宽上限（KUAI_DOWNLOAD_BANDWIDTH_MBPS，单位 MB/s，0 表示不限，见 download_engine）；
+  - 下载任务在提交方的上下文中执行，沿用该任务的重试范围（见 retry_policy）。
+"""
+
+import concurrent.futures
+import contextvars
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable
+
+from .download_engine import download_file
+
+DEFAULT_WORKERS = 4
+DEFAULT_QUEUE_SIZE = 64
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        value = int(os.environ.get(name, "").strip())
+        return value if value > 0 else default
+    except ValueError:
+        return default
+
+
+class DownloadQueue:
+    """下载队列（单例模式）"""
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self._initialized = True
+        self.max_workers = _env_int("KUAI_DOWNLOAD_WORKERS", DEFAULT_WORKERS)
+        self.max_queued = max(_env_int("KUAI_DOWNLOAD_QUEUE", DEFAULT_QUEUE_SIZE), self.max_workers)
+        self._slots = threading.BoundedSemaphore(self.max_queued)
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="kuai-download-queue")
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+
+    @property
+    def pending_count(self) -> int:
+        """排队中与进行中的下载数"""
+        return self._pending
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> concurrent.futures.Future:
+        """把下载阶段（fn）放入队列，返回 Future；队列已满时阻塞直到有空位"""
+        self._slots.acquire()
+        with self._pending_lock:
+            self._pending += 1
+        ctx = contextvars.copy_context()
+
+        def _run():
+            try:
+                return ctx.run(fn, *args, **kwargs)
+            finally:
+                with self._pending_lock:
+                    self._pending -= 1
+                self._slots.release()
+
+        try:
+            return self._executor.submit(_run)
+        except Exception:
+            with self._pending_lock:
+                self._pending -= 1
+            self._slots.release()
+            raise
+
+    def download(self, url: str, dest, timeout=180) -> concurrent.futures.Future:
+        """排队下载 url 到 dest，Future 的结果为目标路径（Path）"""
+        return self.submit(download_file, url, Path(dest), timeout)
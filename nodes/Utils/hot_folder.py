@@ -0,0 +1,419 @@
+"""热文件夹守护 - 在后台持续监视图片目录或 CSV 投递目录，自动运行批量流水线
+
+目录/CSV 批量节点每次都要在界面上触发，并占用一个 ComfyUI 执行队列槽位直到整批结束。
+守护线程在后台运行，不占用执行队列：
+  - 图片目录：目录内容有变化、且在一个扫描间隔内保持不变（写入完成）时运行一次目录批量流水线，
+    目录清单保证只处理新增或修改过的图片；作业异常或有图片上传/生成失败时按指数退避重试
+    （重试时目录清单只放行失败的图片）；
+  - CSV 投递目录：每个写入完成的 CSV 文件运行一次 CSV 并发处理器，结束后连同处理报告移入 done/（失败移入 failed/）；
+  - 同时运行的作业数受 KUAI_HOTFOLDER_JOBS（默认 2）限制，作业内的请求仍经过全局限流器与下载队列；
+  - 每个监视项的作业写入 hotfolder_<名称> 会话（BatchProcessState），进度照常经 kuai.batch.progress 推送。
+"""
+
+import hashlib
+import importlib
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .batch_state import BatchProcessState
+from .task_source import make_csv_source
+
+DEFAULT_SCAN_INTERVAL = 30
+DEFAULT_MAX_JOBS = 2
+# 目录作业失败后的最长重试间隔（秒）
+MAX_RETRY_BACKOFF = 3600
+
+IMAGE_SUFFIXES = ('.png', '.jpg', '.jpeg', '.webp', '.bmp', '.gif')
+CSV_SUFFIXES = ('.csv',)
+
+# 流水线名称 → (监视类型, 模块, 节点类, 方法)
+PIPELINES = {
+    "grok_dir": ("dir", "..Grok.dir_batch_image2video", "GrokDirBatchImage2Video", "run"),
+    "veo3_dir": ("dir", "..Veo3.dir_batch_image2video", "VeoDirBatchImage2Video", "run"),
+    "grok_csv": ("csv", "..Grok.csv_concurrent_processor", "GrokCSVConcurrentProcessor", "process"),
+    "veo3_csv": ("csv", "..Veo3.csv_concurrent_processor", "VeoCSVConcurrentProcessor", "process"),
+}
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        value = int(os.environ.get(name, "").strip())
+        return value if value > 0 else default
+    except ValueError:
+        return default
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _list_files(directory: Path, suffixes) -> List[Path]:
+    return sorted(f for f in directory.iterdir() if f.is_file() and f.suffix.lower() in suffixes)
+
+
+def listing_signature(directory: Path, suffixes=IMAGE_SUFFIXES) -> Optional[str]:
+    """目录中匹配文件的名称、大小与修改时间的哈希；没有匹配文件时返回 None"""
+    files = _list_files(directory, suffixes)
+    if not files:
+        return None
+    listing = "|".join(f"{f.name}:{f.stat().st_size}:{f.stat().st_mtime_ns}" for f in files)
+    return hashlib.md5(listing.encode()).hexdigest()
+
+
+def make_runner(pipeline: str, prompt: str = "", api_key: str = "",
+                options: Optional[Dict[str, Any]] = None) -> Callable[[Path, str], Any]:
+    """按流水线名称构造作业函数 runner(目标路径, 会话ID)，options 为传给批量节点的其余参数"""
+    if pipeline not in PIPELINES:
+        raise RuntimeError(f"不支持的流水线: {pipeline}")
+    kind, module, cls_name, method = PIPELINES[pipeline]
+    node_cls = getattr(importlib.import_module(module, package=__package__), cls_name)
+    options = dict(options or {})
+
+    def _runner(target: Path, session_id: str):
+        fn = getattr(node_cls(), method)
+        if kind == "dir":
+            options.setdefault("skip_processed", True)
+            return fn(str(target), prompt, api_key, session_id=session_id, **options)
+        return fn(make_csv_source(str(target)), api_key, session_id=session_id, **options)
+
+    return _runner
+
+
+class HotFolderWatch:
+    """单个监视项：后台线程按扫描间隔检查目录，发现可处理的内容时运行作业"""
+
+    def __init__(self, name: str, kind: str, path: Path, runner: Callable[[Path, str], Any],
+                 scan_interval: float, job_slots: threading.Semaphore):
+        self.name = name
+        self.kind = kind
+        self.path = Path(path)
+        self.runner = runner
+        self.scan_interval = scan_interval
+        self.session_id = f"hotfolder_{name}"
+        self.status = "idle"
+        self.jobs = 0
+        self.failures = 0
+        self.last_run = ""
+        self.last_error = ""
+        self._slots = job_slots
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # 目录：上次扫描与上次成功处理时的目录签名，以及失败作业的签名与下次重试时间；
+        # CSV：上次扫描时各文件的 (大小, 修改时间)
+        self._seen: Optional[str] = None
+        self._handled: Optional[str] = None
+        self._failed: Optional[str] = None
+        self._dir_failures = 0
+        self._retry_at = 0.0
+        self._observed: Dict[Path, tuple] = {}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, daemon=True, name=f"kuai-hotfolder-{self.name}")
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """停止监视；正在运行的作业会执行完毕"""
+        self._stop.set()
+        if self._thread and timeout:
+            self._thread.join(timeout)
+
+    @property
+    def alive(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def _loop(self):
+        print(f"[HotFolder] 开始监视 {self.name}: {self.path}（每 {self.scan_interval}s 扫描）")
+        while not self._stop.is_set():
+            try:
+                if self.kind == "dir":
+                    self._scan_dir()
+                else:
+                    self._scan_spool()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"[HotFolder] {self.name} 扫描失败: {e}")
+            self._stop.wait(self.scan_interval)
+        print(f"[HotFolder] 停止监视 {self.name}")
+
+    def scan_once(self):
+        """执行一次扫描（测试与手动触发用）"""
+        if self.kind == "dir":
+            self._scan_dir()
+        else:
+            self._scan_spool()
+
+    def _scan_dir(self):
+        signature = listing_signature(self.path, IMAGE_SUFFIXES)
+        # 两次扫描之间目录未变化才视为写入完成；目录内容已成功处理过则跳过，作业失败则按指数退避重试
+        if (signature is not None and signature == self._seen and signature != self._handled
+                and (signature != self._failed or time.monotonic() >= self._retry_at)):
+            outcome = self._run_job(self.path)
+            if outcome is not None and outcome[0]:
+                self._handled, self._failed = signature, None
+            elif outcome is not None:
+                self._dir_failures = self._dir_failures + 1 if signature == self._failed else 1
+                self._failed = signature
+                backoff = min(self.scan_interval * 2 ** self._dir_failures, MAX_RETRY_BACKOFF)
+                self._retry_at = time.monotonic() + backoff
+                print(f"[HotFolder] {self.name} 将在 {backoff:.0f}s 后重试")
+        self._seen = signature
+
+    def _scan_spool(self):
+        observed = {}
+        ready = []
+        for f in _list_files(self.path, CSV_SUFFIXES):
+            stat = f.stat()
+            observed[f] = (stat.st_size, stat.st_mtime_ns)
+            if self._observed.get(f) == observed[f]:
+                ready.append(f)
+        self._observed = observed
+        for f in ready:
+            if self._stop.is_set():
+                return
+            outcome = self._run_job(f)
+            if outcome is None:
+                return  # 作业未开始（监视已停止），CSV 留在原处
+            ok, report = outcome
+            self._archive(f, "done" if ok else "failed", report)
+            self._observed.pop(f, None)
+
+    def _archive(self, csv_path: Path, folder: str, report: str):
+        """把处理完的 CSV 与报告移入 done/ 或 failed/，同名文件加时间戳"""
+        target_dir = self.path / folder
+        target_dir.mkdir(exist_ok=True)
+        target = target_dir / csv_path.name
+        if target.exists():
+            target = target_dir / f"{csv_path.stem}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{csv_path.suffix}"
+        shutil.move(str(csv_path), str(target))
+        target.with_suffix(".report.txt").write_text(report, encoding="utf-8")
+
+    def _run_job(self, target: Path) -> Optional[tuple]:
+        """在作业名额内运行一次作业，返回 (是否成功, 报告或错误信息)；等待名额时监视被停止则返回 None"""
+        while not self._slots.acquire(timeout=1.0):
+            if self._stop.is_set():
+                return None
+        try:
+            self.status = "running"
+            self.jobs += 1
+            self.last_run = _now()
+            print(f"[HotFolder] {self.name} 开始作业: {target}")
+            try:
+                result = self.runner(target, self.session_id)
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                print(f"[HotFolder] {self.name} 作业失败: {e}")
+                BatchProcessState().add_log(0, "ERROR", f"热文件夹作业失败 | {target.name}: {e}",
+                                            session_id=self.session_id)
+                return False, str(e)
+            report = result[0] if isinstance(result, tuple) else result
+            # 目录作业的节点即使部分图片失败也正常返回，按会话中的失败任务数判定
+            failed = BatchProcessState().get_summary(self.session_id)["failed"] if self.kind == "dir" else 0
+            if failed:
+                self.failures += 1
+                self.last_error = f"{failed} 张图片处理失败"
+                print(f"[HotFolder] {self.name} 作业部分失败: {failed} 张图片处理失败")
+                BatchProcessState().add_log(0, "WARNING", f"热文件夹作业部分失败 | {target.name}: {failed} 张图片",
+                                            session_id=self.session_id)
+                return False, str(report)
+            print(f"[HotFolder] {self.name} 作业完成: {target}")
+            BatchProcessState().add_log(0, "INFO", f"热文件夹作业完成 | {target.name}",
+                                        session_id=self.session_id)
+            return True, str(report)
+        finally:
+            # 关闭本次作业的会话：下一次作业复用同一会话名，不会因旧会话未结束（任务总数为 0、
+            # 作业异常退出时仍有处理中的任务）而追加序号
+            BatchProcessState().close_session(self.session_id)
+            self.status = "idle"
+            self._slots.release()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "path": str(self.path),
+            "session_id": self.session_id,
+            "status": self.status if self.alive else "stopped",
+            "jobs": self.jobs,
+            "failures": self.failures,
+            "last_run": self.last_run,
+            "last_error": self.last_error,
+        }
+
+
+class HotFolderDaemon:
+    """热文件夹守护（单例模式）：管理全部监视项，并限制同时运行的作业数"""
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self._initialized = True
+        self.max_jobs = _env_int("KUAI_HOTFOLDER_JOBS", DEFAULT_MAX_JOBS)
+        self._slots = threading.BoundedSemaphore(self.max_jobs)
+        self._watches: Dict[str, HotFolderWatch] = {}
+        self._watch_lock = threading.Lock()
+
+    def add(self, name: str, kind: str, path, runner: Callable[[Path, str], Any],
+            scan_interval: float = DEFAULT_SCAN_INTERVAL, start: bool = True) -> HotFolderWatch:
+        """添加（或替换同名的）监视项并开始监视"""
+        name = name.strip()
+        if not name:
+            raise RuntimeError("监视项名称不能为空")
+        if kind not in ("dir", "csv"):
+            raise RuntimeError(f"不支持的监视类型: {kind}")
+        path = Path(str(path).strip())
+        if not path.is_dir():
+            raise RuntimeError(f"目录不存在: {path}")
+
+        watch = HotFolderWatch(name, kind, path, runner, scan_interval, self._slots)
+        with self._watch_lock:
+            old = self._watches.pop(name, None)
+            self._watches[name] = watch
+        if old:
+            old.stop()
+        if start:
+            watch.start()
+        return watch
+
+    def remove(self, name: str) -> bool:
+        """停止并移除监视项；正在运行的作业会执行完毕"""
+        with self._watch_lock:
+            watch = self._watches.pop(name.strip(), None)
+        if watch:
+            watch.stop()
+        return watch is not None
+
+    def stop_all(self):
+        with self._watch_lock:
+            watches = list(self._watches.values())
+            self._watches.clear()
+        for watch in watches:
+            watch.stop()
+
+    def watches(self) -> List[Dict[str, Any]]:
+        with self._watch_lock:
+            return [w.to_dict() for w in self._watches.values()]
+
+
+class HotFolderControl:
+    """热文件夹守护控制节点：启动 / 停止监视项，或查看全部监视项的状态"""
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "action": (["start", "stop", "status"], {
+                    "default": "status",
+                    "tooltip": "start 启动（或替换同名）监视项；stop 停止监视项；status 查看全部监视项"
+                }),
+                "name": ("STRING", {
+                    "default": "hotfolder1",
+                    "tooltip": "监视项名称，进度写入 hotfolder_<名称> 会话"
+                }),
+            },
+            "optional": {
+                "pipeline": (list(PIPELINES), {
+                    "default": "grok_dir",
+                    "tooltip": "*_dir 监视图片目录并运行目录批量图生视频；*_csv 监视 CSV 投递目录并运行 CSV 并发处理器"
+                }),
+                "path": ("STRING", {
+                    "default": "",
+                    "tooltip": "监视的目录（图片目录或 CSV 投递目录）"
+                }),
+                "prompt": ("STRING", {
+                    "default": "",
+                    "multiline": True,
+                    "tooltip": "视频生成提示词（目录流水线使用）"
+                }),
+                "api_key": ("STRING", {
+                    "default": "",
+                    "tooltip": "API密钥（留空使用环境变量 KUAI_API_KEY）"
+                }),
+                "options": ("STRING", {
+                    "default": "{}",
+                    "multiline": True,
+                    "tooltip": "传给批量节点的其他参数（JSON），如 {\"model\": \"grok-video-3 (6秒)\", \"batch_size\": 5}"
+                }),
+                "scan_interval": ("INT", {
+                    "default": DEFAULT_SCAN_INTERVAL, "min": 5, "max": 3600,
+                    "tooltip": "扫描间隔（秒）；文件在一个扫描间隔内不再变化才开始处理"
+                }),
+            }
+        }
+
+    @classmethod
+    def INPUT_LABELS(cls):
+        return {
+            "action": "操作",
+            "name": "监视项名称",
+            "pipeline": "流水线",
+            "path": "监视目录",
+            "prompt": "提示词",
+            "api_key": "API密钥",
+            "options": "其他参数",
+            "scan_interval": "扫描间隔",
+        }
+
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        return float("nan")
+
+    RETURN_TYPES = ("STRING",)
+    RETURN_NAMES = ("守护状态",)
+    FUNCTION = "control"
+    CATEGORY = "KuAi/配套能力"
+    OUTPUT_NODE = True
+
+    def control(self, action, name, pipeline="grok_dir", path="", prompt="", api_key="",
+                options="{}", scan_interval=DEFAULT_SCAN_INTERVAL):
+        daemon = HotFolderDaemon()
+        if action == "start":
+            try:
+                extra = json.loads(options or "{}")
+            except ValueError as e:
+                raise RuntimeError(f"其他参数不是有效的 JSON: {e}")
+            if not isinstance(extra, dict):
+                raise RuntimeError("其他参数必须是 JSON 对象")
+            kind = PIPELINES[pipeline][0] if pipeline in PIPELINES else ""
+            if kind == "dir" and not prompt.strip():
+                raise RuntimeError("提示词不能为空")
+            daemon.add(name, kind, path, make_runner(pipeline, prompt, api_key, extra), scan_interval)
+        elif action == "stop":
+            if not daemon.remove(name):
+                print(f"[HotFolder] 监视项不存在: {name}")
+
+        lines = [f"热文件夹守护：{len(daemon.watches())} 个监视项，最多同时运行 {daemon.max_jobs} 个作业"]
+        for w in daemon.watches():
+            lines.append(f"  {w['name']} [{w['status']}] {w['kind']} {w['path']} "
+                         f"作业 {w['jobs']} 次，失败 {w['failures']} 次"
+                         + (f"，最近错误: {w['last_error']}" if w["last_error"] else ""))
+        status = "\n".join(lines)
+        print(f"[HotFolder] {status}")
+        return {"ui": {"text": [status]}, "result": (status,)}
+
+
+NODE_CLASS_MAPPINGS = {
+    "HotFolderControl": HotFolderControl,
+}
+
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "HotFolderControl": "🔥 热文件夹守护",
+}
@@ -0,0 +1,156 @@
+"""进程级共享 HTTP 传输层 - 按主机复用 keep-alive 连接池
+
+所有节点统一通过本模块发起请求（get/post/request），同一主机（如 api.kegeai.top）
+的请求复用同一个 requests.Session，避免每次调用都重新进行 TCP + TLS 握手。
+批量处理器在启动并发前调用 ensure_pool_size(max_workers)，使连接池容量与并发数匹配。
+每个请求都经过共享限流器（rate_limiter），按 (API Key, 主机, 模型) 协调速率与在途数；
+可重试的失败按统一重试策略（retry_policy）退避重试。
+"""
+
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
+from typing import List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .rate_limiter import RateLimiter, limit_key, parse_retry_after
+from .retry_policy import RetryPolicy, backoff_delay, classify
+
+# 默认每个主机保留的空闲连接数；批量节点按并发数扩容，上限与处理器 max_workers 上限一致
+DEFAULT_POOL_SIZE = 10
+MAX_POOL_SIZE = 100
+
+_sessions: dict = {}
+_pool_size = DEFAULT_POOL_SIZE
+_lock = threading.Lock()
+
+
+def _host_key(url: str) -> str:
+    """提取 scheme://host:port 作为连接池键"""
+    parts = urlsplit(str(url))
+    return f"{parts.scheme.lower()}://{parts.netloc.lower()}"
+
+
+def _mount_adapter(session: requests.Session, size: int):
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+
+def _new_session(size: int) -> requests.Session:
+    session = requests.Session()
+    # 与裸 requests.post/get 行为保持一致：不在请求之间持久化 Cookie
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    _mount_adapter(session, size)
+    return session
+
+
+def get_session(url: str) -> requests.Session:
+    """获取目标 URL 所在主机的共享 Session（不存在时创建）"""
+    key = _host_key(url)
+    session = _sessions.get(key)
+    if session is not None:
+        return session
+    with _lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _new_session(_pool_size)
+            _sessions[key] = session
+        return session
+
+
+def ensure_pool_size(size: int) -> int:
+    """确保每个主机的连接池至少能容纳 size 个并发连接，返回生效的池大小"""
+    global _pool_size
+    size = min(max(int(size or 0), 1), MAX_POOL_SIZE)
+    with _lock:
+        if size > _pool_size:
+            _pool_size = size
+            for session in _sessions.values():
+                _mount_adapter(session, _pool_size)
+        return _pool_size
+
+
+def _send(session: requests.Session, method: str, url: str, limit: bool, kwargs: dict) -> requests.Response:
+    if not limit:
+        return session.request(method, url, **kwargs)
+    key = limit_key(url, kwargs.get("headers"), kwargs.get("json") or kwargs.get("data"))
+    with RateLimiter().slot(key) as feedback:
+        response = session.request(method, url, **kwargs)
+        feedback.report(response)
+        return response
+
+
+def _mark_body(kwargs: dict) -> Optional[List[Tuple[object, int]]]:
+    """记录请求体（files 各项与 data）中文件对象的起始位置；含无法回绕的流时返回 None"""
+    files = kwargs.get("files") or ()
+    values = list(files.values() if isinstance(files, dict) else (v for _, v in files))
+    values = [v[1] if isinstance(v, (tuple, list)) else v for v in values]
+    values.append(kwargs.get("data"))
+    marks = []
+    for stream in values:
+        if not (hasattr(stream, "read") or hasattr(stream, "__next__")):
+            continue  # bytes / str / dict 等可重复发送
+        try:
+            if not stream.seekable():
+                return None
+            marks.append((stream, stream.tell()))
+        except (AttributeError, OSError, ValueError):
+            return None
+    return marks
+
+
+def request(method: str, url: str, limit: bool = True, retry: bool = True, **kwargs) -> requests.Response:
+    """通过共享连接池发送请求，参数与 requests.request 一致
+
+    limit=False 时绕过共享限流器（仅用于不计入服务商配额的请求）；
+    retry=False 时不重试（调用方自行处理失败）。
+    请求体中的文件对象在每次重试前回绕到起始位置；含无法回绕的流（如生成器）时不重试。
+    """
+    method = method.upper()
+    session = get_session(url)
+    policy = RetryPolicy()
+    marks = _mark_body(kwargs) if retry else None
+    retry = marks is not None
+    attempt = 0
+    while True:
+        try:
+            response = _send(session, method, url, limit, kwargs)
+        except requests.RequestException as e:
+            reason = classify(method, error=e) if retry else None
+            if reason is None or not policy.allow(attempt, reason):
+                raise
+            delay = backoff_delay(attempt)
+        else:
+            reason = classify(method, response=response) if retry else None
+            if reason is None or not policy.allow(attempt, reason):
+                return response
+            delay = backoff_delay(attempt, parse_retry_after(response.headers.get("Retry-After")))
+            response.close()
+        attempt += 1
+        print(f"[HTTP] {method} {_host_key(url)} 失败（{reason}），{delay:.1f}s 后第 {attempt} 次重试")
+        time.sleep(delay)
+        for stream, position in marks:
+            stream.seek(position)
+
+
+def get(url: str, params=None, **kwargs) -> requests.Response:
+    return request("GET", url, params=params, **kwargs)
+
+
+def post(url: str, data=None, json=None, **kwargs) -> requests.Response:
+    return request("POST", url, data=data, json=json, **kwargs)
+
+
+def close_all():
+    """关闭所有共享 Session（主要用于测试与进程退出）"""
+    with _lock:
+        for session in _sessions.values():
+            try:
+                session.close()
+            except Exception:
+                pass
+        _sessions.clear()
@@ -0,0 +1,110 @@
+"""图像解码 - 把生成结果直接解码到预分配的 float32 批量数组 / IMAGE 张量
+
+各图像节点原先逐张 PIL 解码后 np.array(...).astype(np.float32) / 255.0（三份整图拷贝），n>1 时再 torch.cat 一次。
+本模块统一处理：
+  - 先只读文件头得到尺寸，一次性分配 [N,H,W,3] 的 float32 输出，每张图像解码后直接归一化写入对应切片；
+  - 目标尺寸只作为缩小解码的提示：JPEG 以 draft 模式按 1/2、1/4、1/8 缩小解码，其他格式解码后以 reduce
+    整数倍缩小，均保持宽高比且不小于目标尺寸；服务端返回的尺寸或宽高比与请求不同时不会被拉伸；
+  - 多张图像在线程池中并行下载与解码（PIL 解码与 numpy 运算会释放 GIL）；
+  - 尺寸不一致的结果统一缩放到第一张的尺寸（原先会在 torch.cat 时报错）。
+"""
+
+import concurrent.futures
+import contextvars
+import io
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+DEFAULT_WORKERS = 4
+
+
+def parse_size(value: str) -> Optional[Tuple[int, int]]:
+    """解析 "1024x1536" 形式的尺寸为 (宽, 高)；auto 或无法解析时返回 None"""
+    try:
+        width, height = str(value).lower().split("x", 1)
+        return int(width), int(height)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _open(blob: bytes, size: Optional[Tuple[int, int]]) -> Image.Image:
+    img = Image.open(io.BytesIO(blob))
+    if size is not None and img.format == "JPEG":
+        # draft 只能按 1/2^k 缩小，且保证结果不小于目标尺寸
+        img.draft("RGB", size)
+    return img
+
+
+def _reduce_factor(img: Image.Image, size: Optional[Tuple[int, int]]) -> int:
+    """按目标尺寸提示可整数倍缩小的倍数（缩小后不小于目标尺寸）"""
+    if size is None:
+        return 1
+    return max(min(img.size[0] // size[0], img.size[1] // size[1]), 1)
+
+
+def _decoded_size(img: Image.Image, size: Optional[Tuple[int, int]]) -> Tuple[int, int]:
+    """按提示缩小后的解码尺寸（与 Image.reduce 一致向上取整）"""
+    factor = _reduce_factor(img, size)
+    return -(-img.size[0] // factor), -(-img.size[1] // factor)
+
+
+def _decode_into(img: Image.Image, out: np.ndarray, size: Optional[Tuple[int, int]]):
+    """解码 img 并归一化写入 out（[H,W,3] float32 切片）；尺寸与 out 不同时缩放到 out 的尺寸"""
+    height, width = out.shape[:2]
+    img = img.convert("RGB") if img.mode != "RGB" else img
+    factor = _reduce_factor(img, size)
+    if factor >= 2:
+        img = img.reduce(factor)
+    if img.size != (width, height):
+        img = img.resize((width, height), Image.LANCZOS)
+    # 与 astype(np.float32) / 255.0 的结果逐位一致
+    np.divide(np.asarray(img), np.float32(255.0), out=out, dtype=np.float32)
+
+
+def decode_images(blobs: Sequence[bytes], size: Optional[Tuple[int, int]] = None,
+                  max_workers: int = DEFAULT_WORKERS) -> np.ndarray:
+    """把若干张图像的字节解码为 float32 数组 [N,H,W,3]（0~1）
+
+    Args:
+        blobs: 图像文件内容（PNG / JPEG / WebP 等）
+        size: 请求的尺寸 (宽, 高)，只用于缩小解码；输出为第一张图像（缩小解码后）的尺寸
+        max_workers: 并行解码的线程数
+    """
+    if not blobs:
+        raise RuntimeError("没有可解码的图像")
+    images = [_open(blob, size) for blob in blobs]
+    width, height = _decoded_size(images[0], size)
+    out = np.empty((len(images), height, width, 3), dtype=np.float32)
+
+    if len(images) == 1 or max_workers <= 1:
+        for i, img in enumerate(images):
+            _decode_into(img, out[i], size)
+    else:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(max_workers, len(images)),
+                                                   thread_name_prefix="kuai-decode") as pool:
+            for future in [pool.submit(_decode_into, img, out[i], size) for i, img in enumerate(images)]:
+                future.result()
+    return out
+
+
+def load_images(sources: Sequence[str], fetch: Callable[[str], bytes],
+                size: Optional[Tuple[int, int]] = None,
+                max_workers: int = DEFAULT_WORKERS) -> Tuple[np.ndarray, List[bytes]]:
+    """并行获取（fetch(source) -> bytes）并解码多张图像，返回 (float32 数组 [N,H,W,3], 原始字节列表)"""
+    if len(sources) <= 1 or max_workers <= 1:
+        blobs = [fetch(source) for source in sources]
+    else:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(max_workers, len(sources)),
+                                                   thread_name_prefix="kuai-fetch") as pool:
+            # 下载沿用调用方的上下文（重试范围等）
+            contexts = [contextvars.copy_context() for _ in sources]
+            blobs = list(pool.map(lambda ctx, source: ctx.run(fetch, source), contexts, sources))
+    return decode_images(blobs, size, max_workers), blobs
+
+
+def to_image_tensor(batch: np.ndarray):
+    """float32 数组 [N,H,W,3] 零拷贝包装为 ComfyUI IMAGE 张量"""
+    import torch
+    return torch.from_numpy(batch)
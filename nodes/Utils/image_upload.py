@@ -1,5 +1,6 @@
 import json
-import requests
+from . import http_transport
+from .upload_index import UploadIndex, bytes_digest, upload_key
 import sys
 from pathlib import Path
 
@@ -34,6 +35,7 @@ class UploadToImageHost:
                 "format": (["jpeg", "png", "webp"], {"default": "jpeg", "tooltip": "图片格式"}),
                 "quality": ("INT", {"default": 100, "min": 1, "max": 100, "tooltip": "图片质量(1-100)"}),
                 "timeout": ("INT", {"default": 1800, "min": 1, "max": 9999, "tooltip": "超时时间(秒)"}),
+                "dedupe": ("BOOLEAN", {"default": True, "tooltip": "相同图片内容在有效期内直接复用上次上传的URL，不再重复上传"}),
             }
         }
     
@@ -53,10 +55,24 @@ class UploadToImageHost:
             "format": "格式",
             "quality": "质量",
             "timeout": "超时",
+            "dedupe": "复用已上传URL",
         }
 
-    def upload(self, image, upload_url="https://imageproxy.zhongzhuan.chat/api/upload", format="jpeg", quality=100, timeout=30):
+    def upload(self, image, upload_url="https://imageproxy.zhongzhuan.chat/api/upload", format="jpeg", quality=100, timeout=30,
+               dedupe=True):
         pil = to_pil_from_comfy(image, index=0)
+
+        # 按像素内容去重：命中时跳过编码与上传
+        index = UploadIndex()
+        key = ""
+        if dedupe and index.enabled:
+            digest = bytes_digest(f"{pil.mode}:{pil.size}\n".encode("utf-8") + pil.tobytes())
+            key = upload_key(digest, upload_url, f"{format}:{quality}")
+            hit = index.lookup(key)
+            if hit:
+                print(f"[UploadToImageHost] 复用已上传的图片: {hit['url']}")
+                return (hit["url"], str(hit["meta"].get("created", "")))
+
         buf = save_image_to_buffer(pil, fmt=format, quality=quality)
 
         files = {
@@ -68,7 +84,7 @@ class UploadToImageHost:
         }
         
         try:
-            resp = requests.post(upload_url, headers=http_headers_multipart(), files=files, timeout=int(timeout))
+            resp = http_transport.post(upload_url, headers=http_headers_multipart(), files=files, timeout=int(timeout))
             if resp.status_code >= 400:
                 detail = extract_error_message_from_response(resp)
                 raise RuntimeError(f"上传失败: {detail}")
@@ -82,6 +98,8 @@ class UploadToImageHost:
         created = str(data.get("created", ""))
         if not url:
             raise RuntimeError(f"上传响应缺少 url 字段: {json.dumps(data, ensure_ascii=False)}")
+        if key:
+            index.record(key, url, {"created": created})
         return (url, created)
 
 
@@ -0,0 +1,127 @@
+"""input 目录文件索引 - 缓存 文件名 → 路径 映射，避免每次执行都递归遍历整个目录
+
+共享的 input 目录可能有数十万个文件，CSVBatchReader 在文件不在顶层时 os.walk 全目录、
+下拉列表每次刷新也全量扫描，每次排队都要耗费数秒。本模块为每个根目录维护一份索引：
+  - 记录每个子目录的修改时间及其直接包含的文件/子目录；
+  - 校验时只 stat 目录（目录数远少于文件数），修改时间变化的目录才重新列举；
+  - 距上次校验不足 REVALIDATE_INTERVAL 秒时直接使用缓存，查找未命中时再强制校验一次，
+    保证刚上传的文件也能被找到。
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 两次目录校验之间的最短间隔（秒）
+REVALIDATE_INTERVAL = 2.0
+
+
+class DirectoryIndex:
+    """单个根目录的文件索引"""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        # 相对目录 → (修改时间, 文件名列表, 子目录名列表)
+        self._dirs: Dict[str, Tuple[float, List[str], List[str]]] = {}
+        self._by_name: Dict[str, List[str]] = {}
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.scan_count = 0
+
+    def _scan_dir(self, rel_dir: str) -> bool:
+        """重新列举单个目录（不递归）；目录不存在返回 False"""
+        abs_dir = os.path.join(self.root, rel_dir) if rel_dir else self.root
+        try:
+            mtime = os.stat(abs_dir).st_mtime
+            files, subdirs = [], []
+            with os.scandir(abs_dir) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir():
+                            # 与 os.walk 默认行为一致：不进入符号链接指向的目录，避免链接成环时重复收录
+                            if not entry.is_symlink():
+                                subdirs.append(entry.name)
+                        elif entry.is_file():
+                            files.append(entry.name)
+                    except OSError:
+                        continue
+        except OSError:
+            return False
+        self._dirs[rel_dir] = (mtime, files, subdirs)
+        self.scan_count += 1
+        return True
+
+    def _refresh(self, force: bool = False):
+        """校验目录修改时间，只重新列举发生变化的目录（调用方需持有 _lock）"""
+        now = time.monotonic()
+        if not force and self._dirs and now - self._checked_at < REVALIDATE_INTERVAL:
+            return
+
+        changed = False
+        seen = set()
+        pending = [""]
+        while pending:
+            rel_dir = pending.pop()
+            seen.add(rel_dir)
+            cached = self._dirs.get(rel_dir)
+            abs_dir = os.path.join(self.root, rel_dir) if rel_dir else self.root
+            try:
+                mtime = os.stat(abs_dir).st_mtime
+            except OSError:
+                continue
+            if cached is None or cached[0] != mtime:
+                if not self._scan_dir(rel_dir):
+                    continue
+                changed = True
+            pending.extend(os.path.join(rel_dir, d) if rel_dir else d for d in self._dirs[rel_dir][2])
+
+        for rel_dir in [d for d in self._dirs if d not in seen]:
+            del self._dirs[rel_dir]
+            changed = True
+
+        if changed:
+            by_name: Dict[str, List[str]] = {}
+            for rel_dir, (_, files, _) in self._dirs.items():
+                for name in files:
+                    by_name.setdefault(name, []).append(os.path.join(rel_dir, name) if rel_dir else name)
+            for paths in by_name.values():
+                # 浅层优先，其次按路径排序，保证结果稳定
+                paths.sort(key=lambda p: (p.count(os.sep), p))
+            self._by_name = by_name
+        self._checked_at = now
+
+    def find(self, filename: str) -> Optional[str]:
+        """按文件名查找（优先浅层目录），返回绝对路径；未找到返回 None"""
+        with self._lock:
+            self._refresh()
+            paths = self._by_name.get(filename)
+            # 未命中或缓存的文件已被删除时强制校验一次
+            if not paths or not os.path.isfile(os.path.join(self.root, paths[0])):
+                self._refresh(force=True)
+                paths = self._by_name.get(filename)
+        return os.path.join(self.root, paths[0]) if paths else None
+
+    def list_files(self, extensions: Iterable[str] = ()) -> List[str]:
+        """列出全部文件的相对路径（可按扩展名过滤，不区分大小写）"""
+        exts = tuple(e.lower() for e in extensions)
+        with self._lock:
+            self._refresh()
+            paths = [p for ps in self._by_name.values() for p in ps]
+        if exts:
+            paths = [p for p in paths if p.lower().endswith(exts)]
+        return sorted(paths)
+
+
+_indexes: Dict[str, DirectoryIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(root: str) -> DirectoryIndex:
+    """获取根目录对应的共享索引（首次使用时建立）"""
+    key = os.path.abspath(root)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = DirectoryIndex(key)
+        return index
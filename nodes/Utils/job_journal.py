@@ -0,0 +1,181 @@
+"""任务日志（持久化）- 记录批量任务的提交、状态变化与下载，ComfyUI 重启后可断点续跑
+
+批量处理器提交任务后只在内存中持有 task_id，ComfyUI 中途重启会导致已付费的生成任务无人认领，
+或在重新执行工作流时被重复提交。本模块把每个任务写入 temp/kuai_job_journal.db（SQLite）：
+  - jobs 表：每个 (批次键, 任务序号) 一行，保存 task_id、当前状态与任务信息 JSON；
+  - events 表：只追加的事件流水（submitted / 状态变化 / completed / downloaded / failed）。
+批次键由提供方、任务列表内容与输出目录计算，同一份 CSV 重新执行时得到相同的键，
+续跑模式据此直接轮询/下载已提交的任务，不再重复提交。
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# 已结束（不再需要轮询）的状态；超时的任务在服务端可能仍会完成，续跑时继续轮询
+FINAL_STATUSES = ("downloaded", "failed")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    batch_key  TEXT NOT NULL,
+    task_idx   INTEGER NOT NULL,
+    provider   TEXT NOT NULL,
+    task_id    TEXT NOT NULL DEFAULT '',
+    status     TEXT NOT NULL,
+    info       TEXT NOT NULL DEFAULT '{}',
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (batch_key, task_idx)
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status);
+CREATE TABLE IF NOT EXISTS events (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    batch_key TEXT NOT NULL,
+    task_idx  INTEGER NOT NULL,
+    status    TEXT NOT NULL,
+    detail    TEXT NOT NULL DEFAULT '',
+    ts        REAL NOT NULL
+);
+"""
+
+
+def batch_key(provider: str, tasks: Any, output_dir: str = "") -> str:
+    """计算批次键：同一提供方、同一任务列表、同一输出目录得到相同的键"""
+    payload = json.dumps(tasks, ensure_ascii=False, sort_keys=True)
+    digest = hashlib.sha1(f"{provider}\n{output_dir}\n{payload}".encode("utf-8")).hexdigest()[:16]
+    return f"{provider}:{digest}"
+
+
+class JobJournal:
+    """任务日志（单例模式）"""
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self._initialized = True
+        self.db_file = Path(__file__).parent.parent.parent.parent.parent / "temp" / "kuai_job_journal.db"
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        """惰性打开数据库（调用方需持有 _db_lock）"""
+        if self._conn is None:
+            self.db_file.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_file), check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        """关闭数据库连接（下次使用时重新打开）"""
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def record_submit(self, batch: str, task_idx: int, provider: str, task_id: str,
+                      info: Optional[Dict[str, Any]] = None):
+        """记录任务已提交（覆盖同序号的旧记录，例如失败后重新提交）"""
+        now = time.time()
+        try:
+            with self._db_lock:
+                conn = self._connection()
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO jobs "
+                        "(batch_key, task_idx, provider, task_id, status, info, created_at, updated_at) "
+                        "VALUES (?, ?, ?, ?, 'submitted', ?, ?, ?)",
+                        (batch, task_idx, provider, task_id,
+                         json.dumps(info or {}, ensure_ascii=False), now, now),
+                    )
+                    conn.execute(
+                        "INSERT INTO events (batch_key, task_idx, status, detail, ts) VALUES (?, ?, 'submitted', ?, ?)",
+                        (batch, task_idx, task_id, now),
+                    )
+        except Exception as e:
+            print(f"[JobJournal] 记录提交失败 ({task_id}): {e}")
+
+    def update(self, batch: str, task_idx: int, status: str, detail: str = "",
+               info: Optional[Dict[str, Any]] = None):
+        """更新任务状态并合并任务信息；状态未变化时不追加事件"""
+        now = time.time()
+        try:
+            with self._db_lock:
+                conn = self._connection()
+                row = conn.execute(
+                    "SELECT status, info FROM jobs WHERE batch_key = ? AND task_idx = ?",
+                    (batch, task_idx),
+                ).fetchone()
+                if row is None:
+                    return
+                merged = json.loads(row["info"] or "{}")
+                merged.update(info or {})
+                with conn:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, info = ?, updated_at = ? WHERE batch_key = ? AND task_idx = ?",
+                        (status, json.dumps(merged, ensure_ascii=False), now, batch, task_idx),
+                    )
+                    if row["status"] != status:
+                        conn.execute(
+                            "INSERT INTO events (batch_key, task_idx, status, detail, ts) VALUES (?, ?, ?, ?, ?)",
+                            (batch, task_idx, status, detail, now),
+                        )
+        except Exception as e:
+            print(f"[JobJournal] 更新状态失败 ({batch}#{task_idx}): {e}")
+
+    def get(self, batch: str, task_idx: int) -> Optional[Dict[str, Any]]:
+        """读取单个任务记录：{"task_id", "status", "info", ...}；不存在返回 None"""
+        try:
+            with self._db_lock:
+                row = self._connection().execute(
+                    "SELECT * FROM jobs WHERE batch_key = ? AND task_idx = ?", (batch, task_idx)
+                ).fetchone()
+        except Exception as e:
+            print(f"[JobJournal] 读取记录失败 ({batch}#{task_idx}): {e}")
+            return None
+        return self._row_to_dict(row) if row is not None else None
+
+    def in_flight(self, provider: Optional[str] = None) -> List[Dict[str, Any]]:
+        """列出已提交但尚未结束的任务"""
+        sql = "SELECT * FROM jobs WHERE status NOT IN (%s)" % ",".join("?" * len(FINAL_STATUSES))
+        params: list = list(FINAL_STATUSES)
+        if provider:
+            sql += " AND provider = ?"
+            params.append(provider)
+        with self._db_lock:
+            rows = self._connection().execute(sql + " ORDER BY batch_key, task_idx", params).fetchall()
+        return [self._row_to_dict(r) for r in rows]
+
+    def events(self, batch: str, task_idx: int) -> List[Dict[str, Any]]:
+        """按时间顺序返回任务的事件流水"""
+        with self._db_lock:
+            rows = self._connection().execute(
+                "SELECT status, detail, ts FROM events WHERE batch_key = ? AND task_idx = ? ORDER BY id",
+                (batch, task_idx),
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        item = dict(row)
+        item["info"] = json.loads(item.get("info") or "{}")
+        return item
@@ -0,0 +1,253 @@
+"""后台作业管理 - 批量节点的异步模式
+
+Sora2 批量处理器、CSV 并发处理器与 Grok 10 路并发节点会一直占用 ComfyUI 执行器直到整批结束（最长 max_wait_time），
+期间队列中的其他工作流无法执行。开启"后台运行"后，节点把实际处理交给本模块的后台线程池，立即返回作业句柄；
+「⏳ 等待后台作业」节点在下游真正需要结果时才阻塞等待。
+  - 同时运行的后台作业数受 KUAI_BACKGROUND_JOBS（默认 4）限制，超出的作业排队等待；
+  - 作业在提交方的上下文中执行，作业内的请求仍经过全局限流器与下载队列；
+  - 已结束的作业最多保留 MAX_FINISHED_JOBS 个（只保存在内存中，ComfyUI 重启后失效）。
+"""
+
+import concurrent.futures
+import contextvars
+import functools
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+DEFAULT_MAX_JOBS = 4
+MAX_FINISHED_JOBS = 100
+
+JOB_PREFIX = "kuai_job_"
+_JOB_PATTERN = re.compile(JOB_PREFIX + r"[0-9a-f]{12}")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        value = int(os.environ.get(name, "").strip())
+        return value if value > 0 else default
+    except ValueError:
+        return default
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def parse_job_id(text: str) -> str:
+    """从作业句柄或包含句柄的报告文本中取出作业 ID"""
+    match = _JOB_PATTERN.search(text or "")
+    if not match:
+        raise RuntimeError(f"无法识别后台作业ID: {(text or '')[:100]}")
+    return match.group(0)
+
+
+class BackgroundJob:
+    """单个后台作业：记录状态、节点输出名称与结果"""
+
+    def __init__(self, job_id: str, name: str, output_names: Sequence[str], report_index: int = 0):
+        self.job_id = job_id
+        self.name = name
+        self.output_names = tuple(output_names)
+        self.report_index = report_index
+        self.status = "pending"
+        self.created = _now()
+        self.started = ""
+        self.finished = ""
+        self.error = ""
+        self.future: Optional[concurrent.futures.Future] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def outputs(self) -> tuple:
+        """作业的原始输出（与节点同步执行时的返回值相同）"""
+        return tuple(self.future.result())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "name": self.name,
+            "status": self.status,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """后台作业管理（单例模式）"""
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self._initialized = True
+        self.max_jobs = _env_int("KUAI_BACKGROUND_JOBS", DEFAULT_MAX_JOBS)
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_jobs, thread_name_prefix="kuai-background-job")
+        self._jobs: "OrderedDict[str, BackgroundJob]" = OrderedDict()
+        self._jobs_lock = threading.Lock()
+
+    def submit(self, name: str, fn: Callable[[], Any], output_names: Sequence[str] = (),
+               report_index: int = 0) -> BackgroundJob:
+        """提交后台作业 fn()，立即返回作业记录"""
+        job = BackgroundJob(f"{JOB_PREFIX}{uuid.uuid4().hex[:12]}", name, output_names, report_index)
+        ctx = contextvars.copy_context()
+
+        def _run():
+            job.status = "running"
+            job.started = _now()
+            print(f"[JobManager] 作业开始: {job.job_id} ({name})")
+            try:
+                result = ctx.run(fn)
+            except Exception as e:
+                job.error = str(e)
+                job.status = "failed"
+                print(f"[JobManager] 作业失败: {job.job_id} - {e}")
+                raise
+            finally:
+                job.finished = _now()
+            job.status = "completed"
+            print(f"[JobManager] 作业完成: {job.job_id}")
+            return result
+
+        with self._jobs_lock:
+            job.future = self._executor.submit(_run)
+            self._jobs[job.job_id] = job
+            self._evict()
+        return job
+
+    def _evict(self):
+        """已结束的作业超过上限时淘汰最早的（调用方需持有 _jobs_lock）"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            del self._jobs[job_id]
+
+    def get(self, handle: str) -> BackgroundJob:
+        """按作业句柄（或包含句柄的文本）查找作业"""
+        job_id = parse_job_id(handle)
+        with self._jobs_lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise RuntimeError(f"后台作业不存在（可能已过期或 ComfyUI 已重启）: {job_id}")
+        return job
+
+    def wait(self, handle: str, timeout: Optional[float] = None) -> BackgroundJob:
+        """等待作业结束并返回作业记录；超时或作业失败时抛出 RuntimeError"""
+        job = self.get(handle)
+        try:
+            job.future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            raise RuntimeError(f"等待后台作业超时（{timeout}s）: {job.job_id}，作业仍在后台运行")
+        except Exception as e:
+            raise RuntimeError(f"后台作业失败: {job.job_id} - {e}")
+        return job
+
+    def jobs(self) -> List[Dict[str, Any]]:
+        with self._jobs_lock:
+            return [job.to_dict() for job in self._jobs.values()]
+
+
+def run_in_background(name: str, fn: Callable[[], Any], output_names: Sequence[str],
+                      report_index: int = 0) -> tuple:
+    """提交后台作业，返回与节点输出数量相同的占位输出：报告位置为提交说明，其余位置为作业ID"""
+    report_index %= len(output_names)
+    job = JobManager().submit(name, fn, output_names, report_index)
+    outputs = [job.job_id] * len(output_names)
+    outputs[report_index] = f"后台作业已提交: {job.job_id}（用「⏳ 等待后台作业」节点获取结果）"
+    return tuple(outputs)
+
+
+def background_capable(report_index: int = 0):
+    """节点方法装饰器：调用时传入 async_mode=True 则提交为后台作业并立即返回作业句柄，否则照常同步执行"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, async_mode=False, **kwargs):
+            if not async_mode:
+                return method(self, *args, **kwargs)
+            return run_in_background(type(self).__name__, functools.partial(method, self, *args, **kwargs),
+                                     type(self).RETURN_NAMES, report_index)
+        return wrapper
+    return decorator
+
+
+class AwaitBackgroundJob:
+    """等待后台作业结束并取出结果"""
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "job": ("STRING", {
+                    "default": "",
+                    "tooltip": "后台作业句柄：连接批量节点开启后台运行时的任一输出，或填写作业ID"
+                }),
+            },
+            "optional": {
+                "timeout": ("INT", {
+                    "default": 0, "min": 0, "max": 86400,
+                    "tooltip": "最长等待时间（秒），0 表示一直等到作业结束"
+                }),
+                "output_index": ("INT", {
+                    "default": 1, "min": 0, "max": 99,
+                    "tooltip": "指定输出取作业的第几个输出（从 0 开始，如 CSV 处理器的 1 为视频保存目录）"
+                }),
+            }
+        }
+
+    @classmethod
+    def INPUT_LABELS(cls):
+        return {
+            "job": "作业句柄",
+            "timeout": "等待超时",
+            "output_index": "输出序号",
+        }
+
+    RETURN_TYPES = ("STRING", "STRING", "STRING")
+    RETURN_NAMES = ("处理报告", "指定输出", "全部输出JSON")
+    FUNCTION = "collect"
+    CATEGORY = "KuAi/配套能力"
+
+    def collect(self, job, timeout=0, output_index=1):
+        manager = JobManager()
+        record = manager.get(job)
+        if not record.done:
+            print(f"[JobManager] 等待后台作业: {record.job_id} ({record.name})")
+        start = time.monotonic()
+        record = manager.wait(job, timeout or None)
+        print(f"[JobManager] 作业 {record.job_id} 已结束，等待 {time.monotonic() - start:.0f}s")
+
+        outputs = record.outputs()
+        selected = outputs[output_index] if output_index < len(outputs) else ""
+        names = record.output_names or tuple(f"output_{i}" for i in range(len(outputs)))
+        all_outputs = json.dumps(dict(zip(names, outputs)), ensure_ascii=False, indent=2)
+        return (str(outputs[record.report_index]), str(selected), all_outputs)
+
+
+NODE_CLASS_MAPPINGS = {
+    "AwaitBackgroundJob": AwaitBackgroundJob,
+}
+
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "AwaitBackgroundJob": "⏳ 等待后台作业",
+}
@@ -0,0 +1,244 @@
+"""异步轮询引擎 - 单事件循环集中调度所有进行中任务的状态查询
+
+批量处理器不再为每个任务占用一个线程执行 time.sleep 轮询，而是把任务交给本引擎：
+引擎在后台线程中运行唯一的 asyncio 事件循环，由一个中央调度协程按"扫描轮次"工作：
+每轮收集所有到期的等待方，按去重键合并（同一 task_id 被多个节点等待时只查询一次），
+再把查询流水线式地分发到有界线程池（经 http_transport 连接池的阻塞请求）。
+因此同时跟踪数千个任务 ID 只需要固定数量的线程和连接，重复等待也不会放大请求量。
+登记时提供 profile（见 poll_timing.timing_profile）的等待方按历史完成耗时自适应安排查询时机，
+完成时若上一次查询仍未完成，把两次查询之间的完成耗时回写到 PollTimingModel。
+查询在登记时的上下文中执行，因此沿用登记方所在任务的重试范围（见 retry_policy）。
+
+回调约定：
+    query() 执行一次状态查询并返回原始结果；抛出 RuntimeError 表示任务已失败。
+    check(elapsed, result) 接收已等待秒数与查询结果，返回 (done, value)；
+    done 为 True 时 value 作为该等待方 Future 的结果。
+    其他异常视为网络抖动，打印后继续轮询。
+"""
+
+import asyncio
+import concurrent.futures
+import contextvars
+import threading
+import time
+from typing import Any, Callable, Optional, Tuple
+
+from . import http_transport
+from .poll_timing import PollTimingModel
+
+# 同时执行的状态查询数量（即轮询占用的线程/连接数上限）
+DEFAULT_QUERY_CONCURRENCY = 16
+
+# 即将到期（不超过该秒数且不超过轮询间隔 20%）的等待方并入当前扫描，减少零散唤醒
+SWEEP_WINDOW = 1.0
+
+_QUERY_FAILED = object()
+
+
+class PollTimeoutError(RuntimeError):
+    """轮询超过最长等待时间"""
+
+
+class _Watch:
+    """单个等待方；去重键相同的等待方在同一轮扫描中共享一次查询"""
+
+    __slots__ = ("query", "check", "poll_interval", "max_wait", "label", "key", "profile",
+                 "ctx", "future", "elapsed", "delay", "next_due", "probe", "last_pending")
+
+    def __init__(self, query, check, poll_interval, max_wait, label, key, profile):
+        self.query = query
+        self.check = check
+        self.poll_interval = poll_interval
+        self.max_wait = max_wait
+        self.label = label
+        self.key = key
+        self.profile = profile
+        self.ctx = contextvars.copy_context()
+        self.future = concurrent.futures.Future()
+        self.elapsed = 0
+        # 探测方低分位之前也按固定间隔查询；last_pending 为上一次查询到"未完成"时的已等待秒数
+        self.probe = bool(profile) and PollTimingModel().should_probe()
+        self.last_pending = None
+        self.schedule()
+
+    def schedule(self):
+        """按时机模型安排下一次查询（不超过剩余等待时间）"""
+        delay = PollTimingModel().next_delay(self.profile, self.elapsed, self.poll_interval, self.probe)
+        self.delay = max(min(delay, self.max_wait - self.elapsed), 0)
+        self.next_due = time.monotonic() + self.delay
+
+
+class PollEngine:
+    """异步轮询引擎（单例模式）"""
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self._initialized = True
+        self.query_concurrency = DEFAULT_QUERY_CONCURRENCY
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._watches: set = set()
+        self._inflight: set = set()
+        self._watch_lock = threading.Lock()
+        self.sweep_count = 0
+        self.query_count = 0
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """惰性启动后台事件循环线程与中央调度协程"""
+        if self._thread is not None and self._thread.is_alive():
+            return self._loop
+
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                http_transport.ensure_pool_size(self.query_concurrency)
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.query_concurrency, thread_name_prefix="kuai-poll-query"
+                )
+                self._loop = asyncio.new_event_loop()
+                self._wakeup = asyncio.Event()
+                self._thread = threading.Thread(
+                    target=self._run_loop, args=(self._loop,), name="kuai-poll-loop", daemon=True
+                )
+                self._thread.start()
+                asyncio.run_coroutine_threadsafe(self._scheduler(), self._loop)
+        return self._loop
+
+    @staticmethod
+    def _run_loop(loop: asyncio.AbstractEventLoop):
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    @property
+    def active_count(self) -> int:
+        """当前正在跟踪的等待方数量"""
+        return len(self._watches)
+
+    def watch(self, query: Callable[[], Any], check: Callable[[float, Any], Tuple[bool, Any]],
+              poll_interval: float, max_wait: float, label: str = "",
+              key: Optional[str] = None, profile: Optional[str] = None) -> concurrent.futures.Future:
+        """登记一个等待方，立即返回 Future（不阻塞调用线程）
+
+        Args:
+            query: 单次状态查询，返回原始结果
+            check: 结果判定 check(elapsed, result)，返回 (done, value)
+            poll_interval: 轮询间隔（秒）
+            max_wait: 最长等待时间（秒），超时后 Future 抛出 PollTimeoutError
+            label: 日志标识，如 "任务3"
+            key: 去重键（如 "grok:<task_id>"），同一轮扫描中相同键只查询一次
+            profile: 耗时画像（如 "grok:grok-video-3:6s"），提供时按历史耗时自适应轮询
+        """
+        loop = self._ensure_loop()
+        w = _Watch(query, check, poll_interval, max_wait, label,
+                   key if key is not None else object(), profile)
+        with self._watch_lock:
+            self._watches.add(w)
+        loop.call_soon_threadsafe(self._wakeup.set)
+        return w.future
+
+    def wait(self, query: Callable[[], Any], check: Callable[[float, Any], Tuple[bool, Any]],
+             poll_interval: float, max_wait: float, label: str = "",
+             key: Optional[str] = None, profile: Optional[str] = None) -> Any:
+        """登记等待方并阻塞等待结果（用于仍按单任务流程编写的调用方）"""
+        return self.watch(query, check, poll_interval, max_wait, label, key, profile).result()
+
+    async def _scheduler(self):
+        """中央调度：每轮收集到期等待方，按键去重后分发查询，然后睡到下一个到期点"""
+        loop = asyncio.get_running_loop()
+        while True:
+            self._wakeup.clear()
+            due, next_due = self._collect_due(time.monotonic())
+            for key, watchers in due.items():
+                loop.run_in_executor(self._executor, self._sweep_key, key, watchers)
+
+            timeout = None if next_due is None else max(0.0, next_due - time.monotonic())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _collect_due(self, now: float):
+        """收集本轮到期的等待方（按键分组，跳过查询仍在进行中的键），并返回下一个到期时间"""
+        due = {}
+        next_due = None
+        with self._watch_lock:
+            for w in list(self._watches):
+                if w.future.done():
+                    self._watches.discard(w)
+                    continue
+                if w.key in self._inflight:
+                    continue
+                window = min(SWEEP_WINDOW, w.delay * 0.2)
+                if w.next_due - now <= window:
+                    due.setdefault(w.key, []).append(w)
+                elif next_due is None or w.next_due < next_due:
+                    next_due = w.next_due
+            self._inflight.update(due.keys())
+            if due:
+                self.sweep_count += 1
+                self.query_count += len(due)
+        return due, next_due
+
+    def _sweep_key(self, key, watchers):
+        """在线程池中执行：一次查询，结果分发给共享该键的所有等待方"""
+        try:
+            try:
+                result = watchers[0].ctx.run(watchers[0].query)
+            except RuntimeError as e:
+                for w in watchers:
+                    self._finish(w, error=e)
+                return
+            except Exception as e:
+                print(f"[PollEngine] {watchers[0].label or '任务'} 查询出错（继续重试）: {e}")
+                result = _QUERY_FAILED
+
+            for w in watchers:
+                w.elapsed += w.delay
+                if result is not _QUERY_FAILED:
+                    try:
+                        done, value = w.check(w.elapsed, result)
+                    except RuntimeError as e:
+                        self._finish(w, error=e)
+                        continue
+                    except Exception as e:
+                        print(f"[PollEngine] {w.label or '任务'} 结果处理出错（继续重试）: {e}")
+                        done, value = False, None
+                    if done:
+                        # 只有上一次查询仍未完成时完成时刻才有界，取两次查询的中点；首次查询即完成的不记录
+                        if w.last_pending is not None and w.elapsed - w.last_pending <= w.poll_interval + 1e-6:
+                            PollTimingModel().record(w.profile, (w.last_pending + w.elapsed) / 2)
+                        self._finish(w, value=value)
+                        continue
+                    w.last_pending = w.elapsed
+                if w.elapsed >= w.max_wait:
+                    self._finish(w, error=PollTimeoutError(f"{w.label} 超时 ({w.max_wait}s)".strip()))
+                    continue
+                w.schedule()
+        finally:
+            with self._watch_lock:
+                self._inflight.discard(key)
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _finish(self, w: _Watch, value=None, error: Optional[BaseException] = None):
+        with self._watch_lock:
+            self._watches.discard(w)
+        if w.future.done():
+            return
+        if error is not None:
+            w.future.set_exception(error)
+        else:
+            w.future.set_result(value)
@@ -0,0 +1,158 @@
+"""轮询时机模型 - 按模型/时长的实际完成耗时自适应调整轮询间隔
+
+固定间隔轮询在渲染期间产生大量无效查询，又会在视频就绪后多等最多一个间隔才开始下载。
+本模块为每个"画像"（如 "sora2:sora-2:10s"）保留最近若干次的实际完成耗时：
+  - 样本不足时沿用调用方给定的固定间隔；
+  - 预计渲染窗口（低分位）之前一次性睡过去；
+  - 接近预计完成（低分位 ~ 高分位）时加密轮询；
+  - 超过高分位仍未完成则恢复固定间隔。
+睡到低分位的等待方第一次查询就看到完成时，只知道实际耗时不超过低分位，这类样本会让窗口只升不降。
+因此只有上一次查询（间隔不超过轮询间隔）仍未完成时才记录样本（取两次查询的中点）；
+另有 EARLY_PROBE_RATE 比例的等待方从一开始就按固定间隔查询，为低于低分位的完成耗时提供样本。
+统计合并写入 temp/poll_timing_stats.json（SAVE_INTERVAL 内的多次记录只写一次），跨会话复用。
+"""
+
+import atexit
+import json
+import random
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Optional, Tuple
+
+# 每个画像保留的样本数
+MAX_SAMPLES = 50
+# 启用自适应所需的最少样本数
+MIN_SAMPLES = 3
+# 加密轮询的最小间隔（秒），避免对网关造成突发压力
+MIN_DENSE_INTERVAL = 2.0
+# 预计窗口使用的分位数
+LOW_PERCENTILE = 0.1
+HIGH_PERCENTILE = 0.9
+# 按固定间隔探测（不睡到低分位）的等待方比例
+EARLY_PROBE_RATE = 0.1
+# 统计文件的合并写入间隔（秒）
+SAVE_INTERVAL = 5.0
+
+
+def timing_profile(provider: str, model: str = "", duration=None) -> str:
+    """构造画像键，如 timing_profile("grok", "grok-video-3", 6) -> "grok:grok-video-3:6s" """
+    model = str(model or "").strip().lower()
+    if " (" in model:
+        model = model.split(" (")[0].strip()
+    parts = [provider, model or "default"]
+    if duration:
+        parts.append(f"{duration}s")
+    return ":".join(parts)
+
+
+def _percentile(sorted_values, q: float) -> float:
+    """线性插值分位数（sorted_values 非空且已排序）"""
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    pos = (len(sorted_values) - 1) * q
+    lower = int(pos)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (pos - lower)
+
+
+class PollTimingModel:
+    """轮询时机模型（单例模式）"""
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self._initialized = True
+        self.stats_file = Path(__file__).parent.parent.parent.parent.parent / "temp" / "poll_timing_stats.json"
+        self._samples: dict = {}
+        # 锁顺序固定为 _save_lock → _data_lock；_dirty 与 _save_timer 由 _data_lock 保护
+        self._data_lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._save_timer: Optional[threading.Timer] = None
+        self._load()
+        atexit.register(self.flush)
+
+    def _load(self):
+        try:
+            if self.stats_file.exists():
+                with open(self.stats_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                for profile, values in data.items():
+                    self._samples[profile] = deque(
+                        (float(v) for v in values if float(v) > 0), maxlen=MAX_SAMPLES
+                    )
+        except Exception as e:
+            print(f"[PollTiming] 加载统计失败，将重新采集: {e}")
+            self._samples = {}
+
+    def flush(self):
+        """立即把统计写入文件（没有新样本时不写）"""
+        with self._save_lock:
+            with self._data_lock:
+                if self._save_timer is not None:
+                    self._save_timer.cancel()
+                    self._save_timer = None
+                if not self._dirty:
+                    return
+                self._dirty = False
+                data = {profile: list(values) for profile, values in self._samples.items()}
+            try:
+                self.stats_file.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.stats_file, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
+            except Exception as e:
+                print(f"[PollTiming] 保存统计失败: {e}")
+
+    def record(self, profile: str, seconds: float):
+        """记录一次实际完成耗时（SAVE_INTERVAL 后合并写入文件）"""
+        if not profile or seconds <= 0:
+            return
+        with self._data_lock:
+            self._samples.setdefault(profile, deque(maxlen=MAX_SAMPLES)).append(round(float(seconds), 1))
+            self._dirty = True
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(SAVE_INTERVAL, self.flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+
+    @staticmethod
+    def should_probe() -> bool:
+        """新的等待方是否作为探测方（按固定间隔查询，不睡到低分位）"""
+        return random.random() < EARLY_PROBE_RATE
+
+    def expected_window(self, profile: str) -> Optional[Tuple[float, float]]:
+        """返回预计完成窗口 (低分位, 高分位)；样本不足时返回 None"""
+        with self._data_lock:
+            values = sorted(self._samples.get(profile, ()))
+        if len(values) < MIN_SAMPLES:
+            return None
+        return _percentile(values, LOW_PERCENTILE), _percentile(values, HIGH_PERCENTILE)
+
+    def next_delay(self, profile: Optional[str], elapsed: float, base_interval: float,
+                   probe: bool = False) -> float:
+        """根据已等待时间计算下一次查询前的等待秒数；probe 为 True 时低分位之前也按固定间隔查询"""
+        window = self.expected_window(profile) if profile else None
+        if window is None:
+            return base_interval
+
+        low, high = window
+        dense = min(base_interval, max(MIN_DENSE_INTERVAL, base_interval / 3))
+        if elapsed + dense < low:
+            # 尚在渲染窗口之前：一次性睡到预计最早完成时刻（探测方照常按固定间隔查询）
+            return min(base_interval, low - elapsed) if probe else low - elapsed
+        if elapsed < high:
+            return dense
+        return base_interval
@@ -0,0 +1,239 @@
+"""进程级共享限流器 - 按 (API Key, 服务商, 模型) 协调所有节点的请求速率与并发数
+
+各批量节点各自决定并发度（Grok 并发处理器固定 10 路、Sora2 批量最多 100 路、目录批量按图片数开线程），
+多个节点同时使用同一个 Key 时互不知情，很容易触发网关 429 并导致整批任务失败。
+http_transport 发出的每个请求（提交 / 查询 / 上传 / 下载）都先经过本模块：
+  - 令牌桶限制请求速率（每秒 rps 个，允许 burst 个突发）；
+  - 在途上限限制同时进行中的请求数；
+  - 收到 429 时按乘性减小速率（AIMD），并在 Retry-After 指定的时间内暂停该键的新请求；
+    之后每个成功响应按加性逐步恢复，直到配置的速率上限。
+默认值可通过环境变量 KUAI_RATE_LIMIT_RPS / KUAI_RATE_LIMIT_BURST / KUAI_MAX_INFLIGHT 调整
+（KUAI_RATE_LIMIT_RPS 设为 0 时关闭限流），也可调用 RateLimiter().configure() 为指定服务商/模型单独设置。
+"""
+
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+DEFAULT_RPS = 10.0
+DEFAULT_BURST = 20
+DEFAULT_MAX_INFLIGHT = 32
+
+# 429 后速率减半，但不低于该值；每个成功响应恢复上限速率的 1/RECOVERY_STEPS
+MIN_RPS = 0.2
+RECOVERY_STEPS = 20
+# 没有 Retry-After 时的默认暂停时间（秒）与上限
+DEFAULT_BACKOFF = 1.0
+MAX_BACKOFF = 120.0
+
+LimitKey = Tuple[str, str, str]
+
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        value = float(os.environ.get(name, "").strip())
+        return value if value >= 0 else default
+    except ValueError:
+        return default
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 头（秒数或 HTTP 日期），返回需要等待的秒数"""
+    if not value:
+        return None
+    value = str(value).strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def limit_key(url: str, headers: Optional[Dict[str, Any]] = None, payload: Any = None) -> LimitKey:
+    """由请求推导限流键：(API Key 摘要, 主机, 模型)
+
+    API Key 只保留摘要，避免出现在日志与统计中；查询、下载等不带模型的请求按主机共享一个键。
+    """
+    auth = ""
+    for name, value in (headers or {}).items():
+        if str(name).lower() in ("authorization", "x-api-key"):
+            auth = str(value)
+            break
+    if auth.lower().startswith("bearer "):
+        auth = auth[7:]
+    key_id = hashlib.sha256(auth.strip().encode("utf-8")).hexdigest()[:8] if auth.strip() else ""
+    model = payload.get("model", "") if isinstance(payload, dict) else ""
+    return key_id, urlsplit(str(url)).netloc.lower(), str(model or "")
+
+
+class _Limit:
+    """单个键的令牌桶 + 在途计数"""
+
+    def __init__(self, rps: float, burst: int, max_inflight: int):
+        self.max_rps = rps
+        self.rps = rps
+        self.burst = max(int(burst), 1)
+        self.max_inflight = max(int(max_inflight), 1)
+        self.tokens = float(self.burst)
+        self.inflight = 0
+        self.paused_until = 0.0
+        self.updated = time.monotonic()
+        self.throttled = 0
+        self.cond = threading.Condition()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rps)
+        self.updated = now
+
+    def acquire(self):
+        with self.cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.paused_until:
+                    self.cond.wait(self.paused_until - now)
+                elif self.inflight >= self.max_inflight:
+                    self.cond.wait()
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    self.inflight += 1
+                    return
+                else:
+                    self.cond.wait((1 - self.tokens) / self.rps)
+
+    def release(self, status: Optional[int], retry_after: Optional[float]) -> bool:
+        """归还在途名额并根据响应调整速率，返回是否被限流（429）"""
+        with self.cond:
+            self.inflight = max(self.inflight - 1, 0)
+            limited = status == 429
+            if limited:
+                now = time.monotonic()
+                self._refill(now)
+                self.throttled += 1
+                self.rps = max(self.rps / 2, min(MIN_RPS, self.max_rps))
+                self.tokens = min(self.tokens, 0.0)
+                pause = retry_after if retry_after is not None else DEFAULT_BACKOFF
+                self.paused_until = max(self.paused_until, now + min(pause, MAX_BACKOFF))
+            elif status is not None and self.rps < self.max_rps:
+                self._refill(time.monotonic())
+                self.rps = min(self.max_rps, self.rps + self.max_rps / RECOVERY_STEPS)
+            self.cond.notify_all()
+            return limited
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.cond:
+            return {
+                "rps": round(self.rps, 2),
+                "max_rps": self.max_rps,
+                "inflight": self.inflight,
+                "max_inflight": self.max_inflight,
+                "throttled": self.throttled,
+            }
+
+
+class RateLimiter:
+    """共享限流器（单例模式）"""
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self._initialized = True
+        self.default_rps = _env_number("KUAI_RATE_LIMIT_RPS", DEFAULT_RPS)
+        self.default_burst = int(_env_number("KUAI_RATE_LIMIT_BURST", DEFAULT_BURST)) or DEFAULT_BURST
+        self.default_inflight = int(_env_number("KUAI_MAX_INFLIGHT", DEFAULT_MAX_INFLIGHT)) or DEFAULT_MAX_INFLIGHT
+        # (主机, 模型) → 覆盖配置；模型为空表示该主机的所有模型
+        self._overrides: Dict[Tuple[str, str], Dict[str, float]] = {}
+        self._limits: Dict[LimitKey, _Limit] = {}
+        self._limits_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.default_rps > 0
+
+    def configure(self, provider: str, model: str = "", rps: Optional[float] = None,
+                  burst: Optional[int] = None, max_inflight: Optional[int] = None):
+        """为指定服务商（主机）或服务商下的某个模型设置限流参数，对之后新建的键生效"""
+        host = urlsplit(provider).netloc.lower() if "://" in provider else provider.lower()
+        options = {k: v for k, v in (("rps", rps), ("burst", burst), ("max_inflight", max_inflight)) if v}
+        with self._limits_lock:
+            self._overrides[(host, model)] = options
+            for key in [k for k in self._limits if k[1] == host and (not model or k[2] == model)]:
+                del self._limits[key]
+
+    def _get(self, key: LimitKey) -> _Limit:
+        limit = self._limits.get(key)
+        if limit is not None:
+            return limit
+        with self._limits_lock:
+            limit = self._limits.get(key)
+            if limit is None:
+                options = {"rps": self.default_rps, "burst": self.default_burst,
+                           "max_inflight": self.default_inflight}
+                options.update(self._overrides.get((key[1], ""), {}))
+                options.update(self._overrides.get((key[1], key[2]), {}))
+                limit = self._limits[key] = _Limit(**options)
+            return limit
+
+    @contextmanager
+    def slot(self, key: LimitKey):
+        """占用一个请求名额；上下文内返回的响应通过 feedback 回报以便自适应"""
+        if not self.enabled:
+            yield _Feedback()
+            return
+        limit = self._get(key)
+        limit.acquire()
+        feedback = _Feedback()
+        try:
+            yield feedback
+        finally:
+            if limit.release(feedback.status, feedback.retry_after):
+                print(f"[RateLimiter] {key[1]} {key[2] or '*'} 触发限流 (429)，"
+                      f"速率降至 {limit.rps:.2f}/s，暂停 {feedback.retry_after or DEFAULT_BACKOFF:.1f}s")
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """各键当前的速率、在途数与累计限流次数"""
+        with self._limits_lock:
+            items = list(self._limits.items())
+        return {f"{host}/{model or '*'}#{key_id or '-'}": limit.snapshot()
+                for (key_id, host, model), limit in items}
+
+    def reset(self):
+        """清空所有键的状态（主要用于测试）"""
+        with self._limits_lock:
+            self._limits.clear()
+            self._overrides.clear()
+
+
+class _Feedback:
+    """记录一次请求的响应状态，离开 slot 时据此调整速率"""
+
+    def __init__(self):
+        self.status: Optional[int] = None
+        self.retry_after: Optional[float] = None
+
+    def report(self, response: Any):
+        status = getattr(response, "status_code", None)
+        self.status = status if isinstance(status, int) else None
+        if self.status == 429:
+            headers = getattr(response, "headers", None) or {}
+            self.retry_after = parse_retry_after(headers.get("Retry-After"))
@@ -1,9 +1,14 @@
-"""实时批量处理监控节点 - 使用 WebSocket 推送实时进度"""
+"""实时批量处理监控节点 - 使用 WebSocket 推送实时进度
+
+后台线程订阅 BatchProcessState 的进程内变更事件，而不是定时重新读取状态：
+  - 没有变更时线程阻塞等待，不读取、不推送；
+  - 收到变更后在推送间隔内合并，只推送变化的任务与新增的日志（diff 消息）；
+  - 新会话开始、监控启动或事件积压溢出时推送一次完整快照（full 消息）。
+"""
 
 import threading
-import asyncio
 import time
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 try:
     import server
@@ -14,6 +19,9 @@ except ImportError:
 
 from .batch_state import BatchProcessState
 
+# 停止信号的检查间隔（秒）
+_STOP_CHECK_INTERVAL = 0.5
+
 
 class RealtimeBatchMonitor:
     """实时批量处理监控节点 - 后台线程 + WebSocket 推送"""
@@ -34,11 +42,11 @@ class RealtimeBatchMonitor:
             },
             "optional": {
                 "refresh_rate": ("FLOAT", {
-                    "default": 3.0,
-                    "min": 1.0,
+                    "default": 0.25,
+                    "min": 0.05,
                     "max": 10.0,
-                    "step": 0.5,
-                    "tooltip": "刷新间隔（秒）"
+                    "step": 0.05,
+                    "tooltip": "推送合并间隔（秒）：状态变化后在该间隔内合并为一条消息推送，无变化时不推送"
                 }),
                 "max_tasks": ("INT", {
                     "default": 10,
@@ -52,6 +60,10 @@ class RealtimeBatchMonitor:
                     "max": 200,
                     "tooltip": "最多显示日志条数"
                 }),
+                "session_id": ("STRING", {
+                    "default": "",
+                    "tooltip": "只推送指定会话；留空推送全部会话"
+                }),
             }
         }
 
@@ -59,9 +71,10 @@ class RealtimeBatchMonitor:
     def INPUT_LABELS(cls):
         return {
             "enable": "启用监控",
-            "refresh_rate": "刷新间隔",
+            "refresh_rate": "推送间隔",
             "max_tasks": "最多显示任务数",
             "max_logs": "最多显示日志条数",
+            "session_id": "会话ID",
         }
 
     RETURN_TYPES = ("STRING",)
@@ -70,7 +83,7 @@ class RealtimeBatchMonitor:
     CATEGORY = "KuAi/Utils"
     OUTPUT_NODE = True
 
-    def monitor(self, enable=True, refresh_rate=3.0, max_tasks=10, max_logs=50):
+    def monitor(self, enable=True, refresh_rate=0.25, max_tasks=10, max_logs=50, session_id=""):
         """启动或停止实时监控"""
         try:
             if not WEBSOCKET_AVAILABLE:
@@ -81,8 +94,10 @@ class RealtimeBatchMonitor:
 
             if enable:
                 # 启动监控
-                self._start_monitor(refresh_rate, max_tasks, max_logs)
-                status = f"✓ 实时监控已启动\n刷新间隔: {refresh_rate}秒\n最多显示: {max_tasks}个任务, {max_logs}条日志"
+                session_id = (session_id or "").strip()
+                self._start_monitor(refresh_rate, max_tasks, max_logs, session_id)
+                status = f"✓ 实时监控已启动\n推送间隔: {refresh_rate}秒\n最多显示: {max_tasks}个任务, {max_logs}条日志\n" \
+                         f"监控会话: {session_id or '全部'}"
             else:
                 # 停止监控
                 self._stop_monitor()
@@ -104,7 +119,7 @@ class RealtimeBatchMonitor:
             }
 
     @classmethod
-    def _start_monitor(cls, refresh_rate: float, max_tasks: int, max_logs: int):
+    def _start_monitor(cls, refresh_rate: float, max_tasks: int, max_logs: int, session_id: str = ""):
         """启动后台监控线程"""
         with cls._thread_lock:
             # 如果已有线程在运行，先停止
@@ -119,12 +134,12 @@ class RealtimeBatchMonitor:
             # 启动新线程
             cls._monitor_thread = threading.Thread(
                 target=cls._monitor_loop_wrapper,
-                args=(refresh_rate, max_tasks, max_logs),
+                args=(refresh_rate, max_tasks, max_logs, session_id),
                 daemon=True,
                 name="RealtimeBatchMonitor"
             )
             cls._monitor_thread.start()
-            print(f"[RealtimeBatchMonitor] 监控线程已启动 (刷新间隔: {refresh_rate}s)")
+            print(f"[RealtimeBatchMonitor] 监控线程已启动 (推送间隔: {refresh_rate}s)")
 
     @classmethod
     def _stop_monitor(cls):
@@ -137,75 +152,121 @@ class RealtimeBatchMonitor:
                 print("[RealtimeBatchMonitor] 监控线程已停止")
 
     @classmethod
-    def _monitor_loop_wrapper(cls, refresh_rate: float, max_tasks: int, max_logs: int):
-        """线程入口 - 包装 asyncio 事件循环"""
+    def _monitor_loop_wrapper(cls, refresh_rate: float, max_tasks: int, max_logs: int, session_id: str = ""):
+        """线程入口"""
         try:
-            # 创建新的事件循环
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(cls._monitor_loop(refresh_rate, max_tasks, max_logs))
+            cls._monitor_loop(refresh_rate, max_tasks, max_logs, session_id)
         except Exception as e:
             print(f"[RealtimeBatchMonitor] 监控循环异常: {e}")
-        finally:
-            try:
-                loop.close()
-            except:
-                pass
 
     @classmethod
-    async def _monitor_loop(cls, refresh_rate: float, max_tasks: int, max_logs: int):
-        """异步监控循环 - 定期读取状态并推送"""
+    def _send(cls, push_data: Dict[str, Any]):
+        if WEBSOCKET_AVAILABLE:
+            server.PromptServer.instance.send_sync('kuai.batch.progress', push_data)
+
+    @classmethod
+    def _monitor_loop(cls, refresh_rate: float, max_tasks: int, max_logs: int, session_id: str = "",
+                      stop_event: threading.Event = None):
+        """监控循环 - 等待状态变更事件，合并后推送差异"""
+        stop_event = stop_event or cls._thread_controller
         state_manager = BatchProcessState()
-        last_session_id = None
-
-        print(f"[RealtimeBatchMonitor] 监控循环开始 (间隔: {refresh_rate}s)")
-
-        while not cls._thread_controller.is_set():
-            try:
-                # 读取当前状态
-                state = state_manager.get_state()
-
-                # 检查是否有活动会话
-                session_id = state.get("session_id", "")
-                if session_id:
-                    # 计算统计信息
-                    stats = state_manager.get_statistics()
-
-                    # 准备推送数据
-                    push_data = cls._format_push_data(state, stats, max_tasks, max_logs)
-
-                    # 通过 WebSocket 推送
-                    if WEBSOCKET_AVAILABLE:
-                        server.PromptServer.instance.send_sync('kuai.batch.progress', push_data)
-
-                    # 检测会话变化
-                    if session_id != last_session_id:
-                        print(f"[RealtimeBatchMonitor] 检测到新会话: {session_id}")
-                        last_session_id = session_id
-
-                    # 检测会话完成
-                    total = state.get("total", 0)
-                    completed = state.get("completed", 0)
-                    failed = state.get("failed", 0)
-                    if total > 0 and (completed + failed) >= total:
-                        print(f"[RealtimeBatchMonitor] 会话完成: {session_id}")
-                        # 发送完成通知
-                        push_data["completed"] = True
-                        server.PromptServer.instance.send_sync('kuai.batch.progress', push_data)
-
-                # 等待下一次刷新
-                await asyncio.sleep(refresh_rate)
-
-            except Exception as e:
-                print(f"[RealtimeBatchMonitor] 监控循环错误: {e}")
-                await asyncio.sleep(refresh_rate)
+        subscription = state_manager.subscribe(session_id)
+        finished_sessions = set()
+
+        print(f"[RealtimeBatchMonitor] 监控循环开始 (推送间隔: {refresh_rate}s, 会话: {session_id or '全部'})")
+
+        def _push_full(sid: str):
+            state = state_manager.get_state(sid)
+            push_data = cls._format_push_data(state, state_manager.get_statistics(sid), max_tasks, max_logs)
+            cls._finish_check(push_data, finished_sessions)
+            cls._send(push_data)
+
+        try:
+            # 启动时推送现有会话的完整状态
+            states = [state_manager.get_state(session_id)] if session_id else state_manager.get_sessions()
+            for state in states:
+                if state.get("session_id") and state["session_id"] not in finished_sessions:
+                    _push_full(state["session_id"])
+
+            while not stop_event.is_set():
+                # 空闲时阻塞等待，不读取也不推送
+                if not subscription.wait(_STOP_CHECK_INTERVAL):
+                    continue
+
+                # 合并推送间隔内的全部变更
+                stop_event.wait(refresh_rate)
+                events = subscription.drain()
+                overflowed, subscription.overflowed = subscription.overflowed, False
+
+                for sid, changes in cls._group_events(events).items():
+                    if overflowed or changes["full"]:
+                        _push_full(sid)
+                        continue
+                    push_data = cls._format_diff_data(
+                        state_manager.get_summary(sid), state_manager.get_statistics(sid),
+                        changes["tasks"], changes["logs"], max_tasks, max_logs
+                    )
+                    cls._finish_check(push_data, finished_sessions)
+                    cls._send(push_data)
+
+        except Exception as e:
+            print(f"[RealtimeBatchMonitor] 监控循环错误: {e}")
+        finally:
+            state_manager.unsubscribe(subscription)
 
         print("[RealtimeBatchMonitor] 监控循环结束")
 
+    @staticmethod
+    def _group_events(events: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """按会话合并变更：同一任务只保留最新记录，日志按顺序追加"""
+        grouped: Dict[str, Dict[str, Any]] = {}
+        for delta in events:
+            sid = delta.get("session", "")
+            if not sid:
+                continue
+            changes = grouped.setdefault(sid, {"full": False, "tasks": {}, "logs": []})
+            op = delta.get("op")
+            if op == "start":
+                changes.update(full=True, tasks={}, logs=[])
+            elif op == "task":
+                # 重新插入使字典按最后变化的顺序排列
+                changes["tasks"].pop(delta["task"]["idx"], None)
+                changes["tasks"][delta["task"]["idx"]] = delta["task"]
+            elif op == "log":
+                changes["logs"].append(delta["entry"])
+        return grouped
+
+    @staticmethod
+    def _finish_check(push_data: Dict[str, Any], finished_sessions: set):
+        """检测会话完成；每个会话只发送一次完成通知（总数增加后重新计入）"""
+        sid = push_data["session_id"]
+        done = push_data["total"] > 0 and (push_data["completed"] + push_data["failed"]) >= push_data["total"]
+        if done and sid not in finished_sessions:
+            print(f"[RealtimeBatchMonitor] 会话完成: {sid}")
+            finished_sessions.add(sid)
+        elif not done:
+            finished_sessions.discard(sid)
+        push_data["session_completed"] = done
+
+    @classmethod
+    def _format_diff_data(cls, summary: Dict[str, Any], stats: Dict[str, Any], tasks: Dict[int, Dict[str, Any]],
+                          logs: List[Dict[str, Any]], max_tasks: int, max_logs: int) -> Dict[str, Any]:
+        """格式化差异推送数据：计数与统计为最新值，任务与日志只包含本次变化的部分"""
+        data = dict(summary)
+        data.update({
+            "diff": True,
+            "statistics": stats,
+            "session_completed": False,
+            "progress": ((data["completed"] + data["failed"]) / data["total"]) * 100 if data["total"] > 0 else 0,
+            "tasks": list(tasks.values())[-max_tasks:][::-1],
+            "logs": logs[-max_logs:],
+        })
+        return data
+
     @classmethod
     def _format_push_data(cls, state: Dict[str, Any], stats: Dict[str, Any],
                           max_tasks: int, max_logs: int) -> Dict[str, Any]:
-        """格式化推送数据"""
+        """格式化完整推送数据"""
         # 基础信息
         data = {
             "session_id": state.get("session_id", ""),
@@ -216,7 +277,8 @@ class RealtimeBatchMonitor:
             "failed": state.get("failed", 0),
             "processing": state.get("processing", 0),
             "statistics": stats,
-            "completed": False  # 会话是否完成
+            "diff": False,
+            "session_completed": False  # 会话是否完成
         }
 
         # 计算进度百分比
@@ -243,7 +305,6 @@ class RealtimeBatchMonitor:
 
         return data
 
-
 NODE_CLASS_MAPPINGS = {
     "RealtimeBatchMonitor": RealtimeBatchMonitor,
 }
@@ -0,0 +1,207 @@
+"""生成结果缓存（按内容寻址）- 相同请求直接复用上次的结果，跳过重复的付费生成
+
+工作流修复下游节点后重新执行时，上游生成节点的 (模型, 提示词, 参考图, 时长, 宽高比, 种子…)
+完全相同，却会再次调用付费接口。本模块以规范化后的请求参数计算 SHA-256 作为缓存键，
+映射到生成结果的远程 URL、本地文件与附加信息：
+  - 图像等小结果以内容哈希命名保存到 temp/kuai_result_cache/ 下（缓存自管理，计入容量）；
+  - 视频等已下载到输出目录的结果只记录路径（不复制，不计入容量），文件被删除即视为未命中；
+  - 条目超过有效期（默认 7 天）失效；缓存文件总量超过上限（默认 2048MB）时按最近最少使用淘汰。
+有效期与容量可通过环境变量 KUAI_RESULT_CACHE_TTL_HOURS / KUAI_RESULT_CACHE_MAX_MB 调整。
+缓存为可选功能，由各节点的"使用结果缓存"开关启用。
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+DEFAULT_TTL_HOURS = 24 * 7
+DEFAULT_MAX_MB = 2048
+
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        value = float(os.environ.get(name, "").strip())
+        return value if value > 0 else default
+    except ValueError:
+        return default
+
+
+def _normalize(value: Any) -> Any:
+    """规范化请求参数：去除字符串首尾空白，忽略空值，字典按键排序（由 json sort_keys 完成）"""
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items() if v is not None and v != ""}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def request_key(namespace: str, payload: Dict[str, Any]) -> str:
+    """根据命名空间与请求参数计算缓存键（不应包含 API Key 等与结果无关的字段）"""
+    normalized = json.dumps(_normalize(payload), ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha256(f"{namespace}\n{normalized}".encode("utf-8")).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+class ResultCache:
+    """生成结果缓存（单例模式）"""
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self._initialized = True
+        self.comfy_root = Path(__file__).parent.parent.parent.parent.parent
+        self.cache_dir = self.comfy_root / "temp" / "kuai_result_cache"
+        self.ttl_seconds = _env_number("KUAI_RESULT_CACHE_TTL_HOURS", DEFAULT_TTL_HOURS) * 3600
+        self.max_bytes = int(_env_number("KUAI_RESULT_CACHE_MAX_MB", DEFAULT_MAX_MB) * 1024 * 1024)
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self._cache_lock = threading.RLock()
+
+    @property
+    def index_file(self) -> Path:
+        return self.cache_dir / "index.json"
+
+    def _index(self) -> Dict[str, Dict[str, Any]]:
+        """惰性加载索引（调用方需持有 _cache_lock）"""
+        if self._entries is None:
+            self._entries = {}
+            try:
+                if self.index_file.exists():
+                    with open(self.index_file, 'r', encoding='utf-8') as f:
+                        self._entries = json.load(f)
+            except Exception as e:
+                print(f"[ResultCache] 加载索引失败，缓存将重新建立: {e}")
+        return self._entries
+
+    def _save_index(self):
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp = self.index_file.with_suffix(".tmp")
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self._entries or {}, f, ensure_ascii=False)
+            os.replace(tmp, self.index_file)
+        except Exception as e:
+            print(f"[ResultCache] 保存索引失败: {e}")
+
+    def _resolve(self, path: str) -> Path:
+        p = Path(path)
+        return p if p.is_absolute() else self.comfy_root / p
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """查询缓存，命中返回 {"urls", "files", "blobs", "meta"}（路径均为绝对路径），否则返回 None"""
+        with self._cache_lock:
+            entries = self._index()
+            entry = entries.get(key)
+            if entry is None:
+                return None
+
+            now = time.time()
+            paths = [self._resolve(p) for p in entry.get("files", [])]
+            blobs = [self.cache_dir / name for name in entry.get("blobs", [])]
+            if now - entry.get("created_at", 0) > self.ttl_seconds or not all(p.exists() for p in paths + blobs):
+                self._drop(key)
+                self._save_index()
+                return None
+
+            entry["last_access"] = now
+            self._save_index()
+            return {
+                "urls": list(entry.get("urls", [])),
+                "files": [str(p) for p in paths],
+                "blobs": [str(p) for p in blobs],
+                "meta": dict(entry.get("meta", {})),
+            }
+
+    def put(self, key: str, urls: Optional[List[str]] = None, files: Optional[List[str]] = None,
+            blobs: Optional[List[bytes]] = None, meta: Optional[Dict[str, Any]] = None):
+        """写入缓存；blobs 为需要缓存自行保存的结果内容，files 为已存在的结果文件路径"""
+        try:
+            with self._cache_lock:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                # 先移除同键的旧条目：新旧内容相同时，缓存文件由下面重新写入，不会被删掉
+                self._drop(key)
+                names = []
+                for data in blobs or []:
+                    name = hashlib.sha256(data).hexdigest()
+                    blob_path = self.cache_dir / name
+                    if not blob_path.exists():
+                        with open(blob_path, 'wb') as f:
+                            f.write(data)
+                    names.append(name)
+
+                now = time.time()
+                entries = self._index()
+                entries[key] = {
+                    "urls": list(urls or []),
+                    "files": [str(p) for p in files or []],
+                    "blobs": names,
+                    "meta": meta or {},
+                    "created_at": now,
+                    "last_access": now,
+                }
+                self._evict(now)
+                self._save_index()
+        except Exception as e:
+            print(f"[ResultCache] 写入缓存失败: {e}")
+
+    def _evict(self, now: float):
+        """淘汰过期条目，再按最近最少使用淘汰直到缓存文件总量不超过上限"""
+        entries = self._index()
+        for key in [k for k, e in entries.items() if now - e.get("created_at", 0) > self.ttl_seconds]:
+            self._drop(key)
+
+        # 按内容寻址的缓存文件可被多个条目引用，总量按去重后的文件计算
+        blobs = {name for e in entries.values() for name in e.get("blobs", [])}
+        total = sum(self._blob_size(name) for name in blobs)
+        for key in sorted(entries, key=lambda k: entries[k].get("last_access", 0)):
+            if total <= self.max_bytes:
+                break
+            total -= self._drop(key)
+
+    def _blob_size(self, name: str) -> int:
+        try:
+            return (self.cache_dir / name).stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def _drop(self, key: str) -> int:
+        """移除条目，并删除不再被其他条目引用的缓存文件，返回释放的字节数"""
+        entries = self._index()
+        entry = entries.pop(key, None)
+        if not entry:
+            return 0
+        in_use = {name for e in entries.values() for name in e.get("blobs", [])}
+        freed = 0
+        for name in dict.fromkeys(entry.get("blobs", [])):
+            if name not in in_use:
+                size = self._blob_size(name)
+                try:
+                    (self.cache_dir / name).unlink()
+                    freed += size
+                except FileNotFoundError:
+                    pass
+        return freed
+
+    def clear(self):
+        """清空缓存"""
+        with self._cache_lock:
+            for key in list(self._index()):
+                self._drop(key)
+            self._save_index()
@@ -0,0 +1,202 @@
+"""统一重试策略 - 可重试错误按带抖动的指数退避重试，遵循 Retry-After，并受单任务重试预算约束
+
+各服务商节点原先没有任何重试：20 分钟轮询中的一次 502 就可能让已付费的任务失败。
+http_transport 的每个请求都按本模块的策略处理：
+  - 分类：连接失败、超时与 408/425/429/5xx 视为可重试，其余 4xx 直接返回给调用方；
+    非幂等请求（POST 提交）只在服务端明确未处理时重试（连接超时、429、503），避免重复创建付费任务；
+  - 退避：第 n 次重试等待 [0, min(上限, 基数·2^n)] 内的随机时长（full jitter），
+    响应带 Retry-After 时至少等待其指定的时间；
+  - 预算：批量处理器以 bind_task 包装单任务函数，每个任务在独立的重试范围中执行，该任务的提交、轮询与下载
+    共享同一份预算，用尽后不再重试；重试次数与原因汇总到批量范围（RetryScope），用于生成报告。
+单次请求的最多重试次数与单任务预算可通过环境变量 KUAI_HTTP_RETRY / KUAI_TASK_RETRY_BUDGET 调整（0 表示不重试）。
+（config.py 的 HTTP_RETRY 只作用于旧版 utils/http_client.py，不影响本模块。）
+"""
+
+import contextvars
+import os
+import random
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+import requests
+
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_TASK_BUDGET = 10
+BASE_DELAY = 1.0
+MAX_DELAY = 30.0
+# Retry-After 超过该值（秒）时按该值等待
+MAX_RETRY_AFTER = 120.0
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+# 非幂等请求仅在这些状态码下重试（服务端明确没有处理该请求）
+UNPROCESSED_STATUS = {429, 503}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(int(os.environ.get(name, "").strip()), 0)
+    except ValueError:
+        return default
+
+
+def classify(method: str, response: Any = None, error: Optional[BaseException] = None) -> Optional[str]:
+    """判断一次请求结果是否可重试，可重试时返回原因（如 "429"、"timeout"），否则返回 None"""
+    idempotent = method.upper() in IDEMPOTENT_METHODS
+    if error is not None:
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return "timeout"
+        if not idempotent:
+            return None
+        if isinstance(error, requests.exceptions.Timeout):
+            return "timeout"
+        if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError)):
+            return "network"
+        return None
+
+    status = getattr(response, "status_code", None)
+    if not isinstance(status, int):
+        return None
+    if status in (UNPROCESSED_STATUS if not idempotent else RETRYABLE_STATUS):
+        return str(status)
+    return None
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """第 attempt 次重试（从 0 计）前的等待秒数"""
+    delay = random.uniform(0, min(MAX_DELAY, BASE_DELAY * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, MAX_RETRY_AFTER))
+    return delay
+
+
+class RetryScope:
+    """重试范围：记录重试次数与原因，可设预算；子范围的重试同时计入父范围"""
+
+    def __init__(self, budget: Optional[int] = None, parent: Optional["RetryScope"] = None):
+        self.budget = budget
+        self.parent = parent
+        self.retries = 0
+        self.exhausted = 0
+        self.reasons: Counter = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def remaining(self) -> Optional[int]:
+        return None if self.budget is None else max(self.budget - self.retries, 0)
+
+    def take(self, reason: str) -> bool:
+        """申请一次重试；预算用尽时返回 False"""
+        with self._lock:
+            if self.budget is not None and self.retries >= self.budget:
+                self.exhausted += 1
+                allowed = False
+            else:
+                self.retries += 1
+                self.reasons[reason] += 1
+                allowed = True
+        if self.parent is not None:
+            self.parent._record(reason, allowed)
+        return allowed
+
+    def _record(self, reason: str, allowed: bool):
+        with self._lock:
+            if allowed:
+                self.retries += 1
+                self.reasons[reason] += 1
+            else:
+                self.exhausted += 1
+        if self.parent is not None:
+            self.parent._record(reason, allowed)
+
+    def child(self) -> "RetryScope":
+        """创建单任务子范围（预算为 KUAI_TASK_RETRY_BUDGET），其重试计入本范围"""
+        return RetryScope(RetryPolicy().task_budget, parent=self)
+
+    @contextmanager
+    def activate(self):
+        """在当前线程（上下文）中启用本范围"""
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"retries": self.retries, "exhausted": self.exhausted, "reasons": dict(self.reasons)}
+
+    def summary(self) -> str:
+        """报告用的一行摘要，如 "重试 3 次（429×2, 502×1）" """
+        with self._lock:
+            if not self.retries and not self.exhausted:
+                return "重试 0 次"
+            detail = ", ".join(f"{reason}×{count}" for reason, count in self.reasons.most_common())
+            text = f"重试 {self.retries} 次（{detail}）" if detail else f"重试 {self.retries} 次"
+            if self.exhausted:
+                text += f"，{self.exhausted} 次因预算用尽未重试"
+            return text
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar("kuai_retry_scope", default=None)
+
+
+def current_scope() -> Optional[RetryScope]:
+    return _current.get()
+
+
+def retry_scope(budget: Optional[int] = None):
+    """开启一个重试范围（嵌套在当前范围之下），范围内的请求共享预算"""
+    return RetryScope(budget, parent=_current.get()).activate()
+
+
+def bind_task(fn: Callable, parent: Optional[RetryScope] = None) -> Callable:
+    """包装任务函数：在线程池中执行时开启单任务重试范围
+
+    任务范围挂在 parent（通常是批量范围，用于汇总报告）之下；未指定时挂在调用 bind_task 时所在的范围之下。
+    """
+    ctx = contextvars.copy_context()
+    if parent is None:
+        parent = _current.get()
+
+    def _run(*args, **kwargs):
+        scope = parent.child() if parent is not None else RetryScope(RetryPolicy().task_budget)
+        with scope.activate():
+            return fn(*args, **kwargs)
+
+    def _run_in_context(*args, **kwargs):
+        return ctx.copy().run(_run, *args, **kwargs)
+
+    return _run_in_context
+
+
+class RetryPolicy:
+    """全局重试策略（单例模式）"""
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self._initialized = True
+        self.max_retries = _env_int("KUAI_HTTP_RETRY", DEFAULT_MAX_RETRIES)
+        self.task_budget = _env_int("KUAI_TASK_RETRY_BUDGET", DEFAULT_TASK_BUDGET)
+
+    def allow(self, attempt: int, reason: str) -> bool:
+        """第 attempt 次重试（从 0 计）是否允许：不超过单请求上限，且当前任务仍有预算"""
+        if attempt >= self.max_retries:
+            return False
+        scope = _current.get()
+        return scope.take(reason) if scope is not None else True
@@ -0,0 +1,85 @@
+"""滚动统计 - 常数时间更新的计数/均值/标准差与分位数草图
+
+批量状态的统计信息原先在每次读取时遍历全部已完成任务、重新解析 "%H:%M:%S" 字符串，
+任务越多越慢，且跨越午夜时耗时为负。这里的聚合量在每个样本到达时增量更新：
+  - RunningStat 维护 count / sum / sum of squares，均值与标准差直接由聚合量得出；
+  - QuantileSketch 按对数分桶计数（相对误差约 1%），p50/p95 只需遍历有限个桶，
+    与样本数量无关。
+"""
+
+import math
+from typing import Any, Dict
+
+# 小于该值（秒）的样本计入零桶
+_MIN_VALUE = 1e-3
+
+
+class QuantileSketch:
+    """对数分桶分位数草图：更新 O(1)，桶数只随数值范围对数增长"""
+
+    def __init__(self, accuracy: float = 0.01):
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value: float):
+        self.count += 1
+        if value <= _MIN_VALUE:
+            self.zero_count += 1
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+
+    def quantile(self, q: float) -> float:
+        """返回 q 分位数的近似值（相对误差不超过 accuracy）"""
+        if self.count == 0:
+            return 0.0
+        # nearest-rank：第 ceil(q·n) 个样本（从 0 计为 rank）
+        rank = max(math.ceil(q * self.count) - 1, 0)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+class RunningStat:
+    """单个指标的滚动聚合：count / sum / sum of squares + 分位数草图"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.sum_sq = 0.0
+        self.sketch = QuantileSketch()
+
+    def add(self, value: float):
+        value = max(float(value), 0.0)
+        self.count += 1
+        self.total += value
+        self.sum_sq += value * value
+        self.sketch.add(value)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def stdev(self) -> float:
+        if self.count < 2:
+            return 0.0
+        variance = (self.sum_sq - self.total * self.total / self.count) / (self.count - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": round(self.mean, 2),
+            "stdev": round(self.stdev, 2),
+            "p50": round(self.sketch.quantile(0.5), 2),
+            "p95": round(self.sketch.quantile(0.95), 2),
+        }
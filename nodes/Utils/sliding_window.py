@@ -0,0 +1,125 @@
+"""滑动窗口调度器 - 始终保持 N 个任务在途，任一任务结束立即补位
+
+目录/CSV 批量节点原先按批次锁步执行：提交 batch_size 个任务后等待最慢的一个完成才开始下一批，
+一个拖尾任务会让其余并发名额空闲长达 max_wait_time。
+本模块把任务逐个送入固定大小的窗口：
+  - 窗口中每个并发名额（槽位）空出后立即从任务迭代器取下一个任务，迭代器按需读取（适用于流式任务源）；
+  - 按完成先后产出结果，调用方边收集边更新进度；
+  - 记录每个槽位的忙碌时长，报告中给出并发利用率（忙碌时长 / 总耗时）；
+  - 任务迭代器可产出 WAIT 表示暂时没有新任务（如监视目录），窗口不会阻塞在读取上。
+"""
+
+import concurrent.futures
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# 任务迭代器产出 WAIT 表示"暂时没有新任务，稍后再取"
+WAIT = object()
+
+
+class SlidingWindow:
+    """滑动窗口调度器：size 个槽位，每个槽位同时只执行一个任务"""
+
+    WAIT = WAIT
+
+    def __init__(self, size: int, thread_name_prefix: str = "kuai-window"):
+        self.size = max(int(size), 1)
+        self.thread_name_prefix = thread_name_prefix
+        self.slot_busy: List[float] = [0.0] * self.size
+        self.slot_tasks: List[int] = [0] * self.size
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _timed(self, slot: int, fn: Callable, item: Any):
+        start = time.monotonic()
+        try:
+            return fn(item)
+        finally:
+            with self._lock:
+                self.slot_busy[slot] += time.monotonic() - start
+                self.slot_tasks[slot] += 1
+
+    def run(self, fn: Callable[[Any], Any], items: Iterable[Any],
+            poll_interval: float = 1.0) -> Iterator[Tuple[Any, Optional[concurrent.futures.Future]]]:
+        """以窗口方式执行 fn(item)，按完成先后产出 (item, future)
+
+        任务完成后先补位再产出结果，调用方处理结果期间窗口仍保持满载。
+        items 产出 WAIT 时，窗口等待在途任务完成或 poll_interval 秒后再取；
+        期间没有结果可产出时产出 (WAIT, None)，调用方（如下游窗口）借此处理自己的结果，应直接跳过。
+        """
+        items = iter(items)
+        free = list(range(self.size - 1, -1, -1))
+        inflight: Dict[concurrent.futures.Future, Tuple[int, Any]] = {}
+        exhausted = waiting = False
+        self.started = time.monotonic()
+        self.finished = None
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.size,
+                                                   thread_name_prefix=self.thread_name_prefix) as pool:
+            def _fill():
+                nonlocal exhausted, waiting
+                waiting = False
+                while free:
+                    try:
+                        item = next(items)
+                    except StopIteration:
+                        exhausted = True
+                        return
+                    if item is WAIT:
+                        waiting = True
+                        return
+                    slot = free.pop()
+                    inflight[pool.submit(self._timed, slot, fn, item)] = (slot, item)
+
+            _fill()
+            while inflight or not exhausted:
+                if inflight:
+                    done, _ = concurrent.futures.wait(inflight, timeout=poll_interval if waiting else None,
+                                                      return_when=concurrent.futures.FIRST_COMPLETED)
+                else:
+                    # 任务源暂时为空且没有在途任务
+                    time.sleep(poll_interval)
+                    done = ()
+                finished = []
+                for future in done:
+                    slot, item = inflight.pop(future)
+                    free.append(slot)
+                    finished.append((item, future))
+                _fill()
+                for item, future in finished:
+                    yield item, future
+                if not finished:
+                    yield WAIT, None
+        self.finished = time.monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    def utilization(self) -> List[float]:
+        """各槽位的利用率（0~1）"""
+        elapsed = self.elapsed
+        with self._lock:
+            return [min(busy / elapsed, 1.0) if elapsed > 0 else 0.0 for busy in self.slot_busy]
+
+    def to_dict(self) -> Dict[str, Any]:
+        usage = self.utilization()
+        with self._lock:
+            tasks = list(self.slot_tasks)
+        return {
+            "size": self.size,
+            "elapsed": round(self.elapsed, 1),
+            "utilization": round(sum(usage) / len(usage), 3),
+            "slots": [{"slot": i + 1, "tasks": tasks[i], "utilization": round(u, 3)}
+                      for i, u in enumerate(usage)],
+        }
+
+    def summary(self) -> str:
+        """报告用的一行摘要，如 "10 路，平均利用率 87%（最低 62%），耗时 812s" """
+        usage = self.utilization()
+        return (f"{self.size} 路，平均利用率 {sum(usage) / len(usage):.0%}"
+                f"（最低 {min(usage):.0%}），耗时 {self.elapsed:.0f}s")
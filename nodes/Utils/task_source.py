@@ -0,0 +1,130 @@
+"""批量任务源 - 支持完整 JSON 列表与按行流式读取的 CSV 引用
+
+CSVBatchReader 默认把整份 CSV 读入列表再序列化成一个大 JSON 字符串，批量处理器再整体反序列化，
+数万行的商品表会让内存翻倍并阻塞界面。流式模式下读取器只输出一个很小的"任务源引用"字符串
+（仍是 STRING 类型，与现有连线兼容），处理器通过 TaskSource 按行/按窗口读取：
+内存占用与窗口大小成正比，且第一批任务无需等待整份文件解析完成即可提交。
+"""
+
+import csv
+import json
+import os
+from typing import Any, Dict, Iterator, List, Optional
+
+# 任务源引用的标记字段
+SOURCE_MARKER = "kuai_task_source"
+
+
+def iter_csv_rows(file_path: str) -> Iterator[Dict[str, Any]]:
+    """逐行读取 CSV，跳过空行，去除首尾空白并附加 _row_number（用于调试）"""
+    try:
+        with open(file_path, 'r', encoding='utf-8-sig') as f:
+            reader = csv.DictReader(f)
+
+            # 验证必需的列
+            if not reader.fieldnames:
+                raise ValueError("CSV 文件为空或格式不正确")
+
+            for row_num, row in enumerate(reader, start=2):  # 从第2行开始（第1行是标题）
+                # 跳过空行
+                if not any(row.values()):
+                    continue
+
+                # 清理数据（去除空白）
+                cleaned_row = {k: v.strip() if isinstance(v, str) else v for k, v in row.items()}
+                cleaned_row['_row_number'] = row_num
+                yield cleaned_row
+
+    except UnicodeDecodeError as e:
+        raise RuntimeError(
+            f"CSV 文件编码错误: {file_path}\n\n"
+            f"💡 解决方法：\n"
+            f"  1. 用文本编辑器打开CSV文件\n"
+            f"  2. 另存为时选择 UTF-8 编码\n"
+            f"  3. 重新上传文件\n\n"
+            f"详细错误: {str(e)}"
+        )
+
+
+def make_csv_source(file_path: str) -> str:
+    """生成 CSV 任务源引用字符串（包含路径、修改时间与大小，用于校验和生成批次键）"""
+    file_path = os.path.abspath(file_path)
+    stat = os.stat(file_path)
+    return json.dumps({
+        SOURCE_MARKER: "csv",
+        "path": file_path,
+        "mtime": stat.st_mtime,
+        "size": stat.st_size,
+    }, ensure_ascii=False)
+
+
+def parse_source(batch_tasks: str) -> Optional[Dict[str, Any]]:
+    """解析任务源引用；普通 JSON 任务列表返回 None"""
+    text = (batch_tasks or "").lstrip()
+    if not text.startswith("{"):
+        return None
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) and data.get(SOURCE_MARKER) else None
+
+
+class TaskSource:
+    """批量任务源：完整 JSON 列表或流式 CSV 引用，统一按行/按窗口迭代"""
+
+    def __init__(self, tasks: Optional[List[Dict[str, Any]]] = None, ref: Optional[Dict[str, Any]] = None):
+        self._tasks = tasks
+        self.ref = ref
+
+    @classmethod
+    def from_input(cls, batch_tasks: str) -> "TaskSource":
+        """从批量处理器的 batch_tasks 输入构造任务源"""
+        ref = parse_source(batch_tasks)
+        if ref is None:
+            return cls(tasks=json.loads(batch_tasks))
+
+        if ref.get(SOURCE_MARKER) != "csv":
+            raise RuntimeError(f"不支持的任务源类型: {ref.get(SOURCE_MARKER)}")
+        path = ref.get("path", "")
+        if not os.path.exists(path):
+            raise RuntimeError(f"CSV 文件不存在: {path}")
+        if os.path.getmtime(path) != ref.get("mtime"):
+            print(f"[TaskSource] 警告: CSV 文件在读取后已被修改，将按当前内容处理: {path}")
+        return cls(ref=ref)
+
+    @property
+    def streaming(self) -> bool:
+        return self.ref is not None
+
+    @property
+    def total(self) -> Optional[int]:
+        """任务总数；流式任务源在读完之前未知，返回 None"""
+        return None if self.streaming else len(self._tasks)
+
+    @property
+    def fingerprint(self) -> Any:
+        """用于生成批次键的内容标识（流式任务源使用文件路径/修改时间/大小）"""
+        return self.ref if self.streaming else self._tasks
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        if self.streaming:
+            return iter_csv_rows(self.ref["path"])
+        return iter(self._tasks)
+
+    def chunks(self, size: int) -> Iterator[List[Dict[str, Any]]]:
+        """按窗口大小分批迭代，内存中最多保留一个窗口的任务"""
+        size = max(int(size), 1)
+        batch = []
+        for task in self:
+            batch.append(task)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def load_tasks(batch_tasks: str) -> List[Dict[str, Any]]:
+    """读取全部任务为列表（供需要随机访问或预先知道总数的处理器使用）"""
+    return list(TaskSource.from_input(batch_tasks))
@@ -0,0 +1,173 @@
+"""上传去重索引 - 内容哈希 → 图床 URL，相同内容在有效期内不再重复编码和上传
+
+每天对同一批商品图目录重新执行工作流时，上传节点会把完全相同的字节再次编码、上传一遍，
+大部分时间都耗在上传上。本模块在 temp/kuai_upload_index.db（SQLite）中记录：
+  - uploads 表：上传键 → URL（及 created 等附加信息），超过有效期（默认 48 小时，
+    临时图床的链接会过期）视为未命中；
+  - files 表：文件路径 + 大小 + 修改时间 → 内容哈希，未修改的文件无需重新读取计算哈希。
+上传键由源内容哈希、上传地址与编码参数（格式/质量）共同决定，任一变化都会重新上传。
+有效期可通过环境变量 KUAI_UPLOAD_INDEX_TTL_HOURS 调整，设为 0 时关闭去重。
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+DEFAULT_TTL_HOURS = 48
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    upload_key TEXT PRIMARY KEY,
+    url        TEXT NOT NULL,
+    meta       TEXT NOT NULL DEFAULT '{}',
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    path     TEXT PRIMARY KEY,
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest   TEXT NOT NULL
+);
+"""
+
+
+def _ttl_hours() -> float:
+    try:
+        return max(float(os.environ.get("KUAI_UPLOAD_INDEX_TTL_HOURS", "").strip()), 0.0)
+    except ValueError:
+        return float(DEFAULT_TTL_HOURS)
+
+
+def bytes_digest(data: bytes) -> str:
+    """计算内容哈希（SHA-256）"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def upload_key(digest: str, upload_url: str, variant: str = "") -> str:
+    """由源内容哈希、上传地址与编码参数计算上传键"""
+    return hashlib.sha256(f"{upload_url.strip()}\n{variant}\n{digest}".encode("utf-8")).hexdigest()
+
+
+class UploadIndex:
+    """上传去重索引（单例模式）"""
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self._initialized = True
+        self.db_file = Path(__file__).parent.parent.parent.parent.parent / "temp" / "kuai_upload_index.db"
+        self.ttl_seconds = _ttl_hours() * 3600
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """惰性打开数据库（调用方需持有 _db_lock）"""
+        if self._conn is None:
+            self.db_file.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_file), check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            if self.enabled:
+                # 清理过期的上传记录
+                with conn:
+                    conn.execute("DELETE FROM uploads WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        """关闭数据库连接（下次使用时重新打开）"""
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def file_digest(self, path) -> str:
+        """计算文件内容哈希；大小与修改时间未变化时直接使用记录的哈希"""
+        path = os.path.abspath(str(path))
+        stat = os.stat(path)
+        try:
+            with self._db_lock:
+                row = self._connection().execute(
+                    "SELECT size, mtime_ns, digest FROM files WHERE path = ?", (path,)
+                ).fetchone()
+            if row is not None and row["size"] == stat.st_size and row["mtime_ns"] == stat.st_mtime_ns:
+                return row["digest"]
+        except Exception as e:
+            print(f"[UploadIndex] 读取文件哈希记录失败: {e}")
+
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+
+        try:
+            with self._db_lock:
+                conn = self._connection()
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO files (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)",
+                        (path, stat.st_size, stat.st_mtime_ns, digest),
+                    )
+        except Exception as e:
+            print(f"[UploadIndex] 保存文件哈希记录失败: {e}")
+        return digest
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """查找未过期的上传记录，返回 {"url", "meta"}；未命中返回 None"""
+        if not self.enabled:
+            return None
+        try:
+            with self._db_lock:
+                conn = self._connection()
+                row = conn.execute(
+                    "SELECT url, meta, created_at FROM uploads WHERE upload_key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                if time.time() - row["created_at"] > self.ttl_seconds:
+                    with conn:
+                        conn.execute("DELETE FROM uploads WHERE upload_key = ?", (key,))
+                    return None
+            return {"url": row["url"], "meta": json.loads(row["meta"] or "{}")}
+        except Exception as e:
+            print(f"[UploadIndex] 查询上传记录失败: {e}")
+            return None
+
+    def record(self, key: str, url: str, meta: Optional[Dict[str, Any]] = None):
+        """记录上传结果（同一键覆盖旧记录）"""
+        if not self.enabled or not url:
+            return
+        try:
+            with self._db_lock:
+                conn = self._connection()
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO uploads (upload_key, url, meta, created_at) VALUES (?, ?, ?, ?)",
+                        (key, url, json.dumps(meta or {}, ensure_ascii=False), time.time()),
+                    )
+        except Exception as e:
+            print(f"[UploadIndex] 保存上传记录失败: {e}")
@@ -0,0 +1,144 @@
+"""图片编码/上传流水线 - 进程池编码 + 有界线程池上传，结果保持原始顺序
+
+逐张"打开 → 转换 → 重新编码 → 上传"时，CPU 编码与网络上传互相等待，500 张图片需要数分钟。
+流水线把两段拆开并重叠执行：
+  - 编码（PIL 解码/转换/保存，CPU 密集）在进程池中并行，绕开 GIL；
+  - 每张图片编码完成后立即提交到上传线程池，上传复用 http_transport 的 keep-alive 连接；
+  - 已编码但尚未上传的图片数量有上限，避免编码远快于上传时把整个目录的字节都堆在内存里。
+进程池不可用（如受限环境无法创建子进程）时自动退回线程池编码。
+"""
+
+import concurrent.futures
+import io
+import os
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from PIL import Image
+
+# 图片数量少于该值时不启动进程池（进程启动开销大于并行收益）
+MIN_PROCESS_BATCH = 4
+
+
+def encode_image(path: str, fmt: str = "jpeg", quality: int = 90) -> Tuple[str, bytes, str]:
+    """读取并重新编码单张图片，返回 (上传文件名, 字节内容, MIME 类型)
+
+    保持为模块级函数且只依赖 PIL，以便在进程池中执行。
+    """
+    path = Path(path)
+    with Image.open(path) as img:
+        pil_image = img
+        # 转换为RGB（如果需要）
+        if pil_image.mode not in ('RGB', 'RGBA'):
+            pil_image = pil_image.convert('RGB')
+
+        buf = io.BytesIO()
+        save_format = fmt.upper()
+        if save_format == 'JPEG':
+            # JPEG 不支持透明度，使用白色背景合成
+            if pil_image.mode == 'RGBA':
+                background = Image.new('RGB', pil_image.size, (255, 255, 255))
+                background.paste(pil_image, mask=pil_image.split()[3])
+                pil_image = background
+            pil_image.save(buf, format='JPEG', quality=quality)
+        else:
+            pil_image.save(buf, format=save_format, quality=quality)
+
+    ext = 'jpg' if fmt == 'jpeg' else fmt
+    return f"{path.stem}.{ext}", buf.getvalue(), f"image/{fmt}"
+
+
+def default_encode_workers(total: int) -> int:
+    """默认编码进程数：CPU 核数与图片数量取较小值"""
+    return max(1, min(os.cpu_count() or 1, total))
+
+
+def run_pipeline(paths: Sequence[Path], upload: Callable[[str, bytes, str], str],
+                 fmt: str = "jpeg", quality: int = 90,
+                 encode_workers: int = 0, upload_workers: int = 8,
+                 on_result: Optional[Callable[[Dict], None]] = None) -> List[Dict]:
+    """编码并上传一组图片，返回按输入顺序排列的 [{index, path, url, error}]
+
+    Args:
+        paths: 图片路径列表
+        upload: 上传函数 upload(filename, data, mime) -> url，在上传线程中调用
+        encode_workers: 编码进程数，0 表示自动
+        upload_workers: 并发上传数
+        on_result: 每张图片完成（成功或失败）时的回调，在调用线程中执行
+    """
+    total = len(paths)
+    results: List[Optional[Dict]] = [None] * total
+    if total == 0:
+        return []
+
+    encode_workers = int(encode_workers) if encode_workers else default_encode_workers(total)
+    encode_workers = max(1, min(encode_workers, total))
+    upload_workers = max(1, min(int(upload_workers), total))
+    # 已编码待上传的图片上限：保证上传线程不空闲，同时限制内存占用
+    max_pending = encode_workers + upload_workers * 2
+
+    encoder = None
+    if encode_workers > 1 and total >= MIN_PROCESS_BATCH:
+        try:
+            encoder = concurrent.futures.ProcessPoolExecutor(max_workers=encode_workers)
+        except (OSError, NotImplementedError, ValueError) as e:
+            print(f"[UploadPipeline] 无法创建编码进程池，改用线程编码: {e}")
+    if encoder is None:
+        encoder = concurrent.futures.ThreadPoolExecutor(
+            max_workers=encode_workers, thread_name_prefix="kuai-encode")
+
+    def _finish(idx: int, url: str = "", error: str = ""):
+        results[idx] = {"index": idx + 1, "path": paths[idx], "url": url, "error": error}
+        if on_result:
+            on_result(results[idx])
+
+    def _upload(encoded: Tuple[str, bytes, str]) -> str:
+        return upload(*encoded)
+
+    uploader = concurrent.futures.ThreadPoolExecutor(
+        max_workers=upload_workers, thread_name_prefix="kuai-upload")
+    encoding: Dict[concurrent.futures.Future, int] = {}
+    uploading: Dict[concurrent.futures.Future, int] = {}
+    next_idx = 0
+
+    try:
+        while next_idx < total or encoding or uploading:
+            # 在待上传数量未超过上限时继续提交编码任务
+            while next_idx < total and len(encoding) + len(uploading) < max_pending:
+                encoding[encoder.submit(encode_image, str(paths[next_idx]), fmt, quality)] = next_idx
+                next_idx += 1
+
+            done, _ = concurrent.futures.wait(
+                list(encoding) + list(uploading),
+                return_when=concurrent.futures.FIRST_COMPLETED)
+
+            for future in done:
+                if future in encoding:
+                    idx = encoding.pop(future)
+                    try:
+                        encoded = future.result()
+                    except BrokenProcessPool as e:
+                        # 子进程异常退出：后续改用线程编码，并重新编码当前图片
+                        if isinstance(encoder, concurrent.futures.ProcessPoolExecutor):
+                            print(f"[UploadPipeline] 编码进程池不可用，改用线程编码: {e}")
+                            encoder.shutdown(wait=False)
+                            encoder = concurrent.futures.ThreadPoolExecutor(
+                                max_workers=encode_workers, thread_name_prefix="kuai-encode")
+                        encoding[encoder.submit(encode_image, str(paths[idx]), fmt, quality)] = idx
+                        continue
+                    except Exception as e:
+                        _finish(idx, error=str(e))
+                        continue
+                    uploading[uploader.submit(_upload, encoded)] = idx
+                else:
+                    idx = uploading.pop(future)
+                    try:
+                        _finish(idx, url=future.result())
+                    except Exception as e:
+                        _finish(idx, error=str(e))
+    finally:
+        encoder.shutdown(wait=True, cancel_futures=True)
+        uploader.shutdown(wait=True, cancel_futures=True)
+
+    return results
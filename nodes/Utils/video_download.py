@@ -1,5 +1,5 @@
 import os
-import requests
+from .download_engine import download_file
 import hashlib
 from pathlib import Path
 
@@ -57,12 +57,7 @@ class DownloadVideo:
         # 下载视频
         print(f"[DownloadVideo] 下载: {video_url}")
         try:
-            resp = requests.get(video_url, timeout=int(timeout), stream=True)
-            resp.raise_for_status()
-            
-            with open(filepath, 'wb') as f:
-                for chunk in resp.iter_content(chunk_size=8192):
-                    f.write(chunk)
+            download_file(video_url, filepath, timeout=int(timeout))
             
             # 返回相对路径
             rel_path = filepath.relative_to(comfy_root)
@@ -1,7 +1,5 @@
 """Veo3 10路并发视频生成节点"""
 
-import time
-import requests
 import hashlib
 import concurrent.futures
 from pathlib import Path
@@ -10,6 +8,12 @@ from ..Sora2.kuai_utils import env_or
 from .veo3 import VeoText2Video as _VeoText2Video
 from .veo3 import VeoImage2Video as _VeoImage2Video
 from .veo3 import VeoQueryTask as _VeoQueryTask
+from ..Utils import http_transport
+from ..Utils.download_engine import download_file
+from ..Utils.download_queue import DownloadQueue
+from ..Utils.retry_policy import RetryScope, bind_task
+from ..Utils.poll_engine import PollEngine
+from ..Utils.poll_timing import timing_profile
 
 N = 10
 
@@ -26,11 +30,7 @@ def _download(video_url, save_dir, prefix, timeout):
         out_dir.mkdir(parents=True, exist_ok=True)
         url_hash = hashlib.md5(video_url.encode()).hexdigest()[:8]
         filepath = out_dir / f"{prefix}_{url_hash}.mp4"
-        resp = requests.get(video_url, timeout=timeout, stream=True)
-        resp.raise_for_status()
-        with open(filepath, "wb") as f:
-            for chunk in resp.iter_content(chunk_size=8192):
-                f.write(chunk)
+        download_file(video_url, filepath, timeout=timeout)
         return str(filepath.relative_to(comfy_root))
     except Exception as e:
         print(f"[VeoConcurrent] 下载失败: {e}")
@@ -38,29 +38,28 @@ def _download(video_url, save_dir, prefix, timeout):
 
 
 def _poll_and_download(task_idx, task_id, api_key, api_base,
-                       save_dir, max_wait_time, poll_interval, download_timeout):
-    """轮询单个 Veo3 任务直到完成，完成后下载
+                       save_dir, max_wait_time, poll_interval, download_timeout, profile=None):
+    """轮询单个 Veo3 任务直到完成，完成后放入下载队列，返回 (video_url, 下载 Future)
     VeoQueryTask.query(wait=False) 返回 (status, video_url, enhanced_prompt, raw_json)
     """
     querier = _VeoQueryTask()
-    elapsed = 0
-    while elapsed < max_wait_time:
-        time.sleep(poll_interval)
-        elapsed += poll_interval
-        try:
-            status, video_url, _, _ = querier.query(
-                task_id=task_id, api_base=api_base, api_key=api_key, wait=False
-            )
-            if status == "completed" and video_url:
-                local = _download(video_url, save_dir, f"veo3_{task_idx}", download_timeout)
-                print(f"[VeoConcurrent] ✓ 任务{task_idx} 完成: {local}")
-                return video_url, local
-            print(f"[VeoConcurrent] 任务{task_idx} 进行中... {elapsed}/{max_wait_time}s")
-        except RuntimeError:
-            raise  # 任务失败，直接上抛
-        except Exception as e:
-            print(f"[VeoConcurrent] 任务{task_idx} 查询出错（继续重试）: {e}")
-    raise RuntimeError(f"任务{task_idx} 超时 ({max_wait_time}s)")
+
+    def _query():
+        return querier.query(task_id=task_id, api_base=api_base, api_key=api_key, wait=False)
+
+    def _check(elapsed, queried):
+        status, video_url, _, _ = queried
+        if status == "completed" and video_url:
+            return True, video_url
+        print(f"[VeoConcurrent] 任务{task_idx} 进行中... {elapsed}/{max_wait_time}s")
+        return False, None
+
+    # 轮询交给共享引擎（失败时 RuntimeError 直接上抛，超时抛 PollTimeoutError）
+    video_url = PollEngine().wait(_query, _check, poll_interval, max_wait_time,
+                                  label=f"任务{task_idx}", key=f"veo3:{task_id}", profile=profile)
+    # 下载交给独立的下载队列，工作线程不必等待传输完成
+    download = DownloadQueue().submit(_download, video_url, save_dir, f"veo3_{task_idx}", download_timeout)
+    return video_url, download
 
 
 def _worker_text2video(task_idx, prompt, model, aspect_ratio, enhance_prompt, enable_upsample,
@@ -75,7 +74,8 @@ def _worker_text2video(task_idx, prompt, model, aspect_ratio, enhance_prompt, en
     )
     print(f"[VeoConcurrent] 任务{task_idx} 已提交: {task_id}")
     return _poll_and_download(task_idx, task_id, api_key, api_base,
-                              save_dir, max_wait_time, poll_interval, download_timeout)
+                              save_dir, max_wait_time, poll_interval, download_timeout,
+                              timing_profile("veo3", custom_model or model))
 
 
 def _worker_image2video(task_idx, prompt, image_url, model, aspect_ratio,
@@ -93,15 +93,18 @@ def _worker_image2video(task_idx, prompt, image_url, model, aspect_ratio,
     )
     print(f"[VeoConcurrent] 任务{task_idx} 已提交: {task_id}")
     return _poll_and_download(task_idx, task_id, api_key, api_base,
-                              save_dir, max_wait_time, poll_interval, download_timeout)
+                              save_dir, max_wait_time, poll_interval, download_timeout,
+                              timing_profile("veo3", custom_model or model))
 
 
 def _run_concurrent(worker_fn, task_args_list):
-    """并发执行所有任务，收集结果和错误"""
+    """并发执行所有任务，收集结果、错误与重试统计"""
     results, errors = {}, {}
+    retry = RetryScope()
+    http_transport.ensure_pool_size(N)
     with concurrent.futures.ThreadPoolExecutor(max_workers=N) as executor:
         future_map = {
-            executor.submit(worker_fn, *args): args[0]
+            executor.submit(bind_task(worker_fn, retry), *args): args[0]
             for args in task_args_list
         }
         for future in concurrent.futures.as_completed(future_map):
@@ -111,11 +114,19 @@ def _run_concurrent(worker_fn, task_args_list):
             except Exception as e:
                 errors[idx] = str(e)
                 print(f"[VeoConcurrent] ✗ 任务{idx} 失败: {e}")
-    return results, errors
+    # 等待下载队列完成各任务的下载
+    for idx, (video_url, local) in sorted(results.items()):
+        if isinstance(local, concurrent.futures.Future):
+            local = local.result()
+            print(f"[VeoConcurrent] ✓ 任务{idx} 完成: {local}")
+            results[idx] = (video_url, local)
+    return results, errors, retry
 
 
-def _build_report(results, errors, total):
+def _build_report(results, errors, total, retry=None):
     lines = [f"并发完成: {len(results)}/{total} 成功"]
+    if retry is not None:
+        lines.append(f"网络重试: {retry.summary()}")
     for i in range(1, N + 1):
         if i in results:
             lines.append(f"  ✓ 任务{i}: {results[i][1]}")
@@ -215,11 +226,11 @@ class VeoText2Video10Concurrent:
         print(f"[VeoConcurrent] 开始 {len(task_args)} 路并发文生视频")
         print(f"{'='*60}")
 
-        results, errors = _run_concurrent(_worker_text2video, task_args)
+        results, errors, retry = _run_concurrent(_worker_text2video, task_args)
 
         urls  = [results.get(i, ("", ""))[0] for i in range(1, N + 1)]
         paths = [results.get(i, ("", ""))[1] for i in range(1, N + 1)]
-        report = _build_report(results, errors, len(task_args))
+        report = _build_report(results, errors, len(task_args), retry)
 
         return tuple(urls + paths + [report])
 
@@ -323,11 +334,11 @@ class VeoImage2Video10Concurrent:
         print(f"[VeoConcurrent] 开始 {len(task_args)} 路并发图生视频")
         print(f"{'='*60}")
 
-        results, errors = _run_concurrent(_worker_image2video, task_args)
+        results, errors, retry = _run_concurrent(_worker_image2video, task_args)
 
         urls  = [results.get(i, ("", ""))[0] for i in range(1, N + 1)]
         paths = [results.get(i, ("", ""))[1] for i in range(1, N + 1)]
-        report = _build_report(results, errors, len(task_args))
+        report = _build_report(results, errors, len(task_args), retry)
 
         return tuple(urls + paths + [report])
 
@@ -1,9 +1,8 @@
-"""Veo3 CSV 并发批量处理器 — 从 CSV 读取任务，按批次并发提交、轮询、下载"""
+"""Veo3 CSV 并发批量处理器 — 从 CSV 读取任务，以滑动窗口并发提交、轮询、下载"""
 
 import json
 import os
 import time
-import requests
 import hashlib
 import concurrent.futures
 from pathlib import Path
@@ -12,7 +11,18 @@ from ..Sora2.kuai_utils import env_or
 from .veo3 import VeoText2Video as _VeoText2Video
 from .veo3 import VeoImage2Video as _VeoImage2Video
 from .veo3 import VeoQueryTask as _VeoQueryTask
-from ..Utils.batch_state import BatchProcessState
+from ..Utils.batch_state import BatchProcessState, SessionHandle
+from ..Utils import http_transport
+from ..Utils.download_engine import download_file
+from ..Utils.download_queue import DownloadQueue
+from ..Utils.retry_policy import RetryScope, bind_task
+from ..Utils.sliding_window import SlidingWindow
+from ..Utils.poll_engine import PollEngine, PollTimeoutError
+from ..Utils.poll_timing import timing_profile
+from ..Utils.job_journal import JobJournal, batch_key as journal_batch_key
+from ..Utils.result_cache import ResultCache, request_key
+from ..Utils.task_source import TaskSource
+from ..Utils.job_manager import background_capable
 
 
 # ─────────────────────────────────────────────
@@ -27,11 +37,7 @@ def _download(video_url: str, save_dir: str, prefix: str, timeout: int) -> str:
         out_dir.mkdir(parents=True, exist_ok=True)
         url_hash = hashlib.md5(video_url.encode()).hexdigest()[:8]
         filepath = out_dir / f"{prefix}_{url_hash}.mp4"
-        resp = requests.get(video_url, timeout=timeout, stream=True)
-        resp.raise_for_status()
-        with open(filepath, "wb") as f:
-            for chunk in resp.iter_content(chunk_size=8192):
-                f.write(chunk)
+        download_file(video_url, filepath, timeout=timeout)
         return str(filepath.relative_to(comfy_root))
     except Exception as e:
         print(f"[VeoCSVConcurrent] 下载失败 ({prefix}): {e}")
@@ -44,15 +50,38 @@ def _process_one_task(task_idx: int, task: dict,
                       api_key: str, api_base: str,
                       save_dir: str, max_wait_time: int,
                       poll_interval: int, download_timeout: int,
-                      state_manager: BatchProcessState = None) -> dict:
+                      state_manager: SessionHandle = None,
+                      journal_key: str = "", resume: bool = False,
+                      use_cache: bool = False) -> dict:
     """
     单任务完整流程：提交 → 轮询 → 下载。
     task_type="image2video" + image_urls 非空 → VeoImage2Video
     其余 → VeoText2Video
     VeoQueryTask.query(wait=False) 返回 (status, video_url, enhanced_prompt, raw_json)
+    journal_key 非空时把提交/状态/下载写入任务日志；resume=True 时沿用日志中已提交的
+    task_id，只轮询/下载，不重复提交。
+    use_cache=True 时参数完全相同且本地视频仍在的任务直接复用结果缓存，不调用接口。
+    生成完成的任务交给下载队列，返回字典中的 "download" 为下载阶段的 Future，完成后补齐 local_path。
     """
     result = {"task_idx": task_idx, "row": task.get("_row_number", task_idx),
               "prompt": "", "status": "error", "video_url": "", "local_path": "", "error": ""}
+
+    def _fail(e):
+        result["error"] = str(e)
+        result["status"] = "failed"
+        print(f"[VeoCSVConcurrent] [{task_idx}] ✗ {e}")
+
+        if journal_key and result.get("task_id"):
+            JobJournal().update(journal_key, task_idx,
+                                "timeout" if isinstance(e, PollTimeoutError) else "failed",
+                                detail=str(e), info={"error": str(e)})
+
+        if state_manager:
+            state_manager.update_task(task_idx, "failed", error=str(e))
+            state_manager.add_log(task_idx, "ERROR", f"任务失败: {str(e)}")
+
+        return result
+
     try:
         prompt = task.get("prompt", "").strip()
         if not prompt:
@@ -71,14 +100,52 @@ def _process_one_task(task_idx: int, task: dict,
 
         result["prompt"] = prompt
 
+        cache_key = None
+        if use_cache:
+            cache_key = request_key("veo3:video", {
+                "model": custom_model or model, "prompt": prompt, "aspect_ratio": aspect_ratio,
+                "image_urls": image_urls if task_type == "image2video" else "",
+                "enhance_prompt": enhance, "enable_upsample": upsample, "api_base": api_base,
+            })
+            cached = ResultCache().get(cache_key)
+            if cached and cached["files"]:
+                comfy_root = Path(__file__).parent.parent.parent.parent.parent
+                local = str(Path(cached["files"][0]).relative_to(comfy_root))
+                result.update(status="completed", video_url=cached["urls"][0] if cached["urls"] else "",
+                              local_path=local, task_id=cached["meta"].get("task_id", ""))
+                print(f"[VeoCSVConcurrent] [{task_idx}] 命中结果缓存，跳过生成 ({local})")
+                if state_manager:
+                    state_manager.update_task(task_idx, "completed", prompt=prompt,
+                                              video_url=result["video_url"], local_path=local)
+                return result
+
+        journal = JobJournal() if journal_key else None
+        entry = journal.get(journal_key, task_idx) if (journal and resume) else None
+        if entry and entry["status"] == "failed":
+            entry = None
+        if entry and entry["status"] == "downloaded":
+            comfy_root = Path(__file__).parent.parent.parent.parent.parent
+            local = entry["info"].get("local_path", "")
+            if local and (comfy_root / local).exists():
+                result.update(task_id=entry["task_id"], status="completed",
+                              video_url=entry["info"].get("video_url", ""), local_path=local)
+                print(f"[VeoCSVConcurrent] [{task_idx}] 续跑：已下载，跳过 ({local})")
+                if state_manager:
+                    state_manager.update_task(task_idx, "completed", prompt=prompt,
+                                              video_url=result["video_url"], local_path=local)
+                return result
+
         # 更新状态：开始处理
         if state_manager:
-            state_manager.update_task(task_idx, "processing", prompt=prompt)
+            state_manager.update_task(task_idx, "processing", prompt=prompt, model=custom_model or model)
             state_manager.add_log(task_idx, "INFO", f"开始处理任务 (model={model})")
 
-        # 1. 提交任务
+        # 1. 提交任务（续跑时沿用日志中的 task_id）
         # create() 返回 (task_id, status, status_update_time)
-        if task_type == "image2video" and image_urls:
+        if entry:
+            task_id, status = entry["task_id"], entry["status"]
+            print(f"[VeoCSVConcurrent] [{task_idx}] 续跑：沿用已提交的 task_id={task_id}")
+        elif task_type == "image2video" and image_urls:
             creator = _VeoImage2Video()
             task_id, status, _ = creator.create(
                 prompt=prompt, model=model, aspect_ratio=aspect_ratio,
@@ -94,6 +161,11 @@ def _process_one_task(task_idx: int, task: dict,
                 api_base=api_base, api_key=api_key, custom_model=custom_model,
             )
 
+        if journal and not entry:
+            journal.record_submit(journal_key, task_idx, "veo3", task_id,
+                                  {"prompt": prompt, "model": custom_model or model,
+                                   "output_prefix": output_prefix})
+
         result["task_id"] = task_id
         result["status"] = status
         print(f"[VeoCSVConcurrent] [{task_idx}] 已提交 task_id={task_id}")
@@ -102,53 +174,61 @@ def _process_one_task(task_idx: int, task: dict,
             state_manager.update_task(task_idx, "processing", task_id=task_id)
             state_manager.add_log(task_idx, "INFO", f"任务已提交 task_id={task_id}")
 
-        # 2. 轮询直到完成
+        # 2. 轮询直到完成（由共享轮询引擎调度，失败/超时以异常上抛）
         # VeoQueryTask.query(wait=False) → 单次查询，返回 (status, video_url, enhanced_prompt, raw_json)
         querier = _VeoQueryTask()
-        elapsed = 0
-        while elapsed < max_wait_time:
-            time.sleep(poll_interval)
-            elapsed += poll_interval
-            try:
-                status, video_url, _, _ = querier.query(
-                    task_id=task_id, api_base=api_base, api_key=api_key, wait=False
-                )
-                result["status"] = status
-                if status == "completed" and video_url:
-                    result["video_url"] = video_url
-                    print(f"[VeoCSVConcurrent] [{task_idx}] 完成，下载中...")
-
-                    if state_manager:
-                        state_manager.add_log(task_idx, "INFO", f"生成完成，开始下载视频")
-
-                    local = _download(video_url, save_dir, output_prefix, download_timeout)
-                    result["local_path"] = local
-
-                    if state_manager:
-                        state_manager.update_task(task_idx, "completed",
-                                                video_url=video_url, local_path=local)
-                        state_manager.add_log(task_idx, "INFO", f"下载完成: {local}")
-
-                    return result
-                print(f"[VeoCSVConcurrent] [{task_idx}] 进行中 {elapsed}/{max_wait_time}s")
-            except RuntimeError:
-                raise  # 任务失败，停止轮询
-            except Exception as e:
-                print(f"[VeoCSVConcurrent] [{task_idx}] 查询出错（继续重试）: {e}")
-
-        raise RuntimeError(f"超时 ({max_wait_time}s)")
 
-    except Exception as e:
-        result["error"] = str(e)
-        result["status"] = "failed"
-        print(f"[VeoCSVConcurrent] [{task_idx}] ✗ {e}")
+        def _query():
+            return querier.query(task_id=task_id, api_base=api_base, api_key=api_key, wait=False)
+
+        def _check(elapsed, queried):
+            status, video_url, _, _ = queried
+            if journal and status != result["status"]:
+                journal.update(journal_key, task_idx, status)
+            result["status"] = status
+            if status == "completed" and video_url:
+                return True, video_url
+            print(f"[VeoCSVConcurrent] [{task_idx}] 进行中 {elapsed}/{max_wait_time}s")
+            return False, None
+
+        if entry and entry["status"] == "completed" and entry["info"].get("video_url"):
+            video_url = entry["info"]["video_url"]
+        else:
+            video_url = PollEngine().wait(_query, _check, poll_interval, max_wait_time, key=f"veo3:{task_id}",
+                                          profile=timing_profile("veo3", custom_model or model))
+        result["video_url"] = video_url
+        if journal:
+            journal.update(journal_key, task_idx, "completed", info={"video_url": video_url})
+        print(f"[VeoCSVConcurrent] [{task_idx}] 完成，下载中...")
 
         if state_manager:
-            state_manager.update_task(task_idx, "failed", error=str(e))
-            state_manager.add_log(task_idx, "ERROR", f"任务失败: {str(e)}")
+            state_manager.update_task(task_idx, "processing", video_url=video_url)
+            state_manager.add_log(task_idx, "INFO", f"生成完成，开始下载视频")
+
+        # 下载交给独立的下载队列：工作线程立即返回，不因 CDN 传输慢而占住并发名额
+        def _download_stage():
+            try:
+                local = _download(video_url, save_dir, output_prefix, download_timeout)
+                result["local_path"] = local
+                if journal and local:
+                    journal.update(journal_key, task_idx, "downloaded", detail=local, info={"local_path": local})
+                if cache_key and local:
+                    ResultCache().put(cache_key, urls=[video_url], files=[local], meta={"task_id": task_id})
+
+                if state_manager:
+                    state_manager.update_task(task_idx, "completed",
+                                            video_url=video_url, local_path=local)
+                    state_manager.add_log(task_idx, "INFO", f"下载完成: {local}")
+            except Exception as e:
+                _fail(e)
+            return result
 
+        result["download"] = DownloadQueue().submit(_download_stage)
         return result
 
+    except Exception as e:
+        return _fail(e)
+
 
 # ─────────────────────────────────────────────
 # 节点
@@ -182,7 +262,7 @@ class VeoCSVConcurrentProcessor:
                 }),
                 "batch_size": ("INT", {
                     "default": 10, "min": 1, "max": 20,
-                    "tooltip": "每批并发任务数（建议 5-10）"
+                    "tooltip": "同时进行的任务数（建议 5-10，任一任务结束立即补位）"
                 }),
                 "default_model": ([
                     "veo_3_1-fast",
@@ -206,6 +286,12 @@ class VeoCSVConcurrentProcessor:
                                           "tooltip": "单任务最大等待时间（秒）"}),
                 "poll_interval": ("INT", {"default": 15, "min": 5, "max": 60}),
                 "download_timeout": ("INT", {"default": 1800, "min": 30, "max": 9999}),
+                "resume": ("BOOLEAN", {"default": False,
+                                       "tooltip": "断点续跑：同一份任务重新执行时，沿用任务日志中已提交的任务ID只轮询/下载，不重复提交"}),
+                "use_cache": ("BOOLEAN", {"default": False,
+                                          "tooltip": "参数完全相同且本地视频仍在的任务直接复用上次的结果，不再调用接口"}),
+                "async_mode": ("BOOLEAN", {"default": False,
+                                           "tooltip": "后台运行：立即返回作业句柄，不占用执行队列；下游用「⏳ 等待后台作业」节点获取结果"}),
             }
         }
 
@@ -224,6 +310,9 @@ class VeoCSVConcurrentProcessor:
             "max_wait_time": "最大等待时间",
             "poll_interval": "轮询间隔",
             "download_timeout": "下载超时",
+            "resume": "断点续跑",
+            "use_cache": "使用结果缓存",
+            "async_mode": "后台运行",
         }
 
     RETURN_TYPES = ("STRING", "STRING", "STRING")
@@ -231,60 +320,84 @@ class VeoCSVConcurrentProcessor:
     FUNCTION = "process"
     CATEGORY = "KuAi/Veo3"
 
+    @background_capable()
     def process(self, batch_tasks, api_key,
                 save_dir="output/veo3", batch_size=10,
                 default_model="veo_3_1-fast", default_aspect_ratio="9:16",
                 default_enhance_prompt=True, default_enable_upsample=True,
                 api_base="https://api.kegeai.top",
-                max_wait_time=1200, poll_interval=15, download_timeout=180):
+                max_wait_time=1200, poll_interval=15, download_timeout=180, resume=False,
+                use_cache=False, session_id=""):
 
         api_key = env_or(api_key, "KUAI_API_KEY")
         if not api_key:
             raise RuntimeError("API Key 未配置")
 
-        tasks = json.loads(batch_tasks)
-        if not tasks:
+        source = TaskSource.from_input(batch_tasks)
+        if source.total == 0:
             raise RuntimeError("任务列表为空")
 
-        total = len(tasks)
+        # 流式任务源在读完之前总数未知，边读边更新
+        total = source.total
         all_results = []
 
-        # 初始化状态管理器
-        state_manager = BatchProcessState()
-        session_id = f"veo3_csv_{int(time.time())}"
-        state_manager.start_session(session_id, total)
+        # 初始化状态管理器（每次执行独立会话，与同时运行的其他批量节点互不干扰）
+        state_manager = BatchProcessState().start_session(session_id or f"veo3_csv_{int(time.time())}", total or 0)
+        session_id = state_manager.session_id
+        journal_key = journal_batch_key("veo3_csv", source.fingerprint, save_dir)
 
         print(f"\n{'='*60}")
-        print(f"[VeoCSVConcurrent] 共 {total} 个任务，每批 {batch_size} 路并发")
+        print(f"[VeoCSVConcurrent] 共 {total if total is not None else '?（流式读取）'} 个任务，滑动窗口 {batch_size} 路并发")
         print(f"[VeoCSVConcurrent] 保存目录: {save_dir}")
         print(f"[VeoCSVConcurrent] 会话ID: {session_id}")
+        print(f"[VeoCSVConcurrent] 任务日志: {journal_key}{'（断点续跑）' if resume else ''}")
         print(f"{'='*60}\n")
 
-        # 按 batch_size 分批并发处理
-        for batch_start in range(0, total, batch_size):
-            batch = tasks[batch_start: batch_start + batch_size]
-            batch_num = batch_start // batch_size + 1
-            total_batches = (total + batch_size - 1) // batch_size
-            print(f"\n[VeoCSVConcurrent] 批次 {batch_num}/{total_batches}：提交 {len(batch)} 个任务")
-
-            with concurrent.futures.ThreadPoolExecutor(max_workers=len(batch)) as executor:
-                future_map = {}
-                for local_i, task in enumerate(batch):
-                    global_idx = batch_start + local_i + 1
-                    future = executor.submit(
-                        _process_one_task,
-                        global_idx, task,
-                        default_model, default_aspect_ratio,
-                        default_enhance_prompt, default_enable_upsample,
-                        api_key, api_base, save_dir, max_wait_time,
-                        poll_interval, download_timeout,
-                        state_manager  # 传递状态管理器
-                    )
-                    future_map[future] = global_idx
-
-                for future in concurrent.futures.as_completed(future_map):
-                    result = future.result()
-                    all_results.append(result)
+        http_transport.ensure_pool_size(batch_size)
+        # 批量重试范围：汇总各任务的重试次数与原因（每个任务另有独立预算）
+        batch_retry = RetryScope()
+        downloads = []
+
+        process_one = bind_task(_process_one_task, batch_retry)
+
+        def _numbered():
+            """按窗口大小分块读取任务（流式任务源每次只读入一块），边读边登记总数"""
+            count = 0
+            for chunk in source.chunks(batch_size):
+                if total is None:
+                    state_manager.set_total(count + len(chunk))
+                for task in chunk:
+                    count += 1
+                    yield count, task
+
+        def _run(item):
+            idx, task = item
+            return process_one(
+                idx, task,
+                default_model, default_aspect_ratio,
+                default_enhance_prompt, default_enable_upsample,
+                api_key, api_base, save_dir, max_wait_time,
+                poll_interval, download_timeout,
+                state_manager,  # 传递状态管理器
+                journal_key, resume, use_cache,
+            )
+
+        # 滑动窗口：始终保持 batch_size 个任务在途，任一任务结束立即补位（不再等待整批最慢的任务）
+        window = SlidingWindow(min(batch_size, total) if total else batch_size)
+        for _, future in window.run(_run, _numbered()):
+            result = future.result()  # _process_one_task 内部不抛出，总是返回 dict
+            if "download" in result:
+                downloads.append(result.pop("download"))
+            all_results.append(result)
+            print(f"[VeoCSVConcurrent] 进度 {len(all_results)}/{total if total is not None else '?'}")
+
+        # 后续任务的提交不等待已完成任务的下载；报告前等待下载队列完成全部下载
+        concurrent.futures.wait(downloads)
+
+        if total is None:
+            total = len(all_results)
+            if not total:
+                raise RuntimeError("任务列表为空")
 
         # 生成报告
         success = [r for r in all_results if r.get("status") == "completed"]
@@ -294,6 +407,8 @@ class VeoCSVConcurrentProcessor:
             f"\n{'='*60}",
             f"Veo3 CSV 并发处理完成",
             f"总计: {total}  成功: {len(success)}  失败: {len(failed)}",
+            f"网络重试: {batch_retry.summary()}",
+            f"并发利用率: {window.summary()}",
             f"保存目录: {save_dir}",
             f"{'='*60}",
         ]
@@ -317,6 +432,8 @@ class VeoCSVConcurrentProcessor:
             "total": total,
             "success": len(success),
             "failed": len(failed),
+            "retry": batch_retry.to_dict(),
+            "window": window.to_dict(),
             "tasks": [
                 {
                     "idx": r["task_idx"],
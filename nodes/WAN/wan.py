@@ -2,7 +2,6 @@
 
 import json
 import time
-import requests
 
 from ..Sora2.kuai_utils import (
     env_or,
@@ -10,6 +9,7 @@ from ..Sora2.kuai_utils import (
     extract_error_message_from_response,
     extract_task_failure_detail,
 )
+from ..Utils import http_transport
 
 
 class WanCreateAndWait:
@@ -148,7 +148,7 @@ class WanCreateAndWait:
 
     def _create_task(self, api_base, api_key, payload):
         endpoint = f"{api_base.rstrip('/')}/alibailian/api/v1/services/aigc/video-generation/video-synthesis"
-        resp = requests.post(endpoint, json=payload, headers=http_headers_auth_only(api_key), timeout=60)
+        resp = http_transport.post(endpoint, json=payload, headers=http_headers_auth_only(api_key), timeout=60)
 
         if resp.status_code >= 400:
             detail = extract_error_message_from_response(resp)
@@ -166,7 +166,7 @@ class WanCreateAndWait:
 
     def _query_task(self, api_base, api_key, task_id):
         endpoint = f"{api_base.rstrip('/')}/alibailian/api/v1/tasks/{task_id}"
-        resp = requests.get(endpoint, headers=http_headers_auth_only(api_key), timeout=60)
+        resp = http_transport.get(endpoint, headers=http_headers_auth_only(api_key), timeout=60)
 
         if resp.status_code >= 400:
             detail = extract_error_message_from_response(resp)
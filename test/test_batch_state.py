@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""测试批量处理状态管理（索引存储 + 增量日志）"""
+
+import json
+import os
+import sys
+import threading
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from nodes.Utils import batch_state
+from nodes.Utils.batch_state import BatchProcessState
+
+
+@pytest.fixture
+def state(tmp_path):
+    """隔离的状态管理器：状态文件指向临时目录"""
+    manager = BatchProcessState()
+    with patch.object(manager, "state_file", tmp_path / "state.jsonl"):
+        manager.clear_state()
+        yield manager
+        manager.clear_state()
+
+
+def test_counters_follow_transitions(state):
+    """状态切换时计数器增减正确，未知字段被忽略"""
+    state.start_session("s1", 3)
+    state.update_task(1, "processing", prompt="a", bogus="x")
+    state.update_task(2, "processing", prompt="b")
+    state.update_task(1, "completed", local_path="out/1.mp4")
+    state.update_task(2, "failed", error="boom")
+    state.update_task(2, "processing")
+
+    snap = state.get_state()
+    assert (snap["completed"], snap["failed"], snap["processing"]) == (1, 0, 1)
+    tasks = {t["idx"]: t for t in snap["tasks"]}
+    assert tasks[1]["local_path"] == "out/1.mp4" and "bogus" not in tasks[1]
+    assert tasks[2]["error"] == "boom"
+
+
+def test_writes_are_batched_and_replayable(state):
+    """多次变更合并为一次追加写入，重放增量日志可恢复相同状态"""
+    with patch.object(batch_state, "FLUSH_INTERVAL", 60):
+        state.start_session("s2", 2)
+        for i in range(50):
+            state.update_task(1 + i % 2, "processing", prompt=f"p{i}")
+            state.add_log(1, "INFO", f"log {i}", max_logs=10)
+        assert not state.state_file.exists()
+        state.flush()
+
+    lines = state.state_file.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 101 and json.loads(lines[0])["op"] == "start"
+
+    expected = state.get_state()
+    assert len(expected["logs"]) == 10
+    with open(state.state_file, "r", encoding="utf-8") as f:
+        restored = batch_state.replay_sessions(f)["s2"].snapshot()
+    assert restored["tasks"] == expected["tasks"]
+    assert restored["processing"] == 2 and restored["session_id"] == "s2"
+
+
+def test_get_state_recovers_from_disk_without_session(state):
+    """当前进程没有活动会话时从增量日志恢复上次的状态"""
+    state.start_session("s3", 1)
+    state.update_task(1, "completed", prompt="x")
+    state.flush()
+
+    state._sessions, state._latest = {}, ""
+    snap = state.get_state()
+    assert snap["session_id"] == "s3" and snap["completed"] == 1
+
+
+def test_concurrent_updates_are_consistent(state):
+    """多线程并发更新后计数器与任务表一致"""
+    state.start_session("s4", 400)
+
+    def _worker(offset):
+        for i in range(offset, offset + 100):
+            state.update_task(i, "processing")
+            state.update_task(i, "completed" if i % 3 else "failed")
+
+    threads = [threading.Thread(target=_worker, args=(n * 100,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    snap = state.get_state()
+    assert len(snap["tasks"]) == 400 and snap["processing"] == 0
+    assert snap["completed"] + snap["failed"] == 400
+    assert snap["failed"] == len([i for i in range(400) if i % 3 == 0])
+
+
+def test_flush_while_updating_does_not_deadlock(state):
+    """写入线程（先取 _flush_lock）与更新线程（先取 _state_lock）并发时不会互相等待"""
+    state.start_session("s_flush", 200)
+    stop = threading.Event()
+
+    def _flusher():
+        while not stop.is_set():
+            state.flush()
+
+    def _updater():
+        for i in range(200):
+            state.update_task(i + 1, "processing", prompt=f"p{i}")
+
+    flusher = threading.Thread(target=_flusher, daemon=True)
+    updater = threading.Thread(target=_updater, daemon=True)
+    flusher.start()
+    updater.start()
+    updater.join(timeout=10)
+    stop.set()
+    flusher.join(timeout=10)
+    assert not updater.is_alive() and not flusher.is_alive()
+    assert state.get_state()["processing"] == 200
+
+
+def test_sessions_are_isolated(state):
+    """两个批量节点同时运行时各自的计数器与任务表互不覆盖"""
+    grok = state.start_session("grok_1", 2)
+    veo = state.start_session("veo3_csv_1", 3)
+    grok.update_task(1, "completed", prompt="g")
+    veo.update_task(1, "failed", error="x")
+    veo.update_task(2, "processing")
+    grok.add_log(1, "INFO", "grok log")
+
+    g, v = state.get_state("grok_1"), state.get_state("veo3_csv_1")
+    assert (g["completed"], g["failed"], len(g["tasks"])) == (1, 0, 1)
+    assert (v["completed"], v["failed"], v["processing"]) == (0, 1, 1)
+    assert [l["message"] for l in g["logs"]] == ["grok log"] and v["logs"] == []
+    assert [s["session_id"] for s in state.get_sessions()] == ["veo3_csv_1", "grok_1"]
+    assert state.get_state()["session_id"] == "veo3_csv_1"
+
+
+def test_duplicate_running_session_id_gets_suffix(state):
+    """同名会话仍在运行时自动追加序号"""
+    a = state.start_session("grok_1", 1)
+    b = state.start_session("grok_1", 1)
+    assert (a.session_id, b.session_id) == ("grok_1", "grok_1_2")
+
+
+def test_closed_session_id_is_reused(state):
+    """关闭的会话视为已结束（即使仍有处理中的任务），同名会话直接复用名称；关闭状态可重放"""
+    a = state.start_session("hot", 0)
+    a.update_task(1, "processing")
+    a.close()
+    state.flush()
+    with open(state.state_file, "r", encoding="utf-8") as f:
+        assert batch_state.replay_sessions(f)["hot"].finished
+    assert state.start_session("hot", 1).session_id == "hot"
+
+
+def test_multiple_sessions_survive_replay(state):
+    """新会话开始时重写增量日志，其余会话以快照保留，重放后全部恢复"""
+    with patch.object(batch_state, "FLUSH_INTERVAL", 60):
+        first = state.start_session("a", 2)
+        first.update_task(1, "completed")
+        second = state.start_session("b", 1)
+        first.update_task(2, "processing")
+        second.update_task(1, "failed", error="e")
+        state.flush()
+
+    with open(state.state_file, "r", encoding="utf-8") as f:
+        restored = batch_state.replay_sessions(f)
+    assert list(restored) == ["a", "b"]
+    assert (restored["a"].counts["completed"], restored["a"].counts["processing"]) == (1, 1)
+    assert restored["b"].counts["failed"] == 1
+
+
+def test_monitor_shows_one_or_all_sessions(state):
+    """监控节点可显示指定会话或全部会话"""
+    from nodes.Utils.batch_monitor import BatchProcessMonitor
+
+    state.start_session("grok_9", 1).update_task(1, "processing", prompt="grok prompt")
+    state.start_session("veo3_csv_9", 1).update_task(1, "processing", prompt="veo prompt")
+
+    all_log = BatchProcessMonitor().monitor()["result"][0]
+    assert "grok_9" in all_log and "veo3_csv_9" in all_log
+    one_log = BatchProcessMonitor().monitor(session_id="grok_9")["result"][0]
+    assert "grok prompt" in one_log and "veo prompt" not in one_log
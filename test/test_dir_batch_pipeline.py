@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""测试目录批量节点的流水线：上传完成即提交生成，不等待全部上传结束"""
+
+import os
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from nodes.Grok import dir_batch_image2video as grok_dir
+from nodes.Veo3 import dir_batch_image2video as veo_dir
+
+
+@pytest.fixture
+def image_dir(tmp_path):
+    for i in range(1, 5):
+        (tmp_path / f"{i}.png").write_bytes(b"png")
+    return tmp_path
+
+
+def _fake_process(events, lock):
+    def _process(task_idx, image_url, *args, **kwargs):
+        with lock:
+            events.append(("submit", task_idx, time.monotonic()))
+        return {"idx": task_idx, "prompt": "", "status": "completed",
+                "video_url": f"{image_url}.mp4", "local_path": f"out/{task_idx}.mp4", "error": ""}
+    return _process
+
+
+@pytest.mark.parametrize("module, node_cls", [
+    (grok_dir, grok_dir.GrokDirBatchImage2Video),
+    (veo_dir, veo_dir.VeoDirBatchImage2Video),
+])
+def test_generation_starts_before_all_uploads_finish(module, node_cls, image_dir):
+    events, lock = [], threading.Lock()
+
+    def _upload(path, *args):
+        time.sleep(0.1)
+        if path.stem == "3":
+            raise RuntimeError("bad image")
+        with lock:
+            events.append(("uploaded", int(path.stem), time.monotonic()))
+        return f"https://cdn.example.com/{path.stem}"
+
+    with patch.object(module, "_upload_one", side_effect=_upload), \
+            patch.object(module, "_process_one", side_effect=_fake_process(events, lock)):
+        report, _ = node_cls().run(str(image_dir), "prompt", "key", batch_size=2, upload_workers=1)
+
+    first_submit = min(t for kind, _, t in events if kind == "submit")
+    last_upload = max(t for kind, _, t in events if kind == "uploaded")
+    assert first_submit < last_upload
+    assert sorted(i for kind, i, _ in events if kind == "submit") == [1, 2, 4]
+    assert "上传成功: 3" in report and "[3] 3.png: bad image" in report
+
+
+def test_all_uploads_failing_still_raises(image_dir):
+    with patch.object(grok_dir, "_upload_one", side_effect=RuntimeError("down")), \
+            patch.object(grok_dir, "_process_one") as process:
+        with pytest.raises(RuntimeError, match="所有图片上传失败"):
+            grok_dir.GrokDirBatchImage2Video().run(str(image_dir), "prompt", "key")
+    process.assert_not_called()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""测试目录清单（增量处理）、目录监视与滑动窗口的 WAIT 支持"""
+
+import os
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from nodes.Grok import dir_batch_image2video as grok_dir
+from nodes.Utils.download_queue import DownloadQueue
+from nodes.Utils.dir_manifest import DirManifest, MANIFEST_NAME, params_key, watch_new_files
+from nodes.Utils.sliding_window import SlidingWindow, WAIT
+
+
+def _images(directory, *names):
+    paths = []
+    for name in names:
+        path = directory / name
+        path.write_bytes(name.encode())
+        paths.append(path)
+    return paths
+
+
+def test_pending_skips_completed_and_persists(tmp_path):
+    a, b = _images(tmp_path, "1.png", "2.png")
+    output = tmp_path / "out.mp4"
+    output.write_bytes(b"mp4")
+    key = params_key(provider="grok", prompt="p")
+
+    manifest = DirManifest(tmp_path)
+    assert manifest.pending([a, b], key) == [a, b]
+    manifest.record_upload(a, "https://cdn.example.com/1")
+    manifest.record_result(a, key, task_id="t1", output=str(output), status="completed")
+    manifest.record_result(b, key, task_id="t2", status="failed", error="timeout")
+
+    reloaded = DirManifest(tmp_path)
+    assert (tmp_path / MANIFEST_NAME).exists()
+    assert reloaded.pending([a, b], key) == [b]
+    assert reloaded.get(a)["url"] == "https://cdn.example.com/1"
+    # 参数变化时需要重新生成
+    assert reloaded.pending([a], params_key(provider="grok", prompt="other")) == [a]
+
+
+def test_changed_content_or_missing_output_is_reprocessed(tmp_path):
+    (a,) = _images(tmp_path, "1.png")
+    output = tmp_path / "out.mp4"
+    output.write_bytes(b"mp4")
+    manifest = DirManifest(tmp_path)
+    manifest.record_result(a, "k", output=str(output), status="completed")
+    assert manifest.pending([a], "k") == []
+
+    a.write_bytes(b"new content")
+    assert manifest.pending([a], "k") == [a]
+    assert manifest.get(a)["runs"] == {}
+
+    manifest.record_result(a, "k", output=str(output), status="completed")
+    output.unlink()
+    assert manifest.pending([a], "k") == [a]
+
+
+def test_watch_yields_new_files_once_written_and_stops_when_idle(tmp_path):
+    (existing,) = _images(tmp_path, "1.png")
+    list_files = lambda: sorted(tmp_path.glob("*.png"))
+    watcher = watch_new_files(list_files, [existing], lambda p: p.name != "skip.png",
+                              idle_seconds=0.3, settle_seconds=0.05)
+
+    def _drop():
+        time.sleep(0.1)
+        _images(tmp_path, "2.png", "skip.png")
+
+    threading.Thread(target=_drop).start()
+    found = []
+    for item in watcher:
+        if item is WAIT:
+            time.sleep(0.02)
+        else:
+            found.append(item.name)
+    assert found == ["2.png"]
+
+
+def test_window_keeps_collecting_while_source_waits():
+    """任务源产出 WAIT 时窗口不阻塞读取：在途任务照常完成并产出结果"""
+    def _items():
+        yield 1
+        for _ in range(3):
+            yield WAIT
+        yield 2
+
+    window = SlidingWindow(2)
+    results, waits = [], 0
+    for item, future in window.run(lambda i: i * 10, _items(), poll_interval=0.01):
+        if future is None:
+            waits += 1
+        else:
+            results.append(future.result())
+    assert sorted(results) == [10, 20] and waits >= 1
+
+
+def test_results_are_recorded_before_node_returns(tmp_path):
+    """下载结束时的结果记录在节点返回前完成：立即重新运行不会重复生成"""
+    image_dir = tmp_path / "images"
+    image_dir.mkdir()
+    _images(image_dir, "1.png", "2.png", "3.png")
+    processed = []
+
+    def _process(task_idx, image_url, *args, on_downloaded=None):
+        processed.append(image_url)
+        result = {"idx": task_idx, "prompt": "", "status": "completed", "task_id": f"t{task_idx}",
+                  "video_url": f"{image_url}.mp4", "local_path": "", "error": ""}
+
+        def _download_stage():
+            output = tmp_path / f"{task_idx}.mp4"
+            output.write_bytes(b"mp4")
+            result["local_path"] = str(output)
+            time.sleep(0.05)
+            on_downloaded(result)
+            return result
+
+        result["download"] = DownloadQueue().submit(_download_stage)
+        return result
+
+    with patch.object(grok_dir, "_upload_one", side_effect=lambda p, *a: f"https://cdn.example.com/{p.stem}"), \
+            patch.object(grok_dir, "_process_one", side_effect=_process):
+        grok_dir.GrokDirBatchImage2Video().run(str(image_dir), "prompt", "key")
+        assert len(processed) == 3
+        report = grok_dir.GrokDirBatchImage2Video().run(str(image_dir), "prompt", "key")[0]
+    assert len(processed) == 3 and "跳过(已处理): 3" in report
+
+
+def test_dir_node_rerun_only_processes_new_images(tmp_path):
+    image_dir = tmp_path / "images"
+    image_dir.mkdir()
+    _images(image_dir, "1.png", "2.png")
+    processed = []
+
+    def _process(task_idx, image_url, *args, **kwargs):
+        output = tmp_path / f"{image_url.rsplit('/', 1)[-1]}.mp4"
+        output.write_bytes(b"mp4")
+        processed.append(image_url)
+        return {"idx": task_idx, "prompt": "", "status": "completed", "task_id": f"t{task_idx}",
+                "video_url": f"{image_url}.mp4", "local_path": str(output), "error": ""}
+
+    def _run():
+        return grok_dir.GrokDirBatchImage2Video().run(str(image_dir), "prompt", "key")[0]
+
+    with patch.object(grok_dir, "_upload_one", side_effect=lambda p, *a: f"https://cdn.example.com/{p.stem}"), \
+            patch.object(grok_dir, "_process_one", side_effect=_process):
+        _run()
+        assert sorted(processed) == ["https://cdn.example.com/1", "https://cdn.example.com/2"]
+
+        processed.clear()
+        report = _run()
+        assert processed == [] and "跳过(已处理): 2" in report
+
+        _images(image_dir, "3.png")
+        report = _run()
+        assert processed == ["https://cdn.example.com/3"] and "跳过(已处理): 2" in report
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""测试共享下载引擎（断点续传、分段并行、原子替换与校验）"""
+
+import base64
+import hashlib
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from nodes.Utils import download_engine
+from nodes.Utils.download_engine import download_file
+
+PAYLOAD = os.urandom(3 * 1024 * 1024 + 123)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """支持 Range 的测试服务器；drop_after 指定在发送多少字节后断开（仅一次，跳过前 drop_skip 个请求）"""
+
+    server_version = "KuAiTest"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        srv = self.server
+        srv.requests.append(self.headers.get("Range"))
+        data = srv.payload
+        start, end = 0, len(data) - 1
+        rng = self.headers.get("Range")
+        if rng and srv.ranges:
+            first, _, last = rng.split("=", 1)[1].partition("-")
+            start, end = int(first), int(last) if last else len(data) - 1
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+        else:
+            self.send_response(200)
+        body = data[start:end + 1]
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", '"v1"')
+        for k, v in srv.extra_headers.items():
+            self.send_header(k, v)
+        self.end_headers()
+        if srv.drop_skip:
+            srv.drop_skip -= 1
+        elif srv.drop_after is not None and len(body) > srv.drop_after:
+            limit, srv.drop_after = srv.drop_after, None
+            self.wfile.write(body[:limit])
+            self.wfile.flush()
+            self.close_connection = True
+            self.connection.shutdown(2)
+            return
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    srv.payload, srv.ranges, srv.drop_after, srv.extra_headers, srv.requests = PAYLOAD, True, None, {}, []
+    srv.drop_skip = 0
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    srv.url = f"http://127.0.0.1:{srv.server_address[1]}/video.mp4"
+    with patch.object(download_engine.time, "sleep"):
+        yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_small_file_single_stream(server, tmp_path):
+    dest = download_file(server.url, tmp_path / "a.mp4", timeout=10)
+    assert dest.read_bytes() == PAYLOAD
+    assert not (tmp_path / "a.mp4.part").exists() and not (tmp_path / "a.mp4.part.json").exists()
+
+
+def test_large_file_downloads_in_parallel_segments(server, tmp_path):
+    """大文件拆成多个 Range 分段并行下载"""
+    with patch.object(download_engine, "PARALLEL_THRESHOLD", 1024 * 1024), \
+            patch.object(download_engine, "MIN_SEGMENT_SIZE", 512 * 1024):
+        dest = download_file(server.url, tmp_path / "b.mp4", timeout=10, segments=4)
+    assert dest.read_bytes() == PAYLOAD
+    assert len([r for r in server.requests if r and r != "bytes=0-"]) == 4
+
+
+def test_interrupted_stream_resumes_from_offset(server, tmp_path):
+    """连接中途断开后带 Range 续传，而不是从头下载"""
+    server.drop_after = 1024 * 1024
+    dest = download_file(server.url, tmp_path / "c.mp4", timeout=10)
+    assert dest.read_bytes() == PAYLOAD
+    assert server.requests[-1] == f"bytes={1024 * 1024}-"
+
+
+def test_interrupted_segment_resumes(server, tmp_path):
+    server.drop_after, server.drop_skip = 100 * 1024, 1
+    with patch.object(download_engine, "PARALLEL_THRESHOLD", 1024 * 1024), \
+            patch.object(download_engine, "MIN_SEGMENT_SIZE", 512 * 1024):
+        dest = download_file(server.url, tmp_path / "d.mp4", timeout=10, segments=2)
+    assert dest.read_bytes() == PAYLOAD
+    assert len(server.requests) == 4  # 探测 + 2 段 + 1 次续传
+
+
+def test_leftover_part_file_is_resumed_across_runs(server, tmp_path):
+    """上次中断留下的临时文件在下次下载同一 URL 时续传"""
+    server.drop_after = 2 * 1024 * 1024
+    with patch.object(download_engine, "RESUME_ATTEMPTS", 0), pytest.raises(RuntimeError):
+        download_file(server.url, tmp_path / "e.mp4", timeout=10)
+    assert not (tmp_path / "e.mp4").exists()
+    assert (tmp_path / "e.mp4.part").stat().st_size == 2 * 1024 * 1024
+
+    dest = download_file(server.url, tmp_path / "e.mp4", timeout=10)
+    assert dest.read_bytes() == PAYLOAD
+    assert server.requests[-1] == f"bytes={2 * 1024 * 1024}-"
+
+
+class _Killed(BaseException):
+    """模拟进程被终止：不经过下载引擎的异常处理"""
+
+
+def test_killed_segmented_download_resumes_from_saved_progress(server, tmp_path):
+    """分段下载途中进程被终止，进度文件已定期保存，下次运行从各段断点继续而不是重下整段"""
+    consumed = []
+
+    def _consume(nbytes):
+        consumed.append(nbytes)
+        if sum(consumed) > 1024 * 1024:
+            raise _Killed()
+
+    with patch.object(download_engine, "PARALLEL_THRESHOLD", 1024 * 1024), \
+            patch.object(download_engine, "MIN_SEGMENT_SIZE", 512 * 1024), \
+            patch.object(download_engine, "CHUNK_SIZE", 64 * 1024), \
+            patch.object(download_engine, "PROGRESS_SAVE_BYTES", 128 * 1024):
+        with patch.object(download_engine.BandwidthLimiter, "consume", side_effect=_consume), \
+                pytest.raises(_Killed):
+            download_file(server.url, tmp_path / "k.mp4", timeout=10, segments=2)
+        assert not (tmp_path / "k.mp4").exists()
+
+        server.requests.clear()
+        dest = download_file(server.url, tmp_path / "k.mp4", timeout=10, segments=2)
+    assert dest.read_bytes() == PAYLOAD
+    starts = [int(r.split("=")[1].split("-")[0]) for r in server.requests if r != "bytes=0-"]
+    segment_starts = [s[0] for s in download_engine._plan_segments(len(PAYLOAD), 2)]
+    assert starts and all(start not in segment_starts for start in starts)
+
+
+def test_server_without_range_support(server, tmp_path):
+    server.ranges = False
+    server.drop_after = 1024 * 1024
+    dest = download_file(server.url, tmp_path / "f.mp4", timeout=10)
+    assert dest.read_bytes() == PAYLOAD
+
+
+def test_checksum_mismatch_leaves_no_file(server, tmp_path):
+    """校验和不符时不生成目标文件；服务端提供的 Content-MD5 会被自动校验"""
+    with pytest.raises(RuntimeError, match="校验和不符"):
+        download_file(server.url, tmp_path / "g.mp4", timeout=10, checksum="sha256:" + "0" * 64)
+    assert list(tmp_path.iterdir()) == []
+
+    server.extra_headers["Content-MD5"] = base64.b64encode(hashlib.md5(PAYLOAD).digest()).decode()
+    assert download_file(server.url, tmp_path / "g.mp4", timeout=10).read_bytes() == PAYLOAD
+    server.extra_headers["Content-MD5"] = base64.b64encode(hashlib.md5(b"x").digest()).decode()
+    with pytest.raises(RuntimeError, match="校验和不符"):
+        download_file(server.url, tmp_path / "h.mp4", timeout=10)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""测试下载队列（与轮询解耦、并发上限、背压与带宽上限）"""
+
+import os
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from nodes.Grok import csv_concurrent_processor as grok_csv
+from nodes.Utils import download_engine
+from nodes.Utils.download_engine import BandwidthLimiter
+from nodes.Utils.download_queue import DownloadQueue
+from nodes.Utils.retry_policy import current_scope, retry_scope
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    """每个测试使用新的队列实例：2 路下载，最多 3 个排队"""
+    monkeypatch.setenv("KUAI_DOWNLOAD_WORKERS", "2")
+    monkeypatch.setenv("KUAI_DOWNLOAD_QUEUE", "3")
+    DownloadQueue._instance = None
+    yield DownloadQueue()
+    DownloadQueue._instance = None
+
+
+def test_downloads_run_with_bounded_concurrency(queue):
+    running, peak, lock = [0], [0], threading.Lock()
+
+    def _slow(i):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        return i
+
+    futures = [queue.submit(_slow, i) for i in range(8)]
+    assert [f.result(timeout=5) for f in futures] == list(range(8))
+    assert peak[0] == 2
+    assert queue.pending_count == 0
+
+
+def test_full_queue_applies_backpressure(queue):
+    """排队数达到上限时提交方阻塞，直到有下载完成"""
+    release = threading.Event()
+    futures = [queue.submit(release.wait) for _ in range(3)]
+    blocked = threading.Thread(target=lambda: futures.append(queue.submit(lambda: "late")))
+    blocked.start()
+    blocked.join(0.2)
+    assert blocked.is_alive() and queue.pending_count == 3
+
+    release.set()
+    blocked.join(5)
+    assert not blocked.is_alive()
+    assert futures[-1].result(timeout=5) == "late"
+
+
+def test_download_runs_in_submitter_retry_scope(queue):
+    with retry_scope(5) as scope:
+        future = queue.submit(current_scope)
+    assert future.result(timeout=5) is scope
+
+
+def test_csv_worker_returns_before_download_finishes(queue):
+    """轮询完成后工作线程立即返回，下载在队列中完成后才补齐本地路径"""
+    release = threading.Event()
+
+    def _slow_download(video_url, save_dir, prefix, timeout):
+        release.wait(5)
+        return f"{save_dir}/{prefix}.mp4"
+
+    with patch.object(grok_csv._GrokCreateVideo, "create", return_value=("t1", "pending", None)), \
+            patch.object(grok_csv.PollEngine, "wait", return_value="https://cdn.example.com/v.mp4"), \
+            patch.object(grok_csv, "_download", side_effect=_slow_download):
+        result = grok_csv._process_one_task(
+            1, {"prompt": "a cat"}, "grok-video-3", "3:2", "720P", True,
+            "key", "https://api.example.com", "output/grok", 60, 1, 30)
+        assert result["video_url"] and result["local_path"] == ""
+
+        release.set()
+        assert result["download"].result(timeout=5) is result
+    assert result["local_path"] == "output/grok/grok_1.mp4"
+
+
+def test_bandwidth_limiter_throttles_after_burst():
+    limiter = BandwidthLimiter()
+    waits = []
+    try:
+        with patch.object(download_engine.time, "sleep", side_effect=waits.append):
+            limiter.set_rate(1024 * 1024)
+            limiter.consume(1024 * 1024)   # 桶内 1 秒的额度，不等待
+            limiter.consume(512 * 1024)
+        assert len(waits) == 1 and 0.4 < waits[0] <= 0.5
+
+        limiter.set_rate(0)
+        with patch.object(download_engine.time, "sleep") as sleep:
+            limiter.consume(100 * 1024 * 1024)
+        sleep.assert_not_called()
+    finally:
+        limiter.set_rate(download_engine._default_bandwidth() * 1024 * 1024)
@@ -74,7 +74,7 @@ def test_url_to_tensor():
     response.content = png_bytes
     response.raise_for_status = Mock()
 
-    with patch("nodes.GPTImage.gpt_image_2_all.requests.get", return_value=response) as mock_get:
+    with patch("nodes.GPTImage.gpt_image_2_all.http_transport.get", return_value=response) as mock_get:
         tensor = _url_to_tensor("https://example.com/image.png", timeout=30)
 
     mock_get.assert_called_once_with("https://example.com/image.png", timeout=30)
@@ -96,7 +96,7 @@ def test_generate_rejects_blank_prompt():
 
 
 @patch("nodes.GPTImage.gpt_image_2_all._url_to_tensor")
-@patch("nodes.GPTImage.gpt_image_2_all.requests.post")
+@patch("nodes.GPTImage.gpt_image_2_all.http_transport.post")
 def test_generate_posts_documented_payload(mock_post, mock_url_to_tensor):
     """Task 3: generate should post documented payload."""
     mock_resp = MagicMock()
@@ -132,7 +132,7 @@ def test_generate_posts_documented_payload(mock_post, mock_url_to_tensor):
 
 
 @patch("nodes.GPTImage.gpt_image_2_all._url_to_tensor")
-@patch("nodes.GPTImage.gpt_image_2_all.requests.post")
+@patch("nodes.GPTImage.gpt_image_2_all.http_transport.post")
 def test_edit_posts_documented_image_array(mock_post, mock_url_to_tensor):
     """Task 4: edit should post documented image array."""
     mock_resp = MagicMock()
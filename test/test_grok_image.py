@@ -52,7 +52,7 @@ def test_extract_image_url():
 
 
 @patch("nodes.GrokImage.grok_image._download_image_as_tensor")
-@patch("nodes.GrokImage.grok_image.requests.post")
+@patch("nodes.GrokImage.grok_image.http_transport.post")
 def test_generate_posts_documented_payload(mock_post, mock_download):
     mock_resp = MagicMock()
     mock_resp.status_code = 200
@@ -75,7 +75,7 @@ def test_generate_posts_documented_payload(mock_post, mock_download):
 
 
 @patch("nodes.GrokImage.grok_image._download_image_as_tensor")
-@patch("nodes.GrokImage.grok_image.requests.post")
+@patch("nodes.GrokImage.grok_image.http_transport.post")
 def test_edit_posts_documented_multipart_payload(mock_post, mock_download):
     mock_resp = MagicMock()
     mock_resp.status_code = 200
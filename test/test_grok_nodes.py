@@ -235,7 +235,7 @@ def test_extend_task_origin_not_exist_message():
         mock_resp.json.return_value = {"error": {"message": "task_origin_not_exist"}}
         mock_resp.text = "task_origin_not_exist"
 
-        with patch("nodes.Grok.grok.requests.post", return_value=mock_resp):
+        with patch("nodes.Grok.grok.http_transport.post", return_value=mock_resp):
             node = GrokExtendVideo()
             try:
                 node.create(
@@ -35,7 +35,7 @@ _ensure_package("nodes.Grok", os.path.join(_ROOT, "nodes", "Grok"))
 _module = _load_module("nodes.Grok.grok_videos", _GROK_VIDEOS_PY)
 
 
-@patch("nodes.Grok.grok_videos.requests.post")
+@patch("nodes.Grok.grok_videos.http_transport.post")
 def test_create_posts_documented_multipart_payload(mock_post):
     mock_resp = MagicMock()
     mock_resp.status_code = 200
@@ -66,7 +66,7 @@ def test_create_posts_documented_multipart_payload(mock_post):
     assert '"id": "task-1"' in raw
 
 
-@patch("nodes.Grok.grok_videos.requests.post")
+@patch("nodes.Grok.grok_videos.http_transport.post")
 def test_create_skips_empty_input_reference(mock_post):
     mock_resp = MagicMock()
     mock_resp.status_code = 200
@@ -87,7 +87,7 @@ def test_create_skips_empty_input_reference(mock_post):
     assert status == "processing"
 
 
-@patch("nodes.Grok.grok_videos.requests.get")
+@patch("nodes.Grok.grok_videos.http_transport.get")
 def test_query_returns_video_and_cover(mock_get):
     mock_resp = MagicMock()
     mock_resp.status_code = 200
@@ -111,7 +111,7 @@ def test_query_returns_video_and_cover(mock_get):
     assert task_id == "task-3"
 
 
-@patch("nodes.Grok.grok_videos.requests.get")
+@patch("nodes.Grok.grok_videos.http_transport.get")
 def test_query_raises_for_failed_task(mock_get):
     mock_resp = MagicMock()
     mock_resp.status_code = 200
@@ -127,7 +127,7 @@ def test_query_raises_for_failed_task(mock_get):
         assert "内容不合规" in str(exc)
 
 
-@patch("nodes.Grok.grok_videos.requests.get")
+@patch("nodes.Grok.grok_videos.http_transport.get")
 def test_query_raises_when_completed_without_video_url(mock_get):
     mock_resp = MagicMock()
     mock_resp.status_code = 200
@@ -143,8 +143,8 @@ def test_query_raises_when_completed_without_video_url(mock_get):
 
 
 @patch("nodes.Grok.grok_videos.time.sleep", return_value=None)
-@patch("nodes.Grok.grok_videos.requests.get")
-@patch("nodes.Grok.grok_videos.requests.post")
+@patch("nodes.Grok.grok_videos.http_transport.get")
+@patch("nodes.Grok.grok_videos.http_transport.post")
 def test_create_and_wait_polls_until_completed(mock_post, mock_get, _mock_sleep):
     create_resp = MagicMock()
     create_resp.status_code = 200
@@ -181,8 +181,8 @@ def test_create_and_wait_polls_until_completed(mock_post, mock_get, _mock_sleep)
 
 
 @patch("nodes.Grok.grok_videos.time.sleep", return_value=None)
-@patch("nodes.Grok.grok_videos.requests.get")
-@patch("nodes.Grok.grok_videos.requests.post")
+@patch("nodes.Grok.grok_videos.http_transport.get")
+@patch("nodes.Grok.grok_videos.http_transport.post")
 def test_create_and_wait_times_out(mock_post, mock_get, _mock_sleep):
     create_resp = MagicMock()
     create_resp.status_code = 200
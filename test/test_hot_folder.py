@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""测试热文件夹守护（目录变化触发作业、CSV 投递目录归档、控制节点）"""
+
+import os
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from nodes.Grok import dir_batch_image2video as grok_dir
+from nodes.Utils.batch_state import BatchProcessState
+from nodes.Utils.hot_folder import HotFolderControl, HotFolderDaemon, HotFolderWatch, make_runner
+
+
+@pytest.fixture
+def daemon():
+    HotFolderDaemon._instance = None
+    yield HotFolderDaemon()
+    HotFolderDaemon().stop_all()
+    HotFolderDaemon._instance = None
+
+
+def _watch(kind, path, runner):
+    return HotFolderWatch("t", kind, path, runner, 0.01, threading.BoundedSemaphore(1))
+
+
+def test_dir_job_runs_once_contents_settle(tmp_path):
+    calls = []
+    watch = _watch("dir", tmp_path, lambda target, sid: calls.append((target, sid)) or ("ok", ""))
+
+    watch.scan_once()  # 空目录
+    (tmp_path / "1.png").write_bytes(b"1")
+    watch.scan_once()  # 刚出现，等待下一次扫描确认写入完成
+    assert calls == []
+    watch.scan_once()
+    watch.scan_once()  # 内容未变化，不重复运行
+    assert calls == [(tmp_path, "hotfolder_t")]
+
+    (tmp_path / "2.png").write_bytes(b"2")
+    watch.scan_once()
+    watch.scan_once()
+    assert len(calls) == 2 and watch.jobs == 2
+
+
+def test_csv_spool_archives_processed_files(tmp_path):
+    (tmp_path / "ok.csv").write_text("prompt\na\n", encoding="utf-8")
+    (tmp_path / "bad.csv").write_text("prompt\nb\n", encoding="utf-8")
+
+    def _runner(target, sid):
+        if target.stem == "bad":
+            raise RuntimeError("任务列表为空")
+        return ("批量完成", "")
+
+    watch = _watch("csv", tmp_path, _runner)
+    watch.scan_once()
+    watch.scan_once()
+
+    assert not list(tmp_path.glob("*.csv"))
+    assert (tmp_path / "done" / "ok.csv").exists()
+    assert (tmp_path / "done" / "ok.report.txt").read_text(encoding="utf-8") == "批量完成"
+    assert (tmp_path / "failed" / "bad.report.txt").read_text(encoding="utf-8") == "任务列表为空"
+    assert watch.failures == 1 and "任务列表为空" in watch.last_error
+
+
+def test_failed_dir_job_is_retried_with_backoff(tmp_path):
+    """失败的目录作业不标记为已处理，退避时间到后重试，成功后不再运行"""
+    results = [RuntimeError("上传失败"), ("ok", "")]
+    calls = []
+
+    def _runner(target, sid):
+        calls.append(target)
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    watch = _watch("dir", tmp_path, _runner)
+    (tmp_path / "1.png").write_bytes(b"1")
+    watch.scan_once()
+    watch.scan_once()
+    watch.scan_once()  # 仍在退避时间内
+    assert len(calls) == 1 and watch.failures == 1
+
+    time.sleep(0.05)
+    watch.scan_once()
+    watch.scan_once()
+    assert len(calls) == 2 and watch.jobs == 2
+
+
+def test_dir_job_with_failed_images_is_retried(tmp_path):
+    """节点正常返回但会话中有失败的图片时不标记为已处理，退避后重试"""
+    manager = BatchProcessState()
+    runs = []
+
+    def _runner(target, sid):
+        state = manager.start_session(sid, 2)
+        state.update_task(1, "completed")
+        state.update_task(2, "failed" if not runs else "completed", error="上传失败")
+        runs.append(sid)
+        return ("report", "")
+
+    with patch.object(manager, "state_file", tmp_path / "state.jsonl"):
+        manager.clear_state()
+        watch = _watch("dir", tmp_path, _runner)
+        (tmp_path / "1.png").write_bytes(b"1")
+        watch.scan_once()
+        watch.scan_once()
+        assert len(runs) == 1 and watch.failures == 1 and "1 张图片" in watch.last_error
+
+        time.sleep(0.05)
+        watch.scan_once()
+        watch.scan_once()
+        assert len(runs) == 2 and watch.failures == 1
+        manager.clear_state()
+
+
+def test_csv_left_in_place_when_stopped_before_job_starts(tmp_path):
+    """等待作业名额时监视被停止，CSV 留在投递目录，不归档为失败"""
+    (tmp_path / "queued.csv").write_text("prompt\na\n", encoding="utf-8")
+    calls = []
+    watch = _watch("csv", tmp_path, lambda target, sid: calls.append(target) or ("ok", ""))
+    watch.scan_once()
+    watch._slots.acquire()  # 名额被其他作业占用
+    threading.Timer(0.1, watch.stop).start()
+    watch.scan_once()
+    watch._slots.release()
+
+    assert calls == [] and (tmp_path / "queued.csv").exists()
+    assert not (tmp_path / "failed").exists()
+
+
+def test_repeated_jobs_reuse_watch_session(tmp_path):
+    """作业结束后会话被关闭：任务数为 0 或异常退出的作业不会让后续作业的会话名追加序号"""
+    manager = BatchProcessState()
+    started = []
+
+    def _runner(target, sid):
+        state = manager.start_session(sid, 0)
+        started.append(state.session_id)
+        state.update_task(1, "processing")
+        raise RuntimeError("任务列表为空")
+
+    with patch.object(manager, "state_file", tmp_path / "state.jsonl"):
+        manager.clear_state()
+        watch = _watch("dir", tmp_path, _runner)
+        for n in range(2):
+            (tmp_path / f"{n}.png").write_bytes(b"x")
+            watch.scan_once()
+            watch.scan_once()
+        assert started == ["hotfolder_t", "hotfolder_t"]
+        logs = manager.get_state("hotfolder_t")["logs"]
+        assert "热文件夹作业失败" in logs[-1]["message"]
+        manager.clear_state()
+
+
+def test_dir_runner_reports_into_watch_session(tmp_path):
+    with patch("nodes.Utils.hot_folder.importlib.import_module", return_value=grok_dir):
+        runner = make_runner("grok_dir", "prompt", "key", {"batch_size": 3})
+    with patch.object(grok_dir.GrokDirBatchImage2Video, "run", return_value=("report", "")) as run:
+        runner(tmp_path, "hotfolder_demo")
+    args, kwargs = run.call_args
+    assert args == (str(tmp_path), "prompt", "key")
+    assert kwargs == {"session_id": "hotfolder_demo", "skip_processed": True, "batch_size": 3}
+
+
+def test_control_node_starts_and_stops_watches(daemon, tmp_path):
+    node = HotFolderControl()
+    result = node.control("start", "demo", "grok_csv", str(tmp_path), options='{"batch_size": 2}')
+    assert "demo [idle] csv" in result["result"][0]
+
+    node.control("start", "demo", "grok_csv", str(tmp_path))  # 同名替换，不会重复监视
+    assert len(daemon.watches()) == 1
+
+    result = node.control("stop", "demo")
+    assert "0 个监视项" in result["result"][0]
+
+    with pytest.raises(RuntimeError, match="目录不存在"):
+        node.control("start", "x", "grok_csv", str(tmp_path / "missing"))
+    with pytest.raises(RuntimeError, match="JSON"):
+        node.control("start", "x", "grok_csv", str(tmp_path), options="{bad")
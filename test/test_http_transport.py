@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""测试共享 HTTP 传输层（按主机复用连接池）"""
+
+import os
+import sys
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from nodes.Utils import http_transport
+
+
+def test_same_host_reuses_session():
+    """同一主机的请求复用同一个 Session，不同主机互不共享"""
+    http_transport.close_all()
+    a = http_transport.get_session("https://api.kegeai.top/v1/video/create")
+    b = http_transport.get_session("https://API.kegeai.top/v1/video/query?id=1")
+    c = http_transport.get_session("https://imageproxy.zhongzhuan.chat/api/upload")
+    assert a is b
+    assert a is not c
+
+
+def test_ensure_pool_size_grows_and_caps():
+    """连接池只扩不缩，且不超过上限"""
+    http_transport.close_all()
+    with patch.object(http_transport, "_pool_size", http_transport.DEFAULT_POOL_SIZE):
+        session = http_transport.get_session("https://api.kegeai.top")
+        assert http_transport.ensure_pool_size(1) == http_transport.DEFAULT_POOL_SIZE
+        grown = http_transport.ensure_pool_size(http_transport.DEFAULT_POOL_SIZE + 5)
+        assert grown == http_transport.DEFAULT_POOL_SIZE + 5
+        assert session.get_adapter("https://api.kegeai.top")._pool_maxsize == grown
+        assert http_transport.ensure_pool_size(10_000) == http_transport.MAX_POOL_SIZE
+        assert http_transport.ensure_pool_size(1) == http_transport.MAX_POOL_SIZE
+    http_transport.close_all()
+
+
+def test_post_goes_through_shared_session():
+    """post 通过共享 Session 发送，参数原样透传"""
+    http_transport.close_all()
+    session = http_transport.get_session("https://api.kegeai.top")
+    with patch.object(session, "request", return_value="ok") as mock_request:
+        result = http_transport.post("https://api.kegeai.top/v1/video/create",
+                                     json={"a": 1}, headers={"X": "1"}, timeout=5)
+
+    assert result == "ok"
+    args, kwargs = mock_request.call_args
+    assert args == ("POST", "https://api.kegeai.top/v1/video/create")
+    assert kwargs["json"] == {"a": 1}
+    assert kwargs["headers"] == {"X": "1"}
+    assert kwargs["timeout"] == 5
+
+
+def test_session_does_not_persist_cookies():
+    """共享 Session 不跨请求保存 Cookie"""
+    http_transport.close_all()
+    session = http_transport.get_session("https://api.kegeai.top")
+    assert session.cookies._policy.allowed_domains() == ()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""测试 ComfyUI IMAGE → uint8 / PIL 的整批转换"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from nodes.Sora2.kuai_utils import comfy_to_uint8, to_pil_batch_from_comfy, to_pil_from_comfy
+
+
+def _reference(arr):
+    """原实现：逐张 clip(arr * 255) 后转 uint8"""
+    return np.clip(arr * 255.0, 0, 255).astype(np.uint8)
+
+
+def test_batch_conversion_matches_reference_and_keeps_input():
+    batch = (np.random.rand(3, 17, 9, 3) * 1.2 - 0.1).astype(np.float32)
+    original = batch.copy()
+    assert np.array_equal(comfy_to_uint8(batch), _reference(batch))
+    assert np.array_equal(batch, original)  # 原地缩放只发生在内部缓冲中
+
+
+def test_output_buffer_is_reused():
+    batch = np.random.rand(2, 8, 8, 4).astype(np.float32)
+    out = np.empty(batch.shape, dtype=np.uint8)
+    assert comfy_to_uint8(batch, out=out) is out
+    assert np.array_equal(out, _reference(batch))
+
+
+def test_pil_conversion_handles_single_index_and_grayscale():
+    batch = np.random.rand(4, 6, 5, 3).astype(np.float32)
+    assert np.array_equal(np.asarray(to_pil_from_comfy(batch, index=2)), _reference(batch[2]))
+
+    gray = np.random.rand(2, 6, 5, 1).astype(np.float32)
+    images = to_pil_batch_from_comfy(gray)
+    assert [im.mode for im in images] == ["RGB", "RGB"]
+    assert np.array_equal(np.asarray(images[1]), np.repeat(_reference(gray[1]), 3, axis=2))
+
+    assert to_pil_from_comfy(np.zeros((4, 4), dtype=np.float32)).mode == "L"
+    with pytest.raises(ValueError):
+        to_pil_from_comfy("not an image")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""测试共享图像解码器（预分配批量输出、draft 缩小解码、并行获取）"""
+
+import io
+import os
+import sys
+import threading
+
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from nodes.Utils.image_decode import decode_images, load_images, parse_size
+from nodes.Utils.retry_policy import current_scope, retry_scope
+
+
+def _encode(arr, fmt="PNG", mode=None):
+    buf = io.BytesIO()
+    Image.fromarray(arr, mode).save(buf, format=fmt)
+    return buf.getvalue()
+
+
+def _pixels(h, w, channels=3):
+    return np.random.randint(0, 256, (h, w, channels), dtype=np.uint8)
+
+
+def test_batch_matches_per_image_reference():
+    arrays = [_pixels(12, 20) for _ in range(3)]
+    out = decode_images([_encode(a) for a in arrays])
+    assert out.shape == (3, 12, 20, 3) and out.dtype == np.float32
+    for decoded, arr in zip(out, arrays):
+        assert np.array_equal(decoded, arr.astype(np.float32) / 255.0)
+
+
+def test_rgba_and_mismatched_sizes_are_normalised():
+    """RGBA 转为 RGB；尺寸不同的结果统一到第一张的尺寸"""
+    out = decode_images([_encode(_pixels(10, 10, 4)), _encode(_pixels(20, 20))])
+    assert out.shape == (2, 10, 10, 3)
+    assert 0.0 <= out.min() and out.max() <= 1.0
+
+
+def test_jpeg_uses_draft_decoding_for_target_size():
+    big = _encode(_pixels(512, 512), fmt="JPEG")
+    out = decode_images([big], size=(128, 128))
+    assert out.shape == (1, 128, 128, 3)
+
+    img = Image.open(io.BytesIO(big))
+    img.draft("RGB", (128, 128))
+    assert img.size == (128, 128)  # 以 1/4 尺度解码，而不是解码全图后缩小
+
+
+def test_target_size_is_only_a_decode_hint():
+    """返回尺寸或宽高比与请求不同的结果保持原尺寸，不被拉伸；大图按提示整数倍缩小并保持宽高比"""
+    square = _encode(_pixels(64, 64))
+    assert decode_images([square, square], size=(96, 64)).shape == (2, 64, 64, 3)
+
+    large = _encode(_pixels(200, 300))
+    assert decode_images([large], size=(100, 100)).shape == (1, 100, 150, 3)
+
+
+def test_load_images_fetches_in_parallel_within_caller_scope():
+    blobs = {f"u{i}": _encode(_pixels(4, 4)) for i in range(4)}
+    threads, scopes = set(), []
+    barrier = threading.Barrier(4, timeout=5)  # 4 个下载同时进行时才会全部通过
+
+    def _fetch(url):
+        barrier.wait()
+        threads.add(threading.get_ident())
+        scopes.append(current_scope())
+        return blobs[url]
+
+    with retry_scope() as scope:
+        out, fetched = load_images(list(blobs), _fetch)
+    assert out.shape == (4, 4, 4, 3)
+    assert fetched == list(blobs.values())
+    assert len(threads) == 4 and all(s is scope for s in scopes)
+
+
+def test_parse_size_and_empty_input():
+    assert parse_size("1536x1024") == (1536, 1024)
+    assert parse_size("auto") is None
+    with pytest.raises(RuntimeError):
+        decode_images([])
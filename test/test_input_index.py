@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""测试 input 目录文件索引"""
+
+import os
+import sys
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from nodes.Utils import csv_reader, input_index
+from nodes.Utils.input_index import DirectoryIndex
+
+
+@pytest.fixture
+def tree(tmp_path):
+    (tmp_path / "a" / "deep").mkdir(parents=True)
+    (tmp_path / "b").mkdir()
+    (tmp_path / "a" / "deep" / "tasks.csv").write_text("prompt\nx\n", encoding="utf-8")
+    (tmp_path / "b" / "tasks.csv").write_text("prompt\ny\n", encoding="utf-8")
+    (tmp_path / "b" / "voice.mp3").write_bytes(b"mp3")
+    (tmp_path / "a" / "deep" / "report.csv").write_text("prompt\nx\n", encoding="utf-8")
+    return tmp_path
+
+
+def test_find_prefers_shallow_match(tree):
+    """同名文件优先返回层级最浅的路径"""
+    index = DirectoryIndex(str(tree))
+    assert index.find("tasks.csv") == str(tree / "b" / "tasks.csv")
+    assert index.find("voice.mp3") == str(tree / "b" / "voice.mp3")
+    assert index.find("missing.csv") is None
+
+
+def test_list_files_filters_extensions(tree):
+    """按扩展名列出相对路径"""
+    index = DirectoryIndex(str(tree))
+    assert index.list_files((".CSV",)) == sorted([os.path.join("a", "deep", "report.csv"),
+                                                  os.path.join("a", "deep", "tasks.csv"),
+                                                  os.path.join("b", "tasks.csv")])
+
+
+def test_only_changed_directories_are_rescanned(tree):
+    """目录修改时间未变化时不重新列举；新增文件在查找未命中时立即可见"""
+    index = DirectoryIndex(str(tree))
+    index.find("tasks.csv")
+    scans = index.scan_count
+
+    with patch.object(input_index, "REVALIDATE_INTERVAL", 0):
+        index.find("tasks.csv")
+        assert index.scan_count == scans
+
+        (tree / "a" / "deep" / "new.csv").write_text("prompt\nz\n", encoding="utf-8")
+        os.utime(tree / "a" / "deep", (1, 1))
+        assert index.find("new.csv") == str(tree / "a" / "deep" / "new.csv")
+        assert index.scan_count == scans + 1
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink"), reason="需要符号链接支持")
+def test_symlinked_directories_are_not_followed(tree):
+    """与 os.walk 默认行为一致：符号链接目录（包括成环的链接）不被展开"""
+    try:
+        os.symlink(tree / "a", tree / "a" / "deep" / "loop", target_is_directory=True)
+    except OSError:
+        pytest.skip("无法创建符号链接")
+    index = DirectoryIndex(str(tree))
+    assert index.list_files((".csv",)).count(os.path.join("a", "deep", "report.csv")) == 1
+    assert len(index.list_files((".csv",))) == 3
+
+
+def test_removed_directory_drops_entries(tree):
+    """删除的子目录中的文件不再被找到"""
+    index = DirectoryIndex(str(tree))
+    assert index.find("voice.mp3")
+    for f in (tree / "b").iterdir():
+        f.unlink()
+    (tree / "b").rmdir()
+    assert index.find("voice.mp3") is None
+    assert index.find("tasks.csv") == str(tree / "a" / "deep" / "tasks.csv")
+
+
+def test_csv_reader_resolves_subdirectory_file(tree):
+    """CSVBatchReader 通过索引找到子目录中的文件"""
+    fake_folder_paths = SimpleNamespace(get_input_directory=lambda: str(tree))
+    with patch.object(csv_reader, "HAS_FOLDER_PATHS", True), \
+            patch.object(csv_reader, "folder_paths", fake_folder_paths, create=True):
+        (tasks_json,) = csv_reader.CSVBatchReader().read_csv(csv_file="report.csv")
+        changed = csv_reader.CSVBatchReader.IS_CHANGED(csv_file="report.csv")
+    assert '"x"' in tasks_json
+    assert changed == os.path.getmtime(tree / "a" / "deep" / "report.csv")
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""测试持久化任务日志与断点续跑"""
+
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from nodes.Utils.job_journal import JobJournal, batch_key
+from nodes.Veo3 import csv_concurrent_processor as veo_csv
+
+
+@pytest.fixture
+def journal(tmp_path):
+    """隔离的任务日志：数据库写入临时目录"""
+    j = JobJournal()
+    j.close()
+    with patch.object(j, "db_file", tmp_path / "journal.db"):
+        yield j
+        j.close()
+
+
+def test_batch_key_is_stable():
+    """同一任务列表与输出目录得到相同批次键，内容变化则不同"""
+    tasks = [{"prompt": "a"}, {"prompt": "b"}]
+    assert batch_key("veo3", tasks, "out") == batch_key("veo3", [dict(t) for t in tasks], "out")
+    assert batch_key("veo3", tasks, "out") != batch_key("veo3", tasks, "out2")
+    assert batch_key("veo3", tasks, "out").startswith("veo3:")
+
+
+def test_journal_records_lifecycle(journal):
+    """提交、状态变化与下载都会落盘，重复的状态不追加事件"""
+    journal.record_submit("b1", 1, "veo3", "task-1", {"prompt": "p"})
+    journal.update("b1", 1, "processing")
+    journal.update("b1", 1, "processing")
+    journal.update("b1", 1, "completed", info={"video_url": "https://example.com/v.mp4"})
+    assert [j["task_id"] for j in journal.in_flight("veo3")] == ["task-1"]
+
+    journal.update("b1", 1, "downloaded", info={"local_path": "output/v.mp4"})
+    journal.close()  # 模拟重启
+
+    entry = journal.get("b1", 1)
+    assert entry["status"] == "downloaded"
+    assert entry["info"] == {"prompt": "p", "video_url": "https://example.com/v.mp4",
+                             "local_path": "output/v.mp4"}
+    assert [e["status"] for e in journal.events("b1", 1)] == ["submitted", "processing", "completed", "downloaded"]
+    assert journal.in_flight() == []
+
+
+def test_veo_csv_resume_polls_without_resubmitting(journal):
+    """续跑模式下已提交的任务只轮询/下载，不再调用创建接口"""
+    journal.record_submit("veo3_csv:k", 1, "veo3", "task-42", {"prompt": "p"})
+
+    with patch.object(veo_csv._VeoText2Video, "create") as mock_create, \
+            patch.object(veo_csv._VeoQueryTask, "query",
+                         return_value=("completed", "https://example.com/v.mp4", "", {})) as mock_query, \
+            patch.object(veo_csv, "_download", return_value="output/veo3/v.mp4"):
+        result = veo_csv._process_one_task(
+            1, {"prompt": "p"}, "veo3.1", "9:16", True, True, "key", "https://api",
+            "output/veo3", 60, 0.05, 30, None, "veo3_csv:k", True)
+
+    mock_create.assert_not_called()
+    assert mock_query.call_args.kwargs["task_id"] == "task-42"
+    assert result["status"] == "completed"
+    assert result["local_path"] == "output/veo3/v.mp4"
+    assert journal.get("veo3_csv:k", 1)["status"] == "downloaded"
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""测试后台作业管理（异步模式立即返回句柄、等待节点取结果）"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from nodes.Grok.concurrent_processor import GrokText2Video10Concurrent
+from nodes.Utils.job_manager import AwaitBackgroundJob, JobManager, background_capable, parse_job_id
+
+
+@pytest.fixture(autouse=True)
+def manager():
+    JobManager._instance = None
+    yield JobManager()
+    JobManager._instance = None
+
+
+class _SlowNode:
+    RETURN_NAMES = ("处理报告", "输出目录", "详细报告JSON")
+
+    def __init__(self, release):
+        self.release = release
+
+    @background_capable()
+    def process(self, batch_tasks, api_key, save_dir="output"):
+        if not self.release.wait(5):
+            raise RuntimeError("timeout")
+        if batch_tasks == "bad":
+            raise RuntimeError("任务列表为空")
+        return (f"done {batch_tasks}", save_dir, json.dumps({"tasks": batch_tasks}))
+
+
+def test_async_mode_returns_handle_immediately_and_collect_waits():
+    release = threading.Event()
+    node = _SlowNode(release)
+
+    start = time.monotonic()
+    report, save_dir, detail = node.process("t1", "key", save_dir="out/x", async_mode=True)
+    assert time.monotonic() - start < 0.5
+    job_id = parse_job_id(report)
+    assert save_dir == detail == job_id
+    assert JobManager().get(job_id).status in ("pending", "running")
+
+    threading.Timer(0.1, release.set).start()
+    report, selected, all_outputs = AwaitBackgroundJob().collect(report, output_index=1)
+    assert report == "done t1" and selected == "out/x"
+    assert json.loads(all_outputs)["输出目录"] == "out/x"
+    assert JobManager().get(job_id).status == "completed"
+
+
+def test_sync_mode_is_unchanged():
+    release = threading.Event()
+    release.set()
+    assert _SlowNode(release).process("t2", "key") == ("done t2", "output", '{"tasks": "t2"}')
+
+
+def test_failure_and_timeout_surface_in_collect_node():
+    release = threading.Event()
+    handle = _SlowNode(release).process("bad", "key", async_mode=True)[1]
+
+    with pytest.raises(RuntimeError, match="等待后台作业超时"):
+        AwaitBackgroundJob().collect(handle, timeout=1)
+    release.set()
+    with pytest.raises(RuntimeError, match="任务列表为空"):
+        AwaitBackgroundJob().collect(handle)
+    assert JobManager().jobs()[0]["status"] == "failed"
+
+    with pytest.raises(RuntimeError, match="后台作业不存在"):
+        AwaitBackgroundJob().collect("kuai_job_000000000000")
+
+
+def test_concurrent_node_reports_handle_in_report_output():
+    outputs = GrokText2Video10Concurrent().run("key", async_mode=True)
+    assert len(outputs) == len(GrokText2Video10Concurrent.RETURN_NAMES)
+    assert outputs[-1].startswith("后台作业已提交") and outputs[0] == parse_job_id(outputs[-1])
+    with pytest.raises(RuntimeError, match="至少需要填写一条提示词"):
+        AwaitBackgroundJob().collect(outputs[0])
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""测试实时监控的事件推送（合并差异、空闲不推送）"""
+
+import os
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from nodes.Utils.batch_state import BatchProcessState
+from nodes.Utils.realtime_monitor import RealtimeBatchMonitor
+
+
+@pytest.fixture
+def state(tmp_path):
+    manager = BatchProcessState()
+    with patch.object(manager, "state_file", tmp_path / "state.jsonl"):
+        manager.clear_state()
+        yield manager
+        manager.clear_state()
+
+
+@pytest.fixture
+def pushes(state):
+    """在后台线程运行监控循环，收集推送的消息"""
+    sent = []
+    stop = threading.Event()
+    with patch.object(RealtimeBatchMonitor, "_send", side_effect=sent.append):
+        thread = threading.Thread(target=RealtimeBatchMonitor._monitor_loop,
+                                  args=(0.05, 10, 50, ""), kwargs={"stop_event": stop}, daemon=True)
+        thread.start()
+        time.sleep(0.05)
+        yield sent
+        stop.set()
+        thread.join(timeout=2)
+    assert not thread.is_alive()
+
+
+def _wait_for(sent, count, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while len(sent) < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_changes_are_coalesced_into_diffs(state, pushes):
+    """新会话推送完整快照；之后的多次变更合并为一条只含变化部分的差异消息"""
+    session = state.start_session("grok_1", 3)
+    _wait_for(pushes, 1)
+    assert pushes[0]["diff"] is False and pushes[0]["session_id"] == "grok_1"
+
+    for status in ("pending", "processing", "completed"):
+        session.update_task(1, status, prompt="a")
+    session.update_task(2, "processing")
+    session.add_log(1, "INFO", "done 1")
+    _wait_for(pushes, 2)
+    time.sleep(0.15)
+
+    assert len(pushes) == 2
+    diff = pushes[1]
+    assert diff["diff"] is True
+    assert [(t["idx"], t["status"]) for t in diff["tasks"]] == [(2, "processing"), (1, "completed")]
+    assert [l["message"] for l in diff["logs"]] == ["done 1"]
+    assert (diff["completed"], diff["processing"], diff["session_completed"]) == (1, 1, False)
+
+
+def test_idle_state_pushes_nothing(state, pushes):
+    """状态没有变化时不推送"""
+    state.start_session("veo3_csv_1", 1)
+    _wait_for(pushes, 1)
+    time.sleep(0.3)
+    assert len(pushes) == 1
+
+
+def test_completion_is_flagged(state, pushes):
+    """全部任务结束时推送完成标记"""
+    session = state.start_session("grok_2", 1)
+    _wait_for(pushes, 1)
+    session.update_task(1, "failed", error="x")
+    _wait_for(pushes, 2)
+    assert pushes[-1]["session_completed"] is True and pushes[-1]["failed"] == 1
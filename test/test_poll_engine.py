@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""测试异步轮询引擎（中央调度 + 按键去重）"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from nodes.Utils.poll_engine import PollEngine, PollTimeoutError
+
+
+def _done_after(n, value="ok"):
+    """构造第 n 次查询时返回完成的 query/check 对"""
+    calls = []
+
+    def _query():
+        calls.append(1)
+        return len(calls)
+
+    def _check(elapsed, queried):
+        return queried >= n, value
+
+    return _query, _check, calls
+
+
+def test_engine_is_singleton():
+    """PollEngine 为进程级单例"""
+    assert PollEngine() is PollEngine()
+
+
+def test_watch_resolves_when_check_reports_done():
+    """check 返回 done=True 时 Future 得到结果，elapsed 按间隔累加"""
+    seen = []
+
+    def _check(elapsed, queried):
+        seen.append(elapsed)
+        return (len(seen) == 3), "https://example.com/v.mp4"
+
+    future = PollEngine().watch(lambda: "processing", _check, 0.01, 10, label="任务1")
+    assert future.result(timeout=5) == "https://example.com/v.mp4"
+    assert seen == pytest.approx([0.01, 0.02, 0.03])
+
+
+def test_runtime_error_stops_polling():
+    """query 抛 RuntimeError 表示任务失败，直接上抛且不再查询"""
+    calls = []
+
+    def _query():
+        calls.append(1)
+        raise RuntimeError("任务失败: content policy")
+
+    with pytest.raises(RuntimeError, match="content policy"):
+        PollEngine().wait(_query, lambda elapsed, queried: (False, None), 0.01, 10)
+    assert len(calls) == 1
+
+
+def test_transient_errors_are_retried():
+    """非 RuntimeError 视为网络抖动，继续轮询"""
+    calls = []
+
+    def _query():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConnectionError("reset by peer")
+        return "completed"
+
+    assert PollEngine().wait(_query, lambda elapsed, queried: (True, queried), 0.01, 10) == "completed"
+    assert len(calls) == 3
+
+
+def test_timeout_raises_poll_timeout():
+    """超过最长等待时间抛出 PollTimeoutError（RuntimeError 子类）"""
+    with pytest.raises(PollTimeoutError, match="任务2 超时"):
+        PollEngine().wait(lambda: "processing", lambda elapsed, queried: (False, None),
+                          0.01, 0.05, label="任务2")
+    assert issubclass(PollTimeoutError, RuntimeError)
+
+
+def test_same_key_is_queried_once_per_sweep():
+    """多个节点等待同一任务时，每轮只发起一次查询，结果分发给所有等待方"""
+    query, _, calls = _done_after(3)
+    engine = PollEngine()
+    first = engine.watch(query, lambda elapsed, q: (q >= 3, "a"), 0.05, 10, key="grok:task-dup")
+    second = engine.watch(query, lambda elapsed, q: (q >= 3, "b"), 0.05, 10, key="grok:task-dup")
+
+    assert first.result(timeout=5) == "a"
+    assert second.result(timeout=5) == "b"
+    assert len(calls) == 3
+
+
+def test_due_watches_share_sweeps():
+    """同一时刻到期的任务在同一轮扫描中查询，扫描次数随轮次而非任务数增长"""
+    engine = PollEngine()
+    sweeps_before = engine.sweep_count
+    futures = [engine.watch(*_done_after(2)[:2], 0.2, 10) for _ in range(50)]
+    for f in futures:
+        assert f.result(timeout=10) == "ok"
+    assert engine.sweep_count - sweeps_before <= 10
+
+
+def test_many_watches_do_not_spawn_thread_per_task():
+    """上千个并发任务只占用固定数量的线程"""
+    before = threading.active_count()
+    futures = [PollEngine().watch(lambda: None, lambda elapsed, q: (elapsed >= 0.05, elapsed), 0.01, 10)
+               for _ in range(1000)]
+    peak = threading.active_count()
+    while not all(f.done() for f in futures):
+        peak = max(peak, threading.active_count())
+        time.sleep(0.01)
+    for f in futures:
+        assert f.result(timeout=30) >= 0.05
+    assert peak - before <= PollEngine().query_concurrency + 1
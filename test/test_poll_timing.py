@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""测试自适应轮询时机模型"""
+
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from nodes.Utils.poll_engine import PollEngine
+from nodes.Utils.poll_timing import PollTimingModel, timing_profile
+
+
+@pytest.fixture
+def model(tmp_path):
+    """隔离的时机模型：统计写入临时目录，测试结束后恢复"""
+    m = PollTimingModel()
+    with patch.object(m, "stats_file", tmp_path / "poll_timing_stats.json"), \
+            patch.object(m, "_samples", {}):
+        yield m
+        m.flush()
+
+
+def test_timing_profile_format():
+    """画像键统一小写并去掉下拉选项的说明后缀"""
+    assert timing_profile("grok", "grok-video-3 (6秒)", 6) == "grok:grok-video-3:6s"
+    assert timing_profile("veo3", "VEO3.1") == "veo3:veo3.1"
+    assert timing_profile("sora2", "", None) == "sora2:default"
+
+
+def test_falls_back_to_base_interval_without_samples(model):
+    """样本不足时沿用固定间隔"""
+    model.record("sora2:sora-2:10s", 120)
+    model.record("sora2:sora-2:10s", 130)
+    assert model.expected_window("sora2:sora-2:10s") is None
+    assert model.next_delay("sora2:sora-2:10s", 0, 15) == 15
+    assert model.next_delay(None, 0, 15) == 15
+
+
+def test_sleeps_until_expected_window(model):
+    """预计完成前一次性睡到低分位，窗口内加密轮询，超出高分位后恢复固定间隔"""
+    for seconds in (100, 110, 120, 130, 140):
+        model.record("grok:grok-video-3:6s", seconds)
+
+    low, high = model.expected_window("grok:grok-video-3:6s")
+    assert low == pytest.approx(104)
+    assert high == pytest.approx(136)
+
+    assert model.next_delay("grok:grok-video-3:6s", 0, 15) == pytest.approx(104)
+    assert model.next_delay("grok:grok-video-3:6s", 104, 15) == pytest.approx(5)
+    assert model.next_delay("grok:grok-video-3:6s", 140, 15) == 15
+    # 探测方在低分位之前照常按固定间隔查询
+    assert model.next_delay("grok:grok-video-3:6s", 0, 15, probe=True) == 15
+
+
+def test_only_bracketed_completions_are_recorded(model):
+    """首次查询即完成的耗时只是上界，不记录；上一次查询仍未完成时记录两次查询的中点"""
+    profile = "grok:probe-test"
+    for seconds in (0.2, 0.3, 0.4):
+        model.record(profile, seconds)
+
+    def _done_on(n):
+        calls = []
+        return lambda: calls.append(1) or len(calls), lambda elapsed, queried: (queried >= n, elapsed)
+
+    with patch.object(PollTimingModel, "should_probe", return_value=False):
+        query, check = _done_on(1)
+        # 睡到低分位后第一次查询即完成
+        assert PollEngine().wait(query, check, 0.05, 10, profile=profile) == pytest.approx(0.22)
+    assert list(model._samples[profile]) == [0.2, 0.3, 0.4]
+
+    with patch.object(PollTimingModel, "should_probe", return_value=True):
+        query, check = _done_on(3)
+        # 探测方按固定间隔查询，在低分位之前观察到完成
+        assert PollEngine().wait(query, check, 0.05, 10, profile=profile) == pytest.approx(0.15)
+    assert list(model._samples[profile])[-1] == pytest.approx(0.1)
+
+
+def test_samples_persist_to_stats_file(model):
+    """完成耗时写入统计文件，重新加载后仍可用"""
+    for seconds in (60, 70, 80):
+        model.record("veo3:veo3.1", seconds)
+    # 多次记录合并写入
+    assert not model.stats_file.exists()
+    model.flush()
+    assert model.stats_file.exists()
+
+    model._samples = {}
+    model._load()
+    assert model.expected_window("veo3:veo3.1") is not None
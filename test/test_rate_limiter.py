@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""测试共享限流器（令牌桶 + 在途上限 + 429 自适应）"""
+
+import os
+import sys
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from nodes.Utils import http_transport
+from nodes.Utils.rate_limiter import RateLimiter, limit_key, parse_retry_after
+
+
+@pytest.fixture
+def limiter():
+    rl = RateLimiter()
+    rl.reset()
+    with patch.object(rl, "default_rps", 1000.0), patch.object(rl, "default_burst", 1000), \
+            patch.object(rl, "default_inflight", 100):
+        yield rl
+        rl.reset()
+
+
+def test_limit_key_hides_api_key_and_reads_model():
+    key = limit_key("https://api.kegeai.top/v1/video/create",
+                    {"Authorization": "Bearer sk-secret"}, {"model": "grok-video-3"})
+    assert key[1:] == ("api.kegeai.top", "grok-video-3")
+    assert "sk-secret" not in key[0] and len(key[0]) == 8
+    assert limit_key("https://cdn.example.com/a.mp4") == ("", "cdn.example.com", "")
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("") is None and parse_retry_after("soon") is None
+    assert parse_retry_after("Thu, 01 Jan 1970 00:00:00 GMT") == 0.0
+
+
+def test_inflight_cap_is_shared_across_callers(limiter):
+    """不同节点的线程共用同一个键时，同时在途的请求数不超过上限"""
+    limiter.configure("api.kegeai.top", max_inflight=2)
+    key = ("k", "api.kegeai.top", "m")
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def _call():
+        with limiter.slot(key):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+
+    threads = [threading.Thread(target=_call) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert peak[0] == 2
+
+
+def test_token_bucket_limits_rate(limiter):
+    limiter.configure("api.kegeai.top", model="m", rps=50, burst=1)
+    key = ("k", "api.kegeai.top", "m")
+    start = time.monotonic()
+    for _ in range(6):
+        with limiter.slot(key):
+            pass
+    assert time.monotonic() - start >= 0.09
+    # 其他模型不受该模型配置影响
+    start = time.monotonic()
+    for _ in range(6):
+        with limiter.slot(("k", "api.kegeai.top", "other")):
+            pass
+    assert time.monotonic() - start < 0.05
+
+
+def test_429_backs_off_and_recovers(limiter):
+    """429 时速率减半并按 Retry-After 暂停，成功响应后逐步恢复"""
+    limiter.configure("api.kegeai.top", rps=100, burst=100)
+    key = ("k", "api.kegeai.top", "m")
+    with limiter.slot(key) as fb:
+        fb.report(MagicMock(status_code=429, headers={"Retry-After": "0.1"}))
+    snap = limiter.snapshot()["api.kegeai.top/m#k"]
+    assert (snap["rps"], snap["throttled"]) == (50.0, 1)
+
+    start = time.monotonic()
+    with limiter.slot(key) as fb:
+        fb.report(MagicMock(status_code=200))
+    assert time.monotonic() - start >= 0.09
+    assert limiter.snapshot()["api.kegeai.top/m#k"]["rps"] == 55.0
+
+
+def test_transport_requests_feed_the_limiter(limiter):
+    """经由 http_transport 的请求自动占用名额并回报 429"""
+    http_transport.close_all()
+    session = http_transport.get_session("https://api.kegeai.top")
+    resp = MagicMock(status_code=429, headers={"Retry-After": "0"})
+    with patch.object(session, "request", return_value=resp):
+        assert http_transport.post("https://api.kegeai.top/v1/video/create", json={"model": "veo3"},
+                                   headers={"Authorization": "Bearer sk-1"}, retry=False) is resp
+    (name, snap), = limiter.snapshot().items()
+    assert name.startswith("api.kegeai.top/veo3#") and snap["throttled"] == 1 and snap["inflight"] == 0
+    http_transport.close_all()
@@ -60,7 +60,7 @@ def test_gptimage_generate_uses_auth_only_header_and_json_payload():
 
     node = GPTImage2Generate()
 
-    with patch("nodes.GPTImage.gpt_image.requests.post", return_value=_dummy_image_response()) as mock_post, \
+    with patch("nodes.GPTImage.gpt_image.http_transport.post", return_value=_dummy_image_response()) as mock_post, \
          patch("nodes.GPTImage.gpt_image._url_to_tensor", return_value=__import__("torch").zeros((1, 1, 1, 3))):
         node.generate("提示词", "gpt-image-2", "auto（默认）", 1, "test-key")
 
@@ -82,7 +82,7 @@ def test_sora_create_video_uses_auth_only_header_and_json_payload():
             return {"id": "task_123", "status": "pending", "status_update_time": 0}
 
     node = SoraCreateVideo()
-    with patch("nodes.Sora2.sora2.requests.post", return_value=DummyResponse()) as mock_post:
+    with patch("nodes.Sora2.sora2.http_transport.post", return_value=DummyResponse()) as mock_post:
         node.create(
             "https://example.com/a.png",
             "提示词",
@@ -113,7 +113,7 @@ def test_kling_text2video_uses_auth_only_header():
             return {"code": 0, "message": "SUCCEED", "data": {"task_id": "task_123", "task_status": "submitted", "created_at": 123456}}
 
     node = KlingText2Video()
-    with patch("nodes.Kling.kling.requests.post", return_value=DummyResponse()) as mock_post:
+    with patch("nodes.Kling.kling.http_transport.post", return_value=DummyResponse()) as mock_post:
         node.create("提示词", "kling-v2-6", "std", "5", "16:9", api_key="test-key")
 
     kwargs = mock_post.call_args.kwargs
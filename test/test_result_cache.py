@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""测试按内容寻址的生成结果缓存"""
+
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from nodes.Utils.result_cache import ResultCache, request_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """隔离的结果缓存：缓存目录与 ComfyUI 根目录均指向临时目录"""
+    c = ResultCache()
+    with patch.object(c, "cache_dir", tmp_path / "cache"), \
+            patch.object(c, "comfy_root", tmp_path), \
+            patch.object(c, "_entries", None), \
+            patch.object(c, "ttl_seconds", 3600), \
+            patch.object(c, "max_bytes", 1024):
+        yield c
+
+
+def test_request_key_normalizes_payload():
+    """键与字段顺序、首尾空白、空值无关，参数变化则键不同"""
+    a = request_key("grok:video", {"prompt": " a cat ", "model": "grok-video-3", "image_urls": ""})
+    b = request_key("grok:video", {"model": "grok-video-3", "prompt": "a cat"})
+    assert a == b
+    assert a != request_key("grok:video", {"model": "grok-video-3", "prompt": "a dog"})
+    assert a != request_key("veo3:video", {"model": "grok-video-3", "prompt": "a cat"})
+
+
+def test_put_and_get_blobs(cache):
+    """缓存的结果内容按内容哈希落盘，命中时返回 URL、文件与附加信息"""
+    cache.put("k1", urls=["https://example.com/a.png"], blobs=[b"png-bytes"], meta={"thinking": "t"})
+    hit = cache.get("k1")
+    assert hit["urls"] == ["https://example.com/a.png"]
+    assert open(hit["blobs"][0], "rb").read() == b"png-bytes"
+    assert hit["meta"] == {"thinking": "t"}
+    assert cache.get("missing") is None
+
+
+def test_expired_entries_miss(cache):
+    """超过有效期的条目视为未命中并被清理"""
+    cache.put("old", blobs=[b"x"])
+    with patch("nodes.Utils.result_cache.time.time", return_value=10 ** 12):
+        assert cache.get("old") is None
+    assert list(cache.cache_dir.glob("[0-9a-f]*")) == []
+
+
+def test_lru_eviction_by_size(cache):
+    """超过容量上限时淘汰最近最少使用的条目"""
+    with patch("nodes.Utils.result_cache.time.time", side_effect=[1.0, 2.0, 3.0, 4.0]):
+        cache.ttl_seconds = 10 ** 13
+        cache.put("a", blobs=[b"a" * 400])
+        cache.put("b", blobs=[b"b" * 400])
+        cache.get("a")
+        cache.put("c", blobs=[b"c" * 400])
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+
+
+def test_put_same_key_twice_keeps_blob(cache):
+    """同一键以相同内容重复写入时，缓存文件仍保留且可命中"""
+    cache.put("k", blobs=[b"same"])
+    cache.put("k", blobs=[b"same"])
+    hit = cache.get("k")
+    assert hit is not None and open(hit["blobs"][0], "rb").read() == b"same"
+
+
+def test_shared_blob_counts_once_toward_capacity(cache):
+    """多个条目引用同一内容时只计一次大小，不会因重复计算而淘汰仍在容量内的条目"""
+    with patch("nodes.Utils.result_cache.time.time", side_effect=[1.0, 2.0, 3.0]):
+        cache.ttl_seconds = 10 ** 13
+        cache.put("a", blobs=[b"s" * 600])
+        cache.put("b", blobs=[b"s" * 600])
+    assert cache.get("a") is not None and cache.get("b") is not None
+    assert len(list(cache.cache_dir.glob("[0-9a-f]*"))) == 1
+
+
+def test_missing_local_file_is_a_miss(cache, tmp_path):
+    """只记录路径的视频结果在本地文件被删除后不再命中"""
+    video = tmp_path / "output" / "v.mp4"
+    video.parent.mkdir()
+    video.write_bytes(b"mp4")
+    cache.put("v", urls=["https://example.com/v.mp4"], files=["output/v.mp4"])
+    assert cache.get("v")["files"] == [str(video)]
+
+    video.unlink()
+    assert cache.get("v") is None
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""测试统一重试策略（错误分类、退避、单任务预算与报告统计）"""
+
+import io
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from nodes.Grok import concurrent_processor as grok_concurrent
+from nodes.Utils import http_transport
+from nodes.Utils.poll_engine import PollEngine
+from nodes.Utils.rate_limiter import RateLimiter
+from nodes.Utils.retry_policy import (RetryPolicy, RetryScope, backoff_delay, bind_task, classify,
+                                      current_scope, retry_scope)
+
+URL = "https://api.kegeai.top/v1/video/query?id=1"
+
+
+@pytest.fixture
+def session():
+    """共享 Session 的 request 被替换为按顺序返回的响应；退避不实际等待，限流器关闭"""
+    http_transport.close_all()
+    s = http_transport.get_session(URL)
+    limiter = RateLimiter()
+    with patch.object(http_transport.time, "sleep") as sleep, patch.object(limiter, "default_rps", 0), \
+            patch.object(RetryPolicy(), "max_retries", 3), patch.object(RetryPolicy(), "task_budget", 2):
+        s.sleep = sleep
+        yield s
+    http_transport.close_all()
+
+
+def _resp(status, headers=None):
+    return MagicMock(status_code=status, headers=headers or {})
+
+
+def test_classify_distinguishes_idempotent_requests():
+    """查询（GET）的 5xx/超时可重试；提交（POST）只在服务端明确未处理时重试"""
+    assert classify("GET", _resp(502)) == "502"
+    assert classify("GET", _resp(404)) is None
+    assert classify("POST", _resp(502)) is None
+    assert classify("POST", _resp(429)) == "429"
+    assert classify("GET", error=requests.exceptions.ReadTimeout()) == "timeout"
+    assert classify("POST", error=requests.exceptions.ReadTimeout()) is None
+    assert classify("POST", error=requests.exceptions.ConnectTimeout()) == "timeout"
+    assert classify("GET", error=requests.exceptions.ConnectionError()) == "network"
+    assert classify("GET", error=requests.exceptions.InvalidURL()) is None
+
+
+def test_backoff_is_jittered_and_honours_retry_after():
+    delays = [backoff_delay(3) for _ in range(200)]
+    assert 0 <= min(delays) and max(delays) <= 8 and len(set(delays)) > 100
+    assert backoff_delay(0, retry_after=5) >= 5
+    assert backoff_delay(0, retry_after=10_000) <= 120
+
+
+def test_transport_retries_transient_errors(session):
+    """502 与网络错误按退避重试，Retry-After 决定等待时长"""
+    responses = [_resp(502), requests.exceptions.ConnectionError("reset"),
+                 _resp(503, {"Retry-After": "7"}), _resp(200)]
+    with patch.object(session, "request", side_effect=responses) as mock_request, retry_scope() as scope:
+        assert http_transport.get(URL).status_code == 200
+    assert mock_request.call_count == 4
+    assert session.sleep.call_args_list[-1].args[0] >= 7
+    assert scope.to_dict()["reasons"] == {"502": 1, "network": 1, "503": 1}
+
+
+def test_non_retryable_and_post_errors_return_immediately(session):
+    with patch.object(session, "request", return_value=_resp(502)) as mock_request:
+        assert http_transport.post(URL, json={"model": "m"}).status_code == 502
+        assert http_transport.get(URL, retry=False).status_code == 502
+    assert mock_request.call_count == 2
+
+
+def test_retry_rewinds_multipart_files(session):
+    """重试时文件对象回绕到起始位置，每次发送完整内容；无法回绕的请求体不重试"""
+    sent = []
+
+    def _request(method, url, files=None, data=None, **kwargs):
+        sent.append(files["file"][1].read())
+        return _resp(429 if len(sent) == 1 else 200)
+
+    buf = io.BytesIO(b"header-image-bytes")
+    buf.read(7)  # 调用方已定位到的起始位置同样被保留
+    with patch.object(session, "request", side_effect=_request):
+        assert http_transport.post(URL, files={"file": ("a.png", buf, "image/png")}).status_code == 200
+    assert sent == [b"image-bytes", b"image-bytes"]
+
+    with patch.object(session, "request", return_value=_resp(429)) as mock_request:
+        assert http_transport.post(URL, data=(chunk for chunk in [b"a"])).status_code == 429
+    assert mock_request.call_count == 1
+
+
+def test_task_budget_limits_retries_across_calls(session):
+    """同一任务的多次请求共享预算，用尽后直接返回失败响应，批量范围记录未重试次数"""
+    batch = RetryScope()
+    with patch.object(session, "request", return_value=_resp(502)) as mock_request:
+        with batch.child().activate():
+            assert http_transport.get(URL).status_code == 502
+            assert http_transport.get(URL).status_code == 502
+    # 第一次请求重试 2 次后预算用尽；第二次请求不再重试
+    assert mock_request.call_count == 4
+    assert batch.to_dict() == {"retries": 2, "exhausted": 2, "reasons": {"502": 2}}
+    assert "预算用尽" in batch.summary()
+
+
+def test_poll_queries_run_in_task_scope():
+    """轮询引擎的查询沿用登记方所在任务的重试范围"""
+    batch = RetryScope()
+    seen = []
+
+    def _task():
+        def _query():
+            seen.append(current_scope())
+            return "done"
+        return PollEngine().wait(_query, lambda elapsed, r: (True, r), 0.01, 5)
+
+    assert bind_task(_task, batch)() == "done"
+    assert seen[0] is not None and seen[0].parent is batch
+
+
+def test_concurrent_report_includes_retry_stats(session):
+    """并发节点的报告汇总各任务的重试次数"""
+    def _worker(idx):
+        http_transport.get(URL)
+        return "url", f"out/{idx}.mp4"
+
+    with patch.object(session, "request", side_effect=[_resp(502), _resp(200), _resp(200)]):
+        results, errors, retry = grok_concurrent._run_concurrent(_worker, [(1,), (2,)])
+    report = grok_concurrent._build_report(results, errors, 2, retry)
+    assert "网络重试: 重试 1 次（502×1）" in report
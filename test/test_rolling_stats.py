@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""测试滚动统计与批量状态的统计信息"""
+
+import math
+import os
+import random
+import sys
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from nodes.Utils import batch_state
+from nodes.Utils.batch_state import BatchProcessState
+from nodes.Utils.rolling_stats import QuantileSketch, RunningStat
+
+
+class _Clock:
+    """可手动推进的单调时钟"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def state(tmp_path):
+    manager = BatchProcessState()
+    with patch.object(manager, "state_file", tmp_path / "state.jsonl"):
+        manager.clear_state()
+        yield manager
+        manager.clear_state()
+
+
+@pytest.fixture
+def clock():
+    c = _Clock()
+    with patch.object(batch_state.time, "monotonic", c):
+        yield c
+
+
+def test_sketch_quantiles_within_accuracy():
+    """分位数近似值的相对误差不超过草图精度"""
+    rng = random.Random(7)
+    values = [rng.lognormvariate(3, 1) for _ in range(5000)]
+    sketch = QuantileSketch(accuracy=0.01)
+    for v in values:
+        sketch.add(v)
+    values.sort()
+    for q in (0.5, 0.95):
+        exact = values[math.ceil(q * len(values)) - 1]
+        assert abs(sketch.quantile(q) - exact) / exact <= 0.011
+
+
+def test_running_stat_mean_and_stdev():
+    stat = RunningStat()
+    for v in (2, 4, 4, 4, 5, 5, 7, 9):
+        stat.add(v)
+    d = stat.to_dict()
+    assert (d["count"], d["mean"], d["stdev"]) == (8, 5.0, 2.14)
+
+
+def test_statistics_use_monotonic_clock_across_midnight(state, clock):
+    """跨越午夜（墙上时间回绕）时耗时仍为正，ETA 由吞吐量得出"""
+    session = state.start_session("s1", 4)
+    with patch.object(batch_state, "datetime") as fake_dt:
+        fake_dt.now.return_value.strftime.return_value = "23:59:50"
+        session.update_task(1, "processing", model="m")
+        session.update_task(2, "processing", model="m")
+        clock.now += 30
+        fake_dt.now.return_value.strftime.return_value = "00:00:20"
+        session.update_task(1, "completed")
+        clock.now += 30
+        session.update_task(2, "completed")
+
+    stats = session.get_statistics()
+    assert stats["avg_duration"] == 45.0
+    assert stats["p50_duration"] == pytest.approx(30, rel=0.02)
+    assert stats["p95_duration"] == pytest.approx(60, rel=0.02)
+    assert stats["success_rate"] == 100.0
+    # 60 秒内完成 2 个任务 → 2 个/分钟，剩余 2 个约需 60 秒
+    assert stats["throughput_per_min"] == 2.0
+    assert stats["estimated_remaining"] == 60
+
+
+def test_stage_durations_per_model(state, clock):
+    """提交/渲染/下载各阶段按模型分别统计，缓存命中不计入耗时"""
+    session = state.start_session("s2", 3)
+    session.update_task(1, "pending", model="grok-video-3")
+    clock.now += 2
+    session.update_task(1, "processing", task_id="t1")
+    clock.now += 40
+    session.update_task(1, "processing", video_url="https://cdn/1.mp4")
+    clock.now += 5
+    session.update_task(1, "completed", local_path="out/1.mp4")
+    session.update_task(2, "completed", model="grok-video-3", local_path="out/2.mp4")
+
+    stages = session.get_statistics()["stages"]["grok-video-3"]
+    assert {k: v["mean"] for k, v in stages.items()} == {
+        "submit": 2.0, "render": 40.0, "download": 5.0, "total": 47.0}
+    assert stages["total"]["count"] == 1
+
+
+def test_statistics_do_not_scan_tasks(state):
+    """统计信息读取不遍历任务表"""
+    session = state.start_session("s3", 1000)
+    for i in range(1000):
+        session.update_task(i, "processing")
+        session.update_task(i, "completed")
+
+    class _NoIter(dict):
+        def values(self):
+            raise AssertionError("不应遍历任务")
+        __iter__ = values
+        items = values
+
+    sess = state._sessions["s3"]
+    sess.tasks = _NoIter(sess.tasks)
+    stats = session.get_statistics()
+    assert stats["success_rate"] == 100.0 and stats["estimated_remaining"] == 0
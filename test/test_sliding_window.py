@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""测试滑动窗口调度器（立即补位、按需读取、槽位利用率）"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from nodes.Utils.sliding_window import SlidingWindow
+
+
+def test_straggler_does_not_block_other_slots():
+    """一个慢任务占住一个槽位时，其余任务在另一个槽位上连续执行，而不是等整批结束"""
+    durations = {"slow": 0.5, **{f"t{i}": 0.05 for i in range(8)}}
+    order = []
+
+    def _work(name):
+        time.sleep(durations[name])
+        return name
+
+    start = time.monotonic()
+    window = SlidingWindow(2)
+    for name, future in window.run(_work, ["slow"] + [f"t{i}" for i in range(8)]):
+        order.append((name, future.result()))
+    elapsed = time.monotonic() - start
+
+    assert [n for n, _ in order][-1] == "slow"
+    assert all(n == r for n, r in order)
+    # 锁步分批需要约 0.5 + 4×0.05 秒；滑动窗口总耗时约等于最慢任务
+    assert elapsed < 0.65
+    assert [s["tasks"] for s in window.to_dict()["slots"]] in ([1, 8], [8, 1])
+
+
+def test_keeps_exactly_n_in_flight_and_reads_lazily():
+    running, peak, pulled, finished = [0], [0], [], [0]
+    lock = threading.Lock()
+
+    def _items():
+        for i in range(10):
+            pulled.append(i)
+            # 只有槽位空出时才读入下一个任务
+            with lock:
+                assert len(pulled) - finished[0] <= 3
+            yield i
+
+    def _work(i):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+            finished[0] += 1
+        return i * 2
+
+    window = SlidingWindow(3)
+    results = []
+    for item, future in window.run(_work, _items()):
+        results.append(future.result())
+
+    assert sorted(results) == [i * 2 for i in range(10)]
+    assert peak[0] == 3
+
+
+def test_exceptions_surface_through_futures_and_utilization_is_reported():
+    def _work(i):
+        if i == 1:
+            raise ValueError("boom")
+        time.sleep(0.05)
+        return i
+
+    window = SlidingWindow(2)
+    errors = [item for item, future in window.run(_work, [0, 1, 2]) if future.exception()]
+    assert errors == [1]
+
+    info = window.to_dict()
+    assert info["size"] == 2 and 0 < info["utilization"] <= 1
+    assert "2 路，平均利用率" in window.summary()
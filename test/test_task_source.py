@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""测试批量任务源（完整 JSON 列表 / 流式 CSV 引用）"""
+
+import json
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from nodes.Utils.csv_reader import CSVBatchReader
+from nodes.Utils.task_source import TaskSource, load_tasks, parse_source
+from nodes.Veo3 import csv_concurrent_processor as veo_csv
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / "tasks.csv"
+    lines = ["prompt,model"] + [f"prompt {i} ,veo3.1" for i in range(1, 8)]
+    lines.insert(3, ",")  # 空行应被跳过
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return path
+
+
+def test_reader_json_mode_unchanged(csv_file):
+    """默认模式仍输出完整 JSON 任务列表"""
+    (tasks_json,) = CSVBatchReader().read_csv(csv_path=str(csv_file))
+    tasks = json.loads(tasks_json)
+    assert len(tasks) == 7
+    assert tasks[0] == {"prompt": "prompt 1", "model": "veo3.1", "_row_number": 2}
+    assert parse_source(tasks_json) is None
+
+
+def test_reader_streaming_mode_returns_reference(csv_file):
+    """流式模式只输出文件引用，处理器按行读取得到相同的任务"""
+    (ref,) = CSVBatchReader().read_csv(csv_path=str(csv_file), streaming=True)
+    assert parse_source(ref)["path"] == str(csv_file)
+    assert len(ref) < 300
+
+    source = TaskSource.from_input(ref)
+    assert source.streaming and source.total is None
+    assert list(source) == json.loads(CSVBatchReader().read_csv(csv_path=str(csv_file))[0])
+    assert load_tasks(ref) == list(source)
+
+
+def test_chunks_are_bounded(csv_file):
+    """按窗口分批读取，每批不超过窗口大小"""
+    (ref,) = CSVBatchReader().read_csv(csv_path=str(csv_file), streaming=True)
+    sizes = [len(chunk) for chunk in TaskSource.from_input(ref).chunks(3)]
+    assert sizes == [3, 3, 1]
+    assert [len(c) for c in TaskSource.from_input(json.dumps([{"prompt": "a"}] * 4)).chunks(3)] == [3, 1]
+
+
+def test_empty_csv_rejected_in_streaming_mode(tmp_path):
+    """只有表头的 CSV 在流式模式下同样报错"""
+    path = tmp_path / "empty.csv"
+    path.write_text("prompt\n", encoding="utf-8")
+    with pytest.raises(RuntimeError, match="没有有效的任务数据"):
+        CSVBatchReader().read_csv(csv_path=str(path), streaming=True)
+
+
+def test_csv_processor_consumes_stream_in_windows(csv_file):
+    """CSV 并发处理器逐批读取流式任务源，序号连续且总数在读完后确定"""
+    (ref,) = CSVBatchReader().read_csv(csv_path=str(csv_file), streaming=True)
+    seen = []
+
+    def _fake(task_idx, task, *args):
+        seen.append((task_idx, task["prompt"]))
+        return {"task_idx": task_idx, "row": task["_row_number"], "status": "completed",
+                "prompt": task["prompt"], "local_path": f"v{task_idx}.mp4"}
+
+    with patch.object(veo_csv, "_process_one_task", side_effect=_fake), \
+            patch.object(veo_csv.BatchProcessState, "_save_state"):
+        report, _, detail = veo_csv.VeoCSVConcurrentProcessor().process(ref, "key", batch_size=3)
+
+    assert sorted(seen) == [(i, f"prompt {i}") for i in range(1, 8)]
+    assert json.loads(detail)["total"] == 7
+    assert "总计: 7" in report
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""测试上传去重索引（内容哈希 → 图床 URL）"""
+
+import json
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from nodes.Grok import dir_batch_image2video as grok_dir
+from nodes.Utils import batch_image_uploader
+from nodes.Utils.upload_index import UploadIndex, upload_key
+
+
+@pytest.fixture
+def index(tmp_path):
+    """隔离的上传索引：数据库指向临时目录"""
+    idx = UploadIndex()
+    idx.close()
+    with patch.object(idx, "db_file", tmp_path / "upload_index.db"), \
+            patch.object(idx, "ttl_seconds", 3600):
+        yield idx
+        idx.close()
+
+
+def _fake_post(calls):
+    def _post(url, headers=None, files=None, timeout=None, **kwargs):
+        calls.append(files["file"][0])
+        resp = MagicMock(status_code=200)
+        resp.json.return_value = {"url": f"https://cdn.example.com/{len(calls)}/{files['file'][0]}"}
+        return resp
+    return _post
+
+
+def test_file_digest_reused_until_file_changes(index, tmp_path):
+    """文件未修改时使用记录的哈希，内容变化后哈希随之变化"""
+    f = tmp_path / "a.bin"
+    f.write_bytes(b"one")
+    first = index.file_digest(f)
+    with patch("builtins.open", side_effect=AssertionError("不应重新读取文件")):
+        assert index.file_digest(f) == first
+
+    f.write_bytes(b"two!")
+    assert index.file_digest(f) != first
+
+
+def test_lookup_respects_ttl_and_variant(index):
+    """过期记录视为未命中；上传地址或编码参数不同得到不同的键"""
+    key = upload_key("digest", "https://up.example.com", "jpeg:90")
+    assert key != upload_key("digest", "https://up.example.com", "png:90")
+    assert key != upload_key("digest", "https://other.example.com", "jpeg:90")
+
+    index.record(key, "https://cdn.example.com/x.jpg", {"created": "1"})
+    assert index.lookup(key) == {"url": "https://cdn.example.com/x.jpg", "meta": {"created": "1"}}
+
+    with patch("nodes.Utils.upload_index.time.time", return_value=10 ** 12):
+        assert index.lookup(key) is None
+    assert index.lookup(key) is None
+
+
+def test_batch_uploader_skips_unchanged_files(index, tmp_path):
+    """第二次执行时未变化的图片直接复用 URL，只有修改过的图片重新上传"""
+    for i in range(3):
+        Image.new("RGB", (8, 8), (i * 40, 0, 0)).save(tmp_path / f"p{i}.png")
+
+    calls = []
+    node = batch_image_uploader.BatchImageUploader()
+    with patch.object(batch_image_uploader.http_transport, "post", side_effect=_fake_post(calls)):
+        first, _, _ = node.batch_upload(str(tmp_path), encode_workers=1)
+        Image.new("RGB", (8, 8), (255, 255, 255)).save(tmp_path / "p1.png")
+        second, details, count = node.batch_upload(str(tmp_path), encode_workers=1)
+
+    assert sorted(calls) == ["p0.jpg", "p1.jpg", "p1.jpg", "p2.jpg"]
+    first, second = json.loads(first), json.loads(second)
+    assert second[0] == first[0] and second[2] == first[2] and second[1] != first[1]
+    assert count == 3 and details.count("（复用）") == 2
+
+
+def test_dir_batch_upload_one_reuses_url(index, tmp_path):
+    """目录批量节点的单图上传同样按内容去重"""
+    img = tmp_path / "1.png"
+    Image.new("RGB", (8, 8)).save(img)
+    calls = []
+    with patch.object(grok_dir.http_transport, "post", side_effect=_fake_post(calls)):
+        url1 = grok_dir._upload_one(img, "https://up.example.com", "jpeg", 90, 10)
+        url2 = grok_dir._upload_one(img, "https://up.example.com", "jpeg", 90, 10)
+        url3 = grok_dir._upload_one(img, "https://up.example.com", "png", 90, 10)
+    assert url1 == url2 != url3
+    assert len(calls) == 2
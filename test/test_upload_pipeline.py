@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""测试图片编码/上传流水线"""
+
+import io
+import json
+import os
+import sys
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from nodes.Utils import batch_image_uploader
+from nodes.Utils.upload_pipeline import encode_image, run_pipeline
+
+
+@pytest.fixture
+def image_dir(tmp_path):
+    for i in range(1, 9):
+        mode = "RGBA" if i % 2 else "P"
+        Image.new(mode, (16, 16)).save(tmp_path / f"img{i:02d}.png")
+    (tmp_path / "broken.png").write_bytes(b"not an image")
+    (tmp_path / "notes.txt").write_text("skip", encoding="utf-8")
+    return tmp_path
+
+
+def test_encode_image_flattens_alpha_for_jpeg(image_dir):
+    """JPEG 编码时 RGBA 合成到白色背景，文件名与 MIME 类型与格式一致"""
+    name, data, mime = encode_image(str(image_dir / "img01.png"), "jpeg", 80)
+    assert (name, mime) == ("img01.jpg", "image/jpeg")
+    assert Image.open(io.BytesIO(data)).mode == "RGB"
+
+
+@pytest.mark.parametrize("encode_workers", [1, 2])
+def test_results_keep_input_order(image_dir, encode_workers):
+    """上传完成顺序被打乱时，结果仍按输入顺序返回，坏图只标记自身失败"""
+    paths = sorted(p for p in image_dir.iterdir() if p.suffix == ".png")
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def _upload(filename, data, mime):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        # 序号越小上传越慢，使完成顺序与输入顺序相反
+        time.sleep(0.02 * (10 - int(filename[3:5] or 0)) / 10)
+        with lock:
+            active[0] -= 1
+        return f"https://cdn.example.com/{filename}"
+
+    results = run_pipeline(paths, _upload, fmt="png", encode_workers=encode_workers, upload_workers=4)
+
+    assert [r["index"] for r in results] == list(range(1, len(paths) + 1))
+    assert results[0]["path"].name == "broken.png" and results[0]["error"]
+    assert [r["url"] for r in results[1:]] == [f"https://cdn.example.com/img{i:02d}.png" for i in range(1, 9)]
+    assert 1 < peak[0] <= 4
+
+
+def test_node_outputs_urls_in_file_order(image_dir):
+    """节点输出的 URL 列表与详情按文件名顺序排列，失败项不影响其他图片"""
+    def _post(url, headers=None, files=None, timeout=None):
+        name = files["file"][0]
+        resp = MagicMock(status_code=200)
+        resp.json.return_value = {"url": f"https://cdn.example.com/{name}"}
+        return resp
+
+    with patch.object(batch_image_uploader.http_transport, "post", side_effect=_post):
+        urls_json, details, count = batch_image_uploader.BatchImageUploader().batch_upload(
+            str(image_dir), upload_workers=3, encode_workers=2, dedupe=False)
+
+    assert count == 8
+    assert json.loads(urls_json) == [f"https://cdn.example.com/img{i:02d}.jpg" for i in range(1, 9)]
+    lines = details.splitlines()
+    assert lines[lines.index("上传详情:") + 1].startswith("✗ broken.png")
+    assert "失败: 1 个" in details
@@ -8,6 +8,39 @@ import { app } from "../../scripts/app.js";
 // 全局状态
 let monitorPanel = null;
 let isMonitoring = false;
+// session_id → 合并后的会话数据（多个批量节点可同时运行）
+const sessions = {};
+let hideTimer = null;
+// 每个会话在前端保留的日志条数
+const MAX_SESSION_LOGS = 200;
+
+/**
+ * 合并推送数据：full 消息替换会话数据，diff 消息只更新变化的任务并追加新日志
+ */
+function mergeSession(data) {
+    const prev = sessions[data.session_id];
+    const session = (data.diff && prev) ? prev : { taskMap: {}, logs: [] };
+    if (!data.diff || !prev) {
+        session.taskMap = {};
+        session.logs = [];
+    }
+
+    for (const key of Object.keys(data)) {
+        if (key !== "tasks" && key !== "logs") {
+            session[key] = data[key];
+        }
+    }
+    (data.tasks || []).forEach(task => {
+        session.taskMap[task.idx] = task;
+    });
+    session.logs = session.logs.concat(data.logs || []).slice(-MAX_SESSION_LOGS);
+
+    // 最新任务在前（更新时间相同按序号倒序）
+    session.tasks = Object.values(session.taskMap).sort((a, b) =>
+        (b.update_time || "").localeCompare(a.update_time || "") || (b.idx - a.idx)
+    );
+    sessions[data.session_id] = session;
+}
 
 /**
  * 创建浮动监控面板
@@ -116,13 +149,18 @@ function makeDraggable(element, handle) {
 }
 
 /**
- * 更新监控面板内容
+ * 更新监控面板内容（记录该会话的最新数据并重新渲染全部会话）
  */
 function updateMonitorPanel(data) {
     const panel = createMonitorPanel();
     const content = document.getElementById("kuai-monitor-content");
 
-    if (!data || !data.session_id) {
+    if (data && data.session_id) {
+        mergeSession(data);
+    }
+
+    const list = Object.values(sessions).sort((a, b) => (b.start_time || "").localeCompare(a.start_time || ""));
+    if (list.length === 0) {
         content.innerHTML = `
             <div style="text-align: center; padding: 20px; color: #888;">
                 暂无批量处理任务运行
@@ -134,7 +172,41 @@ function updateMonitorPanel(data) {
     // 显示面板
     panel.style.display = "block";
     isMonitoring = true;
+    if (hideTimer) {
+        clearTimeout(hideTimer);
+        hideTimer = null;
+    }
+
+    content.innerHTML = list.map(renderSession).join(
+        '<div style="border-top: 1px dashed #444; margin: 15px 0;"></div>'
+    );
+
+    // 自动滚动日志到底部
+    content.querySelectorAll(".kuai-monitor-logs").forEach(el => {
+        el.scrollTop = el.scrollHeight;
+    });
+
+    // 全部会话完成后，3秒后自动隐藏并清除已完成的会话
+    if (list.every(s => s.session_completed)) {
+        hideTimer = setTimeout(() => {
+            hideTimer = null;
+            if (panel.style.display !== "none") {
+                panel.style.display = "none";
+                isMonitoring = false;
+            }
+            for (const id of Object.keys(sessions)) {
+                if (sessions[id].session_completed) {
+                    delete sessions[id];
+                }
+            }
+        }, 3000);
+    }
+}
 
+/**
+ * 渲染单个会话
+ */
+function renderSession(data) {
     // 计算进度
     const progress = data.progress || 0;
     const total = data.total || 0;
@@ -148,6 +220,8 @@ function updateMonitorPanel(data) {
     const avgDuration = stats.avg_duration || 0;
     const successRate = stats.success_rate || 0;
     const estimatedRemaining = stats.estimated_remaining || 0;
+    const p95Duration = stats.p95_duration || 0;
+    const throughput = stats.throughput_per_min || 0;
 
     // 格式化时间
     const formatTime = (seconds) => {
@@ -193,6 +267,14 @@ function updateMonitorPanel(data) {
                 <div style="color: #888; font-size: 10px;">预计剩余</div>
                 <div style="font-size: 16px; font-weight: bold;">${formatTime(estimatedRemaining)}</div>
             </div>
+            <div style="background: #1a1a1a; padding: 8px; border-radius: 4px;">
+                <div style="color: #888; font-size: 10px;">P95 耗时</div>
+                <div style="font-size: 16px; font-weight: bold;">${formatTime(p95Duration)}</div>
+            </div>
+            <div style="background: #1a1a1a; padding: 8px; border-radius: 4px;">
+                <div style="color: #888; font-size: 10px;">吞吐量</div>
+                <div style="font-size: 16px; font-weight: bold;">${throughput.toFixed(1)}/分钟</div>
+            </div>
         </div>
     `;
 
@@ -257,7 +339,7 @@ function updateMonitorPanel(data) {
 
     // 生成详细日志
     let logsHtml = '<div style="margin-top: 15px;"><div style="color: #888; margin-bottom: 8px; font-weight: bold;">详细日志:</div>';
-    logsHtml += '<div id="kuai-monitor-logs" style="background: #1a1a1a; padding: 10px; border-radius: 4px; max-height: 150px; overflow-y: auto; font-size: 10px;">';
+    logsHtml += '<div class="kuai-monitor-logs" style="background: #1a1a1a; padding: 10px; border-radius: 4px; max-height: 150px; overflow-y: auto; font-size: 10px;">';
 
     const logs = data.logs || [];
     if (logs.length > 0) {
@@ -281,7 +363,7 @@ function updateMonitorPanel(data) {
     logsHtml += '</div></div>';
 
     // 组合所有内容
-    content.innerHTML = `
+    return `
         <div style="color: #888; font-size: 10px; margin-bottom: 10px;">
             会话: ${data.session_id}<br>
             开始: ${data.start_time} | 更新: ${data.last_update}
@@ -292,22 +374,6 @@ function updateMonitorPanel(data) {
         ${tasksHtml}
         ${logsHtml}
     `;
-
-    // 自动滚动日志到底部
-    const logsContainer = document.getElementById("kuai-monitor-logs");
-    if (logsContainer) {
-        logsContainer.scrollTop = logsContainer.scrollHeight;
-    }
-
-    // 如果会话完成，3秒后自动隐藏
-    if (data.completed) {
-        setTimeout(() => {
-            if (panel.style.display !== "none") {
-                panel.style.display = "none";
-                isMonitoring = false;
-            }
-        }, 3000);
-    }
 }
 
 /**